@@ -358,11 +358,13 @@ class ServersController(wsgi.Controller):
 
         limit, marker = common.get_limit_and_marker(req)
         sort_keys, sort_dirs = common.get_sort_params(req.params)
+        # The index only shows the id and the name of the servers
+        fields = None if is_detail else ['display_name']
         try:
             instance_list = self.compute_api.get_all(context,
                     search_opts=search_opts, limit=limit, marker=marker,
                     want_objects=True, expected_attrs=['pci_devices'],
-                    sort_keys=sort_keys, sort_dirs=sort_dirs)
+                    sort_keys=sort_keys, sort_dirs=sort_dirs, fields=fields)
         except exception.MarkerNotFound:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
@@ -103,8 +103,42 @@ class SimpleTenantUsageController(wsgi.Controller):
 
         return flavor_ref
 
+    def _new_summary(self, tenant_id, period_start, period_stop, detailed):
+        summary = {}
+        summary['tenant_id'] = tenant_id
+        if detailed:
+            summary['server_usages'] = []
+        summary['total_local_gb_usage'] = 0
+        summary['total_vcpus_usage'] = 0
+        summary['total_memory_mb_usage'] = 0
+        summary['total_hours'] = 0
+        summary['start'] = timeutils.normalize_time(period_start)
+        summary['stop'] = timeutils.normalize_time(period_stop)
+        return summary
+
+    def _tenant_summaries_for_period(self, context, period_start,
+                                     period_stop, tenant_id=None):
+        # Without the server usages, only the totals of each tenant
+        # are needed, so they are summed up in the database rather than
+        # loading every instance active during the period.
+        usages = objects.InstanceList.get_usage_by_window(
+                        context, period_start, period_stop, tenant_id)
+        rval = []
+        for usage in usages:
+            summary = self._new_summary(usage['project_id'], period_start,
+                                        period_stop, False)
+            summary['total_local_gb_usage'] = usage['local_gb_hours']
+            summary['total_vcpus_usage'] = usage['vcpus_hours']
+            summary['total_memory_mb_usage'] = usage['memory_mb_hours']
+            summary['total_hours'] = usage['hours']
+            rval.append(summary)
+        return rval
+
     def _tenant_usages_for_period(self, context, period_start,
                                   period_stop, tenant_id=None, detailed=True):
+        if not detailed:
+            return self._tenant_summaries_for_period(context, period_start,
+                                                     period_stop, tenant_id)
 
         instances = objects.InstanceList.get_active_by_window_joined(
                         context, period_start, period_stop, tenant_id,
@@ -156,17 +190,8 @@ class SimpleTenantUsageController(wsgi.Controller):
             info['uptime'] = delta.days * 24 * 3600 + delta.seconds
 
             if info['tenant_id'] not in rval:
-                summary = {}
-                summary['tenant_id'] = info['tenant_id']
-                if detailed:
-                    summary['server_usages'] = []
-                summary['total_local_gb_usage'] = 0
-                summary['total_vcpus_usage'] = 0
-                summary['total_memory_mb_usage'] = 0
-                summary['total_hours'] = 0
-                summary['start'] = timeutils.normalize_time(period_start)
-                summary['stop'] = timeutils.normalize_time(period_stop)
-                rval[info['tenant_id']] = summary
+                rval[info['tenant_id']] = self._new_summary(
+                    info['tenant_id'], period_start, period_stop, detailed)
 
             summary = rval[info['tenant_id']]
             summary['total_local_gb_usage'] += info['local_gb'] * info['hours']
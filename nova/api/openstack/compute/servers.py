@@ -213,6 +213,8 @@ class Controller(wsgi.Controller):
         sort_keys, sort_dirs = None, None
         if self.ext_mgr.is_loaded('os-server-sort-keys'):
             sort_keys, sort_dirs = common.get_sort_params(req.params)
+        # The index only shows the id and the name of the servers
+        fields = None if is_detail else ['display_name']
         try:
             instance_list = self.compute_api.get_all(context,
                                                      search_opts=search_opts,
@@ -220,7 +222,8 @@ class Controller(wsgi.Controller):
                                                      marker=marker,
                                                      want_objects=True,
                                                      sort_keys=sort_keys,
-                                                     sort_dirs=sort_dirs)
+                                                     sort_dirs=sort_dirs,
+                                                     fields=fields)
         except exception.MarkerNotFound:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
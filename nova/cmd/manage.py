@@ -57,6 +57,7 @@ from __future__ import print_function
 import argparse
 import os
 import sys
+import time
 
 import decorator
 import netaddr
@@ -673,7 +674,7 @@ class VmCommands(object):
                                              _('index'))))
 
         if host is None:
-            instances = objects.InstanceList.get_by_filters(
+            instances = objects.InstanceList.iter_by_filters(
                 context.get_admin_context(), {}, expected_attrs=['flavor'])
         else:
             instances = objects.InstanceList.get_by_host(
@@ -915,18 +916,51 @@ class DbCommands(object):
         print(migration.db_version())
 
     @args('--max_rows', metavar='<number>',
-            help='Maximum number of deleted rows to archive')
-    def archive_deleted_rows(self, max_rows):
+            help='Maximum number of deleted rows to archive in a batch '
+                 '(default: 1000)')
+    @args('--until_complete', action='store_true', dest='until_complete',
+          help='Archive batches of deleted rows until none is left')
+    @args('--sleep', metavar='<seconds>',
+          help='Number of seconds to wait between two batches, to limit the '
+               'load on the database')
+    @args('--verbose', action='store_true', dest='verbose',
+          help='Print the number of rows archived from each table')
+    def archive_deleted_rows(self, max_rows, until_complete=False, sleep=None,
+                             verbose=False):
         """Move up to max_rows deleted rows from production tables to shadow
         tables.
+
+        The archived rows are removed from the production tables, so an
+        interrupted run can just be started again.
         """
         if max_rows is not None:
             max_rows = int(max_rows)
             if max_rows < 0:
                 print(_("Must supply a positive value for max_rows"))
                 return(1)
+        else:
+            max_rows = 1000
+        sleep = float(sleep) if sleep is not None else 0
         admin_context = context.get_admin_context()
-        db.archive_deleted_rows(admin_context, max_rows)
+        table_to_rows_archived = {}
+        while True:
+            rows_archived = db.archive_deleted_rows(admin_context, max_rows)
+            for tablename, rows in six.iteritems(rows_archived):
+                table_to_rows_archived[tablename] = (
+                    table_to_rows_archived.get(tablename, 0) + rows)
+            if not until_complete or not rows_archived:
+                break
+            print(_('Archived %(rows)d rows, %(total)d so far') %
+                  {'rows': sum(rows_archived.values()),
+                   'total': sum(table_to_rows_archived.values())})
+            if sleep:
+                time.sleep(sleep)
+
+        if verbose:
+            for tablename in sorted(table_to_rows_archived):
+                print(_('%(table)s: %(rows)d') %
+                      {'table': tablename,
+                       'rows': table_to_rows_archived[tablename]})
 
     @args('--delete', action='store_true', dest='delete',
           help='If specified, automatically delete any records found where '
@@ -972,6 +1006,27 @@ class DbCommands(object):
         print(_('%(total)i instances matched query, %(done)i completed'),
               {'total': match, 'done': done})
 
+    @args('--max-number', metavar='<number>',
+          help='Number of instances to rewrite in each batch')
+    def rebuild_system_metadata_blobs(self, max_number=None):
+        """Rewrite the system metadata blobs of all the instances from their
+        key/value rows.
+        """
+        max_number = int(max_number) if max_number is not None else 1000
+        if max_number <= 0:
+            print(_('Must supply a positive value for max_number'))
+            return(1)
+        admin_context = context.get_admin_context()
+        total = 0
+        marker = None
+        while True:
+            done, marker = db.instance_system_metadata_blobs_rebuild(
+                admin_context, max_number, marker=marker)
+            total += done
+            if done < max_number:
+                break
+        print(_('%(total)i instances done') % {'total': total})
+
 
 class AgentBuildCommands(object):
     """Class for managing agent builds."""
@@ -72,6 +72,7 @@ from nova.openstack.common import uuidutils
 from nova.pci import request as pci_request
 import nova.policy
 from nova import rpc
+from nova.scheduler import client as scheduler_client
 from nova import servicegroup
 from nova import utils
 from nova.virt import hardware
@@ -1958,7 +1959,7 @@ class API(base.Base):
 
     def get_all(self, context, search_opts=None, limit=None, marker=None,
                 want_objects=False, expected_attrs=None, sort_keys=None,
-                sort_dirs=None):
+                sort_dirs=None, fields=None):
         """Get all instances filtered by one of the given parameters.
 
         If there is no filter and the context is an admin, it will retrieve
@@ -1972,6 +1973,11 @@ class API(base.Base):
         secondary sort ket, etc.). For each sort key, the associated sort
         direction is based on the list of sort directions in the 'sort_dirs'
         parameter.
+
+        If 'fields' is given, only these fields of the instances are read
+        from the database, and only the optional fields in 'expected_attrs'
+        are joined. The other fields of the instance objects are loaded on
+        first access, so it is only useful with 'want_objects'.
         """
 
         # TODO(bcwaldon): determine the best argument for target here
@@ -2047,10 +2053,13 @@ class API(base.Base):
         if filter_ip and limit:
             LOG.debug('Removing limit for DB query due to IP filter')
             limit = None
+        if filter_ip and fields is not None:
+            # The IP filter reads the network info of the instances
+            expected_attrs = list(expected_attrs or []) + ['info_cache']
 
         inst_models = self._get_instances_by_filters(context, filters,
                 limit=limit, marker=marker, expected_attrs=expected_attrs,
-                sort_keys=sort_keys, sort_dirs=sort_dirs)
+                sort_keys=sort_keys, sort_dirs=sort_dirs, fields=fields)
 
         if filter_ip:
             inst_models = self._ip_filter(inst_models, filters, orig_limit)
@@ -2093,14 +2102,22 @@ class API(base.Base):
 
     def _get_instances_by_filters(self, context, filters,
                                   limit=None, marker=None, expected_attrs=None,
-                                  sort_keys=None, sort_dirs=None):
-        fields = ['metadata', 'system_metadata', 'info_cache',
-                  'security_groups']
+                                  sort_keys=None, sort_dirs=None,
+                                  fields=None):
+        if fields is None:
+            attrs = ['metadata', 'system_metadata', 'info_cache',
+                     'security_groups']
+        else:
+            attrs = []
         if expected_attrs:
-            fields.extend(expected_attrs)
+            attrs.extend(expected_attrs)
+        kwargs = {}
+        if fields is not None:
+            kwargs['fields'] = fields
         return objects.InstanceList.get_by_filters(
             context, filters=filters, limit=limit, marker=marker,
-            expected_attrs=fields, sort_keys=sort_keys, sort_dirs=sort_dirs)
+            expected_attrs=attrs, sort_keys=sort_keys, sort_dirs=sort_dirs,
+            **kwargs)
 
     # NOTE(melwitt): We don't check instance lock for backup because lock is
     #                intended to prevent accidental change/delete of instances
@@ -3507,6 +3524,7 @@ class AggregateAPI(base.Base):
     """Sub-set of the Compute Manager API for managing host aggregates."""
     def __init__(self, **kwargs):
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
+        self.scheduler_client = scheduler_client.SchedulerClient()
         super(AggregateAPI, self).__init__(**kwargs)
 
     @wrap_exception()
@@ -3518,6 +3536,7 @@ class AggregateAPI(base.Base):
         if availability_zone:
             aggregate.metadata = {'availability_zone': availability_zone}
         aggregate.create()
+        self.scheduler_client.update_aggregates(context, [aggregate])
         return aggregate
 
     def get_aggregate(self, context, aggregate_id):
@@ -3543,6 +3562,7 @@ class AggregateAPI(base.Base):
         # which stored availability_zones and host need to be reset
         if values.get('availability_zone'):
             availability_zones.reset_cache()
+        self.scheduler_client.update_aggregates(context, [aggregate])
         return aggregate
 
     @wrap_exception()
@@ -3556,6 +3576,14 @@ class AggregateAPI(base.Base):
         # which stored availability_zones and host need to be reset
         if metadata and metadata.get('availability_zone'):
             availability_zones.reset_cache()
+        self.scheduler_client.update_aggregates(context, [aggregate])
+        # NOTE: Fetch the images planned on the hosts of the aggregate with
+        # the context of this request, the periodic tasks of the hosts have
+        # no token to download them with.
+        image_ids = compute_utils.get_prefetch_images(metadata or {})
+        if image_ids:
+            for host in aggregate.hosts:
+                self.compute_rpcapi.prefetch_images(context, host, image_ids)
         return aggregate
 
     @wrap_exception()
@@ -3571,6 +3599,7 @@ class AggregateAPI(base.Base):
             raise exception.InvalidAggregateActionDelete(
                 aggregate_id=aggregate_id, reason=msg)
         aggregate.destroy()
+        self.scheduler_client.delete_aggregate(context, aggregate)
         compute_utils.notify_about_aggregate_update(context,
                                                     "delete.end",
                                                     aggregate_payload)
@@ -3683,6 +3712,7 @@ class AggregateAPI(base.Base):
                                   aggregate=aggregate)
 
         aggregate.add_host(context, host_name)
+        self.scheduler_client.update_aggregates(context, [aggregate])
         self._update_az_cache_for_host(context, host_name, aggregate.metadata)
         # NOTE(jogo): Send message to host to support resource pools
         self.compute_rpcapi.add_aggregate_host(context,
@@ -3705,6 +3735,7 @@ class AggregateAPI(base.Base):
         objects.Service.get_by_compute_host(context, host_name)
         aggregate = objects.Aggregate.get_by_id(context, aggregate_id)
         aggregate.delete_host(host_name)
+        self.scheduler_client.update_aggregates(context, [aggregate])
         self._update_az_cache_for_host(context, host_name, aggregate.metadata)
         self.compute_rpcapi.remove_aggregate_host(context,
                 aggregate=aggregate, host_param=host_name, host=host_name)
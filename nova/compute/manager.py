@@ -240,6 +240,8 @@ CONF.import_opt('enabled', 'nova.rdp', group='rdp')
 CONF.import_opt('html5_proxy_base_url', 'nova.rdp', group='rdp')
 CONF.import_opt('enabled', 'nova.console.serial', group='serial_console')
 CONF.import_opt('base_url', 'nova.console.serial', group='serial_console')
+CONF.import_opt('resource_tracker_audit_interval',
+                'nova.compute.resource_tracker')
 
 LOG = logging.getLogger(__name__)
 
@@ -590,7 +592,7 @@ class ComputeVirtAPI(virtapi.VirtAPI):
 class ComputeManager(manager.Manager):
     """Manages the running instances from creation to destruction."""
 
-    target = messaging.Target(version='3.39')
+    target = messaging.Target(version='3.40')
 
     # How long to wait in seconds before re-issuing a shutdown
     # signal to a instance during power off.  The overall
@@ -706,18 +708,14 @@ class ComputeManager(manager.Manager):
             pass
 
         # The driver doesn't support uuids listing, so we'll have
-        # to brute force.
-        driver_instances = self.driver.list_instances()
-        instances = objects.InstanceList.get_by_filters(context, filters,
-                                                        use_slave=True)
-        name_map = {instance.name: instance for instance in instances}
-        local_instances = []
-        for driver_instance in driver_instances:
-            instance = name_map.get(driver_instance)
-            if not instance:
-                continue
-            local_instances.append(instance)
-        return local_instances
+        # to brute force. The instances are read in batches since the
+        # filters may match many more instances than the driver has,
+        # like all the instances ever deleted on this host.
+        driver_instances = set(self.driver.list_instances())
+        return [instance for instance in
+                objects.InstanceList.iter_by_filters(context, filters,
+                                                     use_slave=True)
+                if instance.name in driver_instances]
 
     def _destroy_evacuated_instances(self, context):
         """Destroys evacuated instances.
@@ -1635,7 +1633,8 @@ class ComputeManager(manager.Manager):
                    'host': self.host}
 
         building_insts = objects.InstanceList.get_by_filters(context,
-                           filters, expected_attrs=[], use_slave=True)
+                           filters, expected_attrs=[], use_slave=True,
+                           fields=['created_at'])
 
         for instance in building_insts:
             if timeutils.is_older_than(instance.created_at, timeout):
@@ -5193,7 +5192,7 @@ class ComputeManager(manager.Manager):
 
         # NOTE(timello): make sure we update available resources on source
         # host even before next periodic task.
-        self.update_available_resource(ctxt)
+        self.update_available_resource(ctxt, force_audit=True)
 
         self._notify_about_instance_usage(ctxt, instance,
                                           "live_migration._post.end",
@@ -5266,6 +5265,12 @@ class ComputeManager(manager.Manager):
             instance.node = node_name
             instance.save(expected_task_state=task_states.MIGRATING)
 
+        # The resources of the instance were not claimed on this host, only
+        # an audit accounts for them. Do not wait for the next one when the
+        # audits are spaced.
+        if CONF.resource_tracker_audit_interval > 0:
+            self.update_available_resource(context, force_audit=True)
+
         # NOTE(vish): this is necessary to update dhcp
         self.network_api.setup_networks_on_host(context, instance, self.host)
         self._notify_about_instance_usage(
@@ -5601,11 +5606,14 @@ class ComputeManager(manager.Manager):
             return
 
         begin, end = utils.last_completed_audit_period()
-        instances = objects.InstanceList.get_active_by_window_joined(
+        # NOTE: The task log records the number of instances up front, then
+        # the instances are audited a batch at a time.
+        num_instances = objects.InstanceList.get_count_active_by_window(
+            context, begin, end, host=self.host, use_slave=True)
+        instances = objects.InstanceList.iter_active_by_window_joined(
             context, begin, end, host=self.host,
             expected_attrs=['system_metadata', 'info_cache', 'metadata'],
             use_slave=True)
-        num_instances = len(instances)
         errors = 0
         successes = 0
         LOG.info(_LI("Running instance usage audit for"
@@ -5791,10 +5799,19 @@ class ComputeManager(manager.Manager):
         number of virtual machines known by the database, we proceed in a lazy
         loop, one database record at a time, checking if the hypervisor has the
         same power state as is in the database.
+
+        When the driver can fetch the power states of all its instances at
+        once, only the instances whose power state drifted from that
+        snapshot are synced one by one.
         """
-        db_instances = objects.InstanceList.get_by_host(context, self.host,
-                                                        expected_attrs=[],
-                                                        use_slave=True)
+        db_instances = objects.InstanceList.get_by_host(
+            context, self.host, expected_attrs=[], use_slave=True,
+            fields=['uuid', 'power_state', 'vm_state', 'task_state'])
+
+        try:
+            vm_power_states = self.driver.get_all_instance_power_states()
+        except NotImplementedError:
+            vm_power_states = None
 
         num_vm_instances = self.driver.get_num_instances()
         num_db_instances = len(db_instances)
@@ -5825,6 +5842,10 @@ class ComputeManager(manager.Manager):
             self._syncs_in_progress.pop(db_instance.uuid)
 
         for db_instance in db_instances:
+            if vm_power_states is not None and self._power_state_in_sync(
+                    db_instance, vm_power_states.get(db_instance.uuid,
+                                                     power_state.NOSTATE)):
+                continue
             # process syncs asynchronously - don't want instance locking to
             # block entire periodic task thread
             uuid = db_instance.uuid
@@ -5835,6 +5856,40 @@ class ComputeManager(manager.Manager):
                 self._syncs_in_progress[uuid] = True
                 self._sync_power_pool.spawn_n(_sync, db_instance)
 
+    def _power_state_in_sync(self, db_instance, vm_power_state):
+        """Return True if syncing the power state of the instance would not
+        change anything, given the power state of its VM.
+
+        The instances with a pending task are never synced. Otherwise the
+        power state must match the database, and be one the vm_state is
+        expected to have, see _sync_instance_power_state().
+        """
+        if db_instance.task_state is not None:
+            return True
+        if vm_power_state != db_instance.power_state:
+            return False
+
+        vm_state = db_instance.vm_state
+        if vm_state in (vm_states.BUILDING,
+                        vm_states.RESCUED,
+                        vm_states.RESIZED,
+                        vm_states.SUSPENDED,
+                        vm_states.ERROR):
+            return True
+        elif vm_state == vm_states.ACTIVE:
+            return vm_power_state == power_state.RUNNING
+        elif vm_state == vm_states.STOPPED:
+            return vm_power_state in (power_state.NOSTATE,
+                                      power_state.SHUTDOWN,
+                                      power_state.CRASHED)
+        elif vm_state == vm_states.PAUSED:
+            return vm_power_state == power_state.PAUSED
+        elif vm_state in (vm_states.SOFT_DELETED,
+                          vm_states.DELETED):
+            return vm_power_state in (power_state.NOSTATE,
+                                      power_state.SHUTDOWN)
+        return False
+
     def _query_driver_power_state_and_sync(self, context, db_instance):
         if db_instance.task_state is not None:
             LOG.info(_LI("During sync_power_state the instance has a "
@@ -6049,19 +6104,21 @@ class ComputeManager(manager.Manager):
                                 e, instance=instance)
 
     @periodic_task.periodic_task
-    def update_available_resource(self, context):
+    def update_available_resource(self, context, force_audit=False):
         """See driver.get_available_resource()
 
         Periodic process that keeps that the compute host's understanding of
         resource availability and usage in sync with the underlying hypervisor.
 
         :param context: security context
+        :param force_audit: audit the resource usage even if the last audit
+                            is recent
         """
         new_resource_tracker_dict = {}
         nodenames = set(self.driver.get_available_nodes())
         for nodename in nodenames:
             rt = self._get_resource_tracker(nodename)
-            rt.update_available_resource(context)
+            rt.update_available_resource(context, force_audit=force_audit)
             new_resource_tracker_dict[nodename] = rt
 
         # Delete orphan compute node not reported by driver but still in db
@@ -6228,6 +6285,9 @@ class ComputeManager(manager.Manager):
                                     context,
                                     aggregate.delete_host,
                                     aggregate, host)
+        image_ids = compute_utils.get_prefetch_images(aggregate.metadata)
+        if image_ids:
+            self.prefetch_images(context, image_ids)
 
     @aggregate_object_compat
     @wrap_exception()
@@ -6248,6 +6308,16 @@ class ComputeManager(manager.Manager):
                                     aggregate, host,
                                     isinstance(e, exception.AggregateError))
 
+    @wrap_exception()
+    def prefetch_images(self, context, image_ids):
+        """Fetch images into the image cache of this host ahead of the
+        launches planned in one of its aggregates.
+        """
+        try:
+            self.driver.prefetch_images(context, image_ids)
+        except NotImplementedError:
+            LOG.debug('Hypervisor driver does not support prefetch_images')
+
     def _process_instance_event(self, instance, event):
         _event = self.instance_events.pop_instance_event(instance, event)
         if _event:
@@ -23,6 +23,7 @@ import copy
 from oslo_config import cfg
 from oslo_serialization import jsonutils
 from oslo_utils import importutils
+from oslo_utils import timeutils
 
 from nova.compute import claims
 from nova.compute import flavors
@@ -55,6 +56,14 @@ resource_tracker_opts = [
     cfg.ListOpt('compute_resources',
                 default=['vcpu'],
                 help='The names of the extra resources to track.'),
+    cfg.IntOpt('resource_tracker_audit_interval',
+               default=0,
+               help='Number of seconds between two audits of the resource '
+                    'usage of a compute node, which reload all its instances '
+                    'and migrations. Between the audits, the periodic task '
+                    'only reports the host metrics, and the usage is kept '
+                    'up to date by the claims, frees and migrations. 0 '
+                    'audits the usage on every run of the periodic task.'),
 ]
 
 CONF = cfg.CONF
@@ -88,6 +97,10 @@ class ResourceTracker(object):
             ext_resources.ResourceHandler(CONF.compute_resources)
         self.old_resources = {}
         self.scheduler_client = scheduler_client.SchedulerClient()
+        self.last_audit_at = None
+        # Incremented on each change of the usage, so that an audit can tell
+        # whether the instances and migrations it read are still current
+        self.usage_generation = 0
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def instance_claim(self, context, instance_ref, limits=None):
@@ -303,14 +316,21 @@ class ResourceTracker(object):
             notifier.info(context, 'compute.metrics.update', metrics_info)
         return metrics
 
-    def update_available_resource(self, context):
+    def update_available_resource(self, context, force_audit=False):
         """Override in-memory calculations of compute node resource usage based
         on data audited from the hypervisor layer.
 
         Add in resource claims in progress to account for operations that have
         declared a need for resources, but not necessarily retrieved them from
         the hypervisor layer yet.
+
+        Unless force_audit is set, the audit is skipped when the last one is
+        more recent than resource_tracker_audit_interval.
         """
+        if not force_audit and not self._audit_due():
+            self._update_metrics(context)
+            return
+
         LOG.audit(_("Auditing locally available compute resources"))
         resources = self.driver.get_available_resource(self.nodename)
 
@@ -340,8 +360,55 @@ class ResourceTracker(object):
 
         return self._update_available_resource(context, resources)
 
+    def _audit_due(self):
+        interval = CONF.resource_tracker_audit_interval
+        return (interval <= 0 or self.disabled or self.last_audit_at is None
+                or timeutils.is_older_than(self.last_audit_at, interval))
+
+    def _update_metrics(self, context):
+        """Report the host metrics between two audits."""
+        if not self.monitors:
+            return
+        metrics = self._get_host_metrics(context, self.nodename)
+        self._update_compute_node_metrics(context, metrics)
+
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _update_compute_node_metrics(self, context, metrics):
+        self.compute_node['metrics'] = jsonutils.dumps(metrics)
+        self._update(context, self.compute_node)
+
+    def _get_instances_and_migrations(self, context):
+        """Returns the instances and the in-progress migrations of the node.
+        """
+        instances = objects.InstanceList.get_by_host_and_node(
+            context, self.host, self.nodename,
+            expected_attrs=['system_metadata',
+                            'numa_topology'])
+        capi = self.conductor_api
+        migrations = capi.migration_get_in_progress_by_host_and_node(context,
+                self.host, self.nodename)
+        return instances, migrations
+
     def _update_available_resource(self, context, resources):
+        # The instances and migrations are read without holding the
+        # semaphore, so that the claims do not wait for the database. They
+        # are read again with the semaphore held if the usage changed
+        # meanwhile.
+        generation = self.usage_generation
+        instances, migrations = self._get_instances_and_migrations(context)
+        self._audit_usage(context, resources, generation, instances,
+                          migrations)
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _audit_usage(self, context, resources, generation, instances,
+                     migrations):
+        if generation != self.usage_generation:
+            LOG.debug("Resource usage changed during the audit of "
+                      "%(host)s:%(node)s, reading the instances again",
+                      {'host': self.host, 'node': self.nodename})
+            instances, migrations = self._get_instances_and_migrations(
+                context)
+
         if 'pci_passthrough_devices' in resources:
             if not self.pci_tracker:
                 self.pci_tracker = pci_manager.PciDevTracker()
@@ -357,20 +424,8 @@ class ResourceTracker(object):
 
             self.pci_tracker.set_hvdevs(devs)
 
-        # Grab all instances assigned to this node:
-        instances = objects.InstanceList.get_by_host_and_node(
-            context, self.host, self.nodename,
-            expected_attrs=['system_metadata',
-                            'numa_topology'])
-
         # Now calculate usage based on instance utilization:
         self._update_usage_from_instances(context, resources, instances)
-
-        # Grab all in-progress migrations:
-        capi = self.conductor_api
-        migrations = capi.migration_get_in_progress_by_host_and_node(context,
-                self.host, self.nodename)
-
         self._update_usage_from_migrations(context, resources, migrations)
 
         # Detect and account for orphaned instances that may exist on the
@@ -393,6 +448,7 @@ class ResourceTracker(object):
         metrics = self._get_host_metrics(context, self.nodename)
         resources['metrics'] = jsonutils.dumps(metrics)
         self._sync_compute_node(context, resources)
+        self.last_audit_at = timeutils.utcnow()
 
     def _sync_compute_node(self, context, resources):
         """Create or update the compute node DB record."""
@@ -539,6 +595,8 @@ class ResourceTracker(object):
 
     def _update(self, context, values):
         """Update partial stats locally and populate them to Scheduler."""
+        # Every change of the usage ends up here with the semaphore held
+        self.usage_generation += 1
         self._write_ext_resources(values)
         # NOTE(pmurray): the stats field is stored as a json string. The
         # json conversion will be done automatically by the ComputeNode object
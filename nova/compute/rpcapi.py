@@ -283,6 +283,7 @@ class ComputeAPI(object):
                  shelve_offload
         * 3.38 - Add clean_shutdown to prep_resize
         * 3.39 - Add quiesce_instance and unquiesce_instance methods
+        * 3.40 - Add prefetch_images
     '''
 
     VERSION_ALIASES = {
@@ -991,6 +992,15 @@ class ComputeAPI(object):
         cctxt.cast(ctxt, 'unquiesce_instance', instance=instance,
                    mapping=mapping)
 
+    def prefetch_images(self, ctxt, host, image_ids):
+        version = '3.40'
+        if not self.client.can_send_version(version):
+            LOG.debug('Not prefetching images on %s, the compute RPC API '
+                      'is capped below %s', host, version)
+            return
+        cctxt = self.client.prepare(server=host, version=version)
+        cctxt.cast(ctxt, 'prefetch_images', image_ids=image_ids)
+
 
 class SecurityGroupAPI(object):
     '''Client side of the security group rpc API.
@@ -257,6 +257,16 @@ def get_value_from_system_metadata(instance, key, type, default):
         return default
 
 
+def get_prefetch_images(metadata):
+    """Get the IDs of the images to prefetch listed in aggregate metadata.
+
+    @param metadata: The metadata of the aggregate
+    """
+    value = metadata.get('image_cache_prefetch') or ''
+    return [image_id.strip() for image_id in value.split(',')
+            if image_id.strip()]
+
+
 def notify_usage_exists(notifier, context, instance_ref, current_period=False,
                         ignore_missing_network_data=True,
                         system_metadata=None, extra_usage_info=None):
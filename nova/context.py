@@ -73,7 +73,7 @@ class RequestContext(object):
                  request_id=None, auth_token=None, overwrite=True,
                  quota_class=None, user_name=None, project_name=None,
                  service_catalog=None, instance_lock_checked=False,
-                 user_auth_plugin=None, **kwargs):
+                 user_auth_plugin=None, db_written=False, **kwargs):
         """:param read_deleted: 'no' indicates deleted records are hidden,
                 'yes' indicates deleted records are visible,
                 'only' indicates that *only* deleted records are visible.
@@ -84,6 +84,10 @@ class RequestContext(object):
            :param user_auth_plugin: The auth plugin for the current request's
                 authentication data.
 
+           :param db_written: Whether the request wrote to the master
+                database, after which its replica-safe reads go to the
+                master as well.
+
            :param kwargs: Extra arguments that might be present, but we ignore
                 because they possibly came in from older rpc messages.
         """
@@ -115,6 +119,7 @@ class RequestContext(object):
             self.service_catalog = []
 
         self.instance_lock_checked = instance_lock_checked
+        self.db_written = db_written
 
         # NOTE(markmc): this attribute is currently only used by the
         # rs_limits turnstile pre-processor.
@@ -168,6 +173,7 @@ class RequestContext(object):
                 'service_catalog': self.service_catalog,
                 'project_name': self.project_name,
                 'instance_lock_checked': self.instance_lock_checked,
+                'db_written': self.db_written,
                 'tenant': self.tenant,
                 'user': self.user}
 
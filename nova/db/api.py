@@ -115,6 +115,16 @@ def service_get_all_by_topic(context, topic):
     return IMPL.service_get_all_by_topic(context, topic)
 
 
+def service_get_all_by_topic_changed_since(context, topic, changes_since):
+    """Get all services for a given topic changed since a point in time.
+
+    Deleted and disabled services are returned too, so that callers
+    keeping track of services can notice them going away.
+    """
+    return IMPL.service_get_all_by_topic_changed_since(context, topic,
+                                                       changes_since)
+
+
 def service_get_all_by_host(context, host):
     """Get all services for a given host."""
     return IMPL.service_get_all_by_host(context, host)
@@ -204,6 +214,18 @@ def compute_node_get_all(context):
     return IMPL.compute_node_get_all(context)
 
 
+def compute_node_get_all_changed_since(context, changes_since):
+    """Get all computeNodes created, updated or deleted since a point in time.
+
+    :param context: The security context
+    :param changes_since: datetime after which the compute nodes were changed
+
+    :returns: List of dictionaries each containing compute node properties,
+              including the deleted ones
+    """
+    return IMPL.compute_node_get_all_changed_since(context, changes_since)
+
+
 def compute_node_get_all_by_host(context, host, use_slave=False):
     """Get compute nodes by host name
 
@@ -659,8 +681,12 @@ def instance_get_all(context, columns_to_join=None):
 
 def instance_get_all_by_filters(context, filters, sort_key='created_at',
                                 sort_dir='desc', limit=None, marker=None,
-                                columns_to_join=None, use_slave=False):
-    """Get all instances that match all filters."""
+                                columns_to_join=None, use_slave=False,
+                                columns=None):
+    """Get all instances that match all filters.
+
+    If columns is given, only these columns of the instances are read.
+    """
     # Note: This function exists for backwards compatibility since calls to
     # the instance layer coming in over RPC may specify the single sort
     # key/direction values; in this case, this function is invoked instead
@@ -669,44 +695,76 @@ def instance_get_all_by_filters(context, filters, sort_key='created_at',
                                             sort_dir, limit=limit,
                                             marker=marker,
                                             columns_to_join=columns_to_join,
-                                            use_slave=use_slave)
+                                            use_slave=use_slave,
+                                            columns=columns)
 
 
 def instance_get_all_by_filters_sort(context, filters, limit=None,
                                      marker=None, columns_to_join=None,
                                      use_slave=False, sort_keys=None,
-                                     sort_dirs=None):
+                                     sort_dirs=None, columns=None):
     """Get all instances that match all filters sorted by multiple keys.
 
-    sort_keys and sort_dirs must be a list of strings.
+    sort_keys and sort_dirs must be a list of strings. If columns is given,
+    only these columns of the instances are read.
     """
     return IMPL.instance_get_all_by_filters_sort(
         context, filters, limit=limit, marker=marker,
         columns_to_join=columns_to_join, use_slave=use_slave,
-        sort_keys=sort_keys, sort_dirs=sort_dirs)
+        sort_keys=sort_keys, sort_dirs=sort_dirs, columns=columns)
+
+
+def instance_count_active_by_window(context, begin, end=None,
+                                    project_id=None, host=None,
+                                    use_slave=False):
+    """Count the instances active during a certain time window.
+
+    Takes the filters of instance_get_active_by_window_joined.
+    """
+    return IMPL.instance_count_active_by_window(context, begin, end,
+                                                project_id, host,
+                                                use_slave=use_slave)
 
 
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None, host=None,
                                          use_slave=False,
-                                         columns_to_join=None):
+                                         columns_to_join=None,
+                                         limit=None, marker=None):
     """Get instances and joins active during a certain time window.
 
     Specifying a project_id will filter for a certain project.
     Specifying a host will filter for instances on a given compute host.
+    Specifying a limit returns at most that many instances, in id order,
+    after the instance whose uuid is the marker.
     """
     return IMPL.instance_get_active_by_window_joined(context, begin, end,
                                               project_id, host,
                                               use_slave=use_slave,
-                                              columns_to_join=columns_to_join)
+                                              columns_to_join=columns_to_join,
+                                              limit=limit, marker=marker)
+
+
+def instance_usage_get_by_window(context, begin, end, project_id=None):
+    """Get the usage of the instances active during a window per project.
+
+    Specifying a project_id will filter for a certain project.
+    """
+    return IMPL.instance_usage_get_by_window(context, begin, end,
+                                             project_id=project_id)
 
 
 def instance_get_all_by_host(context, host,
-                             columns_to_join=None, use_slave=False):
-    """Get all instances belonging to a host."""
+                             columns_to_join=None, use_slave=False,
+                             columns=None):
+    """Get all instances belonging to a host.
+
+    If columns is given, only these columns of the instances are read.
+    """
     return IMPL.instance_get_all_by_host(context, host,
                                          columns_to_join,
-                                         use_slave=use_slave)
+                                         use_slave=use_slave,
+                                         columns=columns)
 
 
 def instance_get_all_by_host_and_node(context, host, node,
@@ -1139,6 +1197,19 @@ def quota_reserve(context, resources, quotas, user_quotas, deltas, expire,
                               project_id=project_id, user_id=user_id)
 
 
+def quota_reserve_optimistic(context, resources, quotas, user_quotas, deltas,
+                             expire, until_refresh, max_age, project_id=None,
+                             user_id=None):
+    """Check quotas and create appropriate reservations without locking
+    the quota usages.
+    """
+    return IMPL.quota_reserve_optimistic(context, resources, quotas,
+                                         user_quotas, deltas, expire,
+                                         until_refresh, max_age,
+                                         project_id=project_id,
+                                         user_id=user_id)
+
+
 def reservation_commit(context, reservations, project_id=None, user_id=None):
     """Commit quota reservations."""
     return IMPL.reservation_commit(context, reservations,
@@ -1153,6 +1224,22 @@ def reservation_rollback(context, reservations, project_id=None, user_id=None):
                                      user_id=user_id)
 
 
+def reservation_commit_optimistic(context, reservations, project_id=None,
+                                  user_id=None):
+    """Commit quota reservations without locking the quota usages."""
+    return IMPL.reservation_commit_optimistic(context, reservations,
+                                              project_id=project_id,
+                                              user_id=user_id)
+
+
+def reservation_rollback_optimistic(context, reservations, project_id=None,
+                                    user_id=None):
+    """Roll back quota reservations without locking the quota usages."""
+    return IMPL.reservation_rollback_optimistic(context, reservations,
+                                                project_id=project_id,
+                                                user_id=user_id)
+
+
 def quota_destroy_all_by_project_and_user(context, project_id, user_id):
     """Destroy all quotas associated with a given project and user."""
     return IMPL.quota_destroy_all_by_project_and_user(context,
@@ -1617,6 +1704,16 @@ def instance_system_metadata_update(context, instance_uuid, metadata, delete):
             context, instance_uuid, metadata, delete)
 
 
+def instance_system_metadata_blobs_rebuild(context, max_count, marker=None):
+    """Rewrite the system metadata blobs of up to max_count instances from
+    their key/value rows, starting after the instance with id marker.
+
+    :returns: the number of instances done and the id of the last one
+    """
+    return IMPL.instance_system_metadata_blobs_rebuild(context, max_count,
+                                                       marker=marker)
+
+
 ####################
 
 
@@ -1932,7 +2029,7 @@ def archive_deleted_rows(context, max_rows=None):
     """Move up to max_rows rows from production tables to corresponding shadow
     tables.
 
-    :returns: number of rows archived.
+    :returns: dict of the number of rows archived by table name.
     """
     return IMPL.archive_deleted_rows(context, max_rows=max_rows)
 
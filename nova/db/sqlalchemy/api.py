@@ -30,24 +30,31 @@ from oslo_config import cfg
 from oslo_db import exception as db_exc
 from oslo_db.sqlalchemy import session as db_session
 from oslo_db.sqlalchemy import utils as sqlalchemyutils
+from oslo_serialization import jsonutils
 from oslo_utils import excutils
 from oslo_utils import timeutils
 import retrying
 import six
 from sqlalchemy import and_
+from sqlalchemy import event
 from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy import Float
 from sqlalchemy import MetaData
 from sqlalchemy import or_
 from sqlalchemy.orm import aliased
+from sqlalchemy.orm import attributes
 from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import joinedload_all
+from sqlalchemy.orm import load_only
 from sqlalchemy.orm import noload
 from sqlalchemy.orm import undefer
 from sqlalchemy.schema import Table
 from sqlalchemy import sql
 from sqlalchemy.sql.expression import asc
 from sqlalchemy.sql.expression import desc
+from sqlalchemy.sql.expression import FunctionElement
 from sqlalchemy.sql import false
 from sqlalchemy.sql import func
 from sqlalchemy.sql import null
@@ -70,6 +77,24 @@ db_opts = [
                help='When set, compute API will consider duplicate hostnames '
                     'invalid within the specified scope, regardless of case. '
                     'Should be empty, "project" or "global".'),
+    cfg.BoolOpt('read_system_metadata_blob',
+                default=False,
+                help='Read the system metadata of the listed instances from '
+                     'the single blob kept with each instance rather than '
+                     'from its key/value rows. Only enable it once all the '
+                     'services writing to the database keep the blob up to '
+                     'date and "nova-manage db rebuild_system_metadata_blobs"'
+                     ' has been run. The blob is written on top of the rows '
+                     'whatever this option, so each change of the system '
+                     'metadata costs an UPDATE of instance_extra, and the '
+                     'reads of a single instance still join the rows.'),
+    cfg.BoolOpt('route_reads_to_slave',
+                default=False,
+                help='Send the DB API reads that tolerate replication lag to '
+                     'the slave database set by [database]slave_connection. '
+                     'The reads of the records a request may have just '
+                     'written go to the slave only until the request writes '
+                     'to the database.'),
 ]
 
 CONF = cfg.CONF
@@ -88,7 +113,10 @@ def _create_facade_lazily():
     if _ENGINE_FACADE is None:
         with _LOCK:
             if _ENGINE_FACADE is None:
-                _ENGINE_FACADE = db_session.EngineFacade.from_config(CONF)
+                facade = db_session.EngineFacade.from_config(CONF)
+                event.listen(facade.get_engine(), 'before_cursor_execute',
+                             _mark_context_written)
+                _ENGINE_FACADE = facade
     return _ENGINE_FACADE
 
 
@@ -99,9 +127,99 @@ def get_engine(use_slave=False):
 
 def get_session(use_slave=False, **kwargs):
     facade = _create_facade_lazily()
+    use_slave = use_slave or getattr(_ROUTING, 'use_slave', False)
     return facade.get_session(use_slave=use_slave, **kwargs)
 
 
+# Read policies of the DB API functions. The functions without one always
+# read from the master database.
+READ_SLAVE = 'slave'
+READ_MASTER = 'master'
+READ_YOUR_WRITES = 'read_your_writes'
+
+# The context of the DB API call in progress in this thread and whether its
+# sessions connect to the slave database.
+_ROUTING = threading.local()
+
+_WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def _read_policy(policy):
+    """Decorator routing the sessions of a DB API read by its policy.
+
+    READ_SLAVE reads tolerate replication lag and go to the slave database.
+    READ_YOUR_WRITES reads go to the slave database until the context has
+    written to the master, after which they stay on the master so that the
+    request sees its own writes. READ_MASTER reads always go to the master.
+
+    Reads made from within another DB API call keep the routing of that call.
+    Nothing is routed to the slave unless route_reads_to_slave is set.
+
+    The first argument to the wrapped function must be the context.
+    """
+
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(context, *args, **kwargs):
+            if policy == READ_MASTER:
+                use_slave = False
+            elif getattr(_ROUTING, 'context', None) is not None:
+                # Nested in another DB API call, which may have written
+                return f(context, *args, **kwargs)
+            elif policy == READ_YOUR_WRITES:
+                use_slave = (CONF.route_reads_to_slave and
+                             not getattr(context, 'db_written', False))
+            else:
+                use_slave = CONF.route_reads_to_slave
+
+            previous = getattr(_ROUTING, 'use_slave', False)
+            _ROUTING.use_slave = use_slave
+            try:
+                return f(context, *args, **kwargs)
+            finally:
+                _ROUTING.use_slave = previous
+        return wrapper
+    return decorator
+
+
+def _call_with_context(f, context, args, kwargs):
+    """Call a DB API function, remembering the context of the outer call."""
+    if getattr(_ROUTING, 'context', None) is not None:
+        return f(*args, **kwargs)
+    _ROUTING.context = context
+    try:
+        return f(*args, **kwargs)
+    finally:
+        _ROUTING.context = None
+
+
+def _mark_context_written(conn, cursor, statement, parameters, context,
+                          executemany):
+    """Pin the context of the current DB API call to the master database.
+
+    Listens to the statements executed on the master engine.
+    """
+    request_context = getattr(_ROUTING, 'context', None)
+    if (request_context is not None and
+            statement.lstrip()[:7].upper().startswith(_WRITE_STATEMENTS)):
+        request_context.db_written = True
+
+
+def _track_writes(f):
+    """Decorator pinning the context to the master once the call writes.
+
+    For the DB API functions which do not check the context with
+    require_context or require_admin_context, which already do so.
+
+    The first argument to the wrapped function must be the context.
+    """
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        return _call_with_context(f, args[0], args, kwargs)
+    return wrapper
+
+
 _SHADOW_TABLE_PREFIX = 'shadow_'
 _DEFAULT_QUOTA_NAME = 'default'
 PER_PROJECT_QUOTAS = ['fixed_ips', 'floating_ips', 'networks']
@@ -122,7 +240,7 @@ def require_admin_context(f):
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
         nova.context.require_admin_context(args[0])
-        return f(*args, **kwargs)
+        return _call_with_context(f, args[0], args, kwargs)
     return wrapper
 
 
@@ -140,7 +258,7 @@ def require_context(f):
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
         nova.context.require_context(args[0])
-        return f(*args, **kwargs)
+        return _call_with_context(f, args[0], args, kwargs)
     return wrapper
 
 
@@ -259,6 +377,13 @@ def convert_objects_related_datetimes(values, *datetime_keys):
     return values
 
 
+def _changed_since_filter(model, changes_since):
+    """Match the rows of model created, updated or deleted since a time."""
+    return or_(model.created_at >= changes_since,
+               model.updated_at >= changes_since,
+               model.deleted_at >= changes_since)
+
+
 def _sync_instances(context, project_id, user_id, session):
     return dict(zip(('instances', 'cores', 'ram'),
                     _instance_data_get_for_user(
@@ -379,6 +504,7 @@ def service_get(context, service_id, use_slave=False):
                         use_slave=use_slave)
 
 
+@_read_policy(READ_SLAVE)
 @require_admin_context
 def service_get_all(context, disabled=None):
     query = model_query(context, models.Service)
@@ -397,6 +523,15 @@ def service_get_all_by_topic(context, topic):
                 all()
 
 
+@require_admin_context
+def service_get_all_by_topic_changed_since(context, topic, changes_since):
+    changes_since = timeutils.normalize_time(changes_since)
+    return model_query(context, models.Service, read_deleted="yes").\
+                filter_by(topic=topic).\
+                filter(_changed_since_filter(models.Service, changes_since)).\
+                all()
+
+
 @require_admin_context
 def service_get_by_host_and_topic(context, host, topic):
     return model_query(context, models.Service, read_deleted="no").\
@@ -523,11 +658,20 @@ def compute_node_get_all_by_host(context, host, use_slave=False):
     return result
 
 
+@_read_policy(READ_SLAVE)
 @require_admin_context
 def compute_node_get_all(context):
     return model_query(context, models.ComputeNode, read_deleted='no').all()
 
 
+@require_admin_context
+def compute_node_get_all_changed_since(context, changes_since):
+    changes_since = timeutils.normalize_time(changes_since)
+    return model_query(context, models.ComputeNode, read_deleted='yes').\
+            filter(_changed_since_filter(models.ComputeNode, changes_since)).\
+            all()
+
+
 @require_admin_context
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
@@ -686,6 +830,7 @@ def floating_ip_get_pools(context):
 @_retry_on_deadlock
 @retrying.retry(stop_max_attempt_number=5, retry_on_exception=
                 lambda e: isinstance(e, exception.FloatingIpAllocateFailed))
+@_track_writes
 def floating_ip_allocate_address(context, project_id, pool,
                                  auto_assigned=False):
     nova.context.authorize_project_context(context, project_id)
@@ -1073,6 +1218,7 @@ def fixed_ip_associate(context, address, instance_uuid, network_id=None,
 @_retry_on_deadlock
 @retrying.retry(stop_max_attempt_number=5, retry_on_exception=
                 lambda exc: isinstance(exc, exception.FixedIpAssociateFailed))
+@_track_writes
 def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
                             host=None):
     if instance_uuid and not uuidutils.is_uuid_like(instance_uuid):
@@ -1535,6 +1681,8 @@ def instance_create(context, values):
     values['metadata'] = _metadata_refs(
             values.get('metadata'), models.InstanceMetadata)
 
+    system_metadata_blob = _system_metadata_blob(
+        values.get('system_metadata') or {})
     values['system_metadata'] = _metadata_refs(
             values.get('system_metadata'), models.InstanceSystemMetadata)
     _handle_objects_related_type_conversions(values)
@@ -1552,6 +1700,7 @@ def instance_create(context, values):
         {'numa_topology': None,
          'pci_requests': None,
          'vcpu_model': None,
+         'system_metadata': system_metadata_blob,
          })
     instance_ref['extra'].update(values.pop('extra', {}))
     instance_ref.update(values)
@@ -1635,6 +1784,7 @@ def instance_destroy(context, instance_uuid, constraint=None):
     return instance_ref
 
 
+@_read_policy(READ_YOUR_WRITES)
 @require_context
 def instance_get_by_uuid(context, uuid, columns_to_join=None, use_slave=False):
     return _instance_get_by_uuid(context, uuid,
@@ -1655,6 +1805,7 @@ def _instance_get_by_uuid(context, uuid, session=None,
     return result
 
 
+@_read_policy(READ_YOUR_WRITES)
 @require_context
 def instance_get(context, instance_id, columns_to_join=None):
     try:
@@ -1697,7 +1848,7 @@ def _build_instance_get(context, session=None,
 
 
 def _instances_fill_metadata(context, instances,
-                             manual_joins=None, use_slave=False):
+                             manual_joins=None, use_slave=False, keys=None):
     """Selectively fill instances with manually-joined metadata. Note that
     instance will be converted to a dict.
 
@@ -1706,6 +1857,8 @@ def _instances_fill_metadata(context, instances,
     :param manual_joins: list of tables to manually join (can be any
                          combination of 'metadata' and 'system_metadata' or
                          None to take the default of both)
+    :param keys: list of the columns and relationships to copy from the
+                 instances, or None to copy all of them
     """
     uuids = [inst['uuid'] for inst in instances]
 
@@ -1720,7 +1873,13 @@ def _instances_fill_metadata(context, instances,
 
     sys_meta = collections.defaultdict(list)
     if 'system_metadata' in manual_joins:
-        for row in _instance_system_metadata_get_multi(context, uuids,
+        row_uuids = uuids
+        if CONF.read_system_metadata_blob:
+            sys_meta.update(_instance_system_metadata_get_blobs(
+                context, uuids, use_slave=use_slave))
+            row_uuids = [inst_uuid for inst_uuid in uuids
+                         if inst_uuid not in sys_meta]
+        for row in _instance_system_metadata_get_multi(context, row_uuids,
                                                        use_slave=use_slave):
             sys_meta[row['instance_uuid']].append(row)
 
@@ -1731,7 +1890,10 @@ def _instances_fill_metadata(context, instances,
 
     filled_instances = []
     for inst in instances:
-        inst = dict(inst.iteritems())
+        if keys is None:
+            inst = dict(inst.iteritems())
+        else:
+            inst = {key: inst[key] for key in keys}
         inst['system_metadata'] = sys_meta[inst['uuid']]
         inst['metadata'] = meta[inst['uuid']]
         if 'pci_devices' in manual_joins:
@@ -1764,6 +1926,24 @@ def _manual_join_columns(columns_to_join):
     return manual_joins, columns_to_join_new
 
 
+def _instance_projection(columns, columns_to_join):
+    """Return the columns to load for a projected instance query and the keys
+    of the instance dicts built from its rows.
+
+    The columns needed to identify and paginate the instances are always
+    loaded.
+
+    :param columns: list of the Instance columns requested by the caller
+    :param columns_to_join: list of the relationships joined by the query
+    """
+    load_columns = ['id', 'uuid', 'deleted']
+    load_columns.extend(column for column in columns
+                        if column not in load_columns)
+    keys = load_columns + [column for column in columns_to_join
+                           if '.' not in column]
+    return load_columns, keys
+
+
 @require_context
 def instance_get_all(context, columns_to_join=None):
     if columns_to_join is None:
@@ -1785,10 +1965,11 @@ def instance_get_all(context, columns_to_join=None):
     return _instances_fill_metadata(context, instances, manual_joins)
 
 
+@_read_policy(READ_SLAVE)
 @require_context
 def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
                                 limit=None, marker=None, columns_to_join=None,
-                                use_slave=False):
+                                use_slave=False, columns=None):
     """Return instances matching all filters sorted by the primary key.
 
     See instance_get_all_by_filters_sort for more information.
@@ -1800,17 +1981,24 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
                                             columns_to_join=columns_to_join,
                                             use_slave=use_slave,
                                             sort_keys=[sort_key],
-                                            sort_dirs=[sort_dir])
+                                            sort_dirs=[sort_dir],
+                                            columns=columns)
 
 
+@_read_policy(READ_SLAVE)
 @require_context
 def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
                                      columns_to_join=None, use_slave=False,
-                                     sort_keys=None, sort_dirs=None):
+                                     sort_keys=None, sort_dirs=None,
+                                     columns=None):
     """Return instances that match all filters sorted the the given keys.
     Deleted instances will be returned by default, unless there's a filter that
     says otherwise.
 
+    If columns is given, only these columns of the instances table are read,
+    along with id, uuid and deleted, and the returned instances only have
+    these keys and the ones of the joined columns.
+
     Depending on the name of a filter, matching for that filter is
     performed using either exact matching or as regular expression
     matching. Exact matching is applied for the following filters::
@@ -1880,6 +2068,11 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
             _manual_join_columns(columns_to_join))
 
     query_prefix = session.query(models.Instance)
+    keys = None
+    if columns is not None:
+        load_columns, keys = _instance_projection(columns,
+                                                  columns_to_join_new)
+        query_prefix = query_prefix.options(load_only(*load_columns))
     for column in columns_to_join_new:
         if 'extra.' in column:
             query_prefix = query_prefix.options(undefer(column))
@@ -1973,10 +2166,10 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
 
     # paginate query
     if marker is not None:
-        try:
-            marker = _instance_get_by_uuid(context, marker, session=session)
-        except exception.InstanceNotFound:
-            raise exception.MarkerNotFound(marker)
+        marker = _instance_marker(context, marker, sort_keys,
+                                  session=session)
+        query_prefix = _keyset_range(query_prefix, models.Instance, marker,
+                                     sort_keys, sort_dirs)
     try:
         query_prefix = sqlalchemyutils.paginate_query(query_prefix,
                                models.Instance, limit,
@@ -1986,7 +2179,48 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     except db_exc.InvalidSortKey:
         raise exception.InvalidSortKey()
 
-    return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
+    return _instances_fill_metadata(context, query_prefix.all(), manual_joins,
+                                    keys=keys)
+
+
+def _instance_marker(context, marker, sort_keys, session=None):
+    """Return the sort key values of the marker instance.
+
+    Only the sort key columns of the marker are read, rather than the whole
+    instance with its joined tables. The result has one attribute per sort
+    key, as paginate_query expects from a marker.
+    """
+    columns = []
+    for sort_key in sort_keys:
+        if sort_key not in models.Instance.__table__.columns:
+            raise exception.InvalidSortKey()
+        columns.append(getattr(models.Instance, sort_key))
+    result = model_query(context, models.Instance, args=columns,
+                         session=session, project_only=True).\
+                         filter_by(uuid=marker).\
+                         first()
+    if result is None:
+        raise exception.MarkerNotFound(marker)
+    return result
+
+
+def _keyset_range(query, model, marker, sort_keys, sort_dirs):
+    """Restrict a paginated query to the rows after the marker on its first
+    sort key.
+
+    paginate_query() selects the rows after the marker with a disjunction
+    over all the sort keys, which databases cannot use to seek in an index.
+    The redundant range condition on the first sort key lets them start
+    the index scan at the marker, so that deep pages cost the same as the
+    first one.
+    """
+    value = getattr(marker, sort_keys[0])
+    if value is None:
+        return query
+    column = getattr(model, sort_keys[0])
+    if sort_dirs[0] == 'desc':
+        return query.filter(column <= value)
+    return query.filter(column >= value)
 
 
 def _tag_instance_filter(context, query, filters):
@@ -2205,12 +2439,44 @@ def process_sort_params(sort_keys, sort_dirs,
     return result_keys, result_dirs
 
 
+def _instance_active_by_window_filter(query, begin, end, project_id, host):
+    """Filter a query to the instances active during a window."""
+    query = query.filter(or_(models.Instance.terminated_at == null(),
+                             models.Instance.terminated_at > begin))
+    if end:
+        query = query.filter(models.Instance.launched_at < end)
+    if project_id:
+        query = query.filter_by(project_id=project_id)
+    if host:
+        query = query.filter_by(host=host)
+    return query
+
+
+@_read_policy(READ_SLAVE)
+@require_context
+def instance_count_active_by_window(context, begin, end=None,
+                                    project_id=None, host=None,
+                                    use_slave=False):
+    """Return the number of instances that were active during window."""
+    session = get_session(use_slave=use_slave)
+    query = session.query(func.count(models.Instance.id))
+    query = _instance_active_by_window_filter(query, begin, end,
+                                              project_id, host)
+    return query.scalar()
+
+
+@_read_policy(READ_SLAVE)
 @require_context
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None, host=None,
                                          use_slave=False,
-                                         columns_to_join=None):
-    """Return instances and joins that were active during window."""
+                                         columns_to_join=None,
+                                         limit=None, marker=None):
+    """Return instances and joins that were active during window.
+
+    With a limit, at most that many instances are returned in id order,
+    starting after the instance whose uuid is the marker.
+    """
     session = get_session(use_slave=use_slave)
     query = session.query(models.Instance)
 
@@ -2227,16 +2493,92 @@ def instance_get_active_by_window_joined(context, begin, end=None,
         else:
             query = query.options(joinedload(column))
 
-    query = query.filter(or_(models.Instance.terminated_at == null(),
-                             models.Instance.terminated_at > begin))
-    if end:
-        query = query.filter(models.Instance.launched_at < end)
+    query = _instance_active_by_window_filter(query, begin, end,
+                                              project_id, host)
+
+    if marker is not None:
+        # The marker may have been deleted since it was returned, look it
+        # up regardless of read_deleted like the instances themselves.
+        marker_id = session.query(models.Instance.id).\
+                            filter_by(uuid=marker).\
+                            scalar()
+        if marker_id is None:
+            raise exception.MarkerNotFound(marker)
+        query = query.filter(models.Instance.id > marker_id)
+    if limit is not None:
+        query = query.order_by(asc(models.Instance.id)).limit(limit)
+
+    return _instances_fill_metadata(context, query.all(), manual_joins)
+
+
+class _SecondsBetween(FunctionElement):
+    """The number of seconds from a start to an end datetime."""
+    type = Float()
+    name = 'seconds_between'
+
+
+# The arguments are compiled in the order they appear in the
+# statement, for the positional parameters of the bound datetimes.
+@compiles(_SecondsBetween)
+def _compile_seconds_between(element, compiler, **kw):
+    start, end = element.clauses
+    return '((julianday(%s) - julianday(%s)) * 86400.0)' % (
+        compiler.process(end), compiler.process(start))
+
+
+@compiles(_SecondsBetween, 'mysql')
+def _compile_seconds_between_mysql(element, compiler, **kw):
+    start, end = [compiler.process(arg) for arg in element.clauses]
+    return 'TIMESTAMPDIFF(MICROSECOND, %s, %s) / 1000000.0' % (start, end)
+
+
+@compiles(_SecondsBetween, 'postgresql')
+def _compile_seconds_between_postgresql(element, compiler, **kw):
+    start, end = element.clauses
+    return 'EXTRACT(EPOCH FROM (%s - %s))' % (
+        compiler.process(end), compiler.process(start))
+
+
+@_read_policy(READ_SLAVE)
+@require_context
+def instance_usage_get_by_window(context, begin, end, project_id=None):
+    """Return the usage of the instances active during window per project.
+
+    The instance-hours and the vcpu, memory and disk hours are summed up
+    in the database, so that the instances are not loaded.
+    """
+    begin = timeutils.normalize_time(begin)
+    end = timeutils.normalize_time(end)
+    instance = models.Instance
+    start = sql.case([(instance.launched_at < begin,
+                       sql.literal(begin, instance.launched_at.type))],
+                     else_=instance.launched_at)
+    stop = sql.case([(or_(instance.terminated_at == null(),
+                          instance.terminated_at > end),
+                      sql.literal(end, instance.terminated_at.type))],
+                    else_=instance.terminated_at)
+    hours = _SecondsBetween(start, stop) / 3600.0
+
+    session = get_session()
+    query = session.query(
+        instance.project_id,
+        func.sum(hours),
+        func.sum(hours * instance.vcpus),
+        func.sum(hours * instance.memory_mb),
+        func.sum(hours * (instance.root_gb + instance.ephemeral_gb))).\
+        filter(or_(instance.terminated_at == null(),
+                   instance.terminated_at > begin)).\
+        filter(instance.launched_at < end).\
+        group_by(instance.project_id)
     if project_id:
         query = query.filter_by(project_id=project_id)
-    if host:
-        query = query.filter_by(host=host)
 
-    return _instances_fill_metadata(context, query.all(), manual_joins)
+    return [{'project_id': row[0],
+             'hours': row[1] or 0.0,
+             'vcpus_hours': row[2] or 0.0,
+             'memory_mb_hours': row[3] or 0.0,
+             'local_gb_hours': row[4] or 0.0}
+            for row in query.all()]
 
 
 def _instance_get_all_query(context, project_only=False,
@@ -2256,15 +2598,30 @@ def _instance_get_all_query(context, project_only=False,
     return query
 
 
+@_read_policy(READ_MASTER)
 @require_admin_context
 def instance_get_all_by_host(context, host,
                              columns_to_join=None,
-                             use_slave=False):
+                             use_slave=False, columns=None):
+    """Return the instances of a host.
+
+    If columns is given, only these columns of the instances table are read,
+    along with id, uuid and deleted, and nothing is joined but the metadata
+    in columns_to_join.
+    """
+    keys = None
+    joins = None
+    if columns is not None:
+        joins = []
+        load_columns, keys = _instance_projection(columns, joins)
+    query = _instance_get_all_query(context, joins=joins,
+                                    use_slave=use_slave)
+    if columns is not None:
+        query = query.options(load_only(*load_columns))
     return _instances_fill_metadata(context,
-      _instance_get_all_query(context,
-                              use_slave=use_slave).filter_by(host=host).all(),
-                              manual_joins=columns_to_join,
-                              use_slave=use_slave)
+                                    query.filter_by(host=host).all(),
+                                    manual_joins=columns_to_join,
+                                    use_slave=use_slave, keys=keys)
 
 
 def _instance_get_all_uuids_by_host(context, host, session=None):
@@ -2282,6 +2639,7 @@ def _instance_get_all_uuids_by_host(context, host, session=None):
     return uuids
 
 
+@_read_policy(READ_MASTER)
 @require_admin_context
 def instance_get_all_by_host_and_node(context, host, node,
                                       columns_to_join=None):
@@ -2391,6 +2749,93 @@ def _instance_metadata_update_in_place(context, instance, metadata_type, model,
         instance[metadata_type].append(newitem)
 
 
+def _expected_states(values, key):
+    # it is not a db column so always pop out
+    expected = values.pop(key, None)
+    if expected is not None and not isinstance(expected, (tuple, list, set)):
+        expected = (expected,)
+    return expected
+
+
+def _check_instance_states(instance_ref, expected_task_state,
+                           expected_vm_state):
+    if expected_task_state is not None:
+        actual_state = instance_ref["task_state"]
+        if actual_state not in expected_task_state:
+            if actual_state == task_states.DELETING:
+                raise exception.UnexpectedDeletingTaskStateError(
+                        actual=actual_state, expected=expected_task_state)
+            else:
+                raise exception.UnexpectedTaskStateError(
+                        actual=actual_state, expected=expected_task_state)
+    if expected_vm_state is not None:
+        actual_state = instance_ref["vm_state"]
+        if actual_state not in expected_vm_state:
+            raise exception.UnexpectedVMStateError(actual=actual_state,
+                                                   expected=expected_vm_state)
+
+
+def _state_in(column, states):
+    states = set(states)
+    conditions = []
+    if None in states:
+        states.discard(None)
+        conditions.append(column == null())
+    if states:
+        conditions.append(column.in_(states))
+    return or_(*conditions)
+
+
+def _instance_compare_and_swap(context, session, instance_ref, values,
+                               expected_task_state, expected_vm_state):
+    """Update the columns of an instance in a single statement, only if its
+    task and vm states are still the expected ones.
+
+    The states are checked in the WHERE clause of the UPDATE rather than
+    by locking the row, so that concurrent updates of an instance cannot
+    deadlock. The new values are set on instance_ref as committed values,
+    so that the instance is not flushed or read back afterwards.
+    """
+    if not values:
+        return
+    if 'updated_at' not in values:
+        values['updated_at'] = timeutils.utcnow()
+
+    query = model_query(context, models.Instance, session=session,
+                        project_only=True).\
+        filter_by(id=instance_ref['id'])
+    if expected_task_state is not None:
+        query = query.filter(_state_in(models.Instance.task_state,
+                                       expected_task_state))
+    if expected_vm_state is not None:
+        query = query.filter(_state_in(models.Instance.vm_state,
+                                       expected_vm_state))
+
+    if not query.update(values, synchronize_session=False):
+        # The instance changed since it was read, find out how. The states
+        # are read with a locking read, which sees the latest committed row
+        # even under REPEATABLE READ, where a plain read in this transaction
+        # would return the snapshot the instance was first read from.
+        state_columns = ('task_state', 'vm_state', 'deleted')
+        states = model_query(context, models.Instance,
+                             [getattr(models.Instance, column)
+                              for column in state_columns],
+                             session=session, read_deleted="yes").\
+            filter_by(id=instance_ref['id']).\
+            with_lockmode('update').\
+            first()
+        if states is None or states.deleted:
+            raise exception.InstanceNotFound(instance_id=instance_ref['uuid'])
+        for column, value in zip(state_columns, states):
+            attributes.set_committed_value(instance_ref, column, value)
+        _check_instance_states(instance_ref, expected_task_state,
+                               expected_vm_state)
+        raise exception.InstanceNotFound(instance_id=instance_ref['uuid'])
+
+    for key, value in values.iteritems():
+        attributes.set_committed_value(instance_ref, key, value)
+
+
 @_retry_on_deadlock
 def _instance_update(context, instance_uuid, values, copy_old_instance=False,
                      columns_to_join=None):
@@ -2403,27 +2848,10 @@ def _instance_update(context, instance_uuid, values, copy_old_instance=False,
         instance_ref = _instance_get_by_uuid(context, instance_uuid,
                                              session=session,
                                              columns_to_join=columns_to_join)
-        if "expected_task_state" in values:
-            # it is not a db column so always pop out
-            expected = values.pop("expected_task_state")
-            if not isinstance(expected, (tuple, list, set)):
-                expected = (expected,)
-            actual_state = instance_ref["task_state"]
-            if actual_state not in expected:
-                if actual_state == task_states.DELETING:
-                    raise exception.UnexpectedDeletingTaskStateError(
-                            actual=actual_state, expected=expected)
-                else:
-                    raise exception.UnexpectedTaskStateError(
-                            actual=actual_state, expected=expected)
-        if "expected_vm_state" in values:
-            expected = values.pop("expected_vm_state")
-            if not isinstance(expected, (tuple, list, set)):
-                expected = (expected,)
-            actual_state = instance_ref["vm_state"]
-            if actual_state not in expected:
-                raise exception.UnexpectedVMStateError(actual=actual_state,
-                                                       expected=expected)
+        expected_task_state = _expected_states(values, "expected_task_state")
+        expected_vm_state = _expected_states(values, "expected_vm_state")
+        _check_instance_states(instance_ref, expected_task_state,
+                               expected_vm_state)
 
         instance_hostname = instance_ref['hostname'] or ''
         if ("hostname" in values and
@@ -2452,14 +2880,27 @@ def _instance_update(context, instance_uuid, values, copy_old_instance=False,
                                                models.InstanceSystemMetadata,
                                                values.pop('system_metadata'),
                                                session)
+            # NOTE: The rows stay the source of truth for the filters, the
+            # joined loads and the older services, so the blob is one more
+            # UPDATE on top of them rather than a cheaper replacement.
+            _instance_system_metadata_blob_update(
+                context, instance_uuid, system_metadata, session)
 
         _handle_objects_related_type_conversions(values)
-        instance_ref.update(values)
-        session.add(instance_ref)
+        columns = models.Instance.__table__.columns
+        column_values = {key: values.pop(key) for key in values.keys()
+                         if key in columns}
+        _instance_compare_and_swap(context, session, instance_ref,
+                                   column_values, expected_task_state,
+                                   expected_vm_state)
+        if values:
+            instance_ref.update(values)
+            session.add(instance_ref)
 
     return (old_instance_ref, instance_ref)
 
 
+@_track_writes
 def instance_add_security_group(context, instance_uuid, security_group_id):
     """Associate the given security group with the given instance."""
     sec_group_ref = models.SecurityGroupInstanceAssociation()
@@ -2480,6 +2921,7 @@ def instance_remove_security_group(context, instance_uuid, security_group_id):
 ###################
 
 
+@_read_policy(READ_YOUR_WRITES)
 @require_context
 def instance_info_cache_get(context, instance_uuid):
     """Gets an instance info cache from the table.
@@ -2545,6 +2987,7 @@ def _instance_extra_create(context, values):
     return inst_extra_ref
 
 
+@_track_writes
 def instance_extra_update_by_uuid(context, instance_uuid, values):
     return model_query(context, models.InstanceExtra).\
         filter_by(instance_uuid=instance_uuid).\
@@ -3130,11 +3573,13 @@ def _quota_usage_get_all(context, project_id, user_id=None):
     return result
 
 
+@_read_policy(READ_MASTER)
 @require_context
 def quota_usage_get_all_by_project_and_user(context, project_id, user_id):
     return _quota_usage_get_all(context, project_id, user_id=user_id)
 
 
+@_read_policy(READ_MASTER)
 @require_context
 def quota_usage_get_all_by_project(context, project_id):
     return _quota_usage_get_all(context, project_id)
@@ -3165,6 +3610,8 @@ def quota_usage_update(context, project_id, user_id, resource, **kwargs):
         if key in kwargs:
             updates[key] = kwargs[key]
 
+    updates['generation'] = models.QuotaUsage.generation + 1
+
     result = model_query(context, models.QuotaUsage, read_deleted="no").\
                      filter_by(project_id=project_id).\
                      filter_by(resource=resource).\
@@ -3200,15 +3647,32 @@ def _reservation_create(uuid, usage, project_id, user_id, resource,
 # cause under or over counting of resources. To avoid deadlocks, this
 # code always acquires the lock on quota_usages before acquiring the lock
 # on reservations.
+#
+# The optimistic variants of the quota functions take no lock. They change
+# each usage row with a single UPDATE statement, so that concurrent requests
+# only wait for each other for the duration of that statement:
+#
+# - A reservation adds its delta to the reserved quantity of the row only
+#   if the row stays within quota, so concurrent reservations of the same
+#   user cannot go over quota together.
+# - A usage refresh replaces in_use only if the row still has the
+#   generation it was read with, and is retried with a backoff otherwise.
+# - A commit or rollback adds its deltas to the rows, once for each
+#   reservation it deletes.
+#
+# Usage rows created concurrently for the same resource hit the unique
+# constraint of quota_usages and are retried in the same way as a refresh.
+# The constraint does not cover the per-project rows, whose user_id is NULL.
 
 def _get_project_user_quota_usages(context, session, project_id,
-                                   user_id):
-    rows = model_query(context, models.QuotaUsage,
-                       read_deleted="no",
-                       session=session).\
-                   filter_by(project_id=project_id).\
-                   with_lockmode('update').\
-                   all()
+                                   user_id, lock=True):
+    query = model_query(context, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+                    filter_by(project_id=project_id)
+    if lock:
+        query = query.with_lockmode('update')
+    rows = query.all()
     proj_result = dict()
     user_result = dict()
     # Get the total count of in_use,reserved
@@ -3238,15 +3702,22 @@ def _create_quota_usage_if_missing(user_usages, resource, until_refresh,
     :param session:       DB session holding a transaction lock.
     :return:              True if a new QuotaUsage record was created and added
                           to user_usages, False otherwise.
+    :raises:              QuotaUsageConflict if the record was created by
+                          another transaction meanwhile, in which case the
+                          whole transaction must be retried.
     """
     new_usage = None
     if resource not in user_usages:
         user_id_to_use = user_id
         if resource in PER_PROJECT_QUOTAS:
             user_id_to_use = None
-        new_usage = _quota_usage_create(project_id, user_id_to_use, resource,
-                                        0, 0, until_refresh or None,
-                                        session=session)
+        try:
+            new_usage = _quota_usage_create(project_id, user_id_to_use,
+                                            resource, 0, 0,
+                                            until_refresh or None,
+                                            session=session)
+        except db_exc.DBDuplicateEntry:
+            raise exception.QuotaUsageConflict()
         user_usages[resource] = new_usage
     return new_usage is not None
 
@@ -3329,11 +3800,273 @@ def _calculate_overquota(project_quotas, user_quotas, deltas,
     return overs
 
 
+_MAX_CONCURRENT_UPDATE_RETRIES = 5
+
+
+def _retry_on_concurrent_update(f):
+    """Decorator to retry a DB API call if a usage row was changed or
+    created by another transaction.
+
+    Waits a little longer, with some jitter, before each attempt, so that
+    the losers of a burst do not collide again. Gives up after
+    _MAX_CONCURRENT_UPDATE_RETRIES attempts, passing QuotaUsageConflict on
+    to the caller.
+    """
+    return retrying.retry(
+        stop_max_attempt_number=_MAX_CONCURRENT_UPDATE_RETRIES,
+        wait_exponential_multiplier=10, wait_exponential_max=1000,
+        wait_random_max=100,
+        retry_on_exception=lambda exc: isinstance(
+            exc, exception.QuotaUsageConflict))(f)
+
+
+def _raise_over_quota(overs, project_quotas, user_quotas, deltas,
+                      project_usages, user_usages):
+    if project_quotas == user_quotas:
+        usages = project_usages
+    else:
+        usages = user_usages
+    usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'])
+              for k, v in usages.items()}
+    LOG.debug('Raise OverQuota exception because: '
+              'project_quotas: %(project_quotas)s, '
+              'user_quotas: %(user_quotas)s, deltas: %(deltas)s, '
+              'overs: %(overs)s, project_usages: %(project_usages)s, '
+              'user_usages: %(user_usages)s',
+              {'project_quotas': project_quotas,
+               'user_quotas': user_quotas,
+               'overs': overs, 'deltas': deltas,
+               'project_usages': project_usages,
+               'user_usages': user_usages})
+    raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
+                              usages=usages)
+
+
 @require_context
 @_retry_on_deadlock
+@_retry_on_concurrent_update
 def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
                   expire, until_refresh, max_age, project_id=None,
                   user_id=None):
+    return _quota_reserve(context, resources, project_quotas, user_quotas,
+                          deltas, expire, until_refresh, max_age,
+                          project_id, user_id)
+
+
+@require_context
+@_retry_on_deadlock
+def quota_reserve_optimistic(context, resources, project_quotas, user_quotas,
+                             deltas, expire, until_refresh, max_age,
+                             project_id=None, user_id=None):
+    if project_id is None:
+        project_id = context.project_id
+    if user_id is None:
+        user_id = context.user_id
+
+    user_usages = {}
+    for resource in deltas:
+        if resource not in user_usages:
+            user_usages.update(_quota_usage_refresh_optimistic(
+                context, resources, resource, until_refresh, max_age,
+                project_id, user_id))
+
+    unders = [res for res, delta in deltas.items()
+              if delta < 0 and delta + user_usages[res].in_use < 0]
+    if unders:
+        LOG.warning(_LW("Change will make usage less than 0 for the following "
+                        "resources: %s"), unders)
+
+    # Fail early on the usages read so far, without writing anything.
+    project_usages = _quota_usage_totals(context, project_id)
+    overs = _calculate_overquota(project_quotas, user_quotas, deltas,
+                                 project_usages, user_usages)
+    if overs:
+        _raise_over_quota(overs, project_quotas, user_quotas, deltas,
+                          project_usages, user_usages)
+
+    reservations = _quota_usages_reserve(context, project_quotas,
+                                         user_quotas, deltas, expire,
+                                         project_id, user_id,
+                                         project_usages, user_usages)
+
+    # The usage rows of the user were only updated within quota, but the
+    # rows of the other users of the project may have been updated
+    # meanwhile, so check the project quotas again now that the
+    # reservations are visible to the others. The reservations made after
+    # ours are left out, so that of two requests racing for the rest of a
+    # quota only the later one fails, rather than both of them.
+    project_usages = _quota_usage_totals(context, project_id)
+    reserved_after = _quota_reserved_after(context, project_id, reservations)
+    overs = [res for res, delta in deltas.items()
+             if delta > 0 and 0 <= project_quotas[res] <
+             project_usages[res]['total'] - reserved_after.get(res, 0)]
+    if overs:
+        reservation_rollback_optimistic(context, reservations,
+                                        project_id=project_id,
+                                        user_id=user_id)
+        for res, delta in deltas.items():
+            if delta > 0:
+                project_usages[res]['reserved'] -= delta
+                project_usages[res]['total'] -= delta
+        _raise_over_quota(overs, project_quotas, user_quotas, deltas,
+                          project_usages, project_usages)
+    return reservations
+
+
+def _quota_usage_update_if_unchanged(context, usage, values):
+    """Update a usage row if it still has the generation it was read with.
+
+    Returns whether the row was updated.
+    """
+    values = dict(values, generation=usage.generation + 1)
+    updated = model_query(context, models.QuotaUsage, read_deleted="no").\
+                      filter_by(id=usage.id).\
+                      filter_by(generation=usage.generation).\
+                      update(values, synchronize_session=False)
+    if updated:
+        usage.generation += 1
+    return bool(updated)
+
+
+@_retry_on_concurrent_update
+def _quota_usage_refresh_optimistic(context, resources, resource,
+                                    until_refresh, max_age, project_id,
+                                    user_id):
+    """Return the usage row of a resource, refreshed if it needs it.
+
+    The rows of the other resources refreshed by the same sync routine are
+    refreshed and returned too, by resource. Raises QuotaUsageConflict if
+    one of the rows was changed or created meanwhile.
+    """
+    session = get_session()
+    _project_usages, user_usages = _get_project_user_quota_usages(
+            context, session, project_id, user_id, lock=False)
+    created = _create_quota_usage_if_missing(user_usages, resource,
+                                             until_refresh, project_id,
+                                             user_id, None)
+    usage = user_usages[resource]
+    if not created and not _is_quota_refresh_needed(usage, max_age):
+        if usage.until_refresh is not None:
+            # NOTE: The countdown does not depend on the rest of the row,
+            # so it is applied as it is rather than conflicting with the
+            # other updates of the row.
+            model_query(context, models.QuotaUsage, read_deleted="no").\
+                    filter_by(id=usage.id).\
+                    update({'until_refresh':
+                            models.QuotaUsage.until_refresh - 1},
+                           synchronize_session=False)
+        return {resource: usage}
+
+    # The sync routine gets a session of its own, so that its queries do
+    # not flush the rows changed above.
+    sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
+    updates = sync(context.elevated(), project_id, user_id, get_session())
+    refreshed = {resource: usage}
+    for res, in_use in updates.items():
+        _create_quota_usage_if_missing(user_usages, res, until_refresh,
+                                       project_id, user_id, None)
+        values = {'in_use': in_use, 'until_refresh': until_refresh or None}
+        if not _quota_usage_update_if_unchanged(context, user_usages[res],
+                                                values):
+            raise exception.QuotaUsageConflict()
+        _refresh_quota_usages(user_usages[res], until_refresh, in_use)
+        refreshed[res] = user_usages[res]
+    return refreshed
+
+
+def _quota_usages_reserve(context, project_quotas, user_quotas, deltas,
+                          expire, project_id, user_id, project_usages,
+                          user_usages):
+    """Create the reservations of the deltas, adding the positive ones to the
+    reserved quantity of the usage rows.
+
+    Each row is only updated if it stays within the quota of the user, or
+    also of the project for the per-project rows. If any of them would go
+    over quota, nothing is reserved and OverQuota is raised.
+    """
+    session = get_session()
+    with session.begin():
+        overs = []
+        reservations = []
+        for res, delta in deltas.items():
+            usage = user_usages[res]
+            if delta > 0:
+                query = model_query(context, models.QuotaUsage,
+                                    read_deleted="no", session=session).\
+                                filter_by(id=usage.id)
+                limit = user_quotas[res]
+                if limit >= 0:
+                    if usage.user_id is None and project_quotas[res] >= 0:
+                        limit = min(limit, project_quotas[res])
+                    query = query.filter(models.QuotaUsage.in_use +
+                                         models.QuotaUsage.reserved +
+                                         delta <= limit)
+                updated = query.update(
+                    {'reserved': models.QuotaUsage.reserved + delta,
+                     'generation': models.QuotaUsage.generation + 1},
+                    synchronize_session=False)
+                if not updated:
+                    overs.append(res)
+                    continue
+            reservation = _reservation_create(str(uuid.uuid4()), usage,
+                                              project_id, user_id, res,
+                                              delta, expire, session=session)
+            reservations.append(reservation.uuid)
+
+        if overs:
+            # Raised within the transaction, so that the usage rows which
+            # were updated are rolled back.
+            _raise_over_quota(overs, project_quotas, user_quotas, deltas,
+                              project_usages, user_usages)
+    return reservations
+
+
+def _quota_usage_totals(context, project_id):
+    """Return the usages of a project, summed over its users."""
+    rows = model_query(context, models.QuotaUsage,
+                       (models.QuotaUsage.resource,
+                        func.sum(models.QuotaUsage.in_use),
+                        func.sum(models.QuotaUsage.reserved)),
+                       read_deleted="no").\
+                   filter_by(project_id=project_id).\
+                   group_by(models.QuotaUsage.resource).\
+                   all()
+    totals = collections.defaultdict(
+        lambda: dict(in_use=0, reserved=0, total=0))
+    for resource, in_use, reserved in rows:
+        in_use, reserved = int(in_use), int(reserved)
+        totals[resource] = dict(in_use=in_use, reserved=reserved,
+                                total=in_use + reserved)
+    return totals
+
+
+def _quota_reserved_after(context, project_id, reservations):
+    """Return the positive deltas reserved in a project after the given
+    reservations, by resource.
+    """
+    if not reservations:
+        return {}
+    last_id = model_query(context, models.Reservation,
+                          (func.max(models.Reservation.id),),
+                          read_deleted="no").\
+                      filter(models.Reservation.uuid.in_(reservations)).\
+                      scalar()
+    if last_id is None:
+        return {}
+    rows = model_query(context, models.Reservation,
+                       (models.Reservation.resource,
+                        func.sum(models.Reservation.delta)),
+                       read_deleted="no").\
+                   filter_by(project_id=project_id).\
+                   filter(models.Reservation.id > last_id).\
+                   filter(models.Reservation.delta > 0).\
+                   group_by(models.Reservation.resource).\
+                   all()
+    return {resource: int(delta) for resource, delta in rows}
+
+
+def _quota_reserve(context, resources, project_quotas, user_quotas, deltas,
+                   expire, until_refresh, max_age, project_id, user_id):
     elevated = context.elevated()
     session = get_session()
     with session.begin():
@@ -3446,42 +4179,26 @@ def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
                         "resources: %s"), unders)
 
     if overs:
-        if project_quotas == user_quotas:
-            usages = project_usages
-        else:
-            usages = user_usages
-        usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'])
-                  for k, v in usages.items()}
-        LOG.debug('Raise OverQuota exception because: '
-                  'project_quotas: %(project_quotas)s, '
-                  'user_quotas: %(user_quotas)s, deltas: %(deltas)s, '
-                  'overs: %(overs)s, project_usages: %(project_usages)s, '
-                  'user_usages: %(user_usages)s',
-                  {'project_quotas': project_quotas,
-                   'user_quotas': user_quotas,
-                   'overs': overs, 'deltas': deltas,
-                   'project_usages': project_usages,
-                   'user_usages': user_usages})
-        raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
-                                  usages=usages)
+        _raise_over_quota(overs, project_quotas, user_quotas, deltas,
+                          project_usages, user_usages)
 
     return reservations
 
 
-def _quota_reservations_query(session, context, reservations):
+def _quota_reservations_query(session, context, reservations, lock=True):
     """Return the relevant reservations."""
 
     # Get the listed reservations
-    return model_query(context, models.Reservation,
-                       read_deleted="no",
-                       session=session).\
-                   filter(models.Reservation.uuid.in_(reservations)).\
-                   with_lockmode('update')
+    query = model_query(context, models.Reservation,
+                        read_deleted="no",
+                        session=session).\
+                    filter(models.Reservation.uuid.in_(reservations))
+    if lock:
+        query = query.with_lockmode('update')
+    return query
 
 
-@require_context
-@_retry_on_deadlock
-def reservation_commit(context, reservations, project_id=None, user_id=None):
+def _reservations_apply(context, reservations, project_id, user_id, commit):
     session = get_session()
     with session.begin():
         _project_usages, user_usages = _get_project_user_quota_usages(
@@ -3492,24 +4209,67 @@ def reservation_commit(context, reservations, project_id=None, user_id=None):
             usage = user_usages[reservation.resource]
             if reservation.delta >= 0:
                 usage.reserved -= reservation.delta
-            usage.in_use += reservation.delta
+            if commit:
+                usage.in_use += reservation.delta
         reservation_query.soft_delete(synchronize_session=False)
 
 
-@require_context
-@_retry_on_deadlock
-def reservation_rollback(context, reservations, project_id=None, user_id=None):
+def _reservations_apply_optimistic(context, reservations, commit):
     session = get_session()
     with session.begin():
-        _project_usages, user_usages = _get_project_user_quota_usages(
-                context, session, project_id, user_id)
-        reservation_query = _quota_reservations_query(session, context,
-                                                      reservations)
-        for reservation in reservation_query.all():
-            usage = user_usages[reservation.resource]
+        reservation_refs = _quota_reservations_query(session, context,
+                                                     reservations,
+                                                     lock=False).all()
+        for reservation in reservation_refs:
+            # Only the transaction which deletes the reservation applies it,
+            # so that a reservation committed twice concurrently counts once.
+            deleted = model_query(context, models.Reservation,
+                                  read_deleted="no", session=session).\
+                              filter_by(id=reservation.id).\
+                              soft_delete(synchronize_session=False)
+            if not deleted:
+                continue
+            updates = {}
             if reservation.delta >= 0:
-                usage.reserved -= reservation.delta
-        reservation_query.soft_delete(synchronize_session=False)
+                updates['reserved'] = (models.QuotaUsage.reserved -
+                                       reservation.delta)
+            if commit:
+                updates['in_use'] = (models.QuotaUsage.in_use +
+                                     reservation.delta)
+            if updates:
+                updates['generation'] = models.QuotaUsage.generation + 1
+                model_query(context, models.QuotaUsage, read_deleted="no",
+                            session=session).\
+                        filter_by(id=reservation.usage_id).\
+                        update(updates, synchronize_session=False)
+
+
+@require_context
+@_retry_on_deadlock
+def reservation_commit(context, reservations, project_id=None, user_id=None):
+    _reservations_apply(context, reservations, project_id, user_id,
+                        commit=True)
+
+
+@require_context
+@_retry_on_deadlock
+def reservation_rollback(context, reservations, project_id=None, user_id=None):
+    _reservations_apply(context, reservations, project_id, user_id,
+                        commit=False)
+
+
+@require_context
+@_retry_on_deadlock
+def reservation_commit_optimistic(context, reservations, project_id=None,
+                                  user_id=None):
+    _reservations_apply_optimistic(context, reservations, commit=True)
+
+
+@require_context
+@_retry_on_deadlock
+def reservation_rollback_optimistic(context, reservations, project_id=None,
+                                    user_id=None):
+    _reservations_apply_optimistic(context, reservations, commit=False)
 
 
 @require_admin_context
@@ -3720,6 +4480,7 @@ def block_device_mapping_update(context, bdm_id, values, legacy=True):
     return query.first()
 
 
+@_track_writes
 def block_device_mapping_update_or_create(context, values, legacy=True):
     _scrub_empty_str_values(values, ['volume_size'])
     values = _from_legacy_values(values, legacy, allow_updates=True)
@@ -3754,6 +4515,7 @@ def block_device_mapping_update_or_create(context, values, legacy=True):
         return result
 
 
+@_read_policy(READ_YOUR_WRITES)
 @require_context
 def block_device_mapping_get_all_by_instance(context, instance_uuid,
                                              use_slave=False):
@@ -3957,6 +4719,7 @@ def security_group_update(context, security_group_id, values,
     return security_group_ref
 
 
+@_track_writes
 def security_group_ensure_default(context):
     """Ensure default security group exists for a project_id."""
 
@@ -4285,6 +5048,7 @@ def migration_get_unconfirmed_by_dest_compute(context, confirm_window,
              all()
 
 
+@_read_policy(READ_MASTER)
 @require_admin_context
 def migration_get_in_progress_by_host_and_node(context, host, node):
 
@@ -4299,6 +5063,7 @@ def migration_get_in_progress_by_host_and_node(context, host, node):
             all()
 
 
+@_read_policy(READ_SLAVE)
 @require_admin_context
 def migration_get_all_by_filters(context, filters):
     query = model_query(context, models.Migration)
@@ -4314,6 +5079,7 @@ def migration_get_all_by_filters(context, filters):
 ##################
 
 
+@_track_writes
 def console_pool_create(context, values):
     pool = models.ConsolePool()
     pool.update(values)
@@ -4354,6 +5120,7 @@ def console_pool_get_all_by_host_type(context, host, console_type):
                    all()
 
 
+@_track_writes
 def console_create(context, values):
     console = models.Console()
     console.update(values)
@@ -4361,6 +5128,7 @@ def console_create(context, values):
     return console
 
 
+@_track_writes
 def console_delete(context, console_id):
     session = get_session()
     with session.begin():
@@ -4491,6 +5259,7 @@ def _flavor_get_query(context, session=None, read_deleted=None):
     return query
 
 
+@_read_policy(READ_SLAVE)
 @require_context
 def flavor_get_all(context, inactive=False, filters=None,
                    sort_key='flavorid', sort_dir='asc', limit=None,
@@ -4885,14 +5654,19 @@ def instance_system_metadata_update(context, instance_uuid, metadata, delete):
                 soft_delete(synchronize_session=False)
 
         already_existing_keys = []
-        meta_refs = _instance_system_metadata_get_query(context, instance_uuid,
-                                                        session=session).\
-            filter(models.InstanceSystemMetadata.key.in_(all_keys)).\
-            all()
-
-        for meta_ref in meta_refs:
-            already_existing_keys.append(meta_ref.key)
-            meta_ref.update({"value": metadata[meta_ref.key]})
+        query = _instance_system_metadata_get_query(context, instance_uuid,
+                                                    session=session)
+        if delete:
+            query = query.filter(
+                models.InstanceSystemMetadata.key.in_(all_keys))
+        # NOTE: Without delete, all the rows are read so that the blob is
+        # built from them, rather than querying them again once updated.
+        system_metadata = {}
+        for meta_ref in query.all():
+            if meta_ref.key in metadata:
+                already_existing_keys.append(meta_ref.key)
+                meta_ref.update({"value": metadata[meta_ref.key]})
+            system_metadata[meta_ref.key] = meta_ref.value
 
         new_keys = set(all_keys) - set(already_existing_keys)
         for key in new_keys:
@@ -4901,9 +5675,84 @@ def instance_system_metadata_update(context, instance_uuid, metadata, delete):
                              "instance_uuid": instance_uuid})
             session.add(meta_ref)
 
+        system_metadata.update(metadata)
+        _instance_system_metadata_blob_update(context, instance_uuid,
+                                              system_metadata, session)
+
         return metadata
 
 
+# Version of the format of the system metadata blobs kept in instance_extra
+_SYSTEM_METADATA_BLOB_VERSION = 1
+
+
+def _system_metadata_blob(system_metadata):
+    """Serialize the system metadata of an instance to a blob."""
+    return jsonutils.dumps({'version': _SYSTEM_METADATA_BLOB_VERSION,
+                            'system_metadata': system_metadata})
+
+
+def _instance_system_metadata_blob_update(context, instance_uuid,
+                                          system_metadata, session):
+    model_query(context, models.InstanceExtra, session=session).\
+        filter_by(instance_uuid=instance_uuid).\
+        update({'system_metadata': _system_metadata_blob(system_metadata)},
+               synchronize_session=False)
+
+
+def _instance_system_metadata_get_blobs(context, instance_uuids,
+                                        use_slave=False):
+    """Return the system metadata of the instances read from their blobs,
+    as lists of key/value rows by instance uuid.
+
+    The instances without a blob, or with a blob in an unknown format, are
+    left out.
+    """
+    if not instance_uuids:
+        return {}
+    query = model_query(context, models.InstanceExtra,
+                        (models.InstanceExtra.instance_uuid,
+                         models.InstanceExtra.system_metadata),
+                        use_slave=use_slave).\
+        filter(models.InstanceExtra.instance_uuid.in_(instance_uuids)).\
+        filter(models.InstanceExtra.system_metadata != null())
+    sys_meta = {}
+    for instance_uuid, blob in query:
+        blob = jsonutils.loads(blob)
+        if blob.get('version') != _SYSTEM_METADATA_BLOB_VERSION:
+            continue
+        sys_meta[instance_uuid] = [
+            {'key': key, 'value': value, 'instance_uuid': instance_uuid}
+            for key, value in blob['system_metadata'].iteritems()]
+    return sys_meta
+
+
+@require_admin_context
+def instance_system_metadata_blobs_rebuild(context, max_count, marker=None):
+    """Rewrite the system metadata blobs of up to max_count instances from
+    their key/value rows, starting after the instance with id marker.
+
+    :returns: the number of instances done and the id of the last one
+    """
+    session = get_session()
+    with session.begin():
+        query = model_query(context, models.Instance,
+                            (models.Instance.id, models.Instance.uuid),
+                            session=session, read_deleted='no')
+        if marker is not None:
+            query = query.filter(models.Instance.id > marker)
+        instances = query.order_by(models.Instance.id).limit(max_count).all()
+        uuids = [instance_uuid for _id, instance_uuid in instances]
+        sys_meta = collections.defaultdict(dict)
+        for row in _instance_system_metadata_get_multi(context, uuids,
+                                                       session=session):
+            sys_meta[row['instance_uuid']][row['key']] = row['value']
+        for instance_uuid in uuids:
+            _instance_system_metadata_blob_update(
+                context, instance_uuid, sys_meta[instance_uuid], session)
+    return len(instances), instances[-1][0] if instances else marker
+
+
 ####################
 
 
@@ -5172,6 +6021,7 @@ def s3_image_get_by_uuid(context, image_uuid):
     return result
 
 
+@_track_writes
 def s3_image_create(context, image_uuid):
     """Create local s3 image represented by provided uuid."""
     try:
@@ -5203,6 +6053,7 @@ def _aggregate_get_query(context, model_class, id_field=None, id=None,
     return query
 
 
+@_track_writes
 def aggregate_create(context, values, metadata=None):
     session = get_session()
     query = _aggregate_get_query(context,
@@ -5304,6 +6155,7 @@ def aggregate_get_by_metadata_key(context, key):
     return query.all()
 
 
+@_track_writes
 def aggregate_update(context, aggregate_id, values):
     session = get_session()
 
@@ -5348,6 +6200,7 @@ def aggregate_update(context, aggregate_id, values):
         raise exception.AggregateNotFound(aggregate_id=aggregate_id)
 
 
+@_track_writes
 def aggregate_delete(context, aggregate_id):
     session = get_session()
     with session.begin():
@@ -5367,6 +6220,7 @@ def aggregate_delete(context, aggregate_id):
                     soft_delete()
 
 
+@_read_policy(READ_SLAVE)
 def aggregate_get_all(context):
     return _aggregate_get_query(context, models.Aggregate).all()
 
@@ -5488,6 +6342,7 @@ def aggregate_host_add(context, aggregate_id, host):
 ################
 
 
+@_track_writes
 def instance_fault_create(context, values):
     """Create a new InstanceFault."""
     fault_ref = models.InstanceFault()
@@ -5496,6 +6351,7 @@ def instance_fault_create(context, values):
     return dict(fault_ref.iteritems())
 
 
+@_read_policy(READ_SLAVE)
 def instance_fault_get_by_instance_uuids(context, instance_uuids):
     """Get all instance faults for the provided instance_uuids."""
     if not instance_uuids:
@@ -5521,6 +6377,7 @@ def instance_fault_get_by_instance_uuids(context, instance_uuids):
 ##################
 
 
+@_track_writes
 def action_start(context, values):
     convert_objects_related_datetimes(values, 'start_time')
     action_ref = models.InstanceAction()
@@ -5529,6 +6386,7 @@ def action_start(context, values):
     return action_ref
 
 
+@_track_writes
 def action_finish(context, values):
     convert_objects_related_datetimes(values, 'start_time', 'finish_time')
     session = get_session()
@@ -5543,6 +6401,7 @@ def action_finish(context, values):
         return query.one()
 
 
+@_read_policy(READ_SLAVE)
 def actions_get(context, instance_uuid):
     """Get all instance actions for the provided uuid."""
     actions = model_query(context, models.InstanceAction).\
@@ -5567,6 +6426,7 @@ def _action_get_by_request_id(context, instance_uuid, request_id,
     return result
 
 
+@_track_writes
 def action_event_start(context, values):
     """Start an event on an instance action."""
     convert_objects_related_datetimes(values, 'start_time')
@@ -5588,6 +6448,7 @@ def action_event_start(context, values):
     return event_ref
 
 
+@_track_writes
 def action_event_finish(context, values):
     """Finish an event on an instance action."""
     convert_objects_related_datetimes(values, 'start_time', 'finish_time')
@@ -5753,10 +6614,53 @@ def task_log_end_task(context, task_name, period_beginning, period_ending,
             raise exception.TaskNotRunning(task_name=task_name, host=host)
 
 
-@require_admin_context
-def archive_deleted_rows_for_table(context, tablename, max_rows):
-    """Move up to max_rows rows from one tables to the corresponding
-    shadow table. The context argument is only used for the decorator.
+# The reflected tables and shadow tables of the last engine archived, by
+# table name, so that the table metadata is not read again on every call.
+_ARCHIVE_TABLES = {'engine': None, 'tables': {}}
+
+
+def _get_archive_tables(engine, tablename):
+    """Return the table and its shadow table, or None as the shadow table if
+    the table has none.
+    """
+    if _ARCHIVE_TABLES['engine'] is not engine:
+        _ARCHIVE_TABLES['engine'] = engine
+        _ARCHIVE_TABLES['tables'] = {}
+    tables = _ARCHIVE_TABLES['tables']
+    if tablename not in tables:
+        metadata = MetaData()
+        metadata.bind = engine
+        table = Table(tablename, metadata, autoload=True)
+        try:
+            shadow_table = Table(_SHADOW_TABLE_PREFIX + tablename, metadata,
+                                 autoload=True)
+        except NoSuchTableError:
+            shadow_table = None
+        tables[tablename] = (table, shadow_table)
+    return tables[tablename]
+
+
+def _archive_tablenames():
+    """Return the names of the tables to archive, the tables referencing
+    another one by a foreign key coming before it.
+    """
+    tables = reversed(models.BASE.metadata.sorted_tables)
+    return [table.name for table in tables
+            if not table.name.startswith(_SHADOW_TABLE_PREFIX)]
+
+
+def _deleted_rows(table):
+    """Return the condition matching the soft-deleted rows of table.
+
+    The reflected deleted column has no default, so it cannot be compared
+    with it: the soft-deleted rows are the ones whose deleted column is
+    neither 0 nor False.
+    """
+    return table.c.deleted != 0
+
+
+def _archive_rows(conn, table, shadow_table, where, max_rows=None):
+    """Move up to max_rows rows of table matching where to shadow_table.
 
     :returns: number of rows archived
     """
@@ -5764,20 +6668,7 @@ def archive_deleted_rows_for_table(context, tablename, max_rows):
     # imports nova.db.sqlalchemy.api.
     from nova.db.sqlalchemy import utils as db_utils
 
-    engine = get_engine()
-    conn = engine.connect()
-    metadata = MetaData()
-    metadata.bind = engine
-    table = Table(tablename, metadata, autoload=True)
-    shadow_tablename = _SHADOW_TABLE_PREFIX + tablename
-    rows_archived = 0
-    try:
-        shadow_table = Table(shadow_tablename, metadata, autoload=True)
-    except NoSuchTableError:
-        # No corresponding shadow table; skip it.
-        return rows_archived
-
-    if tablename == "dns_domains":
+    if table.name == "dns_domains":
         # We have one table (dns_domains) where the key is called
         # "domain" rather than "id"
         column = table.c.domain
@@ -5785,22 +6676,37 @@ def archive_deleted_rows_for_table(context, tablename, max_rows):
         column = table.c.id
     # NOTE(guochbo): Use InsertFromSelect and DeleteFromSelect to avoid
     # database's limit of maximum parameter in one SQL statement.
-    deleted_column = table.c.deleted
-    query_insert = sql.select([table],
-                          deleted_column != deleted_column.default).\
+    query_insert = sql.select([table], where).\
                           order_by(column).limit(max_rows)
-    query_delete = sql.select([column],
-                          deleted_column != deleted_column.default).\
+    query_delete = sql.select([column], where).\
                           order_by(column).limit(max_rows)
 
     insert_statement = sqlalchemyutils.InsertFromSelect(
         shadow_table, query_insert)
     delete_statement = db_utils.DeleteFromSelect(table, query_delete, column)
+    conn.execute(insert_statement)
+    return conn.execute(delete_statement).rowcount
+
+
+@require_admin_context
+def archive_deleted_rows_for_table(context, tablename, max_rows):
+    """Move up to max_rows rows from one tables to the corresponding
+    shadow table. The context argument is only used for the decorator.
+
+    :returns: number of rows archived
+    """
+    engine = get_engine()
+    conn = engine.connect()
+    table, shadow_table = _get_archive_tables(engine, tablename)
+    if shadow_table is None:
+        # No corresponding shadow table; skip it.
+        return 0
+
     try:
         # Group the insert and delete in a transaction.
         with conn.begin():
-            conn.execute(insert_statement)
-            result_delete = conn.execute(delete_statement)
+            return _archive_rows(conn, table, shadow_table,
+                                 _deleted_rows(table), max_rows=max_rows)
     except db_exc.DBError:
         # TODO(ekudryashova): replace by DBReferenceError when db layer
         # raise it.
@@ -5809,10 +6715,107 @@ def archive_deleted_rows_for_table(context, tablename, max_rows):
         # skip this table for now; we'll come back to it later.
         msg = _("IntegrityError detected when archiving table %s") % tablename
         LOG.warn(msg)
-        return rows_archived
+        return 0
 
-    rows_archived = result_delete.rowcount
 
+# The maximum number of deleted instances archived in a transaction, which
+# also bounds the IN clauses finding the rows referencing them.
+_ARCHIVE_INSTANCES_CHUNK = 100
+
+
+def _archive_instance_child_tables(engine):
+    """Return the tables and shadow tables of the tables referencing the
+    instances by instance_uuid, the tables referencing another one first.
+    """
+    child_tables = []
+    for tablename in _archive_tablenames():
+        if tablename == 'instances':
+            continue
+        table, shadow_table = _get_archive_tables(engine, tablename)
+        if (shadow_table is None or 'instance_uuid' not in table.c or
+                'deleted' not in table.c):
+            continue
+        child_tables.append((table, shadow_table))
+    return child_tables
+
+
+def _archive_instances_fitting(conn, child_tables, uuids, max_rows):
+    """Return the leading uuids whose instances fit in max_rows rows, along
+    with the deleted rows referencing them.
+    """
+    rows_by_uuid = dict.fromkeys(uuids, 1)
+    for table, _shadow_table in child_tables:
+        query = sql.select([table.c.instance_uuid, func.count()],
+                           and_(_deleted_rows(table),
+                                table.c.instance_uuid.in_(uuids))).\
+                    group_by(table.c.instance_uuid)
+        for instance_uuid, rows in conn.execute(query):
+            rows_by_uuid[instance_uuid] += rows
+
+    fitting = []
+    total = 0
+    for instance_uuid in uuids:
+        total += rows_by_uuid[instance_uuid]
+        if total > max_rows:
+            break
+        fitting.append(instance_uuid)
+    return fitting
+
+
+def _archive_deleted_instances(context, max_rows):
+    """Move deleted instances to the shadow tables, along with the deleted
+    rows of the tables referencing them by instance_uuid.
+
+    The instances are archived in transactions of up to
+    _ARCHIVE_INSTANCES_CHUNK instances. The rows referencing them count
+    towards max_rows, and the instances are archived in order for as long
+    as all their rows fit in it. The rows of an instance which does not fit
+    are left to the archiving of the tables one by one.
+
+    :returns: dict of the number of rows archived by table name
+    """
+    engine = get_engine()
+    conn = engine.connect()
+    instances, shadow_instances = _get_archive_tables(engine, 'instances')
+    child_tables = _archive_instance_child_tables(engine)
+    deleted_instances = _deleted_rows(instances)
+
+    rows_archived = {}
+    total = 0
+    while max_rows is None or total < max_rows:
+        limit = _ARCHIVE_INSTANCES_CHUNK
+        if max_rows is not None:
+            limit = min(limit, max_rows - total)
+        uuids = [row[0] for row in conn.execute(
+            sql.select([instances.c.uuid], deleted_instances).
+            order_by(instances.c.id).limit(limit))]
+        if uuids and max_rows is not None:
+            uuids = _archive_instances_fitting(conn, child_tables, uuids,
+                                               max_rows - total)
+        if not uuids:
+            break
+
+        chunk_archived = {}
+        try:
+            with conn.begin():
+                for table, shadow_table in child_tables:
+                    where = and_(_deleted_rows(table),
+                                 table.c.instance_uuid.in_(uuids))
+                    rows = _archive_rows(conn, table, shadow_table, where)
+                    if rows:
+                        chunk_archived[table.name] = rows
+                chunk_archived['instances'] = _archive_rows(
+                    conn, instances, shadow_instances,
+                    and_(deleted_instances, instances.c.uuid.in_(uuids)))
+        except db_exc.DBError:
+            # Some rows still reference these instances, the tables are
+            # archived one by one instead.
+            LOG.warn(_LW("IntegrityError detected when archiving instances "
+                         "%s"), ', '.join(uuids))
+            break
+        for tablename, rows in chunk_archived.items():
+            rows_archived[tablename] = rows_archived.get(tablename, 0) + rows
+            total += rows
     return rows_archived
 
 
@@ -5821,19 +6824,29 @@ def archive_deleted_rows(context, max_rows=None):
     """Move up to max_rows rows from production tables to the corresponding
     shadow tables.
 
-    :returns: Number of rows archived.
+    The deleted instances are archived first, together with the deleted
+    rows referencing them, and then the other tables one by one, the tables
+    referencing another one first. All the deleted rows are archived if
+    max_rows is None, still in transactions of a bounded number of
+    instances.
+
+    :returns: dict of the number of rows archived by table name
     """
     # The context argument is only used for the decorator.
-    tablenames = []
-    for model_class in models.__dict__.itervalues():
-        if hasattr(model_class, "__tablename__"):
-            tablenames.append(model_class.__tablename__)
-    rows_archived = 0
-    for tablename in tablenames:
-        rows_archived += archive_deleted_rows_for_table(context, tablename,
-                                         max_rows=max_rows - rows_archived)
-        if rows_archived >= max_rows:
+    rows_archived = _archive_deleted_instances(context, max_rows)
+    total = sum(rows_archived.values())
+    for tablename in _archive_tablenames():
+        if max_rows is None:
+            rows_left = None
+        elif total < max_rows:
+            rows_left = max_rows - total
+        else:
             break
+        rows = archive_deleted_rows_for_table(context, tablename,
+                                              max_rows=rows_left)
+        if rows:
+            rows_archived[tablename] = rows_archived.get(tablename, 0) + rows
+            total += rows
     return rows_archived
 
 
@@ -5923,6 +6936,7 @@ def _instance_group_get_query(context, model_class, id_field=None, id=None,
     return query
 
 
+@_track_writes
 def instance_group_create(context, values, policies=None,
                           members=None):
     """Create a new group."""
@@ -5983,6 +6997,7 @@ def instance_group_get_by_instance(context, instance_uuid):
         return group
 
 
+@_track_writes
 def instance_group_update(context, group_uuid, values):
     """Update the attributes of an group.
 
@@ -6022,6 +7037,7 @@ def instance_group_update(context, group_uuid, values):
             values['members'] = members
 
 
+@_track_writes
 def instance_group_delete(context, group_uuid):
     """Delete an group."""
     session = get_session()
@@ -6122,6 +7138,7 @@ def _instance_group_members_add(context, id, members, set_delete=False,
         return members
 
 
+@_track_writes
 def instance_group_members_add(context, group_uuid, members,
                                set_delete=False):
     id = _instance_group_id(context, group_uuid)
@@ -6129,6 +7146,7 @@ def instance_group_members_add(context, group_uuid, members,
                                        set_delete=set_delete)
 
 
+@_track_writes
 def instance_group_member_delete(context, group_uuid, instance_id):
     id = _instance_group_id(context, group_uuid)
     count = _instance_group_get_query(context,
@@ -6182,6 +7200,7 @@ def _instance_group_policies_add(context, id, policies, set_delete=False,
         return policies
 
 
+@_track_writes
 def instance_group_policies_add(context, group_uuid, policies,
                                 set_delete=False):
     id = _instance_group_id(context, group_uuid)
@@ -6189,6 +7208,7 @@ def instance_group_policies_add(context, group_uuid, policies,
                                         set_delete=set_delete)
 
 
+@_track_writes
 def instance_group_policy_delete(context, group_uuid, policy):
     id = _instance_group_id(context, group_uuid)
     count = _instance_group_get_query(context,
@@ -6284,6 +7304,7 @@ def pci_device_update(context, node_id, address, values):
 ####################
 
 
+@_track_writes
 def instance_tag_add(context, instance_uuid, tag):
     session = get_session()
 
@@ -6302,6 +7323,7 @@ def instance_tag_add(context, instance_uuid, tag):
     return tag_ref
 
 
+@_track_writes
 def instance_tag_set(context, instance_uuid, tags):
     session = get_session()
 
@@ -6335,6 +7357,7 @@ def instance_tag_get_by_instance_uuid(context, instance_uuid):
             resource_id=instance_uuid).all()
 
 
+@_track_writes
 def instance_tag_delete(context, instance_uuid, tag):
     session = get_session()
 
@@ -6348,6 +7371,7 @@ def instance_tag_delete(context, instance_uuid, tag):
                                                 tag=tag)
 
 
+@_track_writes
 def instance_tag_delete_all(context, instance_uuid):
     session = get_session()
 
@@ -0,0 +1,61 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from sqlalchemy import MetaData, Table, Index
+
+
+def upgrade(migrate_engine):
+    """Add indexes matching the default sort keys of the instance listing.
+
+    The (project_id, deleted) index is replaced by the
+    (project_id, deleted, created_at, id) one, which covers it.
+    """
+
+    meta = MetaData(bind=migrate_engine)
+
+    instances = Table('instances', meta, autoload=True)
+
+    index = Index('instances_deleted_created_at_idx',
+                  instances.c.deleted, instances.c.created_at,
+                  instances.c.id)
+    index.create()
+
+    index = Index('instances_project_id_deleted_created_at_idx',
+                  instances.c.project_id, instances.c.deleted,
+                  instances.c.created_at, instances.c.id)
+    index.create()
+
+    for index in instances.indexes:
+        if [c.name for c in index.columns] == ['project_id', 'deleted']:
+            index.drop()
+
+
+def downgrade(migrate_engine):
+    """Remove the indexes matching the default sort keys of the instance
+    listing.
+    """
+
+    meta = MetaData(bind=migrate_engine)
+
+    instances = Table('instances', meta, autoload=True)
+
+    index = Index('instances_project_id_deleted_idx',
+                  instances.c.project_id, instances.c.deleted)
+    index.create()
+
+    for index in instances.indexes:
+        if index.name in ('instances_deleted_created_at_idx',
+                          'instances_project_id_deleted_created_at_idx'):
+            index.drop()
@@ -0,0 +1,103 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from migrate import UniqueConstraint
+from oslo_utils import timeutils
+from sqlalchemy import and_
+from sqlalchemy import Column
+from sqlalchemy import func
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import select
+from sqlalchemy.sql import text
+from sqlalchemy import Table
+
+from nova.i18n import _LI
+from nova.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+BASE_TABLE_NAME = 'quota_usages'
+NEW_COLUMN_NAME = 'generation'
+UC_NAME = 'uniq_quota_usages0project_id0user_id0resource0deleted'
+UC_COLUMNS = ('project_id', 'user_id', 'resource', 'deleted')
+
+
+def merge_duplicate_usages(quota_usages, reservations):
+    """Merges the usage records of a resource into the oldest one.
+
+    Concurrent first reservations of a resource could create several usage
+    records for it. Their counts are added up into the oldest record, which
+    is then refreshed by the next reservation of the resource, and their
+    reservations are moved over to it. The other records are soft-deleted.
+    """
+    columns = [quota_usages.c[name] for name in UC_COLUMNS]
+    duplicates = select(columns).group_by(
+        *columns).having(func.count() > 1).execute().fetchall()
+    for duplicate in duplicates:
+        rows = quota_usages.select().where(and_(*[
+            column.is_(None) if value is None else column == value
+            for column, value in zip(columns, duplicate)])).order_by(
+                quota_usages.c.id).execute().fetchall()
+        merged_ids = [row.id for row in rows[1:]]
+        quota_usages.update().where(
+            quota_usages.c.id == rows[0].id).values(
+                in_use=sum(row.in_use for row in rows),
+                reserved=sum(row.reserved for row in rows),
+                until_refresh=1).execute()
+        reservations.update().where(
+            reservations.c.usage_id.in_(merged_ids)).values(
+                usage_id=rows[0].id).execute()
+        quota_usages.update().where(
+            quota_usages.c.id.in_(merged_ids)).values(
+                deleted=quota_usages.c.id,
+                deleted_at=timeutils.utcnow()).execute()
+    if duplicates:
+        LOG.info(_LI("Merged the duplicate usage records of %d resources "
+                     "in the quota_usages table."), len(duplicates))
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for prefix in ('', 'shadow_'):
+        table = Table(prefix + BASE_TABLE_NAME, meta, autoload=True)
+        new_column = Column(NEW_COLUMN_NAME, Integer, nullable=False,
+                            server_default=text('0'))
+        if not hasattr(table.c, NEW_COLUMN_NAME):
+            table.create_column(new_column)
+
+    quota_usages = Table(BASE_TABLE_NAME, meta, autoload=True)
+    reservations = Table('reservations', meta, autoload=True)
+    merge_duplicate_usages(quota_usages, reservations)
+    # NOTE: The per-project usages have a NULL user_id, which never equals
+    # another one, so the constraint does not prevent new duplicates of
+    # these.
+    ukey = UniqueConstraint(*UC_COLUMNS, table=quota_usages, name=UC_NAME)
+    ukey.create()
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    quota_usages = Table(BASE_TABLE_NAME, meta, autoload=True)
+    ukey = UniqueConstraint(*UC_COLUMNS, table=quota_usages, name=UC_NAME)
+    ukey.drop()
+
+    for prefix in ('', 'shadow_'):
+        table = Table(prefix + BASE_TABLE_NAME, meta, autoload=True)
+        if hasattr(table.c, NEW_COLUMN_NAME):
+            getattr(table.c, NEW_COLUMN_NAME).drop()
@@ -27,6 +27,7 @@ from sqlalchemy import (Column, Index, Integer, BigInteger, Enum, String,
 from sqlalchemy.dialects.mysql import MEDIUMTEXT
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import orm
+from sqlalchemy import sql
 from sqlalchemy import ForeignKey, DateTime, Boolean, Text, Float
 
 from nova.db.sqlalchemy import types
@@ -195,8 +196,10 @@ class Instance(BASE, NovaBase):
     __tablename__ = 'instances'
     __table_args__ = (
         Index('uuid', 'uuid', unique=True),
-        Index('instances_project_id_deleted_idx',
-              'project_id', 'deleted'),
+        Index('instances_project_id_deleted_created_at_idx',
+              'project_id', 'deleted', 'created_at', 'id'),
+        Index('instances_deleted_created_at_idx',
+              'deleted', 'created_at', 'id'),
         Index('instances_reservation_id_idx',
               'reservation_id'),
         Index('instances_terminated_at_launched_at_idx',
@@ -365,6 +368,7 @@ class InstanceExtra(BASE, NovaBase):
     pci_requests = orm.deferred(Column(Text))
     flavor = orm.deferred(Column(Text))
     vcpu_model = orm.deferred(Column(Text))
+    system_metadata = orm.deferred(Column(Text))
     instance = orm.relationship(Instance,
                             backref=orm.backref('extra',
                                                 uselist=False),
@@ -517,6 +521,11 @@ class QuotaUsage(BASE, NovaBase):
     __table_args__ = (
         Index('ix_quota_usages_project_id', 'project_id'),
         Index('ix_quota_usages_user_id_deleted', 'user_id', 'deleted'),
+        # NOTE: This does not cover the per-project usages, whose user_id
+        # is NULL, as NULL never equals another NULL.
+        schema.UniqueConstraint(
+            'project_id', 'user_id', 'resource', 'deleted',
+            name='uniq_quota_usages0project_id0user_id0resource0deleted'),
     )
     id = Column(Integer, primary_key=True)
 
@@ -533,6 +542,13 @@ class QuotaUsage(BASE, NovaBase):
 
     until_refresh = Column(Integer)
 
+    # Bumped by every update of the row through the ORM, which only updates
+    # the row if its generation is still the one that was read.
+    generation = Column(Integer, nullable=False,
+                        server_default=sql.text('0'))
+
+    __mapper_args__ = {'version_id_col': generation}
+
 
 class Reservation(BASE, NovaBase):
     """Represents a resource reservation for quotas."""
@@ -961,6 +961,13 @@ class OverQuota(NovaException):
     msg_fmt = _("Quota exceeded for resources: %(overs)s")
 
 
+class QuotaUsageConflict(NovaException):
+    msg_fmt = _("Quota usages were updated concurrently, please retry.")
+    code = 409
+    headers = {'Retry-After': 1}
+    safe = True
+
+
 class SecurityGroupNotFound(NotFound):
     msg_fmt = _("Security group %(security_group_id)s not found.")
 
@@ -17,12 +17,20 @@
 Filter support
 """
 
+import time
+
 from nova.i18n import _LI
 from nova import loadables
 from nova.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# Weight of the last run in the moving averages of the filter costs
+COST_AVERAGE_WEIGHT = 0.1
+# Fraction of objects a filter is assumed to remove at least, to rank the
+# filters which remove nothing by their cost
+MIN_REMOVED_FRACTION = 0.001
+
 
 class BaseFilter(object):
     """Base class for all filter classes."""
@@ -47,6 +55,10 @@ class BaseFilter(object):
     # for each request rather than for each instance
     run_filter_once_per_request = False
 
+    # Set to true in a subclass if a filter must stay at its configured
+    # position when the handler reorders the filters by cost
+    keep_filter_position = False
+
     def run_filter_for_index(self, index):
         """Return True if the filter needs to be run for the "index-th"
         instance in a request.  Only need to override this if a filter
@@ -62,19 +74,76 @@ class BaseFilterHandler(loadables.BaseLoader):
     """Base class to handle loading filter classes.
 
     This class should be subclassed where one needs to use filters.
+
+    When reorder_filters is true, the handler keeps a moving average of the
+    time each filter takes per object and of the fraction of the objects it
+    keeps, and runs first the filters which are cheap and remove many
+    objects. The filters with keep_filter_position set are not moved.
     """
 
+    # Set to true in a subclass to reorder the filters by cost
+    reorder_filters = False
+
+    def __init__(self, *args, **kwargs):
+        super(BaseFilterHandler, self).__init__(*args, **kwargs)
+        # Maps filter class names to their average cost per object, in
+        # seconds, and the average fraction of objects they keep
+        self.filter_costs = {}
+
+    def _record_filter_run(self, cls_name, elapsed, num_in, num_out):
+        """Called after each filter run with its duration in seconds and the
+        number of objects it was given and kept.
+
+        Extend in a subclass to collect statistics.
+        """
+        if not self.reorder_filters or not num_in:
+            return
+        cost = elapsed / num_in
+        kept = float(num_out) / num_in
+        if cls_name in self.filter_costs:
+            old_cost, old_kept = self.filter_costs[cls_name]
+            cost = old_cost + COST_AVERAGE_WEIGHT * (cost - old_cost)
+            kept = old_kept + COST_AVERAGE_WEIGHT * (kept - old_kept)
+        self.filter_costs[cls_name] = (cost, kept)
+
+    def _filter_rank(self, filter):
+        """Return the expected cost of a filter per object it removes.
+
+        Filters which were never measured rank first, so that they get
+        measured.
+        """
+        costs = self.filter_costs.get(filter.__class__.__name__)
+        if costs is None:
+            return 0.0
+        cost, kept = costs
+        return cost / max(1.0 - kept, MIN_REMOVED_FRACTION)
+
+    def _order_filters(self, filters):
+        """Sort the filters by rank, except those keeping their position."""
+        filters = list(filters)
+        movable = [filter for filter in filters
+                   if not filter.keep_filter_position]
+        movable = iter(sorted(movable, key=self._filter_rank))
+        return [filter if filter.keep_filter_position else next(movable)
+                for filter in filters]
+
     def get_filtered_objects(self, filters, objs, filter_properties, index=0):
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
+        if self.reorder_filters:
+            filters = self._order_filters(filters)
         for filter in filters:
             if filter.run_filter_for_index(index):
                 cls_name = filter.__class__.__name__
+                start = time.time()
                 objs = filter.filter_all(list_objs, filter_properties)
                 if objs is None:
                     LOG.debug("Filter %s says to stop filtering", cls_name)
                     return
+                num_objs = len(list_objs)
                 list_objs = list(objs)
+                self._record_filter_run(cls_name, time.time() - start,
+                                        num_objs, len(list_objs))
                 if not list_objs:
                     LOG.info(_LI("Filter %s returned 0 hosts"), cls_name)
                     break
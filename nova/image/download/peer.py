@@ -0,0 +1,194 @@
+# Copyright 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import logging
+
+import eventlet
+from oslo_config import cfg
+import requests
+
+from nova import exception
+from nova.i18n import _, _LI
+import nova.image.download.base as xfer_base
+from nova.virt.libvirt import imagecache
+
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+peer_opts = [
+    cfg.ListOpt('peers', default=[],
+                help=_('List of compute hosts ([hostname|ip]:port) that '
+                       'export their image cache directory over HTTP. '
+                       'When "peer" is in glance.allowed_direct_url_schemes, '
+                       'images are fetched from the hosts holding them '
+                       'before falling back to glance.')),
+    cfg.IntOpt('chunk_size', default=64 * 1024 * 1024,
+               help=_('Size in bytes of the ranges requested from peers.')),
+    cfg.IntOpt('max_concurrency', default=4,
+               help=_('Maximum number of ranges fetched from peers at '
+                      'once.')),
+    cfg.IntOpt('timeout', default=30,
+               help=_('Timeout in seconds for requests to peers.')),
+]
+CONF.register_opts(peer_opts, group='image_peer_url')
+
+
+#  This module lets compute hosts pull an image from other compute hosts
+#  which already hold it in their image cache, so that a burst of boots of
+#  a new image does not make every host download it from glance.  To use it
+#  the following needs to be added to nova.conf:
+#  [glance]
+#  allowed_direct_url_schemes = peer
+#  [image_peer_url]
+#  peers = <list of host:port>
+#
+#  Every peer must serve the image cache directory of its compute host
+#  (instances_path/_base) read-only over HTTP, with support for range
+#  requests, for example with a static web server.  Base files are named
+#  after the SHA1 hash of the image id, see imagecache.get_cache_fname().
+#
+#  Only peers whose copy has the size recorded in glance are used, and the
+#  assembled file is verified against the glance checksum.  Cached copies
+#  which were converted to raw differ from the glance image, so they are
+#  skipped or rejected and the image is downloaded from glance instead.
+
+
+class PeerTracker(object):
+    """Finds the peers holding a complete copy of an image."""
+
+    def get_peers(self, image_id, size):
+        fname = imagecache.get_cache_fname({'id': image_id}, 'id')
+        urls = []
+        for peer in CONF.image_peer_url.peers:
+            url = 'http://%s/%s' % (peer, fname)
+            try:
+                resp = requests.head(url, timeout=CONF.image_peer_url.timeout)
+            except requests.RequestException as ex:
+                LOG.debug('Unable to query peer %(peer)s: %(ex)s',
+                          {'peer': peer, 'ex': ex})
+                continue
+            length = resp.headers.get('content-length')
+            if resp.status_code == 200 and length == str(size):
+                urls.append(url)
+        return urls
+
+
+class PeerTransfer(xfer_base.TransferBase):
+
+    def __init__(self, tracker=None):
+        self.tracker = tracker or PeerTracker()
+
+    def _fetch_range(self, urls, dst_file, start, end):
+        """Copy bytes start to end of the image into dst_file.
+
+        Each range starts with a different peer so that the load is spread
+        over all of them, and moves on to the next peer on failure.
+        """
+        expected = end - start + 1
+        offset = start // CONF.image_peer_url.chunk_size
+        for i in xrange(len(urls)):
+            url = urls[(offset + i) % len(urls)]
+            headers = {'Range': 'bytes=%d-%d' % (start, end)}
+            try:
+                resp = requests.get(url, headers=headers, stream=True,
+                                    timeout=CONF.image_peer_url.timeout)
+                if resp.status_code != 206:
+                    LOG.debug('Peer %(url)s returned %(status)s for a range '
+                              'request', {'url': url,
+                                          'status': resp.status_code})
+                    continue
+                written = 0
+                with open(dst_file, 'r+b') as f:
+                    f.seek(start)
+                    for chunk in resp.iter_content(64 * 1024):
+                        f.write(chunk)
+                        written += len(chunk)
+            except requests.RequestException as ex:
+                LOG.debug('Failed to fetch a range from %(url)s: %(ex)s',
+                          {'url': url, 'ex': ex})
+                continue
+            if written == expected:
+                return
+            LOG.debug('Peer %(url)s returned %(written)d bytes instead of '
+                      '%(expected)d', {'url': url, 'written': written,
+                                       'expected': expected})
+
+        msg = (_('No peer could provide bytes %(start)d-%(end)d') %
+               {'start': start, 'end': end})
+        raise exception.ImageDownloadModuleError(module=str(self),
+                                                 reason=msg)
+
+    def _checksum(self, dst_file):
+        md5 = hashlib.md5()
+        with open(dst_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), ''):
+                md5.update(chunk)
+        return md5.hexdigest()
+
+    def download(self, context, url_parts, dst_file, metadata, **kwargs):
+        image_id = url_parts.path.lstrip('/')
+        checksum = metadata.get('checksum')
+        size = metadata.get('size')
+        if not checksum or not size:
+            msg = _('The image checksum and size are required to fetch '
+                    'image %s from peers.') % image_id
+            raise exception.ImageDownloadModuleMetaDataError(
+                module=str(self), reason=msg)
+
+        urls = self.tracker.get_peers(image_id, size)
+        if not urls:
+            msg = _('No peer holds image %s.') % image_id
+            raise exception.ImageDownloadModuleError(module=str(self),
+                                                     reason=msg)
+
+        with open(dst_file, 'wb') as f:
+            f.truncate(size)
+        chunk_size = CONF.image_peer_url.chunk_size
+        pool = eventlet.GreenPool(CONF.image_peer_url.max_concurrency)
+        threads = []
+        for start in xrange(0, size, chunk_size):
+            end = min(start + chunk_size, size) - 1
+            threads.append(pool.spawn(self._fetch_range, urls, dst_file,
+                                      start, end))
+        # NOTE: wait on every range, so that no fetch is still writing to
+        # dst_file when a failure makes the caller fall back to glance.
+        errors = []
+        for thread in threads:
+            try:
+                thread.wait()
+            except Exception as ex:
+                errors.append(ex)
+        if errors:
+            raise errors[0]
+
+        if self._checksum(dst_file) != checksum:
+            msg = _('Checksum of image %s fetched from peers does not '
+                    'match.') % image_id
+            raise exception.ImageDownloadModuleError(module=str(self),
+                                                     reason=msg)
+        LOG.info(_LI('Fetched image %(image_id)s from %(count)d peers using '
+                     '%(module_str)s'),
+                 {'image_id': image_id, 'count': len(urls),
+                  'module_str': str(self)})
+
+
+def get_download_handler(**kwargs):
+    return PeerTransfer()
+
+
+def get_schemes():
+    return ['peer']
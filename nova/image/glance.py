@@ -33,7 +33,7 @@ import six
 import six.moves.urllib.parse as urlparse
 
 from nova import exception
-from nova.i18n import _, _LE
+from nova.i18n import _, _LE, _LW
 import nova.image.download as image_xfers
 from nova.openstack.common import log as logging
 
@@ -65,7 +65,7 @@ glance_opts = [
                 default=[],
                 help='A list of url scheme that can be downloaded directly '
                      'via the direct_url.  Currently supported schemes: '
-                     '[file].'),
+                     '[file, peer].'),
     ]
 
 LOG = logging.getLogger(__name__)
@@ -171,6 +171,14 @@ def get_api_servers():
     return itertools.cycle(api_servers)
 
 
+class _StreamInterrupted(Exception):
+    """Reading image data from glance failed part way through."""
+
+    def __init__(self, reason):
+        super(_StreamInterrupted, self).__init__()
+        self.reason = reason
+
+
 class GlanceClientWrapper(object):
     """Glance client wrapper class that implements retries."""
 
@@ -331,7 +339,15 @@ class GlanceImageService(object):
         """Calls out to Glance for data and writes data."""
         if CONF.glance.allowed_direct_url_schemes and dst_path is not None:
             image = self.show(context, image_id, include_locations=True)
-            for entry in image.get('locations', []):
+            locations = list(image.get('locations', []))
+            if 'peer' in CONF.glance.allowed_direct_url_schemes:
+                # NOTE: images are not advertised at peers by glance, so
+                # try them after the locations it knows about.
+                locations.append({'url': 'peer:///%s' % image_id,
+                                  'metadata': {
+                                      'checksum': image.get('checksum'),
+                                      'size': image.get('size')}})
+            for entry in locations:
                 loc_url = entry['url']
                 loc_meta = entry['metadata']
                 o = urlparse.urlparse(loc_url)
@@ -346,25 +362,70 @@ class GlanceImageService(object):
                     except Exception as ex:
                         LOG.exception(ex)
 
+        if data is None and dst_path:
+            data = open(dst_path, 'wb')
+            try:
+                self._download_to_file(context, image_id, data)
+            finally:
+                data.close()
+            return
+
         try:
             image_chunks = self._client.call(context, 1, 'data', image_id)
         except Exception:
             _reraise_translated_image_exception(image_id)
 
-        close_file = False
-        if data is None and dst_path:
-            data = open(dst_path, 'wb')
-            close_file = True
-
         if data is None:
             return image_chunks
-        else:
+        for chunk in image_chunks:
+            data.write(chunk)
+
+    def _download_to_file(self, context, image_id, data):
+        """Stream the image into a file we own.
+
+        As the file can be rewound, a transfer interrupted part way through
+        is restarted against the next api server, up to
+        CONF.glance.num_retries times, rather than failing the whole fetch.
+        """
+        num_attempts = 1 + CONF.glance.num_retries
+        for attempt in xrange(1, num_attempts + 1):
+            data.seek(0)
+            data.truncate()
             try:
-                for chunk in image_chunks:
-                    data.write(chunk)
-            finally:
-                if close_file:
-                    data.close()
+                self._write_image_chunks(context, image_id, data)
+                return
+            except _StreamInterrupted as e:
+                if attempt == num_attempts:
+                    raise exception.GlanceConnectionFailed(
+                        host=getattr(self._client, 'host', None),
+                        port=getattr(self._client, 'port', None),
+                        reason=six.text_type(e.reason))
+                LOG.warning(_LW("Download of image %(image_id)s was "
+                                "interrupted: %(reason)s, retrying."),
+                            {'image_id': image_id, 'reason': e.reason})
+
+    def _write_image_chunks(self, context, image_id, data):
+        """Stream the image data from glance into data.
+
+        Errors raised while reading from glance, including the client's
+        checksum verification failing at the end of the stream, are raised
+        as _StreamInterrupted so that the caller can retry the transfer.
+        Errors writing to data are raised unchanged.
+        """
+        try:
+            image_chunks = self._client.call(context, 1, 'data', image_id)
+        except Exception:
+            _reraise_translated_image_exception(image_id)
+
+        image_chunks = iter(image_chunks)
+        while True:
+            try:
+                chunk = next(image_chunks)
+            except StopIteration:
+                return
+            except (IOError, glanceclient.exc.CommunicationError) as e:
+                raise _StreamInterrupted(e)
+            data.write(chunk)
 
     def create(self, context, image_meta, data=None):
         """Store the image data and return the new image object."""
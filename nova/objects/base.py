@@ -201,6 +201,9 @@ def remotable(fn):
                         self[key] = field.from_primitive(self, key, value)
             self.obj_reset_changes()
             self._changed_fields = set(updates.get('obj_what_changed', []))
+            # NOTE: The action may have written to the database on our
+            # behalf, so let the later reads of this request see it.
+            ctxt.db_written = True
             return result
         else:
             return fn(self, ctxt, *args, **kwargs)
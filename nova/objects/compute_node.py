@@ -13,6 +13,7 @@
 #    under the License.
 
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 
 from nova import db
 from nova import exception
@@ -283,7 +284,8 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
     # Version 1.8 ComputeNode version 1.8 + add get_all_by_host()
     # Version 1.9 ComputeNode version 1.9
     # Version 1.10 ComputeNode version 1.10
-    VERSION = '1.10'
+    # Version 1.11 Add get_all_changed_since()
+    VERSION = '1.11'
     fields = {
         'objects': fields.ListOfObjectsField('ComputeNode'),
         }
@@ -300,6 +302,7 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         '1.8': '1.8',
         '1.9': '1.9',
         '1.10': '1.10',
+        '1.11': '1.10',
         }
 
     @base.remotable_classmethod
@@ -308,6 +311,27 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @base.remotable_classmethod
+    def _get_all_changed_since(cls, context, changes_since):
+        changes_since = timeutils.parse_isotime(changes_since)
+        db_computes = db.compute_node_get_all_changed_since(context,
+                                                            changes_since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
+    @classmethod
+    def get_all_changed_since(cls, context, changes_since):
+        """Get the compute nodes created, updated or deleted since a time.
+
+        :param context: nova request context
+        :param changes_since: datetime after which the nodes were changed
+        :returns: ComputeNodeList, including the deleted compute nodes
+        """
+        # The timestamp has to be converted to a string primitive for the
+        # remote call.
+        return cls._get_all_changed_since(context,
+                                          timeutils.isotime(changes_since))
+
     @base.remotable_classmethod
     def get_by_hypervisor(cls, context, hypervisor_match):
         db_computes = db.compute_node_search_by_hypervisor(context,
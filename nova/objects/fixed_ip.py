@@ -39,7 +39,8 @@ class FixedIP(obj_base.NovaPersistentObject, obj_base.NovaObject,
     # Version 1.7: Instance 1.17
     # Version 1.8: Instance 1.18
     # Version 1.8: Instance 1.19
-    VERSION = '1.9'
+    # Version 1.10: Instance 1.20
+    VERSION = '1.10'
 
     fields = {
         'id': fields.IntegerField(),
@@ -65,7 +66,7 @@ class FixedIP(obj_base.NovaPersistentObject, obj_base.NovaObject,
     obj_relationships = {
         'instance': [('1.0', '1.13'), ('1.2', '1.14'), ('1.3', '1.15'),
                      ('1.6', '1.16'), ('1.7', '1.17'), ('1.8', '1.18'),
-                     ('1.9', '1.19')],
+                     ('1.9', '1.19'), ('1.10', '1.20')],
         'network': [('1.0', '1.2')],
         'virtual_interface': [('1.1', '1.0')],
         'floating_ips': [('1.5', '1.7')],
@@ -213,7 +214,8 @@ class FixedIPList(obj_base.ObjectListBase, obj_base.NovaObject):
     # Version 1.7: FixedIP <= version 1.7
     # Version 1.8: FixedIP <= version 1.8
     # Version 1.8: FixedIP <= version 1.9
-    VERSION = '1.9'
+    # Version 1.10: FixedIP <= version 1.10
+    VERSION = '1.10'
 
     fields = {
         'objects': fields.ListOfObjectsField('FixedIP'),
@@ -229,6 +231,7 @@ class FixedIPList(obj_base.ObjectListBase, obj_base.NovaObject):
         '1.7': '1.7',
         '1.8': '1.8',
         '1.9': '1.9',
+        '1.10': '1.10',
         }
 
     @obj_base.remotable_classmethod
@@ -56,6 +56,9 @@ INSTANCE_OPTIONAL_ATTRS = (_INSTANCE_OPTIONAL_JOINED_FIELDS +
 INSTANCE_DEFAULT_FIELDS = ['metadata', 'system_metadata',
                            'info_cache', 'security_groups']
 
+# Number of instances fetched at a time by the InstanceList iterators
+ITER_BATCH_SIZE = 1000
+
 
 def _expected_cols(expected_attrs):
     """Return expected_attrs that are columns needing joining.
@@ -153,7 +156,8 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
     # Version 1.17: Added tags
     # Version 1.18: Added flavor, old_flavor, new_flavor
     # Version 1.19: Added vcpu_model
-    VERSION = '1.19'
+    # Version 1.20: Added unloaded_fields
+    VERSION = '1.20'
 
     fields = {
         'id': fields.IntegerField(),
@@ -248,6 +252,9 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         'old_flavor': fields.ObjectField('Flavor', nullable=True),
         'new_flavor': fields.ObjectField('Flavor', nullable=True),
         'vcpu_model': fields.ObjectField('VirtCPUModel', nullable=True),
+
+        # Fields left out of a projected query, loaded on first access
+        'unloaded_fields': fields.ListOfStringsField(),
         }
 
     obj_extra_fields = ['name']
@@ -301,6 +308,15 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
     def obj_make_compatible(self, primitive, target_version):
         super(Instance, self).obj_make_compatible(primitive, target_version)
         target_version = utils.convert_version_to_tuple(target_version)
+        if target_version < (1, 20) and 'unloaded_fields' in primitive:
+            # NOTE: Older versions can not lazy-load the fields left out of
+            # a projected query, so send them the full instance.
+            unloaded_fields = self._get_unloaded_fields()
+            self._load_unloaded_fields()
+            for field in unloaded_fields:
+                primitive[field] = self.fields[field].to_primitive(
+                    self, field, self[field])
+            del primitive['unloaded_fields']
         unicode_attributes = ['user_id', 'project_id', 'image_ref',
                               'kernel_id', 'ramdisk_id', 'hostname',
                               'key_name', 'key_data', 'host', 'node',
@@ -474,24 +490,35 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         return migrated_flavor
 
     @staticmethod
-    def _from_db_object(context, instance, db_inst, expected_attrs=None):
+    def _from_db_object(context, instance, db_inst, expected_attrs=None,
+                        projected=False):
         """Method to help with migration to objects.
 
         Converts a database entity to a formal object.
+
+        If projected is True, db_inst only has some of the columns of the
+        instance and the other fields are loaded on first access.
         """
         instance._context = context
         if expected_attrs is None:
             expected_attrs = []
+        unloaded_fields = []
         # Most of the field names match right now, so be quick
         for field in instance.fields:
             if field in INSTANCE_OPTIONAL_ATTRS:
                 continue
+            elif field == 'unloaded_fields':
+                continue
+            elif projected and field not in db_inst:
+                unloaded_fields.append(field)
             elif field == 'deleted':
                 instance.deleted = db_inst['deleted'] == db_inst['id']
             elif field == 'cleaned':
                 instance.cleaned = db_inst['cleaned'] == 1
             else:
                 instance[field] = db_inst[field]
+        if unloaded_fields or instance.obj_attr_is_set('unloaded_fields'):
+            instance.unloaded_fields = unloaded_fields
 
         if 'metadata' in expected_attrs:
             instance['metadata'] = utils.instance_meta(db_inst)
@@ -661,6 +688,8 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         pass
 
     def _save_numa_topology(self, context):
+        if 'numa_topology' not in self.obj_what_changed():
+            return
         if self.numa_topology:
             self.numa_topology.instance_uuid = self.uuid
             self.numa_topology._save(context)
@@ -681,6 +710,9 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
     def _save_flavor(self, context):
         # FIXME(danms): We can do this smarterly by updating this
         # with all the other extra things at the same time
+        if not (set(['flavor', 'old_flavor', 'new_flavor']) &
+                self.obj_what_changed()):
+            return
         flavor_info = {
             'cur': self.flavor.obj_to_primitive(),
             'old': (self.old_flavor and
@@ -870,6 +902,12 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         # expected_attrs properly)
         current._context = None
 
+        # NOTE: current has all the fields a projected query left out
+        for field in self._get_unloaded_fields():
+            self[field] = current[field]
+        if self._get_unloaded_fields():
+            self.unloaded_fields = []
+
         for field in self.fields:
             if self.obj_attr_is_set(field):
                 if field == 'info_cache':
@@ -891,6 +929,23 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
                 action='obj_load_attr',
                 reason='loading %s requires recursion' % attrname)
 
+    def _get_unloaded_fields(self):
+        if not self.obj_attr_is_set('unloaded_fields'):
+            return []
+        return self.unloaded_fields
+
+    def _load_unloaded_fields(self):
+        unloaded_fields = self._get_unloaded_fields()
+        if not unloaded_fields:
+            return
+        instance = self.__class__.get_by_uuid(self._context,
+                                              uuid=self.uuid,
+                                              expected_attrs=[])
+        for field in unloaded_fields:
+            self[field] = instance[field]
+        self.unloaded_fields = []
+        self.obj_reset_changes(unloaded_fields + ['unloaded_fields'])
+
     def _load_fault(self):
         self.fault = objects.InstanceFault.get_latest_for_instance(
             self._context, self.uuid)
@@ -960,6 +1015,19 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
                 db_vcpu_model)
 
     def obj_load_attr(self, attrname):
+        if attrname == 'unloaded_fields':
+            # NOTE: Only the instances of a projected query have fields
+            # left out
+            self.unloaded_fields = []
+            self.obj_reset_changes(['unloaded_fields'])
+            return
+        if attrname in self._get_unloaded_fields() and self._context:
+            LOG.debug("Lazy-loading the fields left out of the query of "
+                      "%(name)s uuid %(uuid)s",
+                      {'name': self.obj_name(), 'uuid': self.uuid})
+            self._load_unloaded_fields()
+            return
+
         if attrname not in INSTANCE_OPTIONAL_ATTRS:
             raise exception.ObjectActionError(
                 action='obj_load_attr',
@@ -1050,7 +1118,8 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             self.obj_reset_changes(['metadata'])
 
 
-def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
+def _make_instance_list(context, inst_list, db_inst_list, expected_attrs,
+                        projected=False):
     get_fault = expected_attrs and 'fault' in expected_attrs
     inst_faults = {}
     if get_fault:
@@ -1067,7 +1136,7 @@ def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
     for db_inst in db_inst_list:
         inst_obj = objects.Instance._from_db_object(
                 context, objects.Instance(context), db_inst,
-                expected_attrs=expected_attrs)
+                expected_attrs=expected_attrs, projected=projected)
         if get_fault:
             inst_obj.fault = inst_faults.get(inst_obj.uuid, None)
         inst_list.objects.append(inst_obj)
@@ -1093,7 +1162,13 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     # Version 1.13: Instance <= version 1.17
     # Version 1.14: Instance <= version 1.18
     # Version 1.15: Instance <= version 1.19
-    VERSION = '1.15'
+    # Version 1.16: Added fields to get_by_filters
+    # Version 1.17: Added limit and marker to get_active_by_window_joined
+    # Version 1.18: Added get_usage_by_window
+    # Version 1.19: Instance <= version 1.20
+    # Version 1.20: Added fields to get_by_host
+    # Version 1.21: Added get_count_active_by_window
+    VERSION = '1.21'
 
     fields = {
         'objects': fields.ListOfObjectsField('Instance'),
@@ -1115,33 +1190,87 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         '1.13': '1.17',
         '1.14': '1.18',
         '1.15': '1.19',
+        '1.16': '1.19',
+        '1.17': '1.19',
+        '1.18': '1.19',
+        '1.19': '1.20',
+        '1.20': '1.20',
+        '1.21': '1.20',
         }
 
     @base.remotable_classmethod
     def get_by_filters(cls, context, filters,
                        sort_key='created_at', sort_dir='desc', limit=None,
                        marker=None, expected_attrs=None, use_slave=False,
-                       sort_keys=None, sort_dirs=None):
+                       sort_keys=None, sort_dirs=None, fields=None):
+        """Return the instances matching the filters.
+
+        fields is an optional list of the non-joined fields needed by the
+        caller. Only these fields are read from the database, the other
+        ones are loaded on first access. The joined fields are still given
+        by expected_attrs.
+        """
+        kwargs = {}
+        if fields is not None:
+            kwargs['columns'] = fields
         if sort_keys or sort_dirs:
             db_inst_list = db.instance_get_all_by_filters_sort(
                 context, filters, limit=limit, marker=marker,
                 columns_to_join=_expected_cols(expected_attrs),
-                use_slave=use_slave, sort_keys=sort_keys, sort_dirs=sort_dirs)
+                use_slave=use_slave, sort_keys=sort_keys, sort_dirs=sort_dirs,
+                **kwargs)
         else:
             db_inst_list = db.instance_get_all_by_filters(
                 context, filters, sort_key, sort_dir, limit=limit,
                 marker=marker, columns_to_join=_expected_cols(expected_attrs),
-                use_slave=use_slave)
+                use_slave=use_slave, **kwargs)
         return _make_instance_list(context, cls(), db_inst_list,
-                                   expected_attrs)
+                                   expected_attrs,
+                                   projected=fields is not None)
+
+    @classmethod
+    def iter_by_filters(cls, context, filters,
+                        sort_key='created_at', sort_dir='desc',
+                        expected_attrs=None, use_slave=False,
+                        sort_keys=None, sort_dirs=None, fields=None,
+                        batch_size=ITER_BATCH_SIZE):
+        """Iterate over the instances matching the filters.
+
+        The instances are fetched batch_size at a time with get_by_filters,
+        so that only one batch is held in memory however many instances
+        match. The batches are read separately, so an instance changed
+        while iterating may be missed or seen twice.
+        """
+        marker = None
+        while True:
+            batch = cls.get_by_filters(
+                context, filters, sort_key=sort_key, sort_dir=sort_dir,
+                limit=batch_size, marker=marker,
+                expected_attrs=expected_attrs, use_slave=use_slave,
+                sort_keys=sort_keys, sort_dirs=sort_dirs, fields=fields)
+            for instance in batch:
+                yield instance
+            if len(batch) < batch_size:
+                return
+            marker = batch[-1].uuid
 
     @base.remotable_classmethod
-    def get_by_host(cls, context, host, expected_attrs=None, use_slave=False):
+    def get_by_host(cls, context, host, expected_attrs=None, use_slave=False,
+                    fields=None):
+        """Return the instances of a host.
+
+        fields is an optional list of the non-joined fields needed by the
+        caller, as for get_by_filters.
+        """
+        kwargs = {}
+        if fields is not None:
+            kwargs['columns'] = fields
         db_inst_list = db.instance_get_all_by_host(
             context, host, columns_to_join=_expected_cols(expected_attrs),
-            use_slave=use_slave)
+            use_slave=use_slave, **kwargs)
         return _make_instance_list(context, cls(), db_inst_list,
-                                   expected_attrs)
+                                   expected_attrs,
+                                   projected=fields is not None)
 
     @base.remotable_classmethod
     def get_by_host_and_node(cls, context, host, node, expected_attrs=None):
@@ -1171,14 +1300,18 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     def _get_active_by_window_joined(cls, context, begin, end=None,
                                     project_id=None, host=None,
                                     expected_attrs=None,
-                                    use_slave=False):
+                                    use_slave=False, limit=None,
+                                    marker=None):
         # NOTE(mriedem): We need to convert the begin/end timestamp strings
         # to timezone-aware datetime objects for the DB API call.
         begin = timeutils.parse_isotime(begin)
         end = timeutils.parse_isotime(end) if end else None
+        kwargs = {}
+        if limit is not None:
+            kwargs.update(limit=limit, marker=marker)
         db_inst_list = db.instance_get_active_by_window_joined(
             context, begin, end, project_id, host,
-            columns_to_join=_expected_cols(expected_attrs))
+            columns_to_join=_expected_cols(expected_attrs), **kwargs)
         return _make_instance_list(context, cls(), db_inst_list,
                                    expected_attrs)
 
@@ -1209,6 +1342,79 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
                                                 expected_attrs,
                                                 use_slave=use_slave)
 
+    @classmethod
+    def iter_active_by_window_joined(cls, context, begin, end=None,
+                                     project_id=None, host=None,
+                                     expected_attrs=None, use_slave=False,
+                                     batch_size=ITER_BATCH_SIZE):
+        """Iterate over the instances active during a time window.
+
+        Takes the arguments of get_active_by_window_joined, but fetches the
+        instances batch_size at a time in id order, so that only one batch
+        is held in memory however many instances were active.
+        """
+        begin = timeutils.isotime(begin)
+        end = timeutils.isotime(end) if end else None
+        marker = None
+        while True:
+            batch = cls._get_active_by_window_joined(
+                context, begin, end, project_id, host, expected_attrs,
+                use_slave=use_slave, limit=batch_size, marker=marker)
+            for instance in batch:
+                yield instance
+            if len(batch) < batch_size:
+                return
+            marker = batch[-1].uuid
+
+    @base.remotable_classmethod
+    def _get_count_active_by_window(cls, context, begin, end=None,
+                                    project_id=None, host=None,
+                                    use_slave=False):
+        begin = timeutils.parse_isotime(begin)
+        end = timeutils.parse_isotime(end) if end else None
+        return db.instance_count_active_by_window(context, begin, end,
+                                                  project_id, host,
+                                                  use_slave=use_slave)
+
+    @classmethod
+    def get_count_active_by_window(cls, context, begin, end=None,
+                                   project_id=None, host=None,
+                                   use_slave=False):
+        """Count the instances active during a certain time window.
+
+        Takes the filters of get_active_by_window_joined, so that the
+        instances can be counted before iterating over them with
+        iter_active_by_window_joined.
+        """
+        begin = timeutils.isotime(begin)
+        end = timeutils.isotime(end) if end else None
+        return cls._get_count_active_by_window(context, begin, end,
+                                               project_id, host,
+                                               use_slave=use_slave)
+
+    @base.remotable_classmethod
+    def _get_usage_by_window(cls, context, begin, end, project_id=None):
+        begin = timeutils.parse_isotime(begin)
+        end = timeutils.parse_isotime(end)
+        return db.instance_usage_get_by_window(context, begin, end,
+                                               project_id=project_id)
+
+    @classmethod
+    def get_usage_by_window(cls, context, begin, end, project_id=None):
+        """Get the usage of the instances active during a time window.
+
+        :param:context: nova request context
+        :param:begin: datetime for the start of the time window
+        :param:end: datetime for the end of the time window
+        :param:project_id: used to filter instances by project
+        :returns: a list of dicts, one per project, with the project_id
+                  and the instance, vcpus, memory_mb and local_gb hours
+        """
+        begin = timeutils.isotime(begin)
+        end = timeutils.isotime(end)
+        return cls._get_usage_by_window(context, begin, end,
+                                        project_id=project_id)
+
     @base.remotable_classmethod
     def get_by_security_group_id(cls, context, security_group_id):
         db_secgroup = db.security_group_get(
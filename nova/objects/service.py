@@ -12,6 +12,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo_utils import timeutils
+
 from nova import availability_zones
 from nova import db
 from nova import exception
@@ -149,7 +151,8 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
     # Version 1.5: Service version 1.7
     # Version 1.6: Service version 1.8
     # Version 1.7: Service version 1.9
-    VERSION = '1.7'
+    # Version 1.8: Added get_by_topic_changed_since()
+    VERSION = '1.8'
 
     fields = {
         'objects': fields.ListOfObjectsField('Service'),
@@ -164,6 +167,7 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
         '1.5': '1.7',
         '1.6': '1.8',
         '1.7': '1.9',
+        '1.8': '1.9',
         }
 
     @base.remotable_classmethod
@@ -172,6 +176,26 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.Service,
                                   db_services)
 
+    @base.remotable_classmethod
+    def _get_by_topic_changed_since(cls, context, topic, changes_since):
+        changes_since = timeutils.parse_isotime(changes_since)
+        db_services = db.service_get_all_by_topic_changed_since(
+            context, topic, changes_since)
+        return base.obj_make_list(context, cls(context), objects.Service,
+                                  db_services)
+
+    @classmethod
+    def get_by_topic_changed_since(cls, context, topic, changes_since):
+        """Get the services of a topic changed since a point in time.
+
+        Unlike get_by_topic(), the deleted and disabled services are
+        returned as well.
+        """
+        # The timestamp has to be converted to a string primitive for the
+        # remote call.
+        return cls._get_by_topic_changed_since(
+            context, topic, timeutils.isotime(changes_since))
+
     @base.remotable_classmethod
     def get_by_host(cls, context, host):
         db_services = db.service_get_all_by_host(context, host)
@@ -86,7 +86,10 @@ quota_opts = [
                help='Number of seconds between subsequent usage refreshes'),
     cfg.StrOpt('quota_driver',
                default='nova.quota.DbQuotaDriver',
-               help='Default driver to use for quota checks'),
+               help='Default driver to use for quota checks, for example '
+                    'nova.quota.DbQuotaDriver, '
+                    'nova.quota.OptimisticDbQuotaDriver or '
+                    'nova.quota.NoopQuotaDriver'),
     ]
 
 CONF = cfg.CONF
@@ -542,6 +545,11 @@ class DbQuotaDriver(object):
         #            which means access to the session.  Since the
         #            session isn't available outside the DBAPI, we
         #            have to do the work there.
+        return self._reserve(context, resources, quotas, user_quotas,
+                             deltas, expire, project_id, user_id)
+
+    def _reserve(self, context, resources, quotas, user_quotas, deltas,
+                 expire, project_id, user_id):
         return db.quota_reserve(context, resources, quotas, user_quotas,
                                 deltas, expire,
                                 CONF.until_refresh, CONF.max_age,
@@ -567,6 +575,9 @@ class DbQuotaDriver(object):
         if user_id is None:
             user_id = context.user_id
 
+        self._commit(context, reservations, project_id, user_id)
+
+    def _commit(self, context, reservations, project_id, user_id):
         db.reservation_commit(context, reservations, project_id=project_id,
                               user_id=user_id)
 
@@ -590,6 +601,9 @@ class DbQuotaDriver(object):
         if user_id is None:
             user_id = context.user_id
 
+        self._rollback(context, reservations, project_id, user_id)
+
+    def _rollback(self, context, reservations, project_id, user_id):
         db.reservation_rollback(context, reservations, project_id=project_id,
                                 user_id=user_id)
 
@@ -655,6 +669,38 @@ class DbQuotaDriver(object):
         db.reservation_expire(context)
 
 
+class OptimisticDbQuotaDriver(DbQuotaDriver):
+    """Driver keeping the quota usages in the local database without
+    locking them.
+
+    The usages are read without SELECT ... FOR UPDATE. Reservations, commits
+    and rollbacks add their deltas to the usage rows with single UPDATE
+    statements, which check the quota in their WHERE clause, so concurrent
+    reservations in a project only wait for each other for the duration of
+    these statements. Usage refreshes only apply if the row has not changed
+    since it was read, and are retried with a backoff otherwise.
+    QuotaUsageConflict is raised when the retries run out.
+    """
+
+    def _reserve(self, context, resources, quotas, user_quotas, deltas,
+                 expire, project_id, user_id):
+        return db.quota_reserve_optimistic(context, resources, quotas,
+                                           user_quotas, deltas, expire,
+                                           CONF.until_refresh, CONF.max_age,
+                                           project_id=project_id,
+                                           user_id=user_id)
+
+    def _commit(self, context, reservations, project_id, user_id):
+        db.reservation_commit_optimistic(context, reservations,
+                                         project_id=project_id,
+                                         user_id=user_id)
+
+    def _rollback(self, context, reservations, project_id, user_id):
+        db.reservation_rollback_optimistic(context, reservations,
+                                           project_id=project_id,
+                                           user_id=user_id)
+
+
 class NoopQuotaDriver(object):
     """Driver that turns quotas calls into no-ops and pretends that quotas
     for all resources are unlimited.  This can be used if you do not
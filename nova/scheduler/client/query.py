@@ -32,3 +32,11 @@ class SchedulerQueryClient(object):
         """
         return self.scheduler_rpcapi.select_destinations(
             context, request_spec, filter_properties)
+
+    def update_aggregates(self, context, aggregates):
+        """Updates the aggregates known by the schedulers."""
+        self.scheduler_rpcapi.update_aggregates(context, aggregates)
+
+    def delete_aggregate(self, context, aggregate):
+        """Removes a deleted aggregate from the schedulers."""
+        self.scheduler_rpcapi.delete_aggregate(context, aggregate)
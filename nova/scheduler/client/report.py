@@ -14,10 +14,25 @@
 #    under the License.
 
 
+from oslo_config import cfg
+
 from nova import conductor
 from nova import exception
 from nova.i18n import _LI
+from nova import objects
 from nova.openstack.common import log as logging
+from nova.scheduler import rpcapi as scheduler_rpcapi
+
+report_client_opts = [
+    cfg.BoolOpt('scheduler_push_compute_updates',
+                default=False,
+                help='Send the updated compute node records to the '
+                     'schedulers, so that they refresh the state of the host '
+                     'without waiting for their next poll of the database.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(report_client_opts)
 
 LOG = logging.getLogger(__name__)
 
@@ -27,6 +42,7 @@ class SchedulerReportClient(object):
 
     def __init__(self):
         self.conductor_api = conductor.API()
+        self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
 
     def update_resource_stats(self, context, name, stats):
         """Creates or updates stats for the desired service.
@@ -45,9 +61,12 @@ class SchedulerReportClient(object):
         else:
             raise exception.ComputeHostNotCreated(name=str(name))
 
-        self.conductor_api.compute_node_update(context,
-                                               {'id': compute_node_id},
-                                               updates)
+        db_compute = self.conductor_api.compute_node_update(
+            context, {'id': compute_node_id}, updates)
+        if CONF.scheduler_push_compute_updates:
+            compute_node = objects.ComputeNode._from_db_object(
+                context, objects.ComputeNode(), db_compute)
+            self.scheduler_rpcapi.update_compute_node(context, compute_node)
 
         LOG.info(_LI('Compute_service record updated for '
                  '%s') % str(name))
@@ -19,6 +19,7 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import heapq
 import random
 
 from oslo_config import cfg
@@ -44,7 +45,15 @@ filter_scheduler_opts = [
                     'chosen from. A value of 1 chooses the '
                     'first host returned by the weighing functions. '
                     'This value must be at least 1. Any value less than 1 '
-                    'will be ignored, and 1 will be used instead')
+                    'will be ignored, and 1 will be used instead'),
+    cfg.BoolOpt('scheduler_batch_placement',
+                default=False,
+                help='Place the instances of a multiple instances request '
+                     'by filtering and weighing the hosts only once. Each '
+                     'time a host is picked, it is checked against the '
+                     'filters again and only the chosen host is weighed '
+                     'again, instead of filtering and weighing all the '
+                     'hosts for every instance.'),
 ]
 
 CONF.register_opts(filter_scheduler_opts)
@@ -79,6 +88,13 @@ class FilterScheduler(driver.Scheduler):
             reason = _('There are not enough hosts available.')
             raise exception.NoValidHost(reason=reason)
 
+        group_uuid = filter_properties.get('group_uuid')
+        if group_uuid:
+            instance_uuids = request_spec.get('instance_uuids') or []
+            for instance_uuid, host in zip(instance_uuids, selected_hosts):
+                self.host_manager.add_group_member(group_uuid, instance_uuid,
+                                                   host.obj.host)
+
         dests = [dict(host=host.obj.host, nodename=host.obj.nodename,
                       limits=host.obj.limits) for host in selected_hosts]
 
@@ -86,6 +102,10 @@ class FilterScheduler(driver.Scheduler):
                            dict(request_spec=request_spec))
         return dests
 
+    def run_periodic_tasks(self, context):
+        """Called from a periodic tasks in the manager."""
+        self.host_manager.sync_group_members()
+
     def _get_configuration_options(self):
         """Fetch options dictionary. Broken out for testing."""
         return self.options.get_configuration()
@@ -100,16 +120,18 @@ class FilterScheduler(driver.Scheduler):
         filter_properties['project_id'] = project_id
         filter_properties['os_type'] = os_type
 
-    def _schedule(self, context, request_spec, filter_properties):
+    def _schedule(self, context, request_spec, filter_properties,
+                  hosts=None):
         """Returns a list of hosts that meet the required specs,
         ordered by their fitness.
+
+        The hosts are chosen among all the host states, unless a list of
+        host states to choose from is given.
         """
         elevated = context.elevated()
         instance_properties = request_spec['instance_properties']
         instance_type = request_spec.get("instance_type", None)
 
-        update_group_hosts = filter_properties.get('group_updated', False)
-
         config_options = self._get_configuration_options()
 
         filter_properties.update({'context': context,
@@ -119,6 +141,7 @@ class FilterScheduler(driver.Scheduler):
 
         self.populate_filter_properties(request_spec,
                                         filter_properties)
+        self._setup_group_hosts(elevated, filter_properties)
 
         # Find our local list of acceptable hosts by repeatedly
         # filtering and weighing our options. Each time we choose a
@@ -128,10 +151,15 @@ class FilterScheduler(driver.Scheduler):
         # Note: remember, we are using an iterator here. So only
         # traverse this list once. This can bite you if the hosts
         # are being scanned in a filter or weighing function.
-        hosts = self._get_all_host_states(elevated)
+        if hosts is None:
+            hosts = self._get_all_host_states(elevated)
 
-        selected_hosts = []
         num_instances = request_spec.get('num_instances', 1)
+        if CONF.scheduler_batch_placement and num_instances > 1:
+            return self._schedule_batch(hosts, instance_properties,
+                                        filter_properties, num_instances)
+
+        selected_hosts = []
         for num in xrange(num_instances):
             # Filter local hosts based on requirements ...
             hosts = self.host_manager.get_filtered_hosts(hosts,
@@ -159,17 +187,93 @@ class FilterScheduler(driver.Scheduler):
 
             # Now consume the resources so the filter/weights
             # will change for the next instance.
-            chosen_host.obj.consume_from_instance(instance_properties)
-            if update_group_hosts is True:
-                # NOTE(sbauza): Group details are serialized into a list now
-                # that they are populated by the conductor, we need to
-                # deserialize them
-                if isinstance(filter_properties['group_hosts'], list):
-                    filter_properties['group_hosts'] = set(
-                        filter_properties['group_hosts'])
-                filter_properties['group_hosts'].add(chosen_host.obj.host)
+            self._consume_host(chosen_host.obj, instance_properties,
+                               filter_properties)
+        return selected_hosts
+
+    def _schedule_batch(self, hosts, instance_properties, filter_properties,
+                        num_instances):
+        """Returns a list of hosts for all the instances of a request.
+
+        The hosts are filtered and weighed once, then kept in a heap ordered
+        by weight. Each time a host is popped, it is checked against the
+        filters again, as the previous choices consumed resources and may
+        have changed the server group. Only the chosen host is weighed again,
+        the weights of the other hosts are not normalized again.
+        """
+        hosts = self.host_manager.get_filtered_hosts(hosts,
+                filter_properties, index=0)
+        if not hosts:
+            return []
+        weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                filter_properties)
+
+        LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
+
+        # The index breaks the ties, so that WeighedHosts are never
+        # compared and hosts of equal weight keep their order.
+        heap = [(-weighed_host.weight, i, weighed_host)
+                for i, weighed_host in enumerate(weighed_hosts)]
+        heapq.heapify(heap)
+        tie_breaker = len(heap)
+
+        scheduler_host_subset_size = max(CONF.scheduler_host_subset_size, 1)
+        selected_hosts = []
+        for num in xrange(num_instances):
+            candidates = []
+            while heap and len(candidates) < scheduler_host_subset_size:
+                entry = heapq.heappop(heap)
+                # The hosts were all filtered for the first instance.
+                if num == 0 or self.host_manager.get_filtered_hosts(
+                        [entry[2].obj], filter_properties, index=num):
+                    candidates.append(entry)
+            if not candidates:
+                # Can't get any more locally.
+                break
+
+            chosen = random.choice(candidates)
+            for entry in candidates:
+                if entry is not chosen:
+                    heapq.heappush(heap, entry)
+            chosen_host = chosen[2]
+            selected_hosts.append(chosen_host)
+
+            self._consume_host(chosen_host.obj, instance_properties,
+                               filter_properties)
+            reweighed_host = self.host_manager.get_weighed_hosts(
+                [chosen_host.obj], filter_properties)[0]
+            heapq.heappush(heap, (-reweighed_host.weight, tie_breaker,
+                                  reweighed_host))
+            tie_breaker += 1
         return selected_hosts
 
+    def _setup_group_hosts(self, context, filter_properties):
+        """Add the hosts of the server group members, read from the index
+        of the host manager, to the hosts of the server group, kept as a set
+        for the filters.
+        """
+        if filter_properties.get('group_updated', False) is not True:
+            return
+        group_hosts = set(filter_properties.get('group_hosts') or [])
+        group_uuid = filter_properties.get('group_uuid')
+        if group_uuid:
+            group_hosts |= self.host_manager.get_group_hosts(
+                context, group_uuid, filter_properties.get('group_members'))
+        filter_properties['group_hosts'] = group_hosts
+
+    def _consume_host(self, host_state, instance_properties,
+                      filter_properties):
+        """Consume the resources of an instance on the chosen host."""
+        host_state.consume_from_instance(instance_properties)
+        if filter_properties.get('group_updated', False) is True:
+            # NOTE(sbauza): Group details are serialized into a list now
+            # that they are populated by the conductor, we need to
+            # deserialize them
+            if isinstance(filter_properties['group_hosts'], list):
+                filter_properties['group_hosts'] = set(
+                    filter_properties['group_hosts'])
+            filter_properties['group_hosts'].add(host_state.host)
+
     def _get_all_host_states(self, context):
         """Template method, so a subclass can implement caching."""
         return self.host_manager.get_all_host_states(context)
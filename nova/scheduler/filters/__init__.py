@@ -17,7 +17,29 @@
 Scheduler host filters
 """
 
+import time
+
+from oslo_config import cfg
+
 from nova import filters
+from nova.i18n import _LI
+from nova.openstack.common import log as logging
+from nova.scheduler import host_columns
+from nova.scheduler import stats
+
+host_filter_opts = [
+    cfg.BoolOpt('scheduler_reorder_filters',
+                default=False,
+                help='Run the scheduler filters in order of their measured '
+                     'cost per host and selectivity instead of the '
+                     'configured order. Filters such as RetryFilter keep '
+                     'their configured position.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(host_filter_opts)
+
+LOG = logging.getLogger(__name__)
 
 
 class BaseHostFilter(filters.BaseFilter):
@@ -37,6 +59,51 @@ class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
 
+    @property
+    def reorder_filters(self):
+        return CONF.scheduler_reorder_filters
+
+    def _record_filter_run(self, cls_name, elapsed, num_in, num_out):
+        super(HostFilterHandler, self)._record_filter_run(
+            cls_name, elapsed, num_in, num_out)
+        stats.record('filter', cls_name, elapsed, num_in, num_out)
+
+    def get_filtered_objects(self, filters, objs, filter_properties, index=0):
+        """Filter the hosts, running first the filters supporting columns.
+
+        When host columns are enabled, the filters implementing
+        filter_host_columns() check all the hosts at once, and the other
+        filters only run on the hosts which passed them.
+        """
+        if host_columns.enabled():
+            column_filters = [filter for filter in filters
+                              if getattr(filter, 'filter_host_columns', None)
+                              and filter.run_filter_for_index(index)]
+            if column_filters:
+                objs = self._filter_host_columns(column_filters, objs,
+                                                 filter_properties)
+                filters = [filter for filter in filters
+                           if filter not in column_filters]
+        return super(HostFilterHandler, self).get_filtered_objects(
+            filters, objs, filter_properties, index)
+
+    def _filter_host_columns(self, filters, host_states, filter_properties):
+        columns = host_columns.HostColumns(host_states)
+        for filter in filters:
+            cls_name = filter.__class__.__name__
+            start = time.time()
+            num_hosts = len(columns)
+            columns = columns.select(
+                filter.filter_host_columns(columns, filter_properties))
+            self._record_filter_run(cls_name, time.time() - start,
+                                    num_hosts, len(columns))
+            if not len(columns):
+                LOG.info(_LI("Filter %s returned 0 hosts"), cls_name)
+                break
+            LOG.debug("Filter %(cls_name)s returned %(obj_len)d host(s)",
+                      {'cls_name': cls_name, 'obj_len': len(columns)})
+        return columns.host_states
+
 
 def all_filters():
     """Return a list of filter classes found in this directory.
@@ -21,6 +21,7 @@ from nova.i18n import _LW
 from nova.openstack.common import log as logging
 from nova.scheduler import filters
 from nova.scheduler.filters import utils
+from nova.scheduler import host_columns
 
 LOG = logging.getLogger(__name__)
 
@@ -80,6 +81,26 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         return CONF.cpu_allocation_ratio
 
+    def filter_host_columns(self, columns, filter_properties):
+        """Return which hosts have sufficient CPU cores."""
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return host_columns.numpy.ones(len(columns), dtype=bool)
+
+        # Fail safe
+        unknown_vcpus = columns.vcpus_total == 0
+        if unknown_vcpus.any():
+            LOG.warning(_LW("VCPUs not set; assuming CPU collection broken"))
+
+        vcpus_total = columns.vcpus_total * CONF.cpu_allocation_ratio
+        free_vcpus = vcpus_total - columns.vcpus_used
+        passes = unknown_vcpus | (free_vcpus >= instance_type['vcpus'])
+
+        # Only provide a VCPU limit to compute if the virt driver is reporting
+        # an accurate count of installed VCPUs. (XenServer driver does not)
+        columns.set_limits('vcpu', vcpus_total, passes & (vcpus_total > 0))
+        return passes
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -88,13 +109,8 @@ class AggregateCoreFilter(BaseCoreFilter):
     """
 
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
-            filter_properties['context'],
-            host_state.host,
-            'cpu_allocation_ratio')
+        aggregate_vals = utils.aggregate_values_from_key(
+            host_state, 'cpu_allocation_ratio')
         try:
             ratio = utils.validate_num_values(
                 aggregate_vals, CONF.cpu_allocation_ratio, cast_to=float)
@@ -64,6 +64,22 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def filter_host_columns(self, columns, filter_properties):
+        """Return which hosts have sufficient disk."""
+        instance_type = filter_properties.get('instance_type')
+        requested_disk = (1024 * (instance_type['root_gb'] +
+                                 instance_type['ephemeral_gb']) +
+                         instance_type['swap'])
+
+        total_usable_disk_mb = columns.total_usable_disk_gb * 1024
+        disk_mb_limit = total_usable_disk_mb * CONF.disk_allocation_ratio
+        used_disk_mb = total_usable_disk_mb - columns.free_disk_mb
+        usable_disk_mb = disk_mb_limit - used_disk_mb
+        passes = usable_disk_mb >= requested_disk
+
+        columns.set_limits('disk_gb', disk_mb_limit / 1024, passes)
+        return passes
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -72,14 +88,12 @@ class AggregateDiskFilter(DiskFilter):
     found.
     """
 
+    # The ratio can differ for each host, so check them one at a time.
+    filter_host_columns = None
+
     def _get_disk_allocation_ratio(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
-            filter_properties['context'],
-            host_state.host,
-            'disk_allocation_ratio')
+        aggregate_vals = utils.aggregate_values_from_key(
+            host_state, 'disk_allocation_ratio')
         try:
             ratio = utils.validate_num_values(
                 aggregate_vals, CONF.disk_allocation_ratio, cast_to=float)
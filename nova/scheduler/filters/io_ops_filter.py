@@ -54,6 +54,10 @@ class IoOpsFilter(filters.BaseHostFilter):
                          'max_io_ops': max_io_ops})
         return passes
 
+    def filter_host_columns(self, columns, filter_properties):
+        """Return which hosts have less I/O operations than allowed."""
+        return columns.num_io_ops < CONF.max_io_ops_per_host
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -61,14 +65,12 @@ class AggregateIoOpsFilter(IoOpsFilter):
     Fall back to global max_io_ops_per_host if no per-aggregate setting found.
     """
 
+    # The maximum can differ for each host, so check them one at a time.
+    filter_host_columns = None
+
     def _get_max_io_ops_per_host(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
-            filter_properties['context'],
-            host_state.host,
-            'max_io_ops_per_host')
+        aggregate_vals = utils.aggregate_values_from_key(
+            host_state, 'max_io_ops_per_host')
         try:
             value = utils.validate_num_values(
                 aggregate_vals, CONF.max_io_ops_per_host, cast_to=int)
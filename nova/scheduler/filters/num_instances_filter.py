@@ -48,6 +48,10 @@ class NumInstancesFilter(filters.BaseHostFilter):
                          'max_instances': max_instances})
         return passes
 
+    def filter_host_columns(self, columns, filter_properties):
+        """Return which hosts have less instances than allowed."""
+        return columns.num_instances < CONF.max_instances_per_host
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -56,14 +60,12 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
     found.
     """
 
+    # The maximum can differ for each host, so check them one at a time.
+    filter_host_columns = None
+
     def _get_max_instances_per_host(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solutnumn here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
-            filter_properties['context'],
-            host_state.host,
-            'max_instances_per_host')
+        aggregate_vals = utils.aggregate_values_from_key(
+            host_state, 'max_instances_per_host')
         try:
             value = utils.validate_num_values(
                 aggregate_vals, CONF.max_instances_per_host, cast_to=int)
@@ -72,6 +72,21 @@ class RamFilter(BaseRamFilter):
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
         return self.ram_allocation_ratio
 
+    def filter_host_columns(self, columns, filter_properties):
+        """Return which hosts have sufficient available RAM."""
+        instance_type = filter_properties.get('instance_type')
+        requested_ram = instance_type['memory_mb']
+
+        memory_mb_limit = (columns.total_usable_ram_mb *
+                           self.ram_allocation_ratio)
+        used_ram_mb = columns.total_usable_ram_mb - columns.free_ram_mb
+        usable_ram = memory_mb_limit - used_ram_mb
+        passes = usable_ram >= requested_ram
+
+        # save oversubscription limit for compute node to test against:
+        columns.set_limits('memory_mb', memory_mb_limit, passes)
+        return passes
+
 
 class AggregateRamFilter(BaseRamFilter):
     """AggregateRamFilter with per-aggregate ram subscription flag.
@@ -80,13 +95,8 @@ class AggregateRamFilter(BaseRamFilter):
     """
 
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
-            filter_properties['context'],
-            host_state.host,
-            'ram_allocation_ratio')
+        aggregate_vals = utils.aggregate_values_from_key(
+            host_state, 'ram_allocation_ratio')
 
         try:
             ratio = utils.validate_num_values(
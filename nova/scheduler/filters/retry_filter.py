@@ -24,6 +24,10 @@ class RetryFilter(filters.BaseHostFilter):
     purposes
     """
 
+    # Stay where configured, so the filters after it never evaluate the
+    # hosts already attempted.
+    keep_filter_position = True
+
     def host_passes(self, host_state, filter_properties):
         """Skip nodes that have already been attempted."""
         retry = filter_properties.get('retry', None)
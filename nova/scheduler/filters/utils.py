@@ -17,32 +17,25 @@
 import collections
 
 from nova.i18n import _LI
-from nova import objects
 from nova.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
 
-def aggregate_values_from_db(context, host, key_name):
+def aggregate_values_from_key(host_state, key_name):
     """Returns a set of values based on a metadata key for a specific host."""
-    # TODO(sahid): DB query in filter is a performance hit, especially for
-    # system with lots of hosts. Will need a general solution here to fix
-    # all filters with aggregate DB call things.
-    aggrlist = objects.AggregateList.get_by_host(
-        context.elevated(), host, key=key_name)
-    aggregate_vals = set(aggr.metadata[key_name] for aggr in aggrlist)
-    return aggregate_vals
+    return set(aggr.metadata[key_name] for aggr in host_state.aggregates
+               if key_name in aggr.metadata)
 
 
-def aggregate_metadata_get_by_host(context, host, key=None):
+def aggregate_metadata_get_by_host(host_state, key=None):
     """Returns a dict of all metadata for a specific host."""
-    # TODO(pmurray): DB query in filter is a performance hit. Will need a
-    # general solution here.
-    aggrlist = objects.AggregateList.get_by_host(
-        context.elevated(), host, key=key)
-
     metadata = collections.defaultdict(set)
-    for aggr in aggrlist:
+    for aggr in host_state.aggregates:
+        if key is not None:
+            if key in aggr.metadata:
+                metadata[key].add(aggr.metadata[key])
+            continue
         for k, v in aggr.metadata.iteritems():
             metadata[k].add(v)
     return metadata
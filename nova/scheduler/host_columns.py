@@ -0,0 +1,140 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar view of host states.
+
+The capacities of a list of hosts are stored as one array per field, so that
+the simple resource filters and weighers can check all the hosts at once with
+array operations instead of being called once per host.
+
+Filters support it by implementing filter_host_columns(), which returns a
+boolean array of the hosts passing the filter, and weighers by implementing
+weigh_host_columns(), which returns an array of weights. This requires numpy;
+without it, all the filters and weighers run once per host as usual.
+"""
+
+from oslo_config import cfg
+from oslo_utils import importutils
+
+from nova.i18n import _LW
+from nova.openstack.common import log as logging
+
+numpy = importutils.try_import('numpy')
+
+host_columns_opts = [
+    cfg.BoolOpt('scheduler_use_host_columns',
+                default=False,
+                help='Run the filters and weighers supporting it, like '
+                     'RamFilter, CoreFilter, DiskFilter, IoOpsFilter, '
+                     'NumInstancesFilter, RAMWeigher, IoOpsWeigher and '
+                     'MetricsWeigher, as array operations over all the '
+                     'hosts at once. The other filters still run on each of '
+                     'the remaining hosts. Requires numpy.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(host_columns_opts)
+
+LOG = logging.getLogger(__name__)
+
+_NUMPY_WARNING_LOGGED = False
+
+
+def enabled():
+    """Return True if filters and weighers should use host columns."""
+    global _NUMPY_WARNING_LOGGED
+    if not CONF.scheduler_use_host_columns:
+        return False
+    if numpy is None:
+        if not _NUMPY_WARNING_LOGGED:
+            LOG.warning(_LW("scheduler_use_host_columns is set but numpy "
+                            "is not installed, filtering and weighing "
+                            "hosts one at a time."))
+            _NUMPY_WARNING_LOGGED = True
+        return False
+    return True
+
+
+class HostColumns(object):
+    """Capacities of a list of host states, stored as one array per field."""
+
+    fields = ('free_ram_mb', 'total_usable_ram_mb', 'free_disk_mb',
+              'total_usable_disk_gb', 'vcpus_total', 'vcpus_used',
+              'num_io_ops', 'num_instances')
+
+    def __init__(self, host_states, columns=None):
+        self.host_states = list(host_states)
+        if columns is None:
+            count = len(self.host_states)
+            columns = {field: numpy.fromiter(
+                           (getattr(host_state, field)
+                            for host_state in self.host_states),
+                           dtype=float, count=count)
+                       for field in self.fields}
+        for field, column in columns.iteritems():
+            setattr(self, field, column)
+
+    def __len__(self):
+        return len(self.host_states)
+
+    def metric(self, name):
+        """Return the values of a metric, NaN for the hosts without it."""
+        return numpy.array([host_state.metrics[name].value
+                            if name in host_state.metrics else numpy.nan
+                            for host_state in self.host_states],
+                           dtype=float)
+
+    def select(self, mask):
+        """Return the HostColumns of the hosts selected by a boolean array."""
+        indexes = numpy.flatnonzero(mask)
+        return HostColumns([self.host_states[i] for i in indexes],
+                           {field: getattr(self, field)[indexes]
+                            for field in self.fields})
+
+    def set_limits(self, name, values, mask):
+        """Save an oversubscription limit on the hosts selected by mask."""
+        indexes = numpy.flatnonzero(mask)
+        for i, value in zip(indexes, values[indexes].tolist()):
+            self.host_states[i].limits[name] = value
+
+
+def weigh(weigher, columns, weight_properties):
+    """Return the weights of the hosts in columns from a weigher.
+
+    Like BaseWeigher.weigh_objects(), the minimum and maximum weights seen
+    are recorded on the weigher for the normalization.
+    """
+    weights = weigher.weigh_host_columns(columns, weight_properties)
+    if not len(weights):
+        return weights
+    lowest = weights.min().item()
+    highest = weights.max().item()
+    if weigher.minval is None or lowest < weigher.minval:
+        weigher.minval = lowest
+    if weigher.maxval is None or highest > weigher.maxval:
+        weigher.maxval = highest
+    return weights
+
+
+def normalize(weights, minval, maxval):
+    """Normalize an array of weights between 0 and 1.0.
+
+    See nova.weights.normalize(), which this mirrors for arrays.
+    """
+    if minval == maxval:
+        return numpy.zeros(len(weights))
+    minval = float(minval)
+    return (weights - minval) / (float(maxval) - minval)
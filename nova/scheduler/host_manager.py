@@ -18,6 +18,7 @@ Manage hosts in the current zone.
 """
 
 import collections
+import datetime
 import UserDict
 
 import iso8601
@@ -59,6 +60,23 @@ host_manager_opts = [
     cfg.ListOpt('scheduler_weight_classes',
                 default=['nova.scheduler.weights.all_weighers'],
                 help='Which weight class names to use for weighing hosts'),
+    cfg.BoolOpt('scheduler_use_host_state_deltas',
+                default=False,
+                help='Keep the host states between requests and only reload '
+                     'the compute nodes and services which changed since the '
+                     'last poll. All the host states are still rebuilt at '
+                     'startup and whenever the last poll is older than '
+                     'scheduler_host_state_max_delta_age seconds.'),
+    cfg.IntOpt('scheduler_host_state_max_delta_age',
+               default=300,
+               help='Maximum age in seconds of the last poll for which only '
+                    'the changed compute nodes and services are reloaded. '
+                    'Past that age all the host states are rebuilt.'),
+    cfg.IntOpt('scheduler_host_state_delta_margin',
+               default=5,
+               help='Number of seconds the window of changed compute nodes '
+                    'and services is widened by, to tolerate clock skew '
+                    'between the scheduler and the hosts writing them.'),
     ]
 
 CONF = cfg.CONF
@@ -127,6 +145,7 @@ class HostState(object):
         self.numa_topology = None
 
         # Additional host information from the compute node stats:
+        self.stats = {}
         self.num_instances = 0
         self.num_io_ops = 0
 
@@ -144,6 +163,9 @@ class HostState(object):
         # Generic metrics from compute nodes
         self.metrics = {}
 
+        # The aggregates the host belongs to
+        self.aggregates = []
+
         self.updated = None
         if compute:
             self.update_from_compute_node(compute)
@@ -295,6 +317,14 @@ class HostManager(object):
 
     def __init__(self):
         self.host_state_map = {}
+        self.service_map = {}
+        self.last_synced_at = None
+        self.aggs_by_id = {}
+        self.host_aggregates_map = collections.defaultdict(set)
+        # The hosts of the server group members, by group uuid and instance
+        # uuid, recorded since the last sync of the index, and before it
+        self.group_members = {}
+        self.stale_group_members = {}
         self.filter_handler = filters.HostFilterHandler()
         filter_classes = self.filter_handler.get_matching_classes(
                 CONF.scheduler_available_filters)
@@ -418,7 +448,145 @@ class HostManager(object):
         the HostManager knows about. Also, each of the consumable resources
         in HostState are pre-populated and adjusted based on data in the db.
         """
+        if (CONF.scheduler_use_host_state_deltas and self.last_synced_at
+                and not timeutils.is_older_than(
+                    self.last_synced_at,
+                    CONF.scheduler_host_state_max_delta_age)):
+            self._sync_changed_host_states(context)
+        else:
+            self._sync_all_host_states(context)
+        return self.host_state_map.itervalues()
 
+    def update_compute_node(self, compute):
+        """Update the state of a host from a ComputeNode pushed to us."""
+        service = self.service_map.get(compute.host)
+        if not service:
+            LOG.debug("Ignoring compute node %(host)s:%(node)s without a "
+                      "known service",
+                      {'host': compute.host,
+                       'node': compute.hypervisor_hostname})
+            return
+        self._update_host_state(compute, service)
+
+    def _update_host_state(self, compute, service):
+        host = compute.host
+        node = compute.hypervisor_hostname
+        state_key = (host, node)
+        host_state = self.host_state_map.get(state_key)
+        if host_state:
+            host_state.update_from_compute_node(compute)
+        else:
+            host_state = self.host_state_cls(host, node, compute=compute)
+            self.host_state_map[state_key] = host_state
+        host_state.update_service(dict(service.iteritems()))
+        host_state.aggregates = self._get_aggregates_of_host(host)
+        return state_key
+
+    def _get_aggregates_of_host(self, host):
+        return [self.aggs_by_id[agg_id]
+                for agg_id in self.host_aggregates_map.get(host, ())]
+
+    def _load_aggregates(self, context):
+        """Rebuild the index of the aggregates of each host."""
+        self.aggs_by_id = {}
+        self.host_aggregates_map = collections.defaultdict(set)
+        for aggregate in objects.AggregateList.get_all(context):
+            self._add_aggregate(aggregate)
+
+    def _add_aggregate(self, aggregate):
+        self.aggs_by_id[aggregate.id] = aggregate
+        for host in aggregate.hosts:
+            self.host_aggregates_map[host].add(aggregate.id)
+
+    def _remove_aggregate(self, aggregate_id):
+        """Remove an aggregate from the index, return its hosts."""
+        old_aggregate = self.aggs_by_id.pop(aggregate_id, None)
+        if not old_aggregate:
+            return set()
+        for host in old_aggregate.hosts:
+            self.host_aggregates_map[host].discard(aggregate_id)
+        return set(old_aggregate.hosts)
+
+    def _refresh_host_aggregates(self, hosts):
+        for (host, node), host_state in self.host_state_map.iteritems():
+            if host in hosts:
+                host_state.aggregates = self._get_aggregates_of_host(host)
+
+    def update_aggregates(self, aggregates):
+        """Update the index with created or updated aggregates."""
+        hosts = set()
+        for aggregate in aggregates:
+            hosts |= self._remove_aggregate(aggregate.id)
+            self._add_aggregate(aggregate)
+            hosts |= set(aggregate.hosts)
+        self._refresh_host_aggregates(hosts)
+
+    def delete_aggregate(self, aggregate):
+        """Remove a deleted aggregate from the index."""
+        self._refresh_host_aggregates(self._remove_aggregate(aggregate.id))
+
+    def get_group_hosts(self, context, group_uuid, member_uuids=None):
+        """Returns the hosts of the members of a server group.
+
+        Without member_uuids, only the members placed by this scheduler are
+        known. With them, the hosts of the members missing from the index
+        are read from the database and recorded, so that later requests for
+        the group only query the members they have not seen yet, and only
+        the given members are taken into account.
+
+        The members recorded before the last sync of the index are read
+        again too, as they may have been moved since by an evacuation, a
+        migration, a revert or another scheduler. A member moved after it
+        was recorded is therefore seen on its old host until the next sync,
+        that is for at most scheduler_driver_task_period seconds.
+        """
+        members = self.group_members.get(group_uuid, {})
+        stale_members = self.stale_group_members.get(group_uuid, {})
+        if member_uuids is None:
+            return (set(members.itervalues()) |
+                    set(stale_members.itervalues()))
+
+        unknown_uuids = [instance_uuid for instance_uuid in member_uuids
+                         if instance_uuid not in members]
+        if unknown_uuids:
+            instances = objects.InstanceList.get_by_filters(
+                context, {'uuid': unknown_uuids, 'deleted': False},
+                expected_attrs=[], fields=['host'])
+            for instance in instances:
+                # NOTE: members still being built have no host yet. Those
+                # placed by this scheduler keep the host chosen for them,
+                # the others are looked up again by the next request.
+                host = instance.host or stale_members.get(instance.uuid)
+                if host:
+                    self.add_group_member(group_uuid, instance.uuid, host)
+            members = self.group_members.get(group_uuid, {})
+        return set(members[instance_uuid] for instance_uuid in member_uuids
+                   if instance_uuid in members)
+
+    def add_group_member(self, group_uuid, instance_uuid, host):
+        """Record the host chosen for a member of a server group."""
+        self.group_members.setdefault(group_uuid, {})[instance_uuid] = host
+
+    def sync_group_members(self):
+        """Mark the server group members recorded so far as stale.
+
+        Their hosts are read again from the database by the next request
+        for their group. The members which were not needed by any request
+        since the previous sync are dropped.
+        """
+        self.stale_group_members = self.group_members
+        self.group_members = {}
+
+    def _remove_host_state(self, state_key):
+        host, node = state_key
+        LOG.info(_LI("Removing dead compute node %(host)s:%(node)s "
+                     "from scheduler"), {'host': host, 'node': node})
+        del self.host_state_map[state_key]
+
+    def _sync_all_host_states(self, context):
+        """Rebuild the host states from all the compute nodes."""
+        synced_at = timeutils.utcnow()
+        self._load_aggregates(context)
         service_refs = {service.host: service
                         for service in objects.ServiceList.get_by_topic(
                             context, CONF.compute_topic)}
@@ -434,24 +602,68 @@ class HostManager(object):
                     "on %(topic)s topic"),
                     {'host': compute.host, 'topic': CONF.compute_topic})
                 continue
-            host = compute.host
-            node = compute.hypervisor_hostname
-            state_key = (host, node)
-            host_state = self.host_state_map.get(state_key)
-            if host_state:
-                host_state.update_from_compute_node(compute)
-            else:
-                host_state = self.host_state_cls(host, node, compute=compute)
-                self.host_state_map[state_key] = host_state
-            host_state.update_service(dict(service.iteritems()))
-            seen_nodes.add(state_key)
+            seen_nodes.add(self._update_host_state(compute, service))
 
         # remove compute nodes from host_state_map if they are not active
         dead_nodes = set(self.host_state_map.keys()) - seen_nodes
         for state_key in dead_nodes:
-            host, node = state_key
-            LOG.info(_LI("Removing dead compute node %(host)s:%(node)s "
-                         "from scheduler"), {'host': host, 'node': node})
-            del self.host_state_map[state_key]
+            self._remove_host_state(state_key)
 
-        return self.host_state_map.itervalues()
+        self.service_map = service_refs
+        self.last_synced_at = synced_at
+
+    def _sync_changed_host_states(self, context):
+        """Update the host states from the records changed since last sync.
+
+        Deleted records are processed first, so that a compute node or a
+        service being recreated within the window is kept.
+        """
+        synced_at = timeutils.utcnow()
+        changes_since = self.last_synced_at - datetime.timedelta(
+            seconds=CONF.scheduler_host_state_delta_margin)
+        services = objects.ServiceList.get_by_topic_changed_since(
+            context, CONF.compute_topic, changes_since)
+        compute_nodes = objects.ComputeNodeList.get_all_changed_since(
+            context, changes_since)
+
+        nodes_by_host = collections.defaultdict(list)
+        for state_key in self.host_state_map:
+            nodes_by_host[state_key[0]].append(state_key)
+
+        new_hosts = set()
+        for service in sorted(services, key=lambda s: not s.deleted):
+            host = service.host
+            if service.deleted or service.disabled:
+                if self.service_map.pop(host, None):
+                    for state_key in nodes_by_host.pop(host, []):
+                        self._remove_host_state(state_key)
+                continue
+            if host not in self.service_map:
+                new_hosts.add(host)
+            self.service_map[host] = service
+            for state_key in nodes_by_host.get(host, []):
+                self.host_state_map[state_key].update_service(
+                    dict(service.iteritems()))
+
+        for compute in sorted(compute_nodes, key=lambda c: not c.deleted):
+            state_key = (compute.host, compute.hypervisor_hostname)
+            if compute.deleted:
+                if state_key in self.host_state_map:
+                    self._remove_host_state(state_key)
+                continue
+            service = self.service_map.get(compute.host)
+            if service:
+                self._update_host_state(compute, service)
+
+        # Services which were created or enabled again can have compute nodes
+        # we do not know about and which have not necessarily changed lately.
+        for host in new_hosts:
+            try:
+                compute_nodes = objects.ComputeNodeList.get_all_by_host(
+                    context, host)
+            except exception.ComputeHostNotFound:
+                continue
+            for compute in compute_nodes:
+                self._update_host_state(compute, self.service_map[host])
+
+        self.last_synced_at = synced_at
@@ -30,6 +30,7 @@ from nova import objects
 from nova.openstack.common import log as logging
 from nova.openstack.common import periodic_task
 from nova import quota
+from nova.scheduler import stats as scheduler_stats
 
 
 LOG = logging.getLogger(__name__)
@@ -55,7 +56,7 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    target = messaging.Target(version='4.0')
+    target = messaging.Target(version='4.3')
 
     def __init__(self, scheduler_driver=None, *args, **kwargs):
         if not scheduler_driver:
@@ -82,10 +83,35 @@ class SchedulerManager(manager.Manager):
         The result should be a list of dicts with 'host', 'nodename' and
         'limits' as keys.
         """
-        dests = self.driver.select_destinations(context, request_spec,
-            filter_properties)
+        start = scheduler_stats.start_request()
+        try:
+            dests = self.driver.select_destinations(context, request_spec,
+                filter_properties)
+        finally:
+            scheduler_stats.end_request(start, request_spec)
         return jsonutils.to_primitive(dests)
 
+    def update_compute_node(self, context, compute_node):
+        """Updates the state of a host from a compute node it reported."""
+        self.driver.host_manager.update_compute_node(compute_node)
+
+    def get_scheduler_stats(self, context, reset=False):
+        """Returns the timing statistics of the filters and weighers of
+        this scheduler, optionally resetting them.
+        """
+        result = scheduler_stats.get_stats()
+        if reset:
+            scheduler_stats.reset_stats()
+        return result
+
+    def update_aggregates(self, context, aggregates):
+        """Updates the aggregates known by the host manager."""
+        self.driver.host_manager.update_aggregates(aggregates)
+
+    def delete_aggregate(self, context, aggregate):
+        """Removes a deleted aggregate from the host manager."""
+        self.driver.host_manager.delete_aggregate(aggregate)
+
 
 class _SchedulerManagerV3Proxy(object):
 
@@ -0,0 +1,188 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Scheduler partitioning the hosts between the scheduler workers.
+"""
+
+import bisect
+import hashlib
+
+from oslo_config import cfg
+
+from nova import exception
+from nova.i18n import _
+from nova.i18n import _LI
+from nova import objects
+from nova.openstack.common import log as logging
+from nova.scheduler import caching_scheduler
+
+partitioned_scheduler_opts = [
+    cfg.StrOpt('scheduler_partition_mode',
+               default='host',
+               help='How the hosts are partitioned between the scheduler '
+                    'workers. "host" spreads the hosts one by one, '
+                    '"aggregate" keeps all the hosts of an aggregate in the '
+                    'same partition. Hosts which are in no aggregate are '
+                    'spread one by one.'),
+    cfg.IntOpt('scheduler_partition_replicas',
+               default=32,
+               help='Number of points each scheduler worker gets on the '
+                    'consistent hashing ring. More points spread the hosts '
+                    'more evenly between the workers.'),
+    cfg.BoolOpt('scheduler_partition_spill_over',
+                default=True,
+                help='Choose hosts from the partitions of the other '
+                     'scheduler workers when the partition of this worker '
+                     'cannot satisfy a request.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(partitioned_scheduler_opts)
+CONF.import_opt('scheduler_topic', 'nova.scheduler.rpcapi')
+
+LOG = logging.getLogger(__name__)
+
+PARTITION_MODES = ('host', 'aggregate')
+
+
+class HashRing(object):
+    """Consistent hashing ring mapping keys to members.
+
+    Each member is placed on the ring a number of times, and a key belongs to
+    the first member found on the ring after the hash of the key. When a
+    member joins or leaves, only the keys next to its points move.
+    """
+
+    def __init__(self, members, replicas):
+        self.members = sorted(set(members))
+        self._ring = sorted((self._hash('%s-%d' % (member, replica)), member)
+                            for member in self.members
+                            for replica in xrange(max(replicas, 1)))
+        self._hashes = [point[0] for point in self._ring]
+
+    @staticmethod
+    def _hash(key):
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        return int(hashlib.md5(key).hexdigest()[:8], 16)
+
+    def get_member(self, key):
+        """Return the member a key belongs to, None if there is none."""
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(key))
+        return self._ring[index % len(self._ring)][1]
+
+
+class PartitionedScheduler(caching_scheduler.CachingScheduler):
+    """Scheduler choosing hosts from a partition of the hosts.
+
+    With several scheduler workers, each worker considers every host, so
+    concurrent requests tend to pick the same best hosts and then fail to
+    claim resources on them. This scheduler splits the hosts between the
+    scheduler services which are up, using consistent hashing on the host
+    name or on the aggregate of the host, and chooses the hosts of a request
+    from the partition of the scheduler handling it first.
+
+    When the partition cannot satisfy the whole request, the remaining
+    instances spill over to the hosts of the other partitions, unless
+    scheduler_partition_spill_over is disabled.
+
+    The workers of a scheduler service share the same partition, as they
+    share the same host name. The membership and the aggregates are
+    refreshed with the cached host states, in the periodic task.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(PartitionedScheduler, self).__init__(*args, **kwargs)
+        if CONF.scheduler_partition_mode not in PARTITION_MODES:
+            raise exception.NovaException(
+                _("Invalid scheduler_partition_mode %s")
+                % CONF.scheduler_partition_mode)
+        self.ring = None
+        self.partition_keys = {}
+
+    def run_periodic_tasks(self, context):
+        """Called from a periodic tasks in the manager."""
+        super(PartitionedScheduler, self).run_periodic_tasks(context)
+        self._update_partitions(context.elevated())
+
+    def _update_partitions(self, context):
+        members = self.hosts_up(context, CONF.scheduler_topic)
+        # The service of this scheduler may not be reported up yet.
+        if CONF.host not in members:
+            members.append(CONF.host)
+        ring = HashRing(members, CONF.scheduler_partition_replicas)
+        if self.ring is None or ring.members != self.ring.members:
+            LOG.info(_LI("Partitioning hosts between schedulers %s"),
+                     ', '.join(ring.members))
+        self.ring = ring
+
+        partition_keys = {}
+        if CONF.scheduler_partition_mode == 'aggregate':
+            # The hosts of an aggregate are kept together by using the
+            # lowest aggregate id of a host as its key.
+            aggregates = objects.AggregateList.get_all(context)
+            for aggregate in sorted(aggregates, key=lambda agg: agg.id,
+                                    reverse=True):
+                for host in aggregate.hosts:
+                    partition_keys[host] = 'aggregate-%d' % aggregate.id
+        self.partition_keys = partition_keys
+
+    def _get_partition_key(self, host_state):
+        return self.partition_keys.get(host_state.host, host_state.host)
+
+    def _split_host_states(self, context, host_states):
+        """Split host states between this partition and the others."""
+        if self.ring is None:
+            self._update_partitions(context)
+        local_host_states = []
+        other_host_states = []
+        for host_state in host_states:
+            owner = self.ring.get_member(self._get_partition_key(host_state))
+            if owner == CONF.host:
+                local_host_states.append(host_state)
+            else:
+                other_host_states.append(host_state)
+        return local_host_states, other_host_states
+
+    def _schedule(self, context, request_spec, filter_properties,
+                  hosts=None):
+        """Returns a list of hosts, taken from this partition first."""
+        if hosts is None:
+            hosts = self._get_all_host_states(context.elevated())
+        local_hosts, other_hosts = self._split_host_states(
+            context.elevated(), hosts)
+
+        num_instances = request_spec.get('num_instances', 1)
+        selected_hosts = super(PartitionedScheduler, self)._schedule(
+            context, request_spec, filter_properties, hosts=local_hosts)
+        if (len(selected_hosts) >= num_instances or not other_hosts or
+                not CONF.scheduler_partition_spill_over):
+            return selected_hosts
+
+        LOG.debug("Partition of %(host)s could only place %(selected)d of "
+                  "%(num_instances)d instances, spilling over to the other "
+                  "partitions.",
+                  {'host': CONF.host, 'selected': len(selected_hosts),
+                   'num_instances': num_instances})
+        spill_over_spec = dict(request_spec,
+                               num_instances=num_instances -
+                               len(selected_hosts))
+        selected_hosts.extend(super(PartitionedScheduler, self)._schedule(
+            context, spill_over_spec, filter_properties, hosts=other_hosts))
+        filter_properties['request_spec'] = request_spec
+        return selected_hosts
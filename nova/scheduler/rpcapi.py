@@ -87,6 +87,9 @@ class SchedulerAPI(object):
         * 3.1 - Made select_destinations() send flavor object
 
         * 4.0 - Removed backwards compat for Icehouse
+        * 4.1 - Add update_compute_node()
+        * 4.2 - Add get_scheduler_stats()
+        * 4.3 - Add update_aggregates() and delete_aggregate()
 
 
     '''
@@ -112,3 +115,25 @@ class SchedulerAPI(object):
         cctxt = self.client.prepare(version='4.0')
         return cctxt.call(ctxt, 'select_destinations',
             request_spec=request_spec, filter_properties=filter_properties)
+
+    def update_compute_node(self, ctxt, compute_node):
+        if not self.client.can_send_version('4.1'):
+            return
+        cctxt = self.client.prepare(fanout=True, version='4.1')
+        cctxt.cast(ctxt, 'update_compute_node', compute_node=compute_node)
+
+    def get_scheduler_stats(self, ctxt, reset=False):
+        cctxt = self.client.prepare(version='4.2')
+        return cctxt.call(ctxt, 'get_scheduler_stats', reset=reset)
+
+    def update_aggregates(self, ctxt, aggregates):
+        if not self.client.can_send_version('4.3'):
+            return
+        cctxt = self.client.prepare(fanout=True, version='4.3')
+        cctxt.cast(ctxt, 'update_aggregates', aggregates=aggregates)
+
+    def delete_aggregate(self, ctxt, aggregate):
+        if not self.client.can_send_version('4.3'):
+            return
+        cctxt = self.client.prepare(fanout=True, version='4.3')
+        cctxt.cast(ctxt, 'delete_aggregate', aggregate=aggregate)
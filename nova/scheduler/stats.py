@@ -0,0 +1,196 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Timing statistics of the scheduler filters and weighers.
+
+Each run of a filter or a weigher is recorded with the time it took and the
+number of hosts it was given and kept. The runs are aggregated per filter and
+weigher class into histograms, which can be fetched from the scheduler with
+the get_scheduler_stats() RPC call. The runs of a single request can also be
+logged when the request is slow.
+"""
+
+import threading
+import time
+
+from oslo_config import cfg
+
+from nova.i18n import _LW
+from nova.openstack.common import log as logging
+
+scheduler_stats_opts = [
+    cfg.BoolOpt('scheduler_collect_stats',
+                default=False,
+                help='Collect the time spent in each scheduler filter and '
+                     'weigher and the number of hosts each filter removes.'),
+    cfg.FloatOpt('scheduler_slow_request_time',
+                 default=0.0,
+                 help='Log the time spent in each filter and weigher for '
+                      'the scheduling requests taking longer than this '
+                      'number of seconds. 0 disables the logging.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(scheduler_stats_opts)
+
+LOG = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets, in milliseconds. The last bucket
+# holds everything above the last bound.
+BUCKET_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Histogram(object):
+    """Distribution of durations, in milliseconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        for i, bound in enumerate(BUCKET_BOUNDS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def to_dict(self):
+        return {'count': self.count,
+                'total_ms': self.total,
+                'min_ms': self.min,
+                'max_ms': self.max,
+                'buckets': [[bound, count] for bound, count
+                            in zip(BUCKET_BOUNDS + (None,), self.buckets)]}
+
+
+class RunStats(object):
+    """Statistics of the runs of a filter or a weigher."""
+
+    def __init__(self):
+        self.time_ms = Histogram()
+        self.hosts_in = 0
+        self.hosts_removed = 0
+
+    def add(self, elapsed_ms, hosts_in, hosts_out):
+        self.time_ms.add(elapsed_ms)
+        self.hosts_in += hosts_in
+        self.hosts_removed += hosts_in - hosts_out
+
+    def to_dict(self):
+        return {'time': self.time_ms.to_dict(),
+                'hosts_in': self.hosts_in,
+                'hosts_removed': self.hosts_removed}
+
+
+class SchedulerStats(object):
+    """Statistics of the filters, weighers and requests of a scheduler."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.runs = {'filter': {}, 'weigher': {}}
+        self.requests = Histogram()
+
+    def add_run(self, kind, name, elapsed_ms, hosts_in, hosts_out):
+        run_stats = self.runs[kind].get(name)
+        if run_stats is None:
+            run_stats = self.runs[kind][name] = RunStats()
+        run_stats.add(elapsed_ms, hosts_in, hosts_out)
+
+    def to_dict(self):
+        return {'filters': {name: run_stats.to_dict() for name, run_stats
+                            in self.runs['filter'].iteritems()},
+                'weighers': {name: run_stats.to_dict() for name, run_stats
+                             in self.runs['weigher'].iteritems()},
+                'requests': self.requests.to_dict()}
+
+
+_STATS = SchedulerStats()
+# The runs of the request handled by the current greenthread, only kept when
+# slow requests are logged.
+_request = threading.local()
+
+
+def record(kind, name, elapsed, hosts_in, hosts_out):
+    """Record a run of a filter or a weigher.
+
+    :param kind: 'filter' or 'weigher'
+    :param name: the class name of the filter or weigher
+    :param elapsed: the duration of the run, in seconds
+    :param hosts_in: the number of hosts given to the filter or weigher
+    :param hosts_out: the number of hosts kept by the filter
+    """
+    elapsed_ms = elapsed * 1000
+    if CONF.scheduler_collect_stats:
+        _STATS.add_run(kind, name, elapsed_ms, hosts_in, hosts_out)
+    runs = getattr(_request, 'runs', None)
+    if runs is not None:
+        runs.append((kind, name, elapsed_ms, hosts_in, hosts_out))
+
+
+def start_request():
+    """Start timing a scheduling request, return its start time."""
+    if CONF.scheduler_slow_request_time > 0:
+        _request.runs = []
+    return time.time()
+
+
+def end_request(start, request_spec):
+    """Record a scheduling request and log it if it was slow."""
+    elapsed = time.time() - start
+    if CONF.scheduler_collect_stats:
+        _STATS.requests.add(elapsed * 1000)
+    runs = getattr(_request, 'runs', None)
+    _request.runs = None
+    if runs is None or elapsed < CONF.scheduler_slow_request_time:
+        return
+
+    summary = []
+    totals = {}
+    for kind, name, elapsed_ms, hosts_in, hosts_out in runs:
+        if name not in totals:
+            summary.append(name)
+            totals[name] = [0, 0.0, 0]
+        totals[name][0] += 1
+        totals[name][1] += elapsed_ms
+        totals[name][2] += hosts_in - hosts_out
+    LOG.warning(_LW("Scheduling %(num_instances)s instance(s) took "
+                    "%(elapsed).3f seconds: %(runs)s"),
+                {'num_instances': request_spec.get('num_instances', 1),
+                 'elapsed': elapsed,
+                 'runs': ', '.join('%s %d run(s) %.1fms removed %d host(s)'
+                                   % ((name,) + tuple(totals[name]))
+                                   for name in summary)})
+
+
+def get_stats():
+    """Return the statistics collected so far as a dict."""
+    return _STATS.to_dict()
+
+
+def reset_stats():
+    _STATS.reset()
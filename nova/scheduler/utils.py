@@ -47,7 +47,8 @@ CONF.register_opts(scheduler_opts)
 
 CONF.import_opt('scheduler_default_filters', 'nova.scheduler.host_manager')
 
-GroupDetails = collections.namedtuple('GroupDetails', ['hosts', 'policies'])
+GroupDetails = collections.namedtuple('GroupDetails', ['hosts', 'policies',
+                                                     'uuid', 'members'])
 
 
 def build_request_spec(ctxt, image, instances, instance_type=None):
@@ -259,6 +260,9 @@ def _get_group_details(context, instance_uuid, user_group_hosts=None):
     :param instance_uuid: UUID of the instance to check
     :param user_group_hosts: Hosts from the group or empty set
 
+    The hosts of the group members are not looked up here: the scheduler
+    reads them from its index of the group members.
+
     :returns: None or namedtuple GroupDetails
     """
     global _SUPPORTS_AFFINITY
@@ -290,10 +294,9 @@ def _get_group_details(context, instance_uuid, user_group_hosts=None):
             msg = _("ServerGroupAntiAffinityFilter not configured")
             LOG.error(msg)
             raise exception.UnsupportedPolicyException(reason=msg)
-        group_hosts = set(group.get_hosts(context))
         user_hosts = set(user_group_hosts) if user_group_hosts else set()
-        return GroupDetails(hosts=user_hosts | group_hosts,
-                            policies=group.policies)
+        return GroupDetails(hosts=user_hosts, policies=group.policies,
+                            uuid=group.uuid, members=group.members or [])
 
 
 def setup_instance_group(context, request_spec, filter_properties):
@@ -314,6 +317,8 @@ def setup_instance_group(context, request_spec, filter_properties):
         filter_properties['group_updated'] = True
         filter_properties['group_hosts'] = group_info.hosts
         filter_properties['group_policies'] = group_info.policies
+        filter_properties['group_uuid'] = group_info.uuid
+        filter_properties['group_members'] = list(group_info.members)
 
 
 def retry_on_timeout(retries=1):
@@ -17,6 +17,10 @@
 Scheduler host weights
 """
 
+import time
+
+from nova.scheduler import host_columns
+from nova.scheduler import stats
 from nova import weights
 
 
@@ -42,6 +46,49 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def _record_weigher_run(self, cls_name, elapsed, num_objs):
+        stats.record('weigher', cls_name, elapsed, num_objs, num_objs)
+
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties):
+        """Return a sorted (descending), normalized list of WeighedHosts.
+
+        When host columns are enabled, the weighers implementing
+        weigh_host_columns() weigh all the hosts at once.
+        """
+        if not (host_columns.enabled() and obj_list and
+                any(getattr(weigher, 'weigh_host_columns', None)
+                    for weigher in weighers)):
+            return super(HostWeightHandler, self).get_weighed_objects(
+                weighers, obj_list, weighing_properties)
+
+        numpy = host_columns.numpy
+        columns = host_columns.HostColumns(obj_list)
+        weighed_objs = [self.object_class(obj, 0.0)
+                        for obj in columns.host_states]
+        total_weights = numpy.zeros(len(weighed_objs))
+        for weigher in weighers:
+            start = time.time()
+            if getattr(weigher, 'weigh_host_columns', None):
+                weights = host_columns.weigh(weigher, columns,
+                                             weighing_properties)
+            else:
+                weights = numpy.array(
+                    weigher.weigh_objects(weighed_objs, weighing_properties),
+                    dtype=float)
+            weights = host_columns.normalize(weights,
+                                             minval=weigher.minval,
+                                             maxval=weigher.maxval)
+            total_weights += weigher.weight_multiplier() * weights
+            self._record_weigher_run(weigher.__class__.__name__,
+                                     time.time() - start, len(weighed_objs))
+
+        for weighed_obj, weight in zip(weighed_objs, total_weights.tolist()):
+            weighed_obj.weight = weight
+        # A stable sort keeps the hosts with equal weights in the same order
+        # as sorted(reverse=True) does.
+        order = numpy.argsort(-total_weights, kind='mergesort')
+        return [weighed_objs[i] for i in order]
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
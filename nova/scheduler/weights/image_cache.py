@@ -0,0 +1,74 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Image Cache Weigher. Weigh hosts by whether they hold the requested image
+in their image cache.
+
+Compute hosts report the images they have cached in the 'cached_images' key
+of their stats, as a comma separated list of the leading characters of the
+SHA1 hash of each image id. Hosts which do not report it are weighed as not
+holding the image.
+
+The weigher is disabled by default, as preferring hosts which already hold
+the image stacks instances of the same image instead of spreading them by
+free RAM. Setting 'image_cache_weight_multiplier' to a positive number
+prefers hosts which already have the image, so that the instance does not
+wait for it to be downloaded; a negative number has the opposite effect.
+"""
+
+import hashlib
+
+from oslo_config import cfg
+
+from nova.scheduler import weights
+
+image_cache_weight_opts = [
+    cfg.FloatOpt('image_cache_weight_multiplier',
+                 default=0.0,
+                 help='Multiplier used for weighing hosts by whether the '
+                      'requested image is in their image cache. Positive '
+                      'numbers mean a preference for hosts holding it, '
+                      'negative numbers a preference for hosts without it. '
+                      'Disabled by default.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(image_cache_weight_opts)
+
+
+class ImageCacheWeigher(weights.BaseHostWeigher):
+    minval = 0
+    maxval = 1
+
+    def weight_multiplier(self):
+        """Override the weight multiplier."""
+        return CONF.image_cache_weight_multiplier
+
+    def _weigh_object(self, host_state, weight_properties):
+        """Higher weights win. We want to choose hosts holding the image
+        to be the default.
+        """
+        request_spec = weight_properties.get('request_spec') or {}
+        instance_properties = request_spec.get('instance_properties') or {}
+        image_ref = instance_properties.get('image_ref')
+        cached_images = host_state.stats.get('cached_images')
+        if not image_ref or not cached_images:
+            return 0.0
+
+        prefixes = cached_images.split(',')
+        fingerprint = hashlib.sha1(str(image_ref)).hexdigest()
+        if fingerprint[:len(prefixes[0])] in prefixes:
+            return 1.0
+        return 0.0
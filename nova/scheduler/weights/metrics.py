@@ -29,6 +29,7 @@ in the configuration file as the followings:
 from oslo_config import cfg
 
 from nova import exception
+from nova.scheduler import host_columns
 from nova.scheduler import utils
 from nova.scheduler import weights
 
@@ -102,3 +103,28 @@ class MetricsWeigher(weights.BaseHostWeigher):
                         return CONF.metrics.weight_of_unavailable
 
         return value
+
+    def weigh_host_columns(self, columns, weight_properties):
+        numpy = host_columns.numpy
+        values = numpy.zeros(len(columns))
+        unavailable = numpy.zeros(len(columns), dtype=bool)
+
+        for (name, ratio) in self.setting:
+            metric = columns.metric(name)
+            missing = numpy.isnan(metric)
+            if missing.any():
+                if CONF.metrics.required:
+                    host_state = columns.host_states[
+                        numpy.flatnonzero(missing)[0]]
+                    raise exception.ComputeHostMetricNotFound(
+                            host=host_state.host,
+                            node=host_state.nodename,
+                            name=name)
+                # Same as _weigh_object(), the unavailable metrics make
+                # the host weigh weight_of_unavailable.
+                if ratio * self.weight_multiplier() != 0:
+                    unavailable |= missing
+            values += numpy.where(missing, 0.0, metric * ratio)
+
+        return numpy.where(unavailable, CONF.metrics.weight_of_unavailable,
+                           values)
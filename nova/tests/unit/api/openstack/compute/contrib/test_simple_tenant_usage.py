@@ -101,8 +101,21 @@ def fake_instance_get_active_by_window_joined(context, begin, end,
                                          for x in xrange(TENANTS * SERVERS)]
 
 
+def fake_instance_usage_get_by_window(context, begin, end,
+                                      project_id=None):
+    hours = (STOP - START).total_seconds() / 3600.0
+    return [{'project_id': "faketenant_%s" % x,
+             'hours': SERVERS * hours,
+             'vcpus_hours': SERVERS * VCPUS * hours,
+             'memory_mb_hours': SERVERS * MEMORY_MB * hours,
+             'local_gb_hours': SERVERS * (ROOT_GB + EPHEMERAL_GB) * hours}
+            for x in xrange(TENANTS)]
+
+
 @mock.patch.object(db, 'instance_get_active_by_window_joined',
                    fake_instance_get_active_by_window_joined)
+@mock.patch.object(db, 'instance_usage_get_by_window',
+                   fake_instance_usage_get_by_window)
 class SimpleTenantUsageTestV21(test.TestCase):
     policy_rule_prefix = "compute_extension:v3:os-simple-tenant-usage"
     controller = simple_tenant_usage_v21.SimpleTenantUsageController()
@@ -187,6 +200,28 @@ class SimpleTenantUsageTestV21(test.TestCase):
         for i in xrange(TENANTS):
             self.assertIsNone(usages[i].get('server_usages'))
 
+    def test_verify_simple_index_does_not_load_instances(self):
+        with mock.patch.object(objects.InstanceList,
+                               'get_active_by_window_joined') as mock_get:
+            usages = self._get_tenant_usages(detailed='0')
+        self.assertFalse(mock_get.called)
+        self.assertEqual(TENANTS, len(usages))
+        self.assertEqual(SERVERS * HOURS, int(usages[0]['total_hours']))
+
+    def test_simple_index_matches_detailed_index(self):
+        detailed = sorted(self._get_tenant_usages(detailed='1'),
+                          key=lambda usage: usage['tenant_id'])
+        simple = sorted(self._get_tenant_usages(detailed='0'),
+                        key=lambda usage: usage['tenant_id'])
+        for i in xrange(TENANTS):
+            detailed[i].pop('server_usages')
+            for key in ('total_hours', 'total_vcpus_usage',
+                        'total_memory_mb_usage', 'total_local_gb_usage'):
+                self.assertAlmostEqual(detailed[i][key], simple[i][key],
+                                       places=3)
+                del detailed[i][key], simple[i][key]
+            self.assertEqual(detailed[i], simple[i])
+
     def test_verify_simple_index_empty_param(self):
         # NOTE(lzyeval): 'detailed=&start=..&end=..'
         usages = self._get_tenant_usages()
@@ -674,7 +674,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             db_list = [fakes.stub_instance(100, uuid=server_uuid)]
             return instance_obj._make_instance_list(
                 context, objects.InstanceList(), db_list, FIELDS)
@@ -692,7 +692,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('image', search_opts)
             self.assertEqual(search_opts['image'], '12345')
@@ -711,7 +711,7 @@ class ServersControllerTest(ControllerTest):
     def test_tenant_id_filter_converts_to_project_id_for_admin(self):
         def fake_get_all(context, filters=None, sort_key=None,
                          sort_dir='desc', limit=None, marker=None,
-                         columns_to_join=None, use_slave=False):
+                         columns_to_join=None, use_slave=False, columns=None):
             self.assertIsNotNone(filters)
             self.assertEqual(filters['project_id'], 'newfake')
             self.assertFalse(filters.get('tenant_id'))
@@ -729,7 +729,7 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_normal(self):
         def fake_get_all(context, filters=None, sort_key=None,
                          sort_dir='desc', limit=None, marker=None,
-                         columns_to_join=None, use_slave=False):
+                         columns_to_join=None, use_slave=False, columns=None):
             self.assertNotIn('project_id', filters)
             return [fakes.stub_instance(100)]
 
@@ -744,7 +744,7 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_one(self):
         def fake_get_all(context, filters=None, sort_key=None,
                          sort_dir='desc', limit=None, marker=None,
-                         columns_to_join=None, use_slave=False):
+                         columns_to_join=None, use_slave=False, columns=None):
             self.assertNotIn('project_id', filters)
             return [fakes.stub_instance(100)]
 
@@ -759,7 +759,7 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_zero(self):
         def fake_get_all(context, filters=None, sort_key=None,
                          sort_dir='desc', limit=None, marker=None,
-                         columns_to_join=None, use_slave=False):
+                         columns_to_join=None, use_slave=False, columns=None):
             self.assertNotIn('all_tenants', filters)
             return [fakes.stub_instance(100)]
 
@@ -774,7 +774,7 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_false(self):
         def fake_get_all(context, filters=None, sort_key=None,
                          sort_dir='desc', limit=None, marker=None,
-                         columns_to_join=None, use_slave=False):
+                         columns_to_join=None, use_slave=False, columns=None):
             self.assertNotIn('all_tenants', filters)
             return [fakes.stub_instance(100)]
 
@@ -789,7 +789,7 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_invalid(self):
         def fake_get_all(context, filters=None, sort_key=None,
                          sort_dir='desc', limit=None, marker=None,
-                         columns_to_join=None):
+                         columns_to_join=None, columns=None):
             self.assertNotIn('all_tenants', filters)
             return [fakes.stub_instance(100)]
 
@@ -804,7 +804,7 @@ class ServersControllerTest(ControllerTest):
     def test_admin_restricted_tenant(self):
         def fake_get_all(context, filters=None, sort_key=None,
                          sort_dir='desc', limit=None, marker=None,
-                         columns_to_join=None, use_slave=False):
+                         columns_to_join=None, use_slave=False, columns=None):
             self.assertIsNotNone(filters)
             self.assertEqual(filters['project_id'], 'fake')
             return [fakes.stub_instance(100)]
@@ -820,7 +820,7 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_pass_policy(self):
         def fake_get_all(context, filters=None, sort_key=None,
                          sort_dir='desc', limit=None, marker=None,
-                         columns_to_join=None, use_slave=False):
+                         columns_to_join=None, use_slave=False, columns=None):
             self.assertIsNotNone(filters)
             self.assertNotIn('project_id', filters)
             return [fakes.stub_instance(100)]
@@ -844,7 +844,7 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_fail_policy(self):
         def fake_get_all(context, filters=None, sort_key=None,
                          sort_dir='desc', limit=None, marker=None,
-                         columns_to_join=None):
+                         columns_to_join=None, columns=None):
             self.assertIsNotNone(filters)
             return [fakes.stub_instance(100)]
 
@@ -868,7 +868,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('flavor', search_opts)
             # flavor is an integer ID
@@ -902,7 +902,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'], [vm_states.ACTIVE])
@@ -918,6 +918,19 @@ class ServersControllerTest(ControllerTest):
         self.assertEqual(len(servers), 1)
         self.assertEqual(servers[0]['id'], server_uuid)
 
+    @mock.patch.object(compute_api.API, 'get_all')
+    def test_get_servers_reads_only_the_name(self, get_all_mock):
+        get_all_mock.return_value = objects.InstanceList(objects=[])
+
+        req = fakes.HTTPRequest.blank('/fake/servers')
+        self.controller.index(req)
+        self.assertEqual(['display_name'],
+                         get_all_mock.call_args[1]['fields'])
+
+        req = fakes.HTTPRequest.blank('/fake/servers/detail')
+        self.controller.detail(req)
+        self.assertIsNone(get_all_mock.call_args[1]['fields'])
+
     @mock.patch.object(compute_api.API, 'get_all')
     def test_get_servers_allows_multi_status(self, get_all_mock):
         server_uuid0 = str(uuid.uuid4())
@@ -940,7 +953,8 @@ class ServersControllerTest(ControllerTest):
         get_all_mock.assert_called_once_with(mock.ANY,
                         search_opts=expected_search_opts, limit=mock.ANY,
                         marker=mock.ANY, want_objects=mock.ANY,
-                        sort_keys=mock.ANY, sort_dirs=mock.ANY)
+                        sort_keys=mock.ANY, sort_dirs=mock.ANY,
+                        fields=mock.ANY)
 
     @mock.patch.object(compute_api.API, 'get_all')
     def test_get_servers_system_metadata_filter(self, get_all_mock):
@@ -966,7 +980,8 @@ class ServersControllerTest(ControllerTest):
         get_all_mock.assert_called_once_with(mock.ANY,
                         search_opts=expected_search_opts, limit=mock.ANY,
                         marker=mock.ANY, want_objects=mock.ANY,
-                        sort_keys=mock.ANY, sort_dirs=mock.ANY)
+                        sort_keys=mock.ANY, sort_dirs=mock.ANY,
+                        fields=mock.ANY)
 
     @mock.patch.object(compute_api.API, 'get_all')
     def test_get_servers_flavor_not_found(self, get_all_mock):
@@ -998,7 +1013,8 @@ class ServersControllerTest(ControllerTest):
         get_all_mock.assert_called_once_with(mock.ANY,
                         search_opts=expected_search_opts, limit=mock.ANY,
                         marker=mock.ANY, want_objects=mock.ANY,
-                        sort_keys=mock.ANY, sort_dirs=mock.ANY)
+                        sort_keys=mock.ANY, sort_dirs=mock.ANY,
+                        fields=mock.ANY)
 
     def test_get_servers_allows_task_status(self):
         server_uuid = str(uuid.uuid4())
@@ -1006,7 +1022,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('task_state', search_opts)
             self.assertEqual([task_states.REBOOT_PENDING,
@@ -1032,7 +1048,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'],
                              [vm_states.ACTIVE, vm_states.STOPPED])
@@ -1067,7 +1083,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'], ['deleted'])
 
@@ -1089,7 +1105,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('name', search_opts)
             self.assertEqual(search_opts['name'], 'whee.*')
@@ -1110,7 +1126,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('changes-since', search_opts)
             changes_since = datetime.datetime(2011, 1, 24, 17, 8, 1,
@@ -1144,7 +1160,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             # Allowed by user
             self.assertIn('name', search_opts)
@@ -1175,7 +1191,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             # Allowed by user
             self.assertIn('name', search_opts)
@@ -1204,7 +1220,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('ip', search_opts)
             self.assertEqual(search_opts['ip'], '10\..*')
@@ -1228,7 +1244,7 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None, fields=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('ip6', search_opts)
             self.assertEqual(search_opts['ip6'], 'ffff.*')
@@ -69,6 +69,7 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import uuidutils
 from nova import policy
 from nova import quota
+from nova.scheduler import client as scheduler_client
 from nova import test
 from nova.tests.unit.compute import eventlet_utils
 from nova.tests.unit.compute import fake_resource_tracker
@@ -5668,7 +5669,8 @@ class ComputeTestCase(BaseTestCase):
             setup_networks_on_host.assert_has_calls([
                 mock.call(c, instance, self.compute.host, teardown=True)])
             clear_events.assert_called_once_with(instance)
-            update_available_resource.assert_has_calls([mock.call(c)])
+            update_available_resource.assert_has_calls(
+                [mock.call(c, force_audit=True)])
 
     def test_post_live_migration_terminate_volume_connections(self):
         c = context.get_admin_context()
@@ -6493,7 +6495,8 @@ class ComputeTestCase(BaseTestCase):
                                             marker=None,
                                             columns_to_join=[],
                                             use_slave=True,
-                                            limit=None)
+                                            limit=None,
+                                            columns=['created_at'])
             self.assertThat(conductor_instance_update.mock_calls,
                             testtools_matchers.HasLength(len(old_instances)))
             self.assertThat(node_is_available.mock_calls,
@@ -7916,6 +7919,19 @@ class ComputeAPITestCase(BaseTestCase):
                                         want_objects=True)
         self.assertEqual(exp_instance.id, instance.id)
 
+    def test_get_all_with_fields(self):
+        c = context.get_admin_context()
+        instance = self._create_fake_instance_obj({'display_name': 'woot'})
+
+        instances = self.compute_api.get_all(
+            c, search_opts={'uuid': instance.uuid}, want_objects=True,
+            fields=['display_name'])
+        self.assertEqual(1, len(instances))
+        self.assertEqual('woot', instances[0].display_name)
+        self.assertFalse(instances[0].obj_attr_is_set('host'))
+        self.assertFalse(instances[0].obj_attr_is_set('metadata'))
+        self.assertEqual(instance.host, instances[0].host)
+
     def test_get_all_by_name_regexp(self):
         # Test searching instances by name (display_name).
         c = context.get_admin_context()
@@ -9851,6 +9867,16 @@ class ComputeAPIIpFilterTestCase(BaseTestCase):
             kwargs = m_get.call_args[1]
             self.assertEqual(1, kwargs['limit'])
 
+    def test_ip_filtering_with_fields_joins_info_cache(self):
+        c = context.get_admin_context()
+        # The IP filter needs the network info of projected instances
+        with mock.patch('nova.objects.InstanceList.get_by_filters') as m_get:
+            self.compute_api.get_all(c, search_opts={'ip': '.10'},
+                                     fields=['display_name'])
+            kwargs = m_get.call_args[1]
+            self.assertEqual(['display_name'], kwargs['fields'])
+            self.assertEqual(['info_cache'], kwargs['expected_attrs'])
+
 
 def fake_rpc_method(context, method, **kwargs):
     pass
@@ -9891,6 +9917,49 @@ class ComputeAPIAggrTestCase(BaseTestCase):
         self.assertRaises(exception.AggregateNotFound,
                           self.api.delete_aggregate, self.context, aggr['id'])
 
+    @mock.patch.object(scheduler_client.SchedulerClient, 'update_aggregates')
+    def test_create_aggregate_updates_scheduler(self, mock_update_aggs):
+        aggr = self.api.create_aggregate(self.context, 'fake_aggregate',
+                                         None)
+        mock_update_aggs.assert_called_once_with(self.context, [aggr])
+
+    @mock.patch.object(scheduler_client.SchedulerClient, 'update_aggregates')
+    def test_update_aggregate_metadata_updates_scheduler(self,
+                                                         mock_update_aggs):
+        aggr = self.api.create_aggregate(self.context, 'fake_aggregate',
+                                         None)
+        mock_update_aggs.reset_mock()
+        aggr = self.api.update_aggregate_metadata(self.context, aggr['id'],
+                                                  {'foo': 'bar'})
+        mock_update_aggs.assert_called_once_with(self.context, [aggr])
+        self.assertEqual({'foo': 'bar'}, aggr.metadata)
+
+    @mock.patch.object(scheduler_client.SchedulerClient, 'delete_aggregate')
+    def test_delete_aggregate_updates_scheduler(self, mock_delete_agg):
+        aggr = self.api.create_aggregate(self.context, 'fake_aggregate',
+                                         None)
+        self.api.delete_aggregate(self.context, aggr['id'])
+        self.assertEqual(aggr['id'], mock_delete_agg.call_args[0][1].id)
+
+    @mock.patch.object(scheduler_client.SchedulerClient, 'update_aggregates')
+    def test_add_remove_host_updates_scheduler(self, mock_update_aggs):
+        values = _create_service_entries(self.context)
+        fake_host = values[0][1][0]
+        aggr = self.api.create_aggregate(self.context, 'fake_aggregate',
+                                         None)
+        mock_update_aggs.reset_mock()
+
+        aggr = self.api.add_host_to_aggregate(self.context, aggr['id'],
+                                              fake_host)
+        mock_update_aggs.assert_called_once_with(self.context, [aggr])
+        self.assertEqual([fake_host], aggr.hosts)
+
+        mock_update_aggs.reset_mock()
+        aggr = self.api.remove_host_from_aggregate(self.context, aggr['id'],
+                                                   fake_host)
+        mock_update_aggs.assert_called_once_with(self.context, [aggr])
+        self.assertEqual([], aggr.hosts)
+
     def test_check_az_for_aggregate(self):
         # Ensure all conflict hosts can be returned
         values = _create_service_entries(self.context)
@@ -10052,6 +10121,23 @@ class ComputeAPIAggrTestCase(BaseTestCase):
                         matchers.DictMatches({'availability_zone': 'fake_zone',
                         'foo_key2': 'foo_value2'}))
 
+    def test_update_aggregate_metadata_prefetches_images(self):
+        values = _create_service_entries(self.context)
+        fake_zone = values[0][0]
+        fake_host = values[0][1][0]
+        aggr = self._init_aggregate_with_host(None, 'fake_aggregate',
+                                              fake_zone, fake_host)
+        with mock.patch.object(self.api.compute_rpcapi,
+                               'prefetch_images') as mock_prefetch:
+            self.api.update_aggregate_metadata(self.context, aggr['id'],
+                                               {'foo_key': 'foo_value'})
+            self.assertFalse(mock_prefetch.called)
+            self.api.update_aggregate_metadata(
+                self.context, aggr['id'],
+                {'image_cache_prefetch': 'image1, image2'})
+        mock_prefetch.assert_called_once_with(self.context, fake_host,
+                                              ['image1', 'image2'])
+
     def test_update_aggregate_metadata_no_az(self):
         # Ensure metadata without availability zone can be
         # updated,even the aggregate contains hosts belong
@@ -10434,6 +10520,20 @@ class ComputeAggrTestCase(BaseTestCase):
                 aggregate=jsonutils.to_primitive(self.aggr), slave_info=None)
         self.assertTrue(fake_driver_add_to_aggregate.called)
 
+    def test_add_aggregate_host_prefetches_images(self):
+        aggr = db.aggregate_create(self.context, {'name': 'prefetch_aggr'},
+                                   metadata={'image_cache_prefetch': 'image1'})
+        with mock.patch.object(self.compute.driver,
+                               'prefetch_images') as mock_prefetch:
+            self.compute.add_aggregate_host(self.context, host="host",
+                    aggregate=jsonutils.to_primitive(aggr), slave_info=None)
+        mock_prefetch.assert_called_once_with(self.context, ['image1'])
+
+    def test_prefetch_images_not_implemented(self):
+        with mock.patch.object(self.compute.driver, 'prefetch_images',
+                               side_effect=NotImplementedError):
+            self.compute.prefetch_images(self.context, ['image1'])
+
     def test_remove_aggregate_host(self):
         def fake_driver_remove_from_aggregate(context, aggregate, host,
                                               **_ignore):
@@ -40,6 +40,7 @@ from nova.network import api as network_api
 from nova.network import model as network_model
 from nova import objects
 from nova.objects import block_device as block_device_obj
+from nova.objects import instance as instance_obj
 from nova.openstack.common import uuidutils
 from nova import test
 from nova.tests.unit.compute import fake_resource_tracker
@@ -1048,7 +1049,7 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         db.instance_get_all_by_filters(
                 fake_context, filters,
                 'created_at', 'desc', columns_to_join=None,
-                limit=None, marker=None,
+                limit=instance_obj.ITER_BATCH_SIZE, marker=None,
                 use_slave=True).AndReturn(all_instances)
 
         self.mox.ReplayAll()
@@ -1061,16 +1062,25 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         instances = [objects.Instance(uuid='foo')]
 
         @classmethod
-        def fake_get(*a, **k):
-            return instances
+        def fake_iter(*a, **k):
+            return iter(instances)
+
+        @classmethod
+        def fake_count(*a, **k):
+            return len(instances)
+
+        def fake_start(context, conductor, begin, end, host, num_instances):
+            self.assertEqual(1, num_instances)
 
         self.flags(instance_usage_audit=True)
         self.stubs.Set(compute_utils, 'has_audit_been_run',
                        lambda *a, **k: False)
         self.stubs.Set(objects.InstanceList,
-                       'get_active_by_window_joined', fake_get)
+                       'iter_active_by_window_joined', fake_iter)
+        self.stubs.Set(objects.InstanceList,
+                       'get_count_active_by_window', fake_count)
         self.stubs.Set(compute_utils, 'start_instance_usage_audit',
-                       lambda *a, **k: None)
+                       fake_start)
         self.stubs.Set(compute_utils, 'finish_instance_usage_audit',
                        lambda *a, **k: None)
 
@@ -1085,14 +1095,57 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
     def test_sync_power_states(self, mock_get):
         instance = mock.Mock()
         mock_get.return_value = [instance]
-        with mock.patch.object(self.compute._sync_power_pool,
-                               'spawn_n') as mock_spawn:
+        with contextlib.nested(
+            mock.patch.object(self.compute._sync_power_pool, 'spawn_n'),
+            mock.patch.object(self.compute.driver,
+                              'get_all_instance_power_states',
+                              side_effect=NotImplementedError)
+        ) as (mock_spawn, mock_get_states):
             self.compute._sync_power_states(mock.sentinel.context)
             mock_get.assert_called_with(mock.sentinel.context,
                                         self.compute.host, expected_attrs=[],
-                                        use_slave=True)
+                                        use_slave=True,
+                                        fields=['uuid', 'power_state',
+                                                'vm_state', 'task_state'])
             mock_spawn.assert_called_once_with(mock.ANY, instance)
 
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_only_drifted(self, mock_get):
+        def _instance(uuid, vm_state, db_power_state, task_state=None):
+            return objects.Instance(uuid=uuid, vm_state=vm_state,
+                                    power_state=db_power_state,
+                                    task_state=task_state)
+
+        in_sync = _instance('in-sync', vm_states.ACTIVE, power_state.RUNNING)
+        drifted = _instance('drifted', vm_states.ACTIVE, power_state.RUNNING)
+        missing = _instance('missing', vm_states.ACTIVE, power_state.RUNNING)
+        mismatch = _instance('mismatch', vm_states.ACTIVE,
+                             power_state.SHUTDOWN)
+        pending = _instance('pending', vm_states.ACTIVE, power_state.RUNNING,
+                            task_state=task_states.REBOOTING)
+        stopped = _instance('stopped', vm_states.STOPPED,
+                            power_state.SHUTDOWN)
+        mock_get.return_value = [in_sync, drifted, missing, mismatch,
+                                 pending, stopped]
+        vm_power_states = {'in-sync': power_state.RUNNING,
+                           'drifted': power_state.SHUTDOWN,
+                           'mismatch': power_state.SHUTDOWN,
+                           'pending': power_state.SHUTDOWN,
+                           'stopped': power_state.SHUTDOWN}
+
+        with contextlib.nested(
+            mock.patch.object(self.compute._sync_power_pool, 'spawn_n'),
+            mock.patch.object(self.compute.driver,
+                              'get_all_instance_power_states',
+                              return_value=vm_power_states),
+            mock.patch.object(self.compute.driver, 'get_info')
+        ) as (mock_spawn, mock_get_states, mock_get_info):
+            self.compute._sync_power_states(mock.sentinel.context)
+
+        self.assertEqual([drifted, missing, mismatch],
+                         [call[0][1] for call in mock_spawn.call_args_list])
+        self.assertFalse(mock_get_info.called)
+
     def _get_sync_instance(self, power_state, vm_state, task_state=None,
                            shutdown_terminate=False):
         instance = objects.Instance()
@@ -801,6 +801,16 @@ class ComputeUtilsGetValFromSysMetadata(test.NoDBTestCase):
         self.assertEqual(0, result)
 
 
+class ComputeUtilsGetPrefetchImages(test.NoDBTestCase):
+
+    def test_get_prefetch_images(self):
+        self.assertEqual(['1', '2'], compute_utils.get_prefetch_images(
+            {'image_cache_prefetch': ' 1,2, ,'}))
+        self.assertEqual([], compute_utils.get_prefetch_images(
+            {'image_cache_prefetch': None}))
+        self.assertEqual([], compute_utils.get_prefetch_images({}))
+
+
 class ComputeUtilsGetNWInfo(test.NoDBTestCase):
     def test_instance_object_none_info_cache(self):
         inst = fake_instance.fake_instance_obj('fake-context',
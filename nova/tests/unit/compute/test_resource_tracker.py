@@ -15,6 +15,7 @@
 
 """Tests for compute resource tracking."""
 
+import datetime
 import uuid
 
 import mock
@@ -1552,6 +1553,55 @@ class TrackerPeriodicTestCase(BaseTrackerTestCase):
 
         _test()
 
+    @mock.patch.object(resource_tracker.ResourceTracker,
+                       '_update_available_resource')
+    def test_audit_skipped_within_interval(self, mock_uar):
+        self.flags(resource_tracker_audit_interval=600)
+        self.tracker.last_audit_at = timeutils.utcnow()
+
+        self.tracker.update_available_resource(self.context)
+        self.assertFalse(mock_uar.called)
+
+        self.tracker.update_available_resource(self.context,
+                                               force_audit=True)
+        self.assertEqual(1, mock_uar.call_count)
+
+    @mock.patch.object(resource_tracker.ResourceTracker,
+                       '_update_available_resource')
+    def test_audit_due_after_interval(self, mock_uar):
+        self.flags(resource_tracker_audit_interval=600)
+        self.tracker.last_audit_at = timeutils.utcnow()
+        timeutils.set_time_override(self.tracker.last_audit_at +
+                                    datetime.timedelta(seconds=601))
+        self.addCleanup(timeutils.clear_time_override)
+
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual(1, mock_uar.call_count)
+
+    def test_audit_sets_last_audit_at(self):
+        self.flags(resource_tracker_audit_interval=600)
+        self.tracker.last_audit_at = None
+
+        self.tracker.update_available_resource(self.context)
+
+        self.assertIsNotNone(self.tracker.last_audit_at)
+
+    @mock.patch.object(resource_tracker.ResourceTracker,
+                       '_get_instances_and_migrations',
+                       return_value=([], []))
+    def test_audit_reads_again_when_usage_changed(self, mock_get):
+        resources = self.tracker.driver.get_available_resource(
+            self.tracker.nodename)
+        generation = self.tracker.usage_generation
+
+        self.tracker._audit_usage(self.context, resources, generation,
+                                  [], [])
+        self.assertFalse(mock_get.called)
+
+        self.tracker._audit_usage(self.context, resources, generation - 1,
+                                  [], [])
+        mock_get.assert_called_once_with(self.context)
+
 
 class StatsDictTestCase(BaseTrackerTestCase):
     """Test stats handling for a virt driver that provides
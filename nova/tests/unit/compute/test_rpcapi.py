@@ -566,3 +566,18 @@ class ComputeRpcAPITestCase(test.TestCase):
     def test_unquiesce_instance(self):
         self._test_compute_api('unquiesce_instance', 'cast',
                 instance=self.fake_instance_obj, mapping=None, version='3.39')
+
+    def test_prefetch_images(self):
+        self._test_compute_api('prefetch_images', 'cast', host='host',
+                image_ids=['fake-image'], version='3.40')
+
+    def test_prefetch_images_capped(self):
+        rpcapi = compute_rpcapi.ComputeAPI()
+        with contextlib.nested(
+            mock.patch.object(rpcapi.client, 'can_send_version',
+                              return_value=False),
+            mock.patch.object(rpcapi.client, 'prepare'),
+        ) as (csv_mock, prepare_mock):
+            rpcapi.prefetch_images(self.context, 'host', ['fake-image'])
+        csv_mock.assert_called_once_with('3.40')
+        self.assertFalse(prepare_mock.called)
@@ -178,6 +178,92 @@ class DecoratorTestCase(test.TestCase):
         self._test_decorator_wraps_helper(sqlalchemy_api._retry_on_deadlock)
 
 
+class ReadRoutingTestCase(test.TestCase):
+    def setUp(self):
+        super(ReadRoutingTestCase, self).setUp()
+        self.flags(route_reads_to_slave=True)
+        self.ctxt = context.get_admin_context()
+
+    def _routed(self, policy):
+        @sqlalchemy_api._read_policy(policy)
+        @sqlalchemy_api.require_context
+        def read(context):
+            return sqlalchemy_api._ROUTING.use_slave
+        return read
+
+    def test_read_slave(self):
+        read = self._routed(sqlalchemy_api.READ_SLAVE)
+        self.assertTrue(read(self.ctxt))
+        self.assertFalse(sqlalchemy_api._ROUTING.use_slave)
+
+    def test_read_slave_disabled(self):
+        self.flags(route_reads_to_slave=False)
+        read = self._routed(sqlalchemy_api.READ_SLAVE)
+        self.assertFalse(read(self.ctxt))
+
+    def test_read_your_writes(self):
+        read = self._routed(sqlalchemy_api.READ_YOUR_WRITES)
+        self.assertTrue(read(self.ctxt))
+        self.ctxt.db_written = True
+        self.assertFalse(read(self.ctxt))
+
+    def test_read_master_in_slave_read(self):
+        read_master = self._routed(sqlalchemy_api.READ_MASTER)
+
+        @sqlalchemy_api._read_policy(sqlalchemy_api.READ_SLAVE)
+        @sqlalchemy_api.require_context
+        def read(context):
+            return read_master(context)
+
+        self.assertFalse(read(self.ctxt))
+
+    def test_nested_read_keeps_routing(self):
+        read = self._routed(sqlalchemy_api.READ_SLAVE)
+
+        @sqlalchemy_api.require_context
+        def write(context):
+            return read(context)
+
+        self.assertFalse(write(self.ctxt))
+
+    @mock.patch.object(sqlalchemy_api, '_create_facade_lazily')
+    def test_get_session_routed(self, mock_facade):
+        @sqlalchemy_api._read_policy(sqlalchemy_api.READ_SLAVE)
+        def read(context):
+            return sqlalchemy_api.get_session()
+
+        read(self.ctxt)
+        mock_facade.return_value.get_session.assert_called_once_with(
+            use_slave=True)
+
+    @mock.patch.object(sqlalchemy_api, '_create_facade_lazily')
+    def test_host_audit_reads_from_master(self, mock_facade):
+        # The resource tracker audits the claims and migrations of other
+        # requests, with a context which has written nothing.
+        db.instance_get_all_by_host_and_node(self.ctxt, 'fake-host',
+                                             'fake-node')
+        db.migration_get_in_progress_by_host_and_node(self.ctxt,
+                                                      'fake-host',
+                                                      'fake-node')
+        self.assertTrue(mock_facade.return_value.get_session.called)
+        for call in mock_facade.return_value.get_session.call_args_list:
+            self.assertEqual({'use_slave': False}, call[1])
+
+    def test_write_pins_context(self):
+        instance = db.instance_create(self.ctxt, {})
+        self.assertTrue(self.ctxt.db_written)
+
+        other_ctxt = context.get_admin_context()
+        db.instance_get_by_uuid(other_ctxt, instance['uuid'])
+        self.assertFalse(getattr(other_ctxt, 'db_written', False))
+
+    def test_write_without_context_check_pins_context(self):
+        instance = db.instance_create(context.get_admin_context(), {})
+        db.instance_fault_create(self.ctxt, {'instance_uuid': instance['uuid'],
+                                             'code': 404})
+        self.assertTrue(self.ctxt.db_written)
+
+
 def _get_fake_aggr_values():
     return {'name': 'fake_aggregate'}
 
@@ -420,6 +506,40 @@ class NotDbApiTestCase(DbTestCase):
                               filters={},
                               sort_keys=keys)
 
+    def test_instance_get_all_by_filters_sort_key_invalid_marker(self):
+        inst = self.create_instance_with_args()
+        self.assertRaises(exception.InvalidSortKey,
+                          db.instance_get_all_by_filters_sort,
+                          self.context, filters={}, marker=inst['uuid'],
+                          sort_keys=['foo'])
+
+    def test_instance_get_all_by_filters_paginate_same_created_at(self):
+        created_at = datetime.datetime(2015, 1, 1)
+        insts = [self.create_instance_with_args(created_at=created_at)
+                 for i in range(4)]
+        insts.append(self.create_instance_with_args(
+            created_at=created_at - datetime.timedelta(seconds=1)))
+
+        pages = []
+        marker = None
+        while True:
+            page = db.instance_get_all_by_filters_sort(self.context, {},
+                                                       limit=2, marker=marker)
+            if not page:
+                break
+            pages.append([inst['id'] for inst in page])
+            marker = page[-1]['uuid']
+
+        ids = [inst['id'] for inst in insts]
+        self.assertEqual([ids[3:1:-1], ids[1::-1], ids[4:]], pages)
+
+    def test_instance_marker_reads_sort_keys(self):
+        inst = self.create_instance_with_args(display_name='foo')
+        marker = sqlalchemy_api._instance_marker(
+            self.context, inst['uuid'], ['display_name', 'id'])
+        self.assertEqual(('foo', inst['id']), tuple(marker))
+        self.assertEqual('foo', marker.display_name)
+
     def test_convert_objects_related_datetimes(self):
 
         t1 = timeutils.utcnow()
@@ -909,6 +1029,20 @@ class SqlAlchemyDbApiTestCase(DbTestCase):
         result = sqlalchemy_api._instance_get_all_uuids_by_host(ctxt, 'host1')
         self.assertEqual(2, len(result))
 
+    def test_instance_get_all_by_host_columns(self):
+        ctxt = context.get_admin_context()
+        inst = self.create_instance_with_args(vm_state='active')
+        self.create_instance_with_args(host='host2')
+        result = db.instance_get_all_by_host(ctxt, 'host1',
+                                             columns_to_join=[],
+                                             columns=['vm_state'])
+        self.assertEqual(1, len(result))
+        self.assertEqual(set(['id', 'uuid', 'deleted', 'vm_state']),
+                         set(result[0].keys()) - set(['metadata',
+                                                      'system_metadata']))
+        self.assertEqual(inst['uuid'], result[0]['uuid'])
+        self.assertEqual('active', result[0]['vm_state'])
+
     def test_instance_get_all_uuids_by_host(self):
         ctxt = context.get_admin_context()
         self.create_instance_with_args()
@@ -985,6 +1119,91 @@ class SqlAlchemyDbApiTestCase(DbTestCase):
         self.assertIn('info_cache', result[0])
         self.assertEqual(network_info, result[0]['info_cache']['network_info'])
 
+    def test_instance_count_active_by_window(self):
+        now = datetime.datetime(2013, 10, 10, 17, 16, 37, 156701)
+        now1 = now + datetime.timedelta(minutes=1)
+        now2 = now + datetime.timedelta(minutes=2)
+        ctxt = context.get_admin_context()
+        self.create_instance_with_args(launched_at=now)
+        self.create_instance_with_args(launched_at=now, terminated_at=now1)
+        self.create_instance_with_args(launched_at=now, host='host2')
+
+        self.assertEqual(3, sqlalchemy_api.instance_count_active_by_window(
+            ctxt, begin=now))
+        self.assertEqual(1, sqlalchemy_api.instance_count_active_by_window(
+            ctxt, begin=now2, host='host1'))
+        self.assertEqual(0, sqlalchemy_api.instance_count_active_by_window(
+            ctxt, begin=now, end=now))
+
+    def test_instance_get_active_by_window_joined_paginated(self):
+        now = datetime.datetime(2013, 10, 10, 17, 16, 37, 156701)
+        ctxt = context.get_admin_context()
+        uuids = [self.create_instance_with_args(launched_at=now)['uuid']
+                 for i in xrange(5)]
+
+        result = sqlalchemy_api.instance_get_active_by_window_joined(
+            ctxt, begin=now, limit=2)
+        self.assertEqual(uuids[:2], [inst['uuid'] for inst in result])
+
+        result = sqlalchemy_api.instance_get_active_by_window_joined(
+            ctxt, begin=now, limit=2, marker=uuids[1])
+        self.assertEqual(uuids[2:4], [inst['uuid'] for inst in result])
+
+        result = sqlalchemy_api.instance_get_active_by_window_joined(
+            ctxt, begin=now, limit=2, marker=uuids[4])
+        self.assertEqual([], result)
+
+    def test_instance_get_active_by_window_joined_marker_not_found(self):
+        ctxt = context.get_admin_context()
+        self.assertRaises(exception.MarkerNotFound,
+                          sqlalchemy_api.instance_get_active_by_window_joined,
+                          ctxt, begin=timeutils.utcnow(), limit=2,
+                          marker='missing')
+
+    def test_instance_usage_get_by_window(self):
+        now = datetime.datetime(2013, 10, 10, 17, 16, 37)
+
+        def hours(n):
+            return now + datetime.timedelta(hours=n)
+
+        ctxt = context.get_admin_context()
+        other_ctxt = context.RequestContext('user2', 'project2')
+        flavor = {'vcpus': 2, 'memory_mb': 512, 'root_gb': 10,
+                  'ephemeral_gb': 5}
+        # Running across the start of the window
+        self.create_instance_with_args(launched_at=hours(-1), **flavor)
+        # Running within the window
+        self.create_instance_with_args(launched_at=hours(2),
+                                       terminated_at=hours(5), **flavor)
+        # Running across the end of the window
+        self.create_instance_with_args(context=other_ctxt,
+                                       launched_at=hours(8),
+                                       terminated_at=hours(20), **flavor)
+        # Terminated before the window
+        self.create_instance_with_args(context=other_ctxt,
+                                       launched_at=hours(-5),
+                                       terminated_at=hours(-2), **flavor)
+
+        result = sqlalchemy_api.instance_usage_get_by_window(
+            ctxt, hours(0), hours(10))
+        result = {usage.pop('project_id'): usage for usage in result}
+        self.assertEqual(set([self.project_id, 'project2']), set(result))
+        for project_id, expected_hours in ((self.project_id, 13),
+                                           ('project2', 2)):
+            usage = result[project_id]
+            self.assertAlmostEqual(expected_hours, usage['hours'],
+                                   places=3)
+            self.assertAlmostEqual(expected_hours * 2, usage['vcpus_hours'],
+                                   places=3)
+            self.assertAlmostEqual(expected_hours * 512,
+                                   usage['memory_mb_hours'], places=3)
+            self.assertAlmostEqual(expected_hours * 15,
+                                   usage['local_gb_hours'], places=3)
+
+        result = sqlalchemy_api.instance_usage_get_by_window(
+            ctxt, hours(0), hours(10), project_id='project2')
+        self.assertEqual(['project2'], [row['project_id'] for row in result])
+
     @mock.patch('nova.db.sqlalchemy.api.instance_get_all_by_filters_sort')
     def test_instance_get_all_by_filters_calls_sort(self,
                                                     mock_get_all_filters_sort):
@@ -997,7 +1216,8 @@ class SqlAlchemyDbApiTestCase(DbTestCase):
             columns_to_join='columns', use_slave=True)
         mock_get_all_filters_sort.assert_called_once_with(ctxt, {'foo': 'bar'},
             limit=100, marker='uuid', columns_to_join='columns',
-            use_slave=True, sort_keys=['sort_key'], sort_dirs=['sort_dir'])
+            use_slave=True, sort_keys=['sort_key'], sort_dirs=['sort_dir'],
+            columns=None)
 
 
 class ProcessSortParamTestCase(test.TestCase):
@@ -1322,6 +1542,86 @@ class InstanceSystemMetadataTestCase(test.TestCase):
                                                    self.instance['uuid'])
         self.assertEqual(metadata, {'new_key': 'new_value'})
 
+    def _get_blob(self):
+        blobs = sqlalchemy_api._instance_system_metadata_get_blobs(
+            self.ctxt, [self.instance['uuid']])
+        return utils.metadata_to_dict(blobs[self.instance['uuid']])
+
+    def test_instance_create_writes_blob(self):
+        self.assertEqual({'key': 'value'}, self._get_blob())
+
+    def test_instance_system_metadata_update_writes_blob(self):
+        db.instance_system_metadata_update(
+                    self.ctxt, self.instance['uuid'],
+                    {'new_key': 'new_value'}, False)
+        self.assertEqual({'key': 'value', 'new_key': 'new_value'},
+                         self._get_blob())
+
+        db.instance_system_metadata_update(
+                    self.ctxt, self.instance['uuid'],
+                    {'new_key': 'new_value'}, True)
+        self.assertEqual({'new_key': 'new_value'}, self._get_blob())
+
+    def test_instance_system_metadata_update_reads_rows_once(self):
+        with mock.patch.object(
+                sqlalchemy_api, '_instance_system_metadata_get_query',
+                wraps=sqlalchemy_api._instance_system_metadata_get_query
+                ) as get_query:
+            db.instance_system_metadata_update(
+                        self.ctxt, self.instance['uuid'],
+                        {'key': 'new_value'}, False)
+        self.assertEqual(1, get_query.call_count)
+        self.assertEqual({'key': 'new_value'}, self._get_blob())
+
+    def test_instance_update_writes_blob(self):
+        db.instance_update(self.ctxt, self.instance['uuid'],
+                           {'system_metadata': {'new_key': 'new_value'}})
+        self.assertEqual({'new_key': 'new_value'}, self._get_blob())
+
+    def test_instance_get_all_reads_blob(self):
+        self.flags(read_system_metadata_blob=True)
+        db.instance_system_metadata_update(
+                    self.ctxt, self.instance['uuid'],
+                    {'new_key': 'new_value'}, False)
+        self.mox.StubOutWithMock(sqlalchemy_api,
+                                 '_instance_system_metadata_get_multi')
+        sqlalchemy_api._instance_system_metadata_get_multi(
+            self.ctxt, [], use_slave=False).AndReturn([])
+        self.mox.ReplayAll()
+
+        instances = db.instance_get_all_by_filters(self.ctxt, {})
+
+        self.assertEqual({'key': 'value', 'new_key': 'new_value'},
+                         utils.instance_sys_meta(instances[0]))
+
+    def test_instance_get_all_reads_rows_without_blob(self):
+        self.flags(read_system_metadata_blob=True)
+        db.instance_extra_update_by_uuid(self.ctxt, self.instance['uuid'],
+                                         {'system_metadata': None})
+
+        instances = db.instance_get_all_by_filters(self.ctxt, {})
+
+        self.assertEqual({'key': 'value'},
+                         utils.instance_sys_meta(instances[0]))
+
+    def test_instance_system_metadata_blobs_rebuild(self):
+        other = db.instance_create(self.ctxt,
+                                   {'system_metadata': {'foo': 'bar'}})
+        for inst in (self.instance, other):
+            db.instance_extra_update_by_uuid(self.ctxt, inst['uuid'],
+                                             {'system_metadata': None})
+
+        self.assertEqual((1, self.instance['id']),
+                         db.instance_system_metadata_blobs_rebuild(
+                             self.ctxt, 1))
+        self.assertEqual({'key': 'value'}, self._get_blob())
+        self.assertEqual((1, other['id']),
+                         db.instance_system_metadata_blobs_rebuild(
+                             self.ctxt, 1, marker=self.instance['id']))
+        self.assertEqual((0, other['id']),
+                         db.instance_system_metadata_blobs_rebuild(
+                             self.ctxt, 1, marker=other['id']))
+
     @test.testtools.skip("bug 1189462")
     def test_instance_system_metadata_update_nonexistent(self):
         self.assertRaises(exception.InstanceNotFound,
@@ -1387,6 +1687,38 @@ class ReservationTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self.assertEqual(expected, db.quota_usage_get_all_by_project_and_user(
                                             self.ctxt, 'project1', 'user1'))
 
+    def test_reservation_commit_optimistic(self):
+        db.reservation_commit_optimistic(self.ctxt, self.reservations,
+                                         'project1', 'user1')
+        # Committing again does not count the reservations twice
+        db.reservation_commit_optimistic(self.ctxt, self.reservations,
+                                         'project1', 'user1')
+        self.assertRaises(exception.ReservationNotFound,
+            _reservation_get, self.ctxt, self.reservations[0])
+        expected = {'project_id': 'project1', 'user_id': 'user1',
+                'resource0': {'reserved': 0, 'in_use': 0},
+                'resource1': {'reserved': 0, 'in_use': 2},
+                'fixed_ips': {'reserved': 0, 'in_use': 4}}
+        self.assertEqual(expected, db.quota_usage_get_all_by_project_and_user(
+                                            self.ctxt, 'project1', 'user1'))
+
+    def test_reservation_rollback_optimistic(self):
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'resource1',
+                                   'user1')
+        db.reservation_rollback_optimistic(self.ctxt, self.reservations,
+                                           'project1', 'user1')
+        self.assertRaises(exception.ReservationNotFound,
+            _reservation_get, self.ctxt, self.reservations[0])
+        expected = {'project_id': 'project1', 'user_id': 'user1',
+                'resource0': {'reserved': 0, 'in_use': 0},
+                'resource1': {'reserved': 0, 'in_use': 1},
+                'fixed_ips': {'reserved': 0, 'in_use': 2}}
+        self.assertEqual(expected, db.quota_usage_get_all_by_project_and_user(
+                                            self.ctxt, 'project1', 'user1'))
+        updated = db.quota_usage_get(self.ctxt, 'project1', 'resource1',
+                                     'user1')
+        self.assertEqual(usage.generation + 1, updated.generation)
+
     def test_reservation_expire(self):
         db.reservation_expire(self.ctxt)
 
@@ -1952,6 +2284,27 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         filtered_instances = db.instance_get_all_by_filters(self.ctxt, {})
         self._assertEqualListsOfInstances(instances, filtered_instances)
 
+    def test_instance_get_all_by_filters_columns(self):
+        inst = self.create_instance_with_args(host='host1')
+        result = db.instance_get_all_by_filters(self.ctxt, {}, 'created_at',
+                                                'desc', columns=['host'],
+                                                columns_to_join=['info_cache'])
+        self.assertEqual(1, len(result))
+        self.assertEqual(set(['id', 'uuid', 'deleted', 'host', 'info_cache',
+                              'metadata', 'system_metadata']),
+                         set(result[0].keys()))
+        self.assertEqual(inst['uuid'], result[0]['uuid'])
+        self.assertEqual('host1', result[0]['host'])
+        self.assertEqual(inst['uuid'],
+                         result[0]['info_cache']['instance_uuid'])
+
+    @mock.patch('nova.db.sqlalchemy.api.load_only')
+    def test_instance_get_all_by_filters_sort_columns(self, mock_load_only):
+        db.instance_get_all_by_filters_sort(self.ctxt, {},
+                                            columns=['host', 'vm_state'])
+        mock_load_only.assert_called_once_with('id', 'uuid', 'deleted',
+                                               'host', 'vm_state')
+
     def test_instance_get_all_by_filters_zero_limit(self):
         self.create_instance_with_args()
         instances = db.instance_get_all_by_filters(self.ctxt, {}, limit=0)
@@ -2332,6 +2685,59 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                     db.instance_update, self.ctxt, instance['uuid'],
                     {'host': 'h1', 'expected_vm_state': ('spam', 'bar')})
 
+    def test_instance_update_with_expected_task_state_none(self):
+        instance = self.create_instance_with_args(task_state=None)
+        (old_ref, new_ref) = db.instance_update_and_get_original(
+            self.ctxt, instance['uuid'],
+            {'task_state': 'spawning', 'expected_task_state': [None]})
+        self.assertEqual('spawning', new_ref['task_state'])
+        self.assertIsNotNone(new_ref['updated_at'])
+        instance = db.instance_get_by_uuid(self.ctxt, instance['uuid'])
+        self.assertEqual('spawning', instance['task_state'])
+
+    def test_instance_update_with_task_state_changed_after_read(self):
+        instance = self.create_instance_with_args(task_state='foo')
+        real_get = sqlalchemy_api._instance_get_by_uuid
+
+        def get_and_change(context, uuid, session=None, **kwargs):
+            instance_ref = real_get(context, uuid, session=session, **kwargs)
+            # Another update of the instance between the read and the update
+            session.execute(models.Instance.__table__.update().
+                            where(models.Instance.uuid == uuid).
+                            values(task_state='bar'))
+            return instance_ref
+
+        with mock.patch.object(sqlalchemy_api, '_instance_get_by_uuid',
+                               side_effect=get_and_change):
+            exc = self.assertRaises(exception.UnexpectedTaskStateError,
+                                    db.instance_update, self.ctxt,
+                                    instance['uuid'],
+                                    {'host': 'other-host',
+                                     'expected_task_state': 'foo'})
+        self.assertEqual('bar', exc.kwargs['actual'])
+        self.assertNotEqual('other-host', db.instance_get_by_uuid(
+            self.ctxt, instance['uuid'])['host'])
+
+    def test_instance_update_with_instance_deleted_after_read(self):
+        instance = self.create_instance_with_args(task_state='foo')
+        real_get = sqlalchemy_api._instance_get_by_uuid
+
+        def get_and_delete(context, uuid, session=None, **kwargs):
+            instance_ref = real_get(context, uuid, session=session, **kwargs)
+            session.execute(models.Instance.__table__.update().
+                            where(models.Instance.uuid == uuid).
+                            values(deleted=models.Instance.id,
+                                   task_state='bar'))
+            return instance_ref
+
+        with mock.patch.object(sqlalchemy_api, '_instance_get_by_uuid',
+                               side_effect=get_and_delete):
+            self.assertRaises(exception.InstanceNotFound,
+                              db.instance_update, self.ctxt,
+                              instance['uuid'],
+                              {'host': 'other-host',
+                               'expected_task_state': 'foo'})
+
     def test_instance_update_with_instance_uuid(self):
         # test instance_update() works when an instance UUID is passed.
         ctxt = context.get_admin_context()
@@ -2756,6 +3162,24 @@ class ServiceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         real = db.service_get_all_by_topic(self.ctxt, 't1')
         self._assertEqualListsOfObjects(expected, real)
 
+    def test_service_get_all_by_topic_changed_since(self):
+        old = self._create_service({'host': 'host1', 'topic': 't1'})
+        changes_since = timeutils.utcnow()
+        values = [
+            {'host': 'host2', 'topic': 't1'},
+            {'host': 'host3', 'disabled': True, 'topic': 't1'},
+            {'host': 'host4', 'topic': 't2'}
+        ]
+        services = [self._create_service(vals) for vals in values]
+        deleted = self._create_service({'host': 'host5', 'topic': 't1'})
+        db.service_destroy(self.ctxt, deleted['id'])
+        real = db.service_get_all_by_topic_changed_since(self.ctxt, 't1',
+                                                         changes_since)
+        self.assertEqual(set([services[0]['id'], services[1]['id'],
+                              deleted['id']]),
+                         set([service['id'] for service in real]))
+        self.assertNotIn(old['id'], [service['id'] for service in real])
+
     def test_service_get_all_by_host(self):
         values = [
             {'host': 'host1', 'topic': 't11', 'binary': 'b11'},
@@ -5990,6 +6414,169 @@ class QuotaTestCase(test.TestCase, ModelsObjectComparatorMixin):
             resources_names.remove(reservation.resource)
         self.assertEqual(len(resources_names), 0)
 
+    def _quota_reserve_optimistic(self, limit):
+        resources = {'instances': quota.ReservableResource(
+            'instances', '_sync_instances', 'quota_instances')}
+        quotas = {'instances': limit}
+        return db.quota_reserve_optimistic(
+            self.ctxt, resources, quotas, quotas, {'instances': 1},
+            timeutils.utcnow() + datetime.timedelta(days=1), 0, 0,
+            'project1', 'user1')
+
+    def test_quota_reserve_optimistic(self):
+        self._quota_reserve_optimistic(2)
+        self._quota_reserve_optimistic(2)
+        self.assertRaises(exception.OverQuota,
+                          self._quota_reserve_optimistic, 2)
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'instances',
+                                   'user1')
+        self.assertEqual(2, usage.reserved)
+
+    def test_quota_reserve_optimistic_project_over_quota(self):
+        # Another user of the project reserved meanwhile
+        totals = {'instances': {'in_use': 0, 'reserved': 3, 'total': 3}}
+        with mock.patch.object(sqlalchemy_api, '_quota_usage_totals',
+                               return_value=totals):
+            self.assertRaises(exception.OverQuota,
+                              self._quota_reserve_optimistic, 2)
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'instances',
+                                   'user1')
+        self.assertEqual(0, usage.reserved)
+        self.assertEqual(0, sqlalchemy_api.model_query(
+            self.ctxt, models.Reservation, read_deleted="no").count())
+
+    def test_quota_reserve_optimistic_user_over_quota_concurrently(self):
+        self._quota_reserve_optimistic(1)
+        # The usages were read before another request reserved the rest of
+        # the quota of the user.
+        with mock.patch.object(sqlalchemy_api, '_calculate_overquota',
+                               return_value=[]):
+            self.assertRaises(exception.OverQuota,
+                              self._quota_reserve_optimistic, 1)
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'instances',
+                                   'user1')
+        self.assertEqual(1, usage.reserved)
+        self.assertEqual(1, sqlalchemy_api.model_query(
+            self.ctxt, models.Reservation, read_deleted="no").count())
+
+    def test_quota_reserve_optimistic_later_reservation_ignored(self):
+        orig_reserve = sqlalchemy_api._quota_usages_reserve
+        later = []
+
+        def reserve(*args, **kwargs):
+            result = orig_reserve(*args, **kwargs)
+            # Another user of the project reserved the rest of the quota
+            # after us, before the project quotas are checked again
+            usage = sqlalchemy_api._quota_usage_create(
+                'project1', 'user2', 'instances', 0, 1, None)
+            later.append(sqlalchemy_api._reservation_create(
+                'fake-later-uuid', usage, 'project1', 'user2', 'instances',
+                1, None))
+            return result
+
+        with mock.patch.object(sqlalchemy_api, '_quota_usages_reserve',
+                               side_effect=reserve):
+            reservations = self._quota_reserve_optimistic(1)
+        self.assertEqual(1, len(reservations))
+        self.assertEqual({'instances': 1},
+                         sqlalchemy_api._quota_reserved_after(
+                             self.ctxt, 'project1', reservations))
+        # The later request sees ours and goes over quota
+        self.assertEqual({}, sqlalchemy_api._quota_reserved_after(
+            self.ctxt, 'project1', [later[0].uuid]))
+
+    @mock.patch('time.sleep')
+    def test_quota_reserve_optimistic_refresh_retries(self, mock_sleep):
+        orig_update = sqlalchemy_api._quota_usage_update_if_unchanged
+        calls = []
+
+        def update(context, usage, values):
+            if not calls:
+                # Another request refreshed the row meanwhile
+                db.quota_usage_update(self.ctxt, 'project1', 'user1',
+                                      'instances', in_use=0)
+            calls.append(values)
+            return orig_update(context, usage, values)
+
+        with mock.patch.object(sqlalchemy_api,
+                               '_quota_usage_update_if_unchanged',
+                               side_effect=update):
+            with mock.patch.object(
+                    sqlalchemy_api, '_get_project_user_quota_usages',
+                    wraps=sqlalchemy_api._get_project_user_quota_usages
+            ) as mock_get:
+                self._quota_reserve_optimistic(2)
+        # The row read again was refreshed already
+        self.assertEqual(2, mock_get.call_count)
+        self.assertEqual(1, len(calls))
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'instances',
+                                   'user1')
+        self.assertEqual(1, usage.reserved)
+
+    @mock.patch('time.sleep')
+    @mock.patch.object(sqlalchemy_api, '_is_quota_refresh_needed',
+                       return_value=True)
+    @mock.patch.object(sqlalchemy_api, '_quota_usage_update_if_unchanged',
+                       return_value=False)
+    def test_quota_reserve_optimistic_refresh_retries_bounded(self,
+                                                              mock_update,
+                                                              mock_refresh,
+                                                              mock_sleep):
+        self.assertRaises(exception.QuotaUsageConflict,
+                          self._quota_reserve_optimistic, 2)
+        self.assertEqual(sqlalchemy_api._MAX_CONCURRENT_UPDATE_RETRIES,
+                         mock_update.call_count)
+        self.assertEqual(0, sqlalchemy_api.model_query(
+            self.ctxt, models.Reservation, read_deleted="no").count())
+
+    @mock.patch('time.sleep')
+    def test_quota_reserve_optimistic_retries_duplicate_usage(self,
+                                                             mock_sleep):
+        orig_create = sqlalchemy_api._quota_usage_create
+        calls = []
+
+        def create(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                # Another request created the row meanwhile
+                raise db_exc.DBDuplicateEntry()
+            return orig_create(*args, **kwargs)
+
+        with mock.patch.object(sqlalchemy_api, '_quota_usage_create',
+                               side_effect=create):
+            self.assertEqual(1, len(self._quota_reserve_optimistic(2)))
+        # The usage is read again, and created once more as it is missing
+        # from the mocked out first attempt
+        self.assertEqual(calls[0], calls[1])
+
+    @mock.patch('time.sleep')
+    @mock.patch.object(sqlalchemy_api, '_quota_usage_create',
+                       side_effect=db_exc.DBDuplicateEntry())
+    def test_quota_reserve_retries_duplicate_usage_bounded(self, mock_create,
+                                                           mock_sleep):
+        self.assertRaises(exception.QuotaUsageConflict, _quota_reserve,
+                          self.ctxt, 'project1', 'user1')
+        self.assertEqual(sqlalchemy_api._MAX_CONCURRENT_UPDATE_RETRIES,
+                         mock_create.call_count)
+
+    def test_reservation_commit_optimistic_twice(self):
+        reservations = self._quota_reserve_optimistic(2)
+        db.reservation_commit_optimistic(self.ctxt, reservations,
+                                         'project1', 'user1')
+        db.reservation_commit_optimistic(self.ctxt, reservations,
+                                         'project1', 'user1')
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'instances',
+                                   'user1')
+        self.assertEqual(0, usage.reserved)
+        self.assertEqual(1, usage.in_use)
+
+    def test_quota_usage_unique(self):
+        sqlalchemy_api._quota_usage_create('project1', 'user1', 'instances',
+                                           0, 0, None)
+        self.assertRaises(db_exc.DBDuplicateEntry,
+                          sqlalchemy_api._quota_usage_create, 'project1',
+                          'user1', 'instances', 0, 0, None)
+
     def test_quota_destroy_all_by_project(self):
         reservations = _quota_reserve(self.ctxt, 'project1', 'user1')
         db.quota_destroy_all_by_project(self.ctxt, 'project1')
@@ -6349,6 +6936,28 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         new_stats = jsonutils.loads(node['stats'])
         self.assertEqual(self.stats, new_stats)
 
+    def test_compute_node_get_all_changed_since(self):
+        changes_since = timeutils.utcnow() + datetime.timedelta(seconds=1)
+        self.assertEqual(
+            [], db.compute_node_get_all_changed_since(self.ctxt,
+                                                      changes_since))
+
+        with mock.patch.object(timeutils, 'utcnow',
+                               return_value=changes_since):
+            db.compute_node_update(self.ctxt, self.item['id'],
+                                   {'vcpus_used': 1})
+        nodes = db.compute_node_get_all_changed_since(self.ctxt,
+                                                      changes_since)
+        self.assertEqual([self.item['id']], [node['id'] for node in nodes])
+
+    def test_compute_node_get_all_changed_since_deleted(self):
+        changes_since = timeutils.utcnow()
+        db.compute_node_delete(self.ctxt, self.item['id'])
+        nodes = db.compute_node_get_all_changed_since(self.ctxt,
+                                                      changes_since)
+        self.assertEqual(1, len(nodes))
+        self.assertTrue(nodes[0]['deleted'])
+
     def test_compute_node_get_all_deleted_compute_node(self):
         # Create a service and compute node and ensure we can find its stats;
         # delete the service and compute node when done and loop again
@@ -7692,6 +8301,82 @@ class ArchiveTestCase(test.TestCase):
         si_rows = self.conn.execute(qsi).fetchall()
         self.assertEqual(len(siim_rows) + len(si_rows), 8)
 
+    def test_archive_deleted_rows_instance_with_children(self):
+        inst = db.instance_create(self.context, {'metadata': {'foo': 'bar'}})
+        alive = db.instance_create(self.context,
+                                   {'metadata': {'foo': 'bar'}})
+        db.instance_destroy(self.context, inst['uuid'])
+
+        rows_archived = db.archive_deleted_rows(self.context, max_rows=10)
+
+        self.assertEqual({'instances': 1, 'instance_metadata': 1,
+                          'instance_extra': 1, 'instance_info_caches': 1},
+                         rows_archived)
+        shadow_meta = sqlalchemyutils.get_table(self.engine,
+                                                'shadow_instance_metadata')
+        rows = self.conn.execute(sql.select(
+            [shadow_meta.c.instance_uuid])).fetchall()
+        self.assertEqual([(inst['uuid'],)], rows)
+        self.assertEqual(alive['uuid'],
+                         db.instance_get_by_uuid(self.context,
+                                                 alive['uuid'])['uuid'])
+        self.assertEqual({}, db.archive_deleted_rows(self.context,
+                                                     max_rows=10))
+
+    def test_archive_deleted_rows_instance_children_count(self):
+        inst = db.instance_create(self.context, {'metadata': {'foo': 'bar'}})
+        db.instance_destroy(self.context, inst['uuid'])
+
+        # The instance does not fit with its 3 deleted children, which are
+        # archived table by table instead.
+        rows_archived = db.archive_deleted_rows(self.context, max_rows=3)
+
+        self.assertNotIn('instances', rows_archived)
+        self.assertEqual(3, sum(rows_archived.values()))
+        self.assertEqual({'instances': 1},
+                         db.archive_deleted_rows(self.context, max_rows=3))
+
+    def test_archive_deleted_rows_instances_in_chunks(self):
+        uuids = []
+        for i in range(3):
+            inst = db.instance_create(self.context, {})
+            db.instance_destroy(self.context, inst['uuid'])
+            uuids.append(inst['uuid'])
+
+        orig_archive_rows = sqlalchemy_api._archive_rows
+        instances_archived = []
+
+        def archive_rows(conn, table, *args, **kwargs):
+            rows = orig_archive_rows(conn, table, *args, **kwargs)
+            if table.name == 'instances':
+                instances_archived.append(rows)
+            return rows
+
+        with mock.patch.object(sqlalchemy_api, '_ARCHIVE_INSTANCES_CHUNK',
+                               2):
+            with mock.patch.object(sqlalchemy_api, '_archive_rows',
+                                   side_effect=archive_rows):
+                rows_archived = db.archive_deleted_rows(self.context)
+
+        self.assertEqual(3, rows_archived['instances'])
+        # Two chunks of instances, then nothing left for the instances table
+        self.assertEqual([2, 1, 0], instances_archived)
+        shadow_uuids = [row[0] for row in self.conn.execute(sql.select(
+            [self.shadow_instances.c.uuid]))]
+        self.assertEqual(sorted(uuids), sorted(shadow_uuids))
+
+    def test_archive_deleted_rows_keeps_live_rows(self):
+        inst = db.instance_create(self.context, {})
+        self.assertEqual({}, db.archive_deleted_rows(self.context,
+                                                     max_rows=10))
+        db.instance_get_by_uuid(self.context, inst['uuid'])
+
+    def test_archive_deleted_rows_reflects_tables_once(self):
+        self.mox.StubOutWithMock(sqlalchemy_api, 'Table')
+        db.archive_deleted_rows_for_table(self.context, 'instances', 1)
+        self.mox.ReplayAll()
+        db.archive_deleted_rows_for_table(self.context, 'instances', 1)
+
 
 class InstanceGroupDBApiTestCase(test.TestCase, ModelsObjectComparatorMixin):
     def setUp(self):
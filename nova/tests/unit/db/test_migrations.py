@@ -804,6 +804,98 @@ class NovaMigrationsCheckers(test_migrations.ModelsMigrationsSync,
         self.assertColumnNotExists(engine, 'shadow_instance_extra',
                                    'vcpu_model')
 
+    def _check_277(self, engine, data):
+        self.assertIndexMembers(engine, 'instances',
+                                'instances_deleted_created_at_idx',
+                                ['deleted', 'created_at', 'id'])
+        self.assertIndexMembers(engine, 'instances',
+                                'instances_project_id_deleted_created_at_idx',
+                                ['project_id', 'deleted', 'created_at', 'id'])
+        self.assertIndexNotExists(engine, 'instances',
+                                  'instances_project_id_deleted_idx')
+
+    def _post_downgrade_277(self, engine):
+        self.assertIndexMembers(engine, 'instances',
+                                'instances_project_id_deleted_idx',
+                                ['project_id', 'deleted'])
+        self.assertIndexNotExists(engine, 'instances',
+                                  'instances_deleted_created_at_idx')
+        self.assertIndexNotExists(
+            engine, 'instances',
+            'instances_project_id_deleted_created_at_idx')
+
+    def _check_278(self, engine, data):
+        self.assertColumnExists(engine, 'instance_extra', 'system_metadata')
+        self.assertColumnExists(engine, 'shadow_instance_extra',
+                                'system_metadata')
+
+    def _post_downgrade_278(self, engine):
+        self.assertColumnNotExists(engine, 'instance_extra',
+                                   'system_metadata')
+        self.assertColumnNotExists(engine, 'shadow_instance_extra',
+                                   'system_metadata')
+
+    def _pre_upgrade_279(self, engine):
+        # Two usage records of the same resource, each with a reservation
+        quota_usages = oslodbutils.get_table(engine, 'quota_usages')
+        reservations = oslodbutils.get_table(engine, 'reservations')
+        for usage_id, in_use, reserved in [(1, 2, 1), (2, 3, 2)]:
+            quota_usages.insert().execute({'id': usage_id,
+                                           'project_id': 'dup-project',
+                                           'user_id': 'dup-user',
+                                           'resource': 'instances',
+                                           'in_use': in_use,
+                                           'reserved': reserved,
+                                           'deleted': 0})
+            reservations.insert().execute({'uuid': 'dup-%d' % usage_id,
+                                           'usage_id': usage_id,
+                                           'project_id': 'dup-project',
+                                           'user_id': 'dup-user',
+                                           'resource': 'instances',
+                                           'delta': reserved,
+                                           'deleted': 0})
+
+    def _check_279(self, engine, data):
+        self.assertColumnExists(engine, 'quota_usages', 'generation')
+        self.assertColumnExists(engine, 'shadow_quota_usages', 'generation')
+
+        # The duplicates were merged into the oldest record
+        quota_usages = oslodbutils.get_table(engine, 'quota_usages')
+        usages = quota_usages.select().where(
+            quota_usages.c.project_id == 'dup-project').order_by(
+                quota_usages.c.id).execute().fetchall()
+        self.assertEqual([(1, 5, 3, 1, 0), (2, 3, 2, None, 2)],
+                         [(usage.id, usage.in_use, usage.reserved,
+                           usage.until_refresh, usage.deleted)
+                          for usage in usages])
+        reservations = oslodbutils.get_table(engine, 'reservations')
+        usage_ids = [reservation.usage_id for reservation in
+                     reservations.select().where(
+                         reservations.c.project_id == 'dup-project').
+                     execute().fetchall()]
+        self.assertEqual([1, 1], usage_ids)
+
+        quota_usages = oslodbutils.get_table(engine, 'quota_usages')
+        quota_usages.insert().execute({'project_id': 'fake-project',
+                                       'user_id': 'fake-user',
+                                       'resource': 'instances',
+                                       'in_use': 0, 'reserved': 0,
+                                       'deleted': 0})
+        usage = quota_usages.select().where(
+            quota_usages.c.project_id == 'fake-project').execute().first()
+        self.assertEqual(0, usage.generation)
+
+        inspector = reflection.Inspector.from_engine(engine)
+        constraints = inspector.get_unique_constraints('quota_usages')
+        constraint_names = [constraint['name'] for constraint in constraints]
+        self.assertIn('uniq_quota_usages0project_id0user_id0resource0deleted',
+                      constraint_names)
+
+    def _post_downgrade_279(self, engine):
+        self.assertColumnNotExists(engine, 'quota_usages', 'generation')
+        self.assertColumnNotExists(engine, 'shadow_quota_usages',
+                                   'generation')
+
 
 class TestNovaMigrationsSQLite(NovaMigrationsCheckers,
                                test.TestCase,
@@ -512,6 +512,75 @@ class TestDownloadNoDirectUri(test.NoDBTestCase):
         )
         self.assertFalse(data.close.called)
 
+    @staticmethod
+    def _interrupted_chunks(*chunks):
+        for chunk in chunks:
+            yield chunk
+        raise IOError('Corrupt image download')
+
+    @mock.patch('__builtin__.open')
+    @mock.patch('nova.image.glance.GlanceImageService.show')
+    def test_download_dest_path_interrupted_retries(self, show_mock,
+                                                     open_mock):
+        self.flags(num_retries=1, group='glance')
+        client = mock.MagicMock()
+        client.call.side_effect = [self._interrupted_chunks(1), [1, 2, 3]]
+        ctx = mock.sentinel.ctx
+        writer = mock.MagicMock()
+        open_mock.return_value = writer
+        service = glance.GlanceImageService(client)
+        res = service.download(ctx, mock.sentinel.image_id,
+                               dst_path=mock.sentinel.dst_path)
+
+        self.assertIsNone(res)
+        self.assertEqual(2, client.call.call_count)
+        open_mock.assert_called_once_with(mock.sentinel.dst_path, 'wb')
+        self.assertEqual([mock.call(0), mock.call(0)],
+                         writer.seek.call_args_list)
+        self.assertEqual(2, writer.truncate.call_count)
+        self.assertEqual([mock.call(1), mock.call(1), mock.call(2),
+                          mock.call(3)],
+                         writer.write.call_args_list)
+        writer.close.assert_called_once_with()
+
+    @mock.patch('__builtin__.open')
+    @mock.patch('nova.image.glance.GlanceImageService.show')
+    def test_download_dest_path_interrupted_no_retries(self, show_mock,
+                                                        open_mock):
+        client = mock.MagicMock()
+        client.call.return_value = self._interrupted_chunks(1)
+        ctx = mock.sentinel.ctx
+        writer = mock.MagicMock()
+        open_mock.return_value = writer
+        service = glance.GlanceImageService(client)
+        self.assertRaises(exception.GlanceConnectionFailed,
+                          service.download, ctx, mock.sentinel.image_id,
+                          dst_path=mock.sentinel.dst_path)
+
+        client.call.assert_called_once_with(ctx, 1, 'data',
+                                            mock.sentinel.image_id)
+        writer.close.assert_called_once_with()
+
+    @mock.patch('__builtin__.open')
+    @mock.patch('nova.image.glance.GlanceImageService.show')
+    def test_download_dest_path_write_error_not_retried(self, show_mock,
+                                                         open_mock):
+        self.flags(num_retries=1, group='glance')
+        client = mock.MagicMock()
+        client.call.return_value = [1, 2, 3]
+        ctx = mock.sentinel.ctx
+        writer = mock.MagicMock()
+        writer.write.side_effect = IOError('No space left on device')
+        open_mock.return_value = writer
+        service = glance.GlanceImageService(client)
+        self.assertRaises(IOError, service.download, ctx,
+                          mock.sentinel.image_id,
+                          dst_path=mock.sentinel.dst_path)
+
+        client.call.assert_called_once_with(ctx, 1, 'data',
+                                            mock.sentinel.image_id)
+        writer.close.assert_called_once_with()
+
     @mock.patch('nova.image.glance.GlanceImageService._get_transfer_module')
     @mock.patch('nova.image.glance.GlanceImageService.show')
     def test_download_direct_file_uri(self, show_mock, get_tran_mock):
@@ -644,6 +713,45 @@ class TestDownloadNoDirectUri(test.NoDBTestCase):
         )
         writer.close.assert_called_once_with()
 
+    @mock.patch('__builtin__.open')
+    @mock.patch('nova.image.glance.GlanceImageService._get_transfer_module')
+    @mock.patch('nova.image.glance.GlanceImageService.show')
+    def test_download_direct_peer_after_locations(self, show_mock,
+                                                  get_tran_mock, open_mock):
+        self.flags(allowed_direct_url_schemes=['file', 'peer'],
+                   group='glance')
+        show_mock.return_value = {
+            'checksum': mock.sentinel.checksum,
+            'size': mock.sentinel.size,
+            'locations': [
+                {
+                    'url': 'file:///files/image',
+                    'metadata': mock.sentinel.loc_meta
+                }
+            ]
+        }
+        file_mod = mock.MagicMock()
+        file_mod.download.side_effect = Exception
+        peer_mod = mock.MagicMock()
+        get_tran_mock.side_effect = lambda scheme: {'file': file_mod,
+                                                    'peer': peer_mod}[scheme]
+        client = mock.MagicMock()
+        ctx = mock.sentinel.ctx
+        service = glance.GlanceImageService(client)
+        res = service.download(ctx, 'fake_image',
+                               dst_path=mock.sentinel.dst_path)
+
+        self.assertIsNone(res)
+        self.assertFalse(client.call.called)
+        self.assertEqual([mock.call('file'), mock.call('peer')],
+                         get_tran_mock.call_args_list)
+        peer_mod.download.assert_called_once_with(
+            ctx, mock.ANY, mock.sentinel.dst_path,
+            {'checksum': mock.sentinel.checksum,
+             'size': mock.sentinel.size})
+        self.assertEqual('/fake_image',
+                         peer_mod.download.call_args[0][1].path)
+
 
 class TestIsImageAvailable(test.NoDBTestCase):
     """Tests the internal _is_image_available function."""
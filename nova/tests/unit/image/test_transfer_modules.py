@@ -12,12 +12,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
+import os
 import urlparse
 
+import fixtures
 import mock
+import requests
 
 from nova import exception
 from nova.image.download import file as tm_file
+from nova.image.download import peer as tm_peer
 from nova import test
 
 
@@ -99,3 +104,127 @@ class TestFileTransferModule(test.NoDBTestCase):
                           tm.download, mock.sentinel.ctx, url_parts,
                           dst_file, loc_meta)
         self.assertFalse(copy_mock.called)
+
+
+class FakePeers(object):
+    """Stand-in for compute hosts serving their image cache over HTTP."""
+
+    def __init__(self):
+        self.files = {}
+        self.down = set()
+        self.requests = []
+
+    def add(self, peer, image_id, data):
+        fname = hashlib.sha1(image_id).hexdigest()
+        self.files['http://%s/%s' % (peer, fname)] = data
+
+    def _check(self, url):
+        if url.split('/')[2] in self.down:
+            raise requests.ConnectionError(url)
+
+    def head(self, url, timeout=None):
+        self._check(url)
+        resp = mock.Mock(headers={})
+        resp.status_code = 200 if url in self.files else 404
+        if url in self.files:
+            resp.headers['content-length'] = str(len(self.files[url]))
+        return resp
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        self.requests.append((url, headers['Range']))
+        self._check(url)
+        start, end = headers['Range'][len('bytes='):].split('-')
+        data = self.files[url][int(start):int(end) + 1]
+        resp = mock.Mock(status_code=206)
+        resp.iter_content.return_value = [data[:3], data[3:]]
+        return resp
+
+
+class TestPeerTransferModule(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestPeerTransferModule, self).setUp()
+        self.peers = FakePeers()
+        self.stubs.Set(tm_peer.requests, 'head', self.peers.head)
+        self.stubs.Set(tm_peer.requests, 'get', self.peers.get)
+        self.flags(group='image_peer_url', peers=['peer1', 'peer2'],
+                   chunk_size=4)
+        self.dst_file = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                     'image')
+        self.data = 'imagedata!'
+        self.url_parts = urlparse.urlparse('peer:///fake_image')
+        self.loc_meta = {'checksum': hashlib.md5(self.data).hexdigest(),
+                         'size': len(self.data)}
+
+    def _read_dst_file(self):
+        with open(self.dst_file, 'rb') as f:
+            return f.read()
+
+    def test_download_spreads_ranges_over_peers(self):
+        self.peers.add('peer1', 'fake_image', self.data)
+        self.peers.add('peer2', 'fake_image', self.data)
+
+        tm_peer.PeerTransfer().download(mock.sentinel.ctx, self.url_parts,
+                                        self.dst_file, self.loc_meta)
+
+        self.assertEqual(self.data, self._read_dst_file())
+        self.assertEqual(
+            sorted([('peer1', 'bytes=0-3'), ('peer2', 'bytes=4-7'),
+                    ('peer1', 'bytes=8-9')]),
+            sorted((url.split('/')[2], rng)
+                   for url, rng in self.peers.requests))
+
+    def test_download_retries_range_on_other_peer(self):
+        self.peers.add('peer1', 'fake_image', self.data)
+        self.peers.add('peer2', 'fake_image', self.data)
+        real_head = self.peers.head
+
+        def head_then_fail(url, timeout=None):
+            # peer2 goes away once the tracker has found it.
+            resp = real_head(url, timeout)
+            if 'peer2' in url:
+                self.peers.down.add('peer2')
+            return resp
+        self.stubs.Set(tm_peer.requests, 'head', head_then_fail)
+
+        tm_peer.PeerTransfer().download(mock.sentinel.ctx, self.url_parts,
+                                        self.dst_file, self.loc_meta)
+
+        self.assertEqual(self.data, self._read_dst_file())
+        self.assertIn('bytes=4-7', [rng for url, rng in self.peers.requests
+                                    if 'peer2' in url])
+        self.assertEqual(['bytes=0-3', 'bytes=4-7', 'bytes=8-9'],
+                         sorted(rng for url, rng in self.peers.requests
+                                if 'peer1' in url))
+
+    def test_download_skips_peers_without_image(self):
+        self.peers.add('peer1', 'fake_image', 'converted to raw')
+        self.peers.add('peer2', 'fake_image', self.data)
+
+        tm_peer.PeerTransfer().download(mock.sentinel.ctx, self.url_parts,
+                                        self.dst_file, self.loc_meta)
+
+        self.assertEqual(self.data, self._read_dst_file())
+        self.assertEqual(set(['peer2']),
+                         set(url.split('/')[2]
+                             for url, rng in self.peers.requests))
+
+    def test_download_no_peers(self):
+        self.peers.down.add('peer2')
+        self.assertRaises(exception.ImageDownloadModuleError,
+                          tm_peer.PeerTransfer().download, mock.sentinel.ctx,
+                          self.url_parts, self.dst_file, self.loc_meta)
+        self.assertEqual([], self.peers.requests)
+
+    def test_download_checksum_mismatch(self):
+        self.peers.add('peer1', 'fake_image', 'corruptdata')
+        self.loc_meta['size'] = len('corruptdata')
+
+        self.assertRaises(exception.ImageDownloadModuleError,
+                          tm_peer.PeerTransfer().download, mock.sentinel.ctx,
+                          self.url_parts, self.dst_file, self.loc_meta)
+
+    def test_download_requires_checksum(self):
+        self.assertRaises(exception.ImageDownloadModuleMetaDataError,
+                          tm_peer.PeerTransfer().download, mock.sentinel.ctx,
+                          self.url_parts, self.dst_file, {'size': 10})
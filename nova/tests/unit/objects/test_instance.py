@@ -76,7 +76,7 @@ class _TestInstanceObject(object):
         primitive = inst.obj_to_primitive()
         expected = {'nova_object.name': 'Instance',
                     'nova_object.namespace': 'nova',
-                    'nova_object.version': '1.19',
+                    'nova_object.version': '1.20',
                     'nova_object.data':
                         {'uuid': 'fake-uuid',
                          'launched_at': '1955-11-05T00:00:00Z'},
@@ -92,7 +92,7 @@ class _TestInstanceObject(object):
         primitive = inst.obj_to_primitive()
         expected = {'nova_object.name': 'Instance',
                     'nova_object.namespace': 'nova',
-                    'nova_object.version': '1.19',
+                    'nova_object.version': '1.20',
                     'nova_object.data':
                         {'uuid': 'fake-uuid',
                          'access_ip_v4': '1.2.3.4',
@@ -209,6 +209,46 @@ class _TestInstanceObject(object):
         self.assertEqual(meta2, {'foo': 'bar'})
         self.assertRemotes()
 
+    @mock.patch.object(db, 'instance_get_by_uuid')
+    def test_load_unloaded_fields(self, mock_get):
+        fake_inst = dict(self.fake_instance, vm_state='active',
+                         display_name='foo')
+        mock_get.return_value = fake_inst
+        db_inst = {'id': fake_inst['id'], 'uuid': fake_inst['uuid'],
+                   'deleted': 0, 'host': 'host1'}
+        inst = instance.Instance._from_db_object(
+            self.context, instance.Instance(), db_inst, expected_attrs=[],
+            projected=True)
+
+        self.assertEqual('host1', inst.host)
+        self.assertFalse(mock_get.called)
+        self.assertEqual('active', inst.vm_state)
+        self.assertEqual('foo', inst.display_name)
+        self.assertEqual(1, mock_get.call_count)
+        self.assertEqual(set(), inst.obj_what_changed())
+
+    @mock.patch.object(db, 'instance_get_by_uuid')
+    def test_obj_make_compatible_unloaded_fields(self, mock_get):
+        fake_inst = dict(self.fake_instance, display_name='foo')
+        mock_get.return_value = fake_inst
+        db_inst = {'id': fake_inst['id'], 'uuid': fake_inst['uuid'],
+                   'deleted': 0, 'host': 'host1'}
+        inst = instance.Instance._from_db_object(
+            self.context, instance.Instance(), db_inst, expected_attrs=[],
+            projected=True)
+
+        primitive = inst.obj_to_primitive()['nova_object.data']
+        self.assertIn('display_name', primitive['unloaded_fields'])
+        self.assertNotIn('display_name', primitive)
+        self.assertFalse(mock_get.called)
+
+        primitive = inst.obj_to_primitive(
+            target_version='1.19')['nova_object.data']
+        self.assertNotIn('unloaded_fields', primitive)
+        self.assertEqual('foo', primitive['display_name'])
+        self.assertEqual('host1', primitive['host'])
+        self.assertEqual(1, mock_get.call_count)
+
     def test_load_invalid(self):
         inst = instance.Instance(context=self.context, uuid='fake-uuid')
         self.assertRaises(exception.ObjectActionError,
@@ -471,6 +511,29 @@ class _TestInstanceObject(object):
         mock_extra_update.assert_called_once_with(
                 self.context, inst.uuid, {'numa_topology': None})
 
+    @mock.patch('nova.db.instance_extra_update_by_uuid')
+    @mock.patch('nova.db.instance_update_and_get_original')
+    @mock.patch.object(objects.Instance, '_from_db_object')
+    def test_save_skips_unchanged_extra(self, mock_fdo, mock_update,
+                                        mock_extra_update):
+        mock_update.return_value = None, None
+        inst = instance.Instance(
+            context=self.context, id=123, uuid='fake-uuid',
+            flavor=objects.Flavor(name='m1.small'), old_flavor=None,
+            new_flavor=None, numa_topology=None)
+        inst.flavor.obj_reset_changes()
+        inst.obj_reset_changes()
+        inst.host = 'newhost'
+        inst.save()
+        self.assertTrue(mock_update.called)
+        self.assertFalse(mock_extra_update.called)
+
+        inst.flavor.name = 'm1.large'
+        inst.save()
+        self.assertEqual(1, mock_extra_update.call_count)
+        self.assertEqual(['flavor'],
+                         mock_extra_update.call_args[0][2].keys())
+
     @mock.patch('nova.db.instance_extra_update_by_uuid')
     def test_save_vcpu_model(self, mock_update):
         inst = fake_instance.fake_instance_obj(self.context)
@@ -1189,6 +1252,20 @@ class TestRemoteInstanceObject(test_objects._RemoteTest,
         self.assertEqual('bar', inst.system_metadata['foo'])
         self.assertIn('instance_type_id', inst.system_metadata)
 
+    def test_load_unloaded_fields_after_remote_list(self):
+        inst = objects.Instance(context=self.context,
+                                host='host1', display_name='foo',
+                                user_id=self.context.user_id,
+                                project_id=self.context.project_id)
+        inst.create()
+
+        insts = objects.InstanceList.get_by_filters(
+            self.context, {'uuid': inst.uuid}, fields=['host'])
+        self.assertEqual(1, len(insts))
+        self.assertEqual('host1', insts[0].host)
+        self.assertFalse(insts[0].obj_attr_is_set('display_name'))
+        self.assertEqual('foo', insts[0].display_name)
+
 
 class _TestInstanceListObject(object):
     def fake_instance(self, id, updates=None):
@@ -1247,6 +1324,26 @@ class _TestInstanceListObject(object):
             self.assertEqual(inst_list.objects[i].uuid, fakes[i]['uuid'])
         self.assertRemotes()
 
+    @mock.patch.object(db, 'instance_get_all_by_filters')
+    def test_get_all_by_filters_fields(self, mock_get_by_filters):
+        fake_inst = self.fake_instance(1)
+        mock_get_by_filters.return_value = [
+            {'id': fake_inst['id'], 'uuid': fake_inst['uuid'],
+             'deleted': 0, 'host': 'host1', 'metadata': [],
+             'system_metadata': []}]
+
+        inst_list = instance.InstanceList.get_by_filters(
+            self.context, {'foo': 'bar'}, 'uuid', 'asc', expected_attrs=[],
+            fields=['host'])
+
+        mock_get_by_filters.assert_called_once_with(
+            self.context, {'foo': 'bar'}, 'uuid', 'asc', limit=None,
+            marker=None, columns_to_join=[], use_slave=False,
+            columns=['host'])
+        self.assertEqual(fake_inst['uuid'], inst_list[0].uuid)
+        self.assertEqual('host1', inst_list[0].host)
+        self.assertFalse(inst_list[0].obj_attr_is_set('vm_state'))
+
     @mock.patch.object(db, 'instance_get_all_by_filters_sort')
     @mock.patch.object(db, 'instance_get_all_by_filters')
     def test_get_all_by_filters_calls_non_sort(self,
@@ -1317,6 +1414,24 @@ class _TestInstanceListObject(object):
         self.assertEqual(inst_list.obj_what_changed(), set())
         self.assertRemotes()
 
+    @mock.patch.object(db, 'instance_get_all_by_host')
+    def test_get_by_host_fields(self, mock_get_by_host):
+        fake_inst = self.fake_instance(1)
+        mock_get_by_host.return_value = [
+            {'id': fake_inst['id'], 'uuid': fake_inst['uuid'],
+             'deleted': 0, 'vm_state': 'active'}]
+
+        inst_list = instance.InstanceList.get_by_host(
+            self.context, 'foo', expected_attrs=[], fields=['vm_state'])
+
+        mock_get_by_host.assert_called_once_with(
+            self.context, 'foo', columns_to_join=[], use_slave=False,
+            columns=['vm_state'])
+        self.assertEqual(fake_inst['uuid'], inst_list[0].uuid)
+        self.assertEqual('active', inst_list[0].vm_state)
+        self.assertFalse(inst_list[0].obj_attr_is_set('host'))
+        self.assertEqual(inst_list.obj_what_changed(), set())
+
     def test_get_by_host_and_node(self):
         fakes = [self.fake_instance(1),
                  self.fake_instance(2)]
@@ -1388,6 +1503,72 @@ class _TestInstanceListObject(object):
             self.assertEqual(obj.uuid, fake['uuid'])
         self.assertRemotes()
 
+    def test_iter_active_by_window_joined(self):
+        fakes = [self.fake_instance(1), self.fake_instance(2),
+                 self.fake_instance(3)]
+        dt = timeutils.utcnow()
+
+        with mock.patch.object(db, 'instance_get_active_by_window_joined',
+                               side_effect=[fakes[:2], fakes[2:]]) as get:
+            inst_list = list(
+                instance.InstanceList.iter_active_by_window_joined(
+                    self.context, dt, host='host', batch_size=2))
+
+        self.assertEqual([fake['uuid'] for fake in fakes],
+                         [inst.uuid for inst in inst_list])
+        self.assertEqual(2, get.call_count)
+        self.assertEqual({'limit': 2, 'marker': fakes[1]['uuid'],
+                          'columns_to_join': None},
+                         get.call_args[1])
+        self.assertIsNone(get.call_args_list[0][1]['marker'])
+
+    def test_get_count_active_by_window(self):
+        dt = timeutils.utcnow().replace(microsecond=0)
+        dt_tz = dt.replace(tzinfo=iso8601.iso8601.Utc())
+
+        with mock.patch.object(db, 'instance_count_active_by_window',
+                               return_value=3) as count:
+            result = instance.InstanceList.get_count_active_by_window(
+                self.context, dt, host='host')
+
+        self.assertEqual(3, result)
+        count.assert_called_once_with(self.context, dt_tz, None, None,
+                                      'host', use_slave=False)
+
+    def test_get_usage_by_window(self):
+        usages = [{'project_id': 'fake', 'hours': 1.5, 'vcpus_hours': 3.0,
+                   'memory_mb_hours': 768.0, 'local_gb_hours': 15.0}]
+        dt = timeutils.utcnow().replace(microsecond=0)
+        dt_tz = dt.replace(tzinfo=iso8601.iso8601.Utc())
+
+        with mock.patch.object(db, 'instance_usage_get_by_window',
+                               return_value=usages) as get:
+            result = instance.InstanceList.get_usage_by_window(
+                self.context, dt, dt, project_id='fake')
+
+        self.assertEqual(usages, result)
+        get.assert_called_once_with(self.context, dt_tz, dt_tz,
+                                    project_id='fake')
+
+    def test_iter_by_filters(self):
+        fakes = [self.fake_instance(1), self.fake_instance(2)]
+        self.mox.StubOutWithMock(db, 'instance_get_all_by_filters')
+        db.instance_get_all_by_filters(self.context, {'foo': 'bar'},
+                                       'created_at', 'desc', limit=2,
+                                       marker=None, columns_to_join=[],
+                                       use_slave=False).AndReturn(fakes)
+        db.instance_get_all_by_filters(self.context, {'foo': 'bar'},
+                                       'created_at', 'desc', limit=2,
+                                       marker=fakes[1]['uuid'],
+                                       columns_to_join=[],
+                                       use_slave=False).AndReturn([])
+        self.mox.ReplayAll()
+        inst_list = list(instance.InstanceList.iter_by_filters(
+            self.context, {'foo': 'bar'}, expected_attrs=[], batch_size=2))
+
+        self.assertEqual([fake['uuid'] for fake in fakes],
+                         [inst.uuid for inst in inst_list])
+
     def test_with_fault(self):
         fake_insts = [
             fake_instance.fake_db_instance(uuid='fake-uuid', host='host'),
@@ -920,6 +920,12 @@ class TestRemoteObject(_RemoteTest, _TestObject):
         obj = MyObj2.query(self.context)
         self.assertEqual('bar', obj.bar)
 
+    def test_remote_action_pins_context(self):
+        obj = MyObj.query(self.context)
+        self.assertFalse(self.context.db_written)
+        obj.save()
+        self.assertTrue(self.context.db_written)
+
 
 class TestObjectListBase(test.TestCase):
     def test_list_like_operations(self):
@@ -1144,23 +1150,23 @@ object_data = {
     'AggregateList': '1.2-4b02a285b8612bfb86a96ff80052fb0a',
     'BandwidthUsage': '1.2-a9d7c2ba54995e48ce38688c51c9416d',
     'BandwidthUsageList': '1.2-5b564cbfd5ae6e106443c086938e7602',
-    'BlockDeviceMapping': '1.8-c53f09c7f969e0222d9f6d67a950a08e',
-    'BlockDeviceMappingList': '1.9-0faaeebdca213010c791bc37a22546e3',
+    'BlockDeviceMapping': '1.9-c53f09c7f969e0222d9f6d67a950a08e',
+    'BlockDeviceMappingList': '1.10-fb22f945b9f304b8c9fb0c1b9571a52e',
     'ComputeNode': '1.10-70202a38b858977837b313d94475a26b',
-    'ComputeNodeList': '1.10-4ae1f844c247029fbcdb5fdccbe9e619',
+    'ComputeNodeList': '1.11-a9cfa25e4e6db8a29e04775eda5606ab',
     'DNSDomain': '1.0-5bdc288d7c3b723ce86ede998fd5c9ba',
     'DNSDomainList': '1.0-cfb3e7e82be661501c31099523154db4',
     'EC2InstanceMapping': '1.0-627baaf4b12c9067200979bdc4558a99',
     'EC2SnapshotMapping': '1.0-26cf315be1f8abab4289d4147671c836',
     'EC2VolumeMapping': '1.0-2f8c3bf077c65a425294ec2b361c9143',
-    'FixedIP': '1.9-2472964d39e50da67202109eb85cd173',
-    'FixedIPList': '1.9-68ade91cf8d97053c1ef401d87eb6ecd',
+    'FixedIP': '1.10-2472964d39e50da67202109eb85cd173',
+    'FixedIPList': '1.10-114ea67ff69b82d4c07e668b94786f23',
     'Flavor': '1.1-096cfd023c35d07542cf732fb29b45e4',
     'FlavorList': '1.1-a3d5551267cb8f62ff38ded125900721',
     'FloatingIP': '1.6-27eb68b7c9c620dd5f0561b5a3be0e82',
     'FloatingIPList': '1.7-f376f63ed99243f9d90841b7f6732bbf',
     'HVSpec': '1.0-c4d8377cc4fe519930e60c1d8265a142',
-    'Instance': '1.19-e5b80cc3b734b418d5c4b9140a4d2a25',
+    'Instance': '1.20-4b818b6694059bc2a87dd3edd4024f94',
     'InstanceAction': '1.1-6b1d0a6dbd522b5a83c20757ec659663',
     'InstanceActionEvent': '1.1-42dbdba74bd06e0619ca75cd3397cd1b',
     'InstanceActionEventList': '1.0-1d5cc958171d6ce07383c2ad6208318e',
@@ -1171,7 +1177,7 @@ object_data = {
     'InstanceGroup': '1.9-95ece99f092e8f4f88327cdbb44162c9',
     'InstanceGroupList': '1.6-c6b78f3c9d9080d33c08667e80589817',
     'InstanceInfoCache': '1.5-ef64b604498bfa505a8c93747a9d8b2f',
-    'InstanceList': '1.15-20d822b2abb0051d72f81ed686a79e5b',
+    'InstanceList': '1.21-6457a4d4fb530b69832bcba9d367d30b',
     'InstanceNUMACell': '1.2-5d2dfa36e9ecca9b63f24bf3bc958ea4',
     'InstanceNUMATopology': '1.1-86b95d263c4c68411d44c6741b8d2bb0',
     'InstancePCIRequest': '1.1-e082d174f4643e5756ba098c47c1510f',
@@ -1201,7 +1207,7 @@ object_data = {
     'SecurityGroupRule': '1.1-a9175baf7664439af1a16c2010b55576',
     'SecurityGroupRuleList': '1.1-667fca3a9928f23d2d10e61962c55f3c',
     'Service': '1.9-82bbfd46a744a9c89bc44b47a1b81683',
-    'ServiceList': '1.7-b856301eb7714839248e189bf4886168',
+    'ServiceList': '1.8-e9317ced658176e0596fdb2d84ddaa98',
     'Tag': '1.0-a11531f4e4e3166eef6243d6d58a18bd',
     'TagList': '1.0-e89bf8c8055f1f1d654fb44f0abf1f53',
     'TestSubclassedObject': '1.6-87177ccbefd7a740a9e261f958e15b00',
@@ -1214,12 +1220,12 @@ object_data = {
 
 
 object_relationships = {
-    'BlockDeviceMapping': {'Instance': '1.19'},
+    'BlockDeviceMapping': {'Instance': '1.20'},
     'ComputeNode': {'HVSpec': '1.0', 'PciDevicePoolList': '1.0'},
-    'FixedIP': {'Instance': '1.19', 'Network': '1.2',
+    'FixedIP': {'Instance': '1.20', 'Network': '1.2',
                 'VirtualInterface': '1.0',
                 'FloatingIPList': '1.7'},
-    'FloatingIP': {'FixedIP': '1.9'},
+    'FloatingIP': {'FixedIP': '1.10'},
     'Instance': {'InstanceFault': '1.2',
                  'InstanceInfoCache': '1.5',
                  'InstanceNUMATopology': '1.1',
@@ -155,6 +155,17 @@ class _TestServiceObject(object):
         self.assertEqual(1, len(services))
         self.compare_obj(services[0], fake_service, allow_missing=OPTIONAL)
 
+    @mock.patch.object(db, 'service_get_all_by_topic_changed_since')
+    def test_get_by_topic_changed_since(self, mock_get):
+        mock_get.return_value = [fake_service]
+        services = service.ServiceList.get_by_topic_changed_since(
+            self.context, 'fake-topic', NOW)
+        self.assertEqual(1, len(services))
+        self.compare_obj(services[0], fake_service, allow_missing=OPTIONAL)
+        self.assertEqual('fake-topic', mock_get.call_args[0][1])
+        self.assertEqual(timeutils.isotime(NOW),
+                         timeutils.isotime(mock_get.call_args[0][2]))
+
     def test_get_by_host(self):
         self.mox.StubOutWithMock(db, 'service_get_all_by_host')
         db.service_get_all_by_host(self.context, 'fake-host').AndReturn(
@@ -0,0 +1,335 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Synthetic clouds and request mixes to benchmark the schedulers.
+
+A SyntheticCloud creates the services, compute nodes and aggregates of a
+cloud in the database, with NUMA topologies and PCI device pools on some of
+the hosts. The compute nodes are based on the resources the fake virt driver
+reports. A RequestMix generates select_destinations() requests, some of them
+asking for NUMA cells, PCI devices, aggregate extra specs, an availability
+zone or a server group. run_benchmark() sends the requests to a scheduler
+driver in process and measures the latency, the decisions per second and the
+memory used.
+
+See test_benchmark.py to run it.
+"""
+
+import random
+import resource
+import time
+
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+
+from nova import db
+from nova import exception
+from nova import objects
+from nova.openstack.common import uuidutils
+from nova.virt import fake
+
+CONF = cfg.CONF
+
+BENCHMARK_FILTERS = ['RetryFilter', 'AvailabilityZoneFilter', 'RamFilter',
+                     'DiskFilter', 'CoreFilter', 'ComputeFilter',
+                     'AggregateInstanceExtraSpecsFilter',
+                     'NUMATopologyFilter', 'PciPassthroughFilter',
+                     'ServerGroupAntiAffinityFilter',
+                     'ServerGroupAffinityFilter']
+
+PCI_VENDOR_ID = '8086'
+PCI_PRODUCT_ID = '1520'
+
+# Flavors as (vcpus, memory_mb, root_gb)
+FLAVORS = {'small': (1, 2048, 20),
+           'medium': (2, 4096, 40),
+           'large': (8, 16384, 80)}
+
+DEFAULT_MIX = {'small': 40, 'large': 10, 'numa': 10, 'pci': 10, 'ssd': 10,
+               'az': 10, 'anti_affinity': 5, 'affinity': 5}
+
+
+def _numa_topology(num_cells, cpus_per_cell, memory_per_cell):
+    cells = []
+    for cell_id in xrange(num_cells):
+        cpuset = set(xrange(cell_id * cpus_per_cell,
+                            (cell_id + 1) * cpus_per_cell))
+        cells.append(objects.NUMACell(id=cell_id, cpuset=cpuset,
+                                      memory=memory_per_cell, cpu_usage=0,
+                                      memory_usage=0, mempages=[],
+                                      siblings=[], pinned_cpus=set([])))
+    return objects.NUMATopology(cells=cells)
+
+
+class SyntheticCloud(object):
+    """A cloud of fake compute hosts stored in the database.
+
+    :param num_hosts: number of compute hosts
+    :param numa_ratio: fraction of the hosts reporting a NUMA topology
+    :param pci_ratio: fraction of the hosts with PCI devices
+    :param num_aggregates: number of aggregates, each host is in one of them
+    :param num_zones: number of availability zones the aggregates are in
+    :param seed: seed of the random sizes of the hosts
+    """
+
+    def __init__(self, context, num_hosts, numa_ratio=0.25, pci_ratio=0.1,
+                 num_aggregates=10, num_zones=2, seed=None):
+        self.context = context
+        self.num_hosts = num_hosts
+        self.numa_ratio = numa_ratio
+        self.pci_ratio = pci_ratio
+        self.num_aggregates = max(num_aggregates, 1)
+        self.num_zones = max(num_zones, 1)
+        self.random = random.Random(seed)
+        self.compute_nodes = {}
+        self.zones = []
+
+    def _host_resources(self, host):
+        """Return the compute node values of a host.
+
+        They start from what the fake virt driver reports, with a random
+        size and, on some of the hosts, NUMA cells and PCI devices.
+        """
+        values = dict(fake.FakeDriver(None).host_status_base)
+        vcpus = self.random.choice((16, 32, 48))
+        memory_mb = vcpus * self.random.choice((2048, 4096))
+        local_gb = self.random.choice((500, 1000, 2000))
+        values.update(host=host, hypervisor_hostname=host,
+                      vcpus=vcpus, memory_mb=memory_mb, local_gb=local_gb,
+                      vcpus_used=0, memory_mb_used=0, local_gb_used=0,
+                      free_ram_mb=memory_mb, free_disk_gb=local_gb,
+                      disk_available_least=local_gb, running_vms=0,
+                      current_workload=0, host_ip='127.0.0.1',
+                      cpu_info='?', stats='{}')
+        if self.random.random() < self.numa_ratio:
+            values['numa_topology'] = _numa_topology(
+                2, vcpus // 2, memory_mb // 2)._to_json()
+        # Like the resource tracker, report an empty list of PCI device
+        # pools on the hosts without PCI devices.
+        pools = []
+        if self.random.random() < self.pci_ratio:
+            pools.append(objects.PciDevicePool(vendor_id=PCI_VENDOR_ID,
+                                               product_id=PCI_PRODUCT_ID,
+                                               count=8, tags={}))
+        values['pci_stats'] = jsonutils.dumps(
+            objects.PciDevicePoolList(objects=pools).obj_to_primitive())
+        return values
+
+    def build(self):
+        """Create the services, compute nodes and aggregates."""
+        aggregates = []
+        for i in xrange(self.num_aggregates):
+            zone = 'zone%d' % (i % self.num_zones)
+            metadata = {'availability_zone': zone,
+                        'ssd': 'true' if i % 2 else 'false'}
+            aggregates.append(db.aggregate_create(
+                self.context, {'name': 'aggregate%d' % i}, metadata=metadata))
+            if zone not in self.zones:
+                self.zones.append(zone)
+
+        for i in xrange(self.num_hosts):
+            host = 'host%d' % i
+            service = db.service_create(self.context,
+                                        {'host': host,
+                                         'binary': 'nova-compute',
+                                         'topic': CONF.compute_topic,
+                                         'report_count': 0})
+            values = self._host_resources(host)
+            values['service_id'] = service['id']
+            compute_node = db.compute_node_create(self.context, values)
+            self.compute_nodes[host] = compute_node
+            db.aggregate_host_add(self.context,
+                                  aggregates[i % len(aggregates)]['id'],
+                                  host)
+
+    def claim(self, host, instance_properties):
+        """Record the resources of an instance on a compute node.
+
+        This is what the resource tracker would report after the instance
+        is built, so that the next requests see the consumed resources.
+        """
+        compute_node = self.compute_nodes[host]
+        memory_mb = instance_properties['memory_mb']
+        disk_gb = (instance_properties['root_gb'] +
+                   instance_properties['ephemeral_gb'])
+        values = {
+            'vcpus_used': compute_node['vcpus_used'] +
+                          instance_properties['vcpus'],
+            'memory_mb_used': compute_node['memory_mb_used'] + memory_mb,
+            'free_ram_mb': compute_node['free_ram_mb'] - memory_mb,
+            'local_gb_used': compute_node['local_gb_used'] + disk_gb,
+            'free_disk_gb': compute_node['free_disk_gb'] - disk_gb,
+            'disk_available_least': (compute_node['disk_available_least'] -
+                                     disk_gb),
+            'running_vms': compute_node['running_vms'] + 1}
+        self.compute_nodes[host] = db.compute_node_update(
+            self.context, compute_node['id'], values)
+
+
+class RequestMix(object):
+    """Generates scheduling requests of several kinds.
+
+    :param weights: dict of request kinds to their relative frequency, the
+                    kinds being the FLAVORS names, 'numa', 'pci', 'ssd',
+                    'az', 'anti_affinity' and 'affinity'
+    :param zones: availability zones the 'az' requests can ask for
+    :param group_size: number of instances of the server group requests
+    """
+
+    def __init__(self, weights=None, zones=None, group_size=3, seed=None):
+        self.weights = sorted((weights or DEFAULT_MIX).items())
+        self.zones = zones or ['zone0']
+        self.group_size = group_size
+        self.random = random.Random(seed)
+
+    def _choose_kind(self):
+        total = sum(weight for kind, weight in self.weights)
+        value = self.random.uniform(0, total)
+        for kind, weight in self.weights:
+            value -= weight
+            if value <= 0:
+                return kind
+        return self.weights[-1][0]
+
+    def next_request(self):
+        """Return a kind, a request spec and filter properties."""
+        kind = self._choose_kind()
+        flavor_name = kind if kind in FLAVORS else 'medium'
+        vcpus, memory_mb, root_gb = FLAVORS[flavor_name]
+        instance_type = {'name': flavor_name, 'vcpus': vcpus,
+                         'memory_mb': memory_mb, 'root_gb': root_gb,
+                         'ephemeral_gb': 0, 'swap': 0, 'extra_specs': {}}
+        instance_uuid = uuidutils.generate_uuid()
+        instance_properties = {'uuid': instance_uuid,
+                               'project_id': 'benchmark',
+                               'os_type': 'linux',
+                               'vcpus': vcpus,
+                               'memory_mb': memory_mb,
+                               'root_gb': root_gb,
+                               'ephemeral_gb': 0,
+                               'numa_topology': None,
+                               'pci_requests': None}
+        filter_properties = {}
+        num_instances = 1
+
+        if kind == 'numa':
+            instance_properties['numa_topology'] = (
+                objects.InstanceNUMATopology(
+                    instance_uuid=instance_uuid,
+                    cells=[objects.InstanceNUMACell(
+                               id=cell_id, cpuset=set([cell_id]),
+                               memory=memory_mb // 2)
+                           for cell_id in xrange(2)]))
+        elif kind == 'pci':
+            pci_requests = objects.InstancePCIRequests(
+                instance_uuid=instance_uuid,
+                requests=[objects.InstancePCIRequest(
+                    count=1, spec=[{'vendor_id': PCI_VENDOR_ID,
+                                    'product_id': PCI_PRODUCT_ID}])])
+            instance_properties['pci_requests'] = pci_requests
+            filter_properties['pci_requests'] = pci_requests
+        elif kind == 'ssd':
+            instance_type['extra_specs'] = {'ssd': 'true'}
+        elif kind == 'az':
+            instance_properties['availability_zone'] = self.random.choice(
+                self.zones)
+        elif kind in ('anti_affinity', 'affinity'):
+            num_instances = self.group_size
+            policy = kind.replace('_', '-')
+            filter_properties.update(group_updated=True,
+                                     group_hosts=set(),
+                                     group_policies=[policy])
+
+        request_spec = {'instance_properties': instance_properties,
+                        'instance_type': instance_type,
+                        'image': {},
+                        'num_instances': num_instances}
+        return kind, request_spec, filter_properties
+
+
+def _max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _percentile_ms(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index] * 1000
+
+
+def run_benchmark(context, scheduler, cloud, request_mix, num_requests):
+    """Send requests to a scheduler driver and measure them.
+
+    Each placed instance is claimed on its compute node in the database
+    outside of the timed section, the way the compute would report it.
+
+    :returns: a dict of the results
+    """
+    max_rss_before = _max_rss_kb()
+    latencies = []
+    decisions = 0
+    failures = 0
+    start = time.time()
+    for i in xrange(num_requests):
+        kind, request_spec, filter_properties = request_mix.next_request()
+        request_start = time.time()
+        try:
+            dests = scheduler.select_destinations(context, request_spec,
+                                                  filter_properties)
+        except exception.NoValidHost:
+            dests = []
+            failures += 1
+        latencies.append(time.time() - request_start)
+        decisions += len(dests)
+        for dest in dests:
+            cloud.claim(dest['host'], request_spec['instance_properties'])
+    elapsed = time.time() - start
+
+    latencies.sort()
+    scheduling_time = sum(latencies)
+    return {'scheduler': scheduler.__class__.__name__,
+            'hosts': cloud.num_hosts,
+            'requests': num_requests,
+            'decisions': decisions,
+            'failures': failures,
+            'elapsed': elapsed,
+            'p50_ms': _percentile_ms(latencies, 50),
+            'p99_ms': _percentile_ms(latencies, 99),
+            'decisions_per_second': (decisions / scheduling_time
+                                     if scheduling_time else None),
+            'max_rss_kb': _max_rss_kb(),
+            'max_rss_growth_kb': _max_rss_kb() - max_rss_before}
+
+
+def _format_value(value, fmt):
+    return 'n/a' if value is None else fmt % value
+
+
+def format_results(results):
+    """Return the results of run_benchmark() as a line of text.
+
+    The latencies and the rate are printed as n/a when no request was
+    sent or no time was spent scheduling.
+    """
+    results = dict(results,
+                   p50=_format_value(results['p50_ms'], '%.2fms'),
+                   p99=_format_value(results['p99_ms'], '%.2fms'),
+                   rate=_format_value(results['decisions_per_second'],
+                                      '%.1f'))
+    return ('%(scheduler)s: %(hosts)d hosts, %(requests)d requests, '
+            '%(decisions)d decisions, %(failures)d failures, '
+            'p50 %(p50)s, p99 %(p99)s, %(rate)s decisions/s, '
+            'max RSS %(max_rss_kb)dKB (+%(max_rss_growth_kb)dKB)' % results)
@@ -61,7 +61,7 @@ class TestDiskFilter(test.NoDBTestCase):
                 {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 12})
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
-    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_db')
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_disk_filter_value_error(self, agg_mock):
         filt_cls = disk_filter.AggregateDiskFilter()
         self.flags(disk_allocation_ratio=1.0)
@@ -75,10 +75,9 @@ class TestDiskFilter(test.NoDBTestCase):
                                     'total_usable_disk_gb': 1})
         agg_mock.return_value = set(['XXX'])
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
-        agg_mock.assert_called_once_with(mock.sentinel.ctx, 'host1',
-            'disk_allocation_ratio')
+        agg_mock.assert_called_once_with(host, 'disk_allocation_ratio')
 
-    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_db')
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_disk_filter_default_value(self, agg_mock):
         filt_cls = disk_filter.AggregateDiskFilter()
         self.flags(disk_allocation_ratio=1.0)
@@ -93,8 +92,7 @@ class TestDiskFilter(test.NoDBTestCase):
         # Uses global conf.
         agg_mock.return_value = set([])
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
-        agg_mock.assert_called_once_with(mock.sentinel.ctx, 'host1',
-            'disk_allocation_ratio')
+        agg_mock.assert_called_once_with(host, 'disk_allocation_ratio')
 
         agg_mock.return_value = set(['2'])
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
@@ -0,0 +1,150 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Scheduler benchmark on synthetic clouds.
+
+As unit tests, the benchmark runs on a tiny cloud to check it still works.
+To measure the schedulers, run this module, for example:
+
+    python -m nova.tests.unit.scheduler.test_benchmark --hosts 1000 \
+        --requests 500 --scheduler filter --scheduler caching
+"""
+
+from nova import context
+from nova.scheduler import caching_scheduler
+from nova.scheduler import filter_scheduler
+from nova import test
+from nova.tests.unit.scheduler import benchmark
+
+SCHEDULERS = {'filter': filter_scheduler.FilterScheduler,
+              'caching': caching_scheduler.CachingScheduler}
+
+
+class SchedulerBenchmarkTestCase(test.TestCase):
+    """Run the schedulers on a synthetic cloud."""
+
+    # Overridden when this module is run
+    num_hosts = 4
+    num_requests = 5
+    request_mix = None
+    seed = 0
+    print_results = False
+
+    def setUp(self):
+        super(SchedulerBenchmarkTestCase, self).setUp()
+        self.flags(scheduler_default_filters=benchmark.BENCHMARK_FILTERS,
+                   service_down_time=3600)
+        self.context = context.get_admin_context()
+        self.cloud = benchmark.SyntheticCloud(self.context, self.num_hosts,
+                                              seed=self.seed)
+        self.cloud.build()
+
+    def _run(self, scheduler_cls):
+        scheduler = scheduler_cls()
+        request_mix = benchmark.RequestMix(self.request_mix,
+                                           zones=self.cloud.zones,
+                                           seed=self.seed)
+        results = benchmark.run_benchmark(self.context, scheduler,
+                                          self.cloud, request_mix,
+                                          self.num_requests)
+        if self.print_results:
+            print(benchmark.format_results(results))
+        return results
+
+    def _test_scheduler(self, scheduler_cls):
+        results = self._run(scheduler_cls)
+
+        self.assertEqual(self.num_requests, results['requests'])
+        self.assertTrue(results['decisions'] > 0)
+        self.assertIsNotNone(results['p99_ms'])
+        self.assertIn(scheduler_cls.__name__,
+                      benchmark.format_results(results))
+
+    def test_filter_scheduler(self):
+        self._test_scheduler(filter_scheduler.FilterScheduler)
+
+    def test_caching_scheduler(self):
+        self._test_scheduler(caching_scheduler.CachingScheduler)
+
+    def test_no_requests(self):
+        self.num_requests = 0
+        results = self._run(filter_scheduler.FilterScheduler)
+
+        self.assertIsNone(results['p50_ms'])
+        self.assertIsNone(results['decisions_per_second'])
+        self.assertIn('p50 n/a, p99 n/a, n/a decisions/s',
+                      benchmark.format_results(results))
+
+
+class RequestMixTestCase(test.NoDBTestCase):
+
+    def test_next_request(self):
+        request_mix = benchmark.RequestMix({'pci': 1})
+        kind, request_spec, filter_properties = request_mix.next_request()
+
+        self.assertEqual('pci', kind)
+        self.assertEqual(1, request_spec['num_instances'])
+        self.assertEqual(
+            filter_properties['pci_requests'],
+            request_spec['instance_properties']['pci_requests'])
+
+    def test_next_request_server_group(self):
+        request_mix = benchmark.RequestMix({'anti_affinity': 1},
+                                           group_size=4)
+        kind, request_spec, filter_properties = request_mix.next_request()
+
+        self.assertEqual(4, request_spec['num_instances'])
+        self.assertEqual(['anti-affinity'],
+                         filter_properties['group_policies'])
+
+    def test_mix_is_repeatable(self):
+        kinds = [[benchmark.RequestMix(seed=42).next_request()[0]
+                  for i in xrange(20)]
+                 for j in xrange(2)]
+        self.assertEqual(kinds[0], kinds[1])
+
+
+def main():
+    import argparse
+    import unittest
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--hosts', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--scheduler', action='append',
+                        choices=sorted(SCHEDULERS))
+    parser.add_argument('--mix', help='Request kinds and their weights, '
+                        'for example small=5,numa=1,anti_affinity=1')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    SchedulerBenchmarkTestCase.num_hosts = args.hosts
+    SchedulerBenchmarkTestCase.num_requests = args.requests
+    SchedulerBenchmarkTestCase.seed = args.seed
+    SchedulerBenchmarkTestCase.print_results = True
+    if args.mix:
+        SchedulerBenchmarkTestCase.request_mix = {
+            kind: float(weight) for kind, weight in
+            (item.split('=') for item in args.mix.split(','))}
+
+    suite = unittest.TestSuite()
+    for name in args.scheduler or ['filter']:
+        suite.addTest(SchedulerBenchmarkTestCase(
+            'test_%s_scheduler' % name))
+    unittest.TextTestRunner().run(suite)
+
+
+if __name__ == '__main__':
+    main()
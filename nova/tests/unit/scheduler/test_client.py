@@ -19,6 +19,7 @@ import oslo_messaging as messaging
 from nova.conductor import api as conductor_api
 from nova import context
 from nova import exception
+from nova import objects
 from nova.scheduler import client as scheduler_client
 from nova.scheduler.client import query as scheduler_query_client
 from nova.scheduler.client import report as scheduler_report_client
@@ -50,6 +51,29 @@ class SchedulerReportClientTestCase(test.TestCase):
                                                {"id": 1},
                                                {"foo": "bar"})
 
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.update_compute_node')
+    @mock.patch.object(conductor_api.LocalAPI, 'compute_node_update')
+    def test_update_compute_node_pushes(self, mock_cn_update,
+                                        mock_push):
+        self.flags(scheduler_push_compute_updates=True)
+        mock_cn_update.return_value = {
+            'id': 1, 'host': 'fakehost', 'hypervisor_hostname': 'fakenode'}
+        with mock.patch.object(objects.ComputeNode,
+                               '_from_db_object') as mock_from_db:
+            self.client.update_resource_stats(self.context,
+                                              ('fakehost', 'fakenode'),
+                                              {"id": 1, "foo": "bar"})
+        mock_push.assert_called_once_with(self.context,
+                                          mock_from_db.return_value)
+
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.update_compute_node')
+    @mock.patch.object(conductor_api.LocalAPI, 'compute_node_update')
+    def test_update_compute_node_no_push(self, mock_cn_update, mock_push):
+        self.client.update_resource_stats(self.context,
+                                          ('fakehost', 'fakenode'),
+                                          {"id": 1, "foo": "bar"})
+        self.assertFalse(mock_push.called)
+
     def test_update_compute_node_raises(self):
         stats = {"foo": "bar"}
         self.assertRaises(exception.ComputeHostNotCreated,
@@ -80,6 +104,18 @@ class SchedulerQueryClientTestCase(test.TestCase):
             'fake_request_spec',
             'fake_prop')
 
+    @mock.patch.object(scheduler_rpcapi.SchedulerAPI, 'update_aggregates')
+    def test_update_aggregates(self, mock_update_aggs):
+        aggregates = [objects.Aggregate(id=1)]
+        self.client.update_aggregates(self.context, aggregates)
+        mock_update_aggs.assert_called_once_with(self.context, aggregates)
+
+    @mock.patch.object(scheduler_rpcapi.SchedulerAPI, 'delete_aggregate')
+    def test_delete_aggregate(self, mock_delete_agg):
+        aggregate = objects.Aggregate(id=1)
+        self.client.delete_aggregate(self.context, aggregate)
+        mock_delete_agg.assert_called_once_with(self.context, aggregate)
+
 
 class SchedulerClientTestCase(test.TestCase):
 
@@ -131,3 +167,15 @@ class SchedulerClientTestCase(test.TestCase):
         self.assertIsNotNone(self.client.reportclient.instance)
         mock_update_resource_stats.assert_called_once_with(
             'ctxt', 'fake_name', 'fake_stats')
+
+    @mock.patch.object(scheduler_query_client.SchedulerQueryClient,
+                       'update_aggregates')
+    def test_update_aggregates(self, mock_update_aggs):
+        self.client.update_aggregates('ctxt', ['fake_aggregate'])
+        mock_update_aggs.assert_called_once_with('ctxt', ['fake_aggregate'])
+
+    @mock.patch.object(scheduler_query_client.SchedulerQueryClient,
+                       'delete_aggregate')
+    def test_delete_aggregate(self, mock_delete_agg):
+        self.client.delete_aggregate('ctxt', 'fake_aggregate')
+        mock_delete_agg.assert_called_once_with('ctxt', 'fake_aggregate')
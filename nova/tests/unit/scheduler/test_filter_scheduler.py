@@ -16,6 +16,8 @@
 Tests For Filter Scheduler.
 """
 
+import contextlib
+
 import mock
 
 from nova import exception
@@ -318,3 +320,168 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                 # Make sure that we provided a reason why NoValidHost.
                 self.assertIn('reason', e.kwargs)
                 self.assertTrue(len(e.kwargs['reason']) > 0)
+
+    def test_select_destinations_records_group_members(self):
+        selected = [weights.WeighedHost(fakes.FakeHostState(host, node, {}),
+                                        1.0)
+                    for host, node in (('host1', 'node1'),
+                                       ('host2', 'node2'))]
+        request_spec = {'num_instances': 2,
+                        'instance_uuids': ['uuid1', 'uuid2']}
+        filter_properties = {'group_uuid': 'fake-group'}
+
+        with mock.patch.object(self.driver, '_schedule',
+                               return_value=selected):
+            self.driver.select_destinations(self.context, request_spec,
+                                            filter_properties)
+
+        self.assertEqual({'fake-group': {'uuid1': 'host1',
+                                         'uuid2': 'host2'}},
+                         self.driver.host_manager.group_members)
+
+    def test_setup_group_hosts(self):
+        self.driver.host_manager.add_group_member('fake-group', 'uuid1',
+                                                  'host1')
+        filter_properties = {'group_updated': True,
+                             'group_hosts': ['host2'],
+                             'group_uuid': 'fake-group'}
+
+        self.driver._setup_group_hosts(self.context, filter_properties)
+
+        self.assertEqual(set(['host1', 'host2']),
+                         filter_properties['group_hosts'])
+
+    @mock.patch.object(host_manager.HostManager, 'get_group_hosts',
+                       return_value=set(['host1']))
+    def test_setup_group_hosts_with_members(self, mock_get_group_hosts):
+        filter_properties = {'group_updated': True,
+                             'group_hosts': ['host2'],
+                             'group_uuid': 'fake-group',
+                             'group_members': ['uuid1', 'uuid2']}
+
+        self.driver._setup_group_hosts(self.context, filter_properties)
+
+        self.assertEqual(set(['host1', 'host2']),
+                         filter_properties['group_hosts'])
+        mock_get_group_hosts.assert_called_once_with(
+            self.context, 'fake-group', ['uuid1', 'uuid2'])
+
+    def test_setup_group_hosts_no_group(self):
+        filter_properties = {}
+        self.driver._setup_group_hosts(self.context, filter_properties)
+        self.assertEqual({}, filter_properties)
+
+    @mock.patch.object(host_manager.HostManager, 'sync_group_members')
+    def test_run_periodic_tasks(self, mock_sync):
+        context = mock.Mock()
+        self.driver.run_periodic_tasks(context)
+        mock_sync.assert_called_once_with()
+
+    def _batch_hosts(self):
+        return [fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                    {'free_ram_mb': 1024 * i})
+                for i in xrange(1, 4)]
+
+    def _schedule_batch(self, hosts, num_instances, filter_properties=None):
+        def _fake_filter(hosts, filter_properties, index):
+            group_hosts = filter_properties.get('group_hosts', [])
+            return [host for host in hosts
+                    if host.free_ram_mb >= 1024 and
+                    host.host not in group_hosts]
+
+        def _fake_weigh(hosts, filter_properties):
+            return [weights.WeighedHost(host, host.free_ram_mb)
+                    for host in hosts]
+
+        self.flags(scheduler_host_subset_size=1)
+        instance_properties = {'memory_mb': 1024, 'root_gb': 0,
+                               'ephemeral_gb': 0, 'vcpus': 1,
+                               'os_type': 'Linux', 'uuid': 'fake-uuid'}
+        with contextlib.nested(
+                mock.patch.object(self.driver.host_manager,
+                                  'get_filtered_hosts',
+                                  side_effect=_fake_filter),
+                mock.patch.object(self.driver.host_manager,
+                                  'get_weighed_hosts',
+                                  side_effect=_fake_weigh),
+                mock.patch.object(host_manager.HostState,
+                                  'consume_from_instance',
+                                  autospec=True,
+                                  side_effect=self._fake_consume)
+        ) as (mock_filter, mock_weigh, mock_consume):
+            selected = self.driver._schedule_batch(
+                hosts, instance_properties, filter_properties or {},
+                num_instances)
+        return selected, mock_filter, mock_weigh
+
+    @staticmethod
+    def _fake_consume(host_state, instance_properties):
+        host_state.free_ram_mb -= instance_properties['memory_mb']
+
+    def test_schedule_batch(self):
+        hosts = self._batch_hosts()
+        selected, mock_filter, mock_weigh = self._schedule_batch(hosts, 4)
+
+        self.assertEqual(['host3', 'host2', 'host3', 'host1'],
+                         [weighed.obj.host for weighed in selected])
+        self.assertEqual([0, 1024, 1024], [host.free_ram_mb for host in hosts])
+        # All the hosts are filtered and weighed only for the first instance,
+        # then only the popped and chosen hosts are.
+        self.assertEqual(hosts, mock_filter.call_args_list[0][0][0])
+        self.assertEqual(hosts, mock_weigh.call_args_list[0][0][0])
+        for call in (mock_filter.call_args_list[1:] +
+                     mock_weigh.call_args_list[1:]):
+            self.assertEqual(1, len(call[0][0]))
+
+    def test_schedule_batch_not_enough_hosts(self):
+        hosts = self._batch_hosts()
+        selected, mock_filter, mock_weigh = self._schedule_batch(hosts, 10)
+
+        self.assertEqual(6, len(selected))
+
+    def test_schedule_batch_no_hosts(self):
+        hosts = self._batch_hosts()
+        for host in hosts:
+            host.free_ram_mb = 0
+        selected, mock_filter, mock_weigh = self._schedule_batch(hosts, 2)
+
+        self.assertEqual([], selected)
+        self.assertFalse(mock_weigh.called)
+
+    def test_schedule_batch_anti_affinity(self):
+        hosts = self._batch_hosts()
+        filter_properties = {'group_updated': True, 'group_hosts': []}
+        selected, mock_filter, mock_weigh = self._schedule_batch(
+            hosts, 3, filter_properties)
+
+        self.assertEqual(['host3', 'host2', 'host1'],
+                         [weighed.obj.host for weighed in selected])
+        self.assertEqual(set(['host1', 'host2', 'host3']),
+                         filter_properties['group_hosts'])
+
+    @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule_batch')
+    @mock.patch('nova.objects.ServiceList.get_by_topic',
+                return_value=fakes.SERVICES)
+    @mock.patch('nova.objects.ComputeNodeList.get_all',
+                return_value=fakes.COMPUTE_NODES)
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_schedule_uses_batch_placement(self, mock_get_extra,
+                                           mock_get_all, mock_get_by_topic,
+                                           mock_batch):
+        self.flags(scheduler_batch_placement=True)
+        instance_properties = {'project_id': 1,
+                               'root_gb': 512,
+                               'memory_mb': 512,
+                               'ephemeral_gb': 0,
+                               'vcpus': 1,
+                               'os_type': 'Linux',
+                               'uuid': 'fake-uuid'}
+        request_spec = dict(instance_properties=instance_properties,
+                            instance_type={}, num_instances=2)
+
+        hosts = self.driver._schedule(self.context, request_spec, {})
+
+        self.assertEqual(mock_batch.return_value, hosts)
+        self.assertEqual(2, mock_batch.call_args[0][3])
@@ -18,6 +18,8 @@ Tests For Scheduler Host Filters.
 import inspect
 import sys
 
+import mock
+
 from nova import filters
 from nova import loadables
 from nova import test
@@ -199,3 +201,80 @@ class FiltersTestCase(test.NoDBTestCase):
                                                      filter_objs_initial,
                                                      filter_properties)
         self.assertIsNone(result)
+
+    def _filter_handler(self, reorder_filters=True):
+        def _fake_base_loader_init(*args, **kwargs):
+            pass
+
+        self.stubs.Set(loadables.BaseLoader, '__init__',
+                       _fake_base_loader_init)
+        filter_handler = filters.BaseFilterHandler(filters.BaseFilter)
+        filter_handler.reorder_filters = reorder_filters
+        return filter_handler
+
+    def test_record_filter_run(self):
+        filter_handler = self._filter_handler()
+
+        filter_handler._record_filter_run('Filter1', 1.0, 10, 5)
+        self.assertEqual((0.1, 0.5), filter_handler.filter_costs['Filter1'])
+        filter_handler._record_filter_run('Filter1', 2.0, 10, 10)
+        cost, kept = filter_handler.filter_costs['Filter1']
+        self.assertAlmostEqual(0.11, cost)
+        self.assertAlmostEqual(0.55, kept)
+
+    def test_record_filter_run_not_reordering(self):
+        filter_handler = self._filter_handler(reorder_filters=False)
+        filter_handler._record_filter_run('Filter1', 1.0, 10, 5)
+        self.assertEqual({}, filter_handler.filter_costs)
+
+    def test_order_filters(self):
+        class Filter3(filters.BaseFilter):
+            keep_filter_position = True
+
+        class Filter4(filters.BaseFilter):
+            pass
+
+        filter_handler = self._filter_handler()
+        filter_handler.filter_costs = {'Filter1': (1.0, 0.5),
+                                       'Filter2': (0.1, 0.5),
+                                       'Filter3': (0.0, 0.0),
+                                       'Filter4': (0.1, 1.0)}
+        filter_objs = [Filter3(), Filter4(), Filter1(), Filter2()]
+
+        result = filter_handler._order_filters(filter_objs)
+
+        self.assertEqual(['Filter3', 'Filter2', 'Filter1', 'Filter4'],
+                         [filter.__class__.__name__ for filter in result])
+
+    def test_order_filters_not_measured_first(self):
+        filter_handler = self._filter_handler()
+        filter_handler.filter_costs = {'Filter1': (0.1, 0.5)}
+        filter_objs = [Filter1(), Filter2()]
+
+        result = filter_handler._order_filters(filter_objs)
+
+        self.assertEqual(['Filter2', 'Filter1'],
+                         [filter.__class__.__name__ for filter in result])
+
+    def test_get_filtered_objects_reordered(self):
+        class EvenFilter(filters.BaseFilter):
+            def _filter_one(self, obj, filter_properties):
+                return obj % 2 == 0
+
+        filter_handler = self._filter_handler()
+        filter_objs = [Filter1(), EvenFilter()]
+
+        result = filter_handler.get_filtered_objects(filter_objs, range(10),
+                                                     {})
+        self.assertEqual([0, 2, 4, 6, 8], result)
+        self.assertEqual(['Filter1', 'EvenFilter'],
+                         sorted(filter_handler.filter_costs, reverse=True))
+
+        with mock.patch.object(Filter1, 'filter_all',
+                               return_value=[0, 2]) as mock_filter_all:
+            result = filter_handler.get_filtered_objects(filter_objs,
+                                                         range(10), {})
+        # EvenFilter removes objects and Filter1 does not, so EvenFilter
+        # now runs first.
+        self.assertEqual([0, 2], result)
+        mock_filter_all.assert_called_once_with([0, 2, 4, 6, 8], {})
@@ -0,0 +1,208 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the columnar filtering and weighing of hosts.
+"""
+
+import mock
+
+from nova import exception
+from nova.scheduler import filters
+from nova.scheduler.filters import core_filter
+from nova.scheduler.filters import disk_filter
+from nova.scheduler.filters import io_ops_filter
+from nova.scheduler.filters import num_instances_filter
+from nova.scheduler.filters import ram_filter
+from nova.scheduler import host_columns
+from nova.scheduler import host_manager
+from nova.scheduler import weights
+from nova.scheduler.weights import io_ops
+from nova.scheduler.weights import metrics
+from nova.scheduler.weights import ram
+from nova import test
+from nova.tests.unit.scheduler import fakes
+
+
+def _make_hosts():
+    hosts = []
+    for i in xrange(20):
+        values = {'free_ram_mb': 512 * (i % 7) - 256,
+                  'total_usable_ram_mb': 4096,
+                  'free_disk_mb': 10240 * (i % 5),
+                  'total_usable_disk_gb': 40,
+                  'vcpus_total': 4 * (i % 4),
+                  'vcpus_used': i % 9,
+                  'num_io_ops': i % 10,
+                  'num_instances': 10 * (i % 8),
+                  'metrics': {
+                      'foo': host_manager.MetricItem(value=i % 6,
+                                                     timestamp=None,
+                                                     source='fake'),
+                  }}
+        if i % 3:
+            values['metrics']['bar'] = host_manager.MetricItem(
+                value=i * 10, timestamp=None, source='fake')
+        hosts.append(fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                         values))
+    return hosts
+
+
+class HostColumnsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(HostColumnsTestCase, self).setUp()
+        if host_columns.numpy is None:
+            self.skipTest("Unable to test host columns without numpy")
+        self.flags(scheduler_use_host_columns=True)
+        self.hosts = _make_hosts()
+
+    def test_enabled(self):
+        self.assertTrue(host_columns.enabled())
+        self.flags(scheduler_use_host_columns=False)
+        self.assertFalse(host_columns.enabled())
+
+    def test_enabled_without_numpy(self):
+        with mock.patch.object(host_columns, 'numpy', None):
+            self.assertFalse(host_columns.enabled())
+
+    def test_columns(self):
+        columns = host_columns.HostColumns(self.hosts)
+        self.assertEqual(20, len(columns))
+        self.assertEqual([host.free_ram_mb for host in self.hosts],
+                         columns.free_ram_mb.tolist())
+        self.assertEqual([host.num_io_ops for host in self.hosts],
+                         columns.num_io_ops.tolist())
+
+    def test_select(self):
+        columns = host_columns.HostColumns(self.hosts)
+        selected = columns.select(columns.num_io_ops < 2)
+        self.assertEqual(['host0', 'host1', 'host10', 'host11'],
+                         [host.host for host in selected.host_states])
+        self.assertEqual([0, 1, 0, 1], selected.num_io_ops.tolist())
+
+    def test_metric(self):
+        columns = host_columns.HostColumns(self.hosts[:3])
+        self.assertEqual([0.0, 1.0, 2.0], columns.metric('foo').tolist())
+        bar = columns.metric('bar')
+        self.assertTrue(host_columns.numpy.isnan(bar[0]))
+        self.assertEqual([10.0, 20.0], bar[1:].tolist())
+
+    def _assert_same_filtering(self, filter_obj, filter_properties):
+        hosts = _make_hosts()
+        expected = [host.host for host in hosts
+                    if filter_obj.host_passes(host, filter_properties)]
+        expected_limits = [host.limits for host in hosts
+                           if host.host in expected]
+
+        columns = host_columns.HostColumns(self.hosts)
+        passes = filter_obj.filter_host_columns(columns, filter_properties)
+        self.assertEqual(expected,
+                         [host.host for host in columns.select(passes)
+                          .host_states])
+        self.assertEqual(expected_limits,
+                         [host.limits for host in self.hosts
+                          if host.host in expected])
+
+    def test_ram_filter(self):
+        self.stubs.Set(ram_filter.RamFilter, 'ram_allocation_ratio', 1.5)
+        self._assert_same_filtering(ram_filter.RamFilter(),
+                                    {'instance_type': {'memory_mb': 1024}})
+
+    def test_core_filter(self):
+        self._assert_same_filtering(core_filter.CoreFilter(),
+                                    {'instance_type': {'vcpus': 2}})
+
+    def test_core_filter_no_instance_type(self):
+        self._assert_same_filtering(core_filter.CoreFilter(), {})
+
+    def test_disk_filter(self):
+        self._assert_same_filtering(disk_filter.DiskFilter(),
+                                    {'instance_type': {'root_gb': 10,
+                                                       'ephemeral_gb': 5,
+                                                       'swap': 512}})
+
+    def test_io_ops_filter(self):
+        self.flags(max_io_ops_per_host=4)
+        self._assert_same_filtering(io_ops_filter.IoOpsFilter(), {})
+
+    def test_num_instances_filter(self):
+        self.flags(max_instances_per_host=35)
+        self._assert_same_filtering(
+            num_instances_filter.NumInstancesFilter(), {})
+
+    def test_aggregate_filters_not_columnar(self):
+        for filter_obj in (disk_filter.AggregateDiskFilter(),
+                           io_ops_filter.AggregateIoOpsFilter(),
+                           num_instances_filter.AggregateNumInstancesFilter(),
+                           ram_filter.AggregateRamFilter(),
+                           core_filter.AggregateCoreFilter()):
+            self.assertIsNone(getattr(filter_obj, 'filter_host_columns',
+                                      None))
+
+    def test_filter_handler(self):
+        class HostnameFilter(filters.BaseHostFilter):
+            def host_passes(self, host_state, filter_properties):
+                return host_state.host.endswith('0')
+
+        self.flags(max_io_ops_per_host=4)
+        handler = filters.HostFilterHandler()
+        filter_objs = [HostnameFilter(), io_ops_filter.IoOpsFilter()]
+        with mock.patch.object(io_ops_filter.IoOpsFilter,
+                               'host_passes') as mock_passes:
+            result = handler.get_filtered_objects(filter_objs,
+                                                  self.hosts, {})
+        self.assertFalse(mock_passes.called)
+        self.assertEqual(['host0', 'host10'],
+                         [host.host for host in result])
+
+    def _weigh(self, weighers, hosts):
+        handler = weights.HostWeightHandler()
+        return [(weighed.obj.host, weighed.weight)
+                for weighed in handler.get_weighed_objects(weighers, hosts,
+                                                           {})]
+
+    def test_weigh_handler(self):
+        self.flags(weight_setting=['foo=1.0', 'bar=-0.5'], required=False,
+                   group='metrics')
+        weigher_classes = (ram.RAMWeigher, io_ops.IoOpsWeigher,
+                           metrics.MetricsWeigher)
+        self.flags(scheduler_use_host_columns=False)
+        expected = self._weigh([cls() for cls in weigher_classes],
+                               _make_hosts())
+        self.flags(scheduler_use_host_columns=True)
+        self.assertEqual(expected,
+                         self._weigh([cls() for cls in weigher_classes],
+                                     self.hosts))
+
+    def test_weigh_handler_mixed_weighers(self):
+        class HostnameWeigher(weights.BaseHostWeigher):
+            def _weigh_object(self, host_state, weight_properties):
+                return len(host_state.host)
+
+        self.flags(scheduler_use_host_columns=False)
+        expected = self._weigh([HostnameWeigher(), ram.RAMWeigher()],
+                               _make_hosts())
+        self.flags(scheduler_use_host_columns=True)
+        self.assertEqual(expected,
+                         self._weigh([HostnameWeigher(), ram.RAMWeigher()],
+                                     self.hosts))
+
+    def test_metrics_weigher_required(self):
+        self.flags(weight_setting=['bar=1.0'], required=True,
+                   group='metrics')
+        columns = host_columns.HostColumns(self.hosts)
+        self.assertRaises(exception.ComputeHostMetricNotFound,
+                          metrics.MetricsWeigher().weigh_host_columns,
+                          columns, {})
@@ -16,6 +16,9 @@
 Tests For HostManager
 """
 
+import contextlib
+import datetime
+
 import mock
 from oslo_config import cfg
 from oslo_serialization import jsonutils
@@ -52,6 +55,10 @@ class HostManagerTestCase(test.NoDBTestCase):
 
     def setUp(self):
         super(HostManagerTestCase, self).setUp()
+        patcher = mock.patch.object(objects.AggregateList, 'get_all',
+                                    return_value=[])
+        self.mock_get_aggregates = patcher.start()
+        self.addCleanup(patcher.stop)
         self.flags(scheduler_available_filters=['%s.%s' % (__name__, cls) for
                                                 cls in ['FakeFilterClass1',
                                                         'FakeFilterClass2']])
@@ -318,6 +325,10 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
 
     def setUp(self):
         super(HostManagerChangedNodesTestCase, self).setUp()
+        patcher = mock.patch.object(objects.AggregateList, 'get_all',
+                                    return_value=[])
+        self.mock_get_aggregates = patcher.start()
+        self.addCleanup(patcher.stop)
         self.host_manager = host_manager.HostManager()
         self.fake_hosts = [
               host_manager.HostState('host1', 'node1'),
@@ -382,6 +393,246 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         host_states_map = self.host_manager.host_state_map
         self.assertEqual(len(host_states_map), 0)
 
+    def _changed_compute_node(self, index, **updates):
+        compute = fakes.COMPUTE_NODES[index].obj_clone()
+        compute.deleted = False
+        for key, value in updates.items():
+            setattr(compute, key, value)
+        return compute
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_changed_since')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic_changed_since')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_get_all_host_states_deltas(self, mock_get_by_topic,
+                                        mock_get_all, mock_changed_services,
+                                        mock_changed_computes):
+        self.flags(scheduler_use_host_state_deltas=True)
+        context = 'fake_context'
+        mock_get_by_topic.return_value = fakes.SERVICES
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        mock_changed_services.return_value = []
+        mock_changed_computes.return_value = [
+            self._changed_compute_node(0, free_ram_mb=256),
+            self._changed_compute_node(3, deleted=True)]
+
+        self.host_manager.get_all_host_states(context)
+        synced_at = self.host_manager.last_synced_at
+        self.host_manager.get_all_host_states(context)
+
+        self.assertEqual(1, mock_get_all.call_count)
+        changes_since = synced_at - datetime.timedelta(
+            seconds=CONF.scheduler_host_state_delta_margin)
+        mock_changed_services.assert_called_once_with(
+            context, CONF.compute_topic, changes_since)
+        mock_changed_computes.assert_called_once_with(context, changes_since)
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(3, len(host_states_map))
+        self.assertNotIn(('host4', 'node4'), host_states_map)
+        self.assertEqual(256, host_states_map[('host1', 'node1')].free_ram_mb)
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_changed_since')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_get_all_host_states_deltas_after_gap(self, mock_get_by_topic,
+                                                  mock_get_all,
+                                                  mock_changed_computes):
+        self.flags(scheduler_use_host_state_deltas=True)
+        context = 'fake_context'
+        mock_get_by_topic.return_value = fakes.SERVICES
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+
+        self.host_manager.get_all_host_states(context)
+        self.host_manager.last_synced_at -= datetime.timedelta(
+            seconds=CONF.scheduler_host_state_max_delta_age + 1)
+        self.host_manager.get_all_host_states(context)
+
+        self.assertEqual(2, mock_get_all.call_count)
+        self.assertFalse(mock_changed_computes.called)
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_by_host')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_changed_since')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic_changed_since')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_get_all_host_states_deltas_services(self, mock_get_by_topic,
+                                                 mock_get_all,
+                                                 mock_changed_services,
+                                                 mock_changed_computes,
+                                                 mock_get_by_host):
+        self.flags(scheduler_use_host_state_deltas=True)
+        context = 'fake_context'
+        mock_get_by_topic.return_value = fakes.SERVICES[:3]
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        mock_changed_services.return_value = [
+            objects.Service(host='host3', disabled=True, deleted=False),
+            objects.Service(host='host4', disabled=False, deleted=False)]
+        mock_changed_computes.return_value = []
+        mock_get_by_host.return_value = [fakes.COMPUTE_NODES[3]]
+
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(3, len(self.host_manager.host_state_map))
+        self.host_manager.get_all_host_states(context)
+
+        mock_get_by_host.assert_called_once_with(context, 'host4')
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(set([('host1', 'node1'), ('host2', 'node2'),
+                              ('host4', 'node4')]),
+                         set(host_states_map.keys()))
+        self.assertNotIn('host3', self.host_manager.service_map)
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_update_compute_node(self, mock_get_by_topic, mock_get_all):
+        mock_get_by_topic.return_value = fakes.SERVICES
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        self.host_manager.get_all_host_states('fake_context')
+
+        self.host_manager.update_compute_node(
+            self._changed_compute_node(1, free_ram_mb=42))
+        self.host_manager.update_compute_node(
+            self._changed_compute_node(4))
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(4, len(host_states_map))
+        self.assertEqual(42, host_states_map[('host2', 'node2')].free_ram_mb)
+
+    def _sync_with_aggregates(self, aggregates):
+        self.mock_get_aggregates.return_value = aggregates
+        with contextlib.nested(
+                mock.patch.object(objects.ServiceList, 'get_by_topic',
+                                  return_value=fakes.SERVICES),
+                mock.patch.object(objects.ComputeNodeList, 'get_all',
+                                  return_value=fakes.COMPUTE_NODES)):
+            self.host_manager.get_all_host_states('fake_context')
+        return self.host_manager.host_state_map
+
+    def test_get_all_host_states_aggregates(self):
+        agg1 = objects.Aggregate(id=1, hosts=['host1', 'host2'],
+                                 metadata={'k1': 'v1'})
+        agg2 = objects.Aggregate(id=2, hosts=['host2'], metadata={})
+
+        host_states_map = self._sync_with_aggregates([agg1, agg2])
+
+        self.mock_get_aggregates.assert_called_once_with('fake_context')
+        self.assertEqual([agg1],
+                         host_states_map[('host1', 'node1')].aggregates)
+        self.assertEqual(set([1, 2]),
+                         set(agg.id for agg in
+                             host_states_map[('host2', 'node2')].aggregates))
+        self.assertEqual([], host_states_map[('host3', 'node3')].aggregates)
+
+    def test_update_aggregates(self):
+        agg1 = objects.Aggregate(id=1, hosts=['host1'], metadata={})
+        host_states_map = self._sync_with_aggregates([agg1])
+        new_agg1 = objects.Aggregate(id=1, hosts=['host2'],
+                                     metadata={'k1': 'v1'})
+        agg2 = objects.Aggregate(id=2, hosts=['host3'], metadata={})
+
+        self.host_manager.update_aggregates([new_agg1, agg2])
+
+        self.assertEqual([], host_states_map[('host1', 'node1')].aggregates)
+        self.assertEqual([new_agg1],
+                         host_states_map[('host2', 'node2')].aggregates)
+        self.assertEqual([agg2],
+                         host_states_map[('host3', 'node3')].aggregates)
+        self.assertEqual({1: new_agg1, 2: agg2}, self.host_manager.aggs_by_id)
+
+    def test_delete_aggregate(self):
+        agg1 = objects.Aggregate(id=1, hosts=['host1'], metadata={})
+        host_states_map = self._sync_with_aggregates([agg1])
+
+        self.host_manager.delete_aggregate(objects.Aggregate(id=1))
+
+        self.assertEqual([], host_states_map[('host1', 'node1')].aggregates)
+        self.assertEqual({}, self.host_manager.aggs_by_id)
+
+    def test_delete_unknown_aggregate(self):
+        self._sync_with_aggregates([])
+        self.host_manager.delete_aggregate(objects.Aggregate(id=1))
+        self.assertEqual({}, self.host_manager.aggs_by_id)
+
+    def test_get_group_hosts(self):
+        self.host_manager.add_group_member('group1', 'uuid1', 'host1')
+        self.host_manager.add_group_member('group1', 'uuid2', 'host1')
+        self.host_manager.add_group_member('group1', 'uuid3', 'host2')
+
+        self.assertEqual(set(['host1', 'host2']),
+                         self.host_manager.get_group_hosts('fake_context',
+                                                           'group1'))
+        self.assertEqual(set(), self.host_manager.get_group_hosts(
+            'fake_context', 'group2'))
+
+    @mock.patch.object(objects.InstanceList, 'get_by_filters')
+    def test_get_group_hosts_with_members(self, mock_get_by_filters):
+        self.host_manager.add_group_member('group1', 'uuid1', 'host1')
+        self.host_manager.add_group_member('group1', 'uuid5', 'host5')
+        mock_get_by_filters.return_value = [
+            objects.Instance(uuid='uuid2', host='host2'),
+            objects.Instance(uuid='uuid3', host=None)]
+
+        hosts = self.host_manager.get_group_hosts(
+            'fake_context', 'group1', ['uuid1', 'uuid2', 'uuid3', 'uuid4'])
+
+        # uuid5 is no longer a member, uuid4 was deleted and uuid3 is still
+        # being built
+        self.assertEqual(set(['host1', 'host2']), hosts)
+        filters = mock_get_by_filters.call_args[0][1]
+        self.assertEqual(['uuid2', 'uuid3', 'uuid4'], filters['uuid'])
+        self.assertEqual(['host'], mock_get_by_filters.call_args[1]['fields'])
+        self.assertEqual({'uuid1': 'host1', 'uuid2': 'host2',
+                          'uuid5': 'host5'},
+                         self.host_manager.group_members['group1'])
+
+    @mock.patch.object(objects.InstanceList, 'get_by_filters')
+    def test_get_group_hosts_all_members_known(self, mock_get_by_filters):
+        self.host_manager.add_group_member('group1', 'uuid1', 'host1')
+
+        hosts = self.host_manager.get_group_hosts('fake_context', 'group1',
+                                                  ['uuid1'])
+
+        self.assertEqual(set(['host1']), hosts)
+        self.assertFalse(mock_get_by_filters.called)
+
+    @mock.patch.object(objects.InstanceList, 'get_by_filters')
+    def test_get_group_hosts_rereads_stale_members(self,
+                                                   mock_get_by_filters):
+        self.host_manager.add_group_member('group1', 'uuid1', 'host1')
+        self.host_manager.add_group_member('group1', 'uuid2', 'host2')
+        self.host_manager.add_group_member('group1', 'uuid3', 'host3')
+        self.host_manager.sync_group_members()
+        self.host_manager.add_group_member('group1', 'uuid4', 'host4')
+        mock_get_by_filters.return_value = [
+            objects.Instance(uuid='uuid1', host='host5'),
+            objects.Instance(uuid='uuid2', host=None)]
+
+        hosts = self.host_manager.get_group_hosts(
+            'fake_context', 'group1', ['uuid1', 'uuid2', 'uuid3', 'uuid4'])
+
+        # uuid1 was migrated, uuid2 is still being built and uuid3 was
+        # deleted since the sync
+        self.assertEqual(set(['host2', 'host4', 'host5']), hosts)
+        filters = mock_get_by_filters.call_args[0][1]
+        self.assertEqual(['uuid1', 'uuid2', 'uuid3'], filters['uuid'])
+        self.assertEqual({'uuid1': 'host5', 'uuid2': 'host2',
+                          'uuid4': 'host4'},
+                         self.host_manager.group_members['group1'])
+
+    def test_sync_group_members(self):
+        self.host_manager.add_group_member('group1', 'uuid1', 'host1')
+        self.host_manager.sync_group_members()
+        self.host_manager.add_group_member('group2', 'uuid2', 'host2')
+
+        self.assertEqual(set(['host1']), self.host_manager.get_group_hosts(
+            'fake_context', 'group1'))
+
+        self.host_manager.sync_group_members()
+
+        # group1 was not needed by any request since the previous sync
+        self.assertEqual({}, self.host_manager.group_members)
+        self.assertEqual({'group2': {'uuid2': 'host2'}},
+                         self.host_manager.stale_group_members)
+
 
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
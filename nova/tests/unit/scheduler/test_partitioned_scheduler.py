@@ -0,0 +1,220 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from nova import exception
+from nova import objects
+from nova.scheduler import filter_scheduler
+from nova.scheduler import partitioned_scheduler
+from nova import test
+from nova.tests.unit.scheduler import fakes
+from nova.tests.unit.scheduler import test_filter_scheduler
+from nova.tests.unit.scheduler import test_scheduler
+
+
+class HashRingTestCase(test.NoDBTestCase):
+
+    def test_get_member(self):
+        ring = partitioned_scheduler.HashRing(['sched1', 'sched2'], 16)
+        keys = ['host%d' % i for i in xrange(100)]
+        members = [ring.get_member(key) for key in keys]
+
+        self.assertEqual(set(['sched1', 'sched2']), set(members))
+        self.assertEqual(members, [ring.get_member(key) for key in keys])
+
+    def test_get_member_no_members(self):
+        ring = partitioned_scheduler.HashRing([], 16)
+        self.assertIsNone(ring.get_member('host1'))
+
+    def test_member_leaving_only_moves_its_keys(self):
+        keys = ['host%d' % i for i in xrange(100)]
+        ring = partitioned_scheduler.HashRing(['sched1', 'sched2', 'sched3'],
+                                              16)
+        before = {key: ring.get_member(key) for key in keys}
+        ring = partitioned_scheduler.HashRing(['sched1', 'sched2'], 16)
+
+        for key in keys:
+            if before[key] != 'sched3':
+                self.assertEqual(before[key], ring.get_member(key))
+
+    def test_unicode_key(self):
+        ring = partitioned_scheduler.HashRing(['sched1'], 1)
+        self.assertEqual('sched1', ring.get_member(u'h\xf4te'))
+
+
+class PartitionedSchedulerTestCase(test_scheduler.SchedulerTestCase):
+    """Test case for Partitioned Scheduler."""
+
+    driver_cls = partitioned_scheduler.PartitionedScheduler
+
+    def setUp(self):
+        super(PartitionedSchedulerTestCase, self).setUp()
+        self.flags(host='sched1')
+        self.host_states = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                                {})
+                            for i in xrange(20)]
+
+    def _set_ring(self, members):
+        self.driver.ring = partitioned_scheduler.HashRing(members, 16)
+
+    def test_invalid_partition_mode(self):
+        self.flags(scheduler_partition_mode='cell')
+        self.assertRaises(exception.NovaException,
+                          partitioned_scheduler.PartitionedScheduler)
+
+    @mock.patch.object(partitioned_scheduler.PartitionedScheduler,
+                       'hosts_up', return_value=['sched2'])
+    def test_update_partitions(self, mock_hosts_up):
+        self.driver._update_partitions(self.context)
+
+        mock_hosts_up.assert_called_once_with(self.context, 'scheduler')
+        self.assertEqual(['sched1', 'sched2'], self.driver.ring.members)
+        self.assertEqual({}, self.driver.partition_keys)
+
+    @mock.patch.object(objects.AggregateList, 'get_all')
+    @mock.patch.object(partitioned_scheduler.PartitionedScheduler,
+                       'hosts_up', return_value=['sched1'])
+    def test_update_partitions_by_aggregate(self, mock_hosts_up,
+                                            mock_get_all):
+        self.flags(scheduler_partition_mode='aggregate')
+        mock_get_all.return_value = [
+            objects.Aggregate(id=1, hosts=['host1', 'host2']),
+            objects.Aggregate(id=2, hosts=['host2', 'host3'])]
+
+        self.driver._update_partitions(self.context)
+
+        self.assertEqual({'host1': 'aggregate-1', 'host2': 'aggregate-1',
+                          'host3': 'aggregate-2'},
+                         self.driver.partition_keys)
+
+    @mock.patch.object(partitioned_scheduler.PartitionedScheduler,
+                       '_get_up_hosts', return_value=[])
+    @mock.patch.object(partitioned_scheduler.PartitionedScheduler,
+                       '_update_partitions')
+    def test_run_periodic_tasks(self, mock_update, mock_up_hosts):
+        context = mock.Mock()
+
+        self.driver.run_periodic_tasks(context)
+
+        self.assertTrue(mock_up_hosts.called)
+        mock_update.assert_called_once_with(context.elevated.return_value)
+
+    def test_split_host_states(self):
+        self._set_ring(['sched1', 'sched2'])
+
+        local, other = self.driver._split_host_states(self.context,
+                                                      self.host_states)
+
+        self.assertTrue(local)
+        self.assertTrue(other)
+        for host_state in local:
+            self.assertEqual('sched1',
+                             self.driver.ring.get_member(host_state.host))
+        for host_state in other:
+            self.assertEqual('sched2',
+                             self.driver.ring.get_member(host_state.host))
+
+    def test_split_host_states_by_aggregate(self):
+        self._set_ring(['sched1', 'sched2'])
+        self.driver.partition_keys = {host_state.host: 'aggregate-1'
+                                      for host_state in self.host_states}
+
+        local, other = self.driver._split_host_states(self.context,
+                                                      self.host_states)
+
+        self.assertEqual(20, len(local) + len(other))
+        self.assertEqual(0, min(len(local), len(other)))
+
+    @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule')
+    def test_schedule_local_partition(self, mock_schedule):
+        self._set_ring(['sched1', 'sched2'])
+        self.driver.all_host_states = self.host_states
+        local, other = self.driver._split_host_states(self.context,
+                                                      self.host_states)
+        mock_schedule.return_value = [mock.sentinel.host1]
+        request_spec = {'num_instances': 1}
+
+        selected = self.driver._schedule(self.context, request_spec, {})
+
+        self.assertEqual([mock.sentinel.host1], selected)
+        mock_schedule.assert_called_once_with(self.context, request_spec, {},
+                                              hosts=local)
+
+    @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule')
+    def test_schedule_spill_over(self, mock_schedule):
+        self._set_ring(['sched1', 'sched2'])
+        self.driver.all_host_states = self.host_states
+        local, other = self.driver._split_host_states(self.context,
+                                                      self.host_states)
+        mock_schedule.side_effect = [[mock.sentinel.host1],
+                                     [mock.sentinel.host2,
+                                      mock.sentinel.host3]]
+        request_spec = {'num_instances': 3}
+        filter_properties = {}
+
+        selected = self.driver._schedule(self.context, request_spec,
+                                         filter_properties)
+
+        self.assertEqual([mock.sentinel.host1, mock.sentinel.host2,
+                          mock.sentinel.host3], selected)
+        self.assertEqual([
+            mock.call(self.context, request_spec, filter_properties,
+                      hosts=local),
+            mock.call(self.context, {'num_instances': 2}, filter_properties,
+                      hosts=other)], mock_schedule.call_args_list)
+        self.assertIs(request_spec, filter_properties['request_spec'])
+
+    @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule')
+    def test_schedule_spill_over_disabled(self, mock_schedule):
+        self.flags(scheduler_partition_spill_over=False)
+        self._set_ring(['sched1', 'sched2'])
+        self.driver.all_host_states = self.host_states
+        mock_schedule.return_value = []
+
+        selected = self.driver._schedule(self.context, {'num_instances': 1},
+                                         {})
+
+        self.assertEqual([], selected)
+        self.assertEqual(1, mock_schedule.call_count)
+
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_select_destinations_spills_over(self, mock_get_extra):
+        self._set_ring(['sched2'])
+        self.stubs.Set(self.driver.host_manager, 'get_filtered_hosts',
+                       test_filter_scheduler.fake_get_filtered_hosts)
+        host_state = fakes.FakeHostState('host1', 'node1',
+                                         {'free_ram_mb': 1024,
+                                          'free_disk_mb': 10240,
+                                          'vcpus_total': 4,
+                                          'vcpus_used': 0})
+        self.driver.all_host_states = [host_state]
+        request_spec = {'instance_type': {'memory_mb': 512, 'root_gb': 1,
+                                          'ephemeral_gb': 0, 'vcpus': 1},
+                        'instance_properties': {'project_id': 1,
+                                                'root_gb': 1,
+                                                'memory_mb': 512,
+                                                'ephemeral_gb': 0,
+                                                'vcpus': 1,
+                                                'os_type': 'Linux',
+                                                'uuid': 'fake-uuid'},
+                        'num_instances': 1}
+
+        dests = self.driver.select_destinations(self.context, request_spec,
+                                                {})
+
+        self.assertEqual('host1', dests[0]['host'])
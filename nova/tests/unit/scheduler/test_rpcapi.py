@@ -68,3 +68,22 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
                 request_spec='fake_request_spec',
                 filter_properties='fake_prop',
                 version='4.0')
+
+    def test_update_compute_node(self):
+        self._test_scheduler_api('update_compute_node', rpc_method='cast',
+                compute_node='fake_compute_node',
+                version='4.1', fanout=True)
+
+    def test_get_scheduler_stats(self):
+        self._test_scheduler_api('get_scheduler_stats', rpc_method='call',
+                reset=True, version='4.2')
+
+    def test_update_aggregates(self):
+        self._test_scheduler_api('update_aggregates', rpc_method='cast',
+                aggregates='fake_aggregates',
+                version='4.3', fanout=True)
+
+    def test_delete_aggregate(self):
+        self._test_scheduler_api('delete_aggregate', rpc_method='cast',
+                aggregate='fake_aggregate',
+                version='4.3', fanout=True)
@@ -18,11 +18,15 @@ Tests For Scheduler
 """
 
 import mock
+import oslo_messaging as messaging
 
 from nova import context
 from nova import db
+from nova import exception
+from nova import objects
 from nova.scheduler import driver
 from nova.scheduler import manager
+from nova.scheduler import stats as scheduler_stats
 from nova import servicegroup
 from nova import test
 from nova.tests.unit import fake_server_actions
@@ -56,6 +60,49 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
             self.manager.select_destinations(None, None, {})
             select_destinations.assert_called_once_with(None, None, {})
 
+    def test_update_compute_node(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'update_compute_node'
+                ) as update_compute_node:
+            self.manager.update_compute_node(self.context, 'fake_node')
+            update_compute_node.assert_called_once_with('fake_node')
+
+    def test_update_aggregates(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'update_aggregates'
+                ) as update_aggregates:
+            self.manager.update_aggregates(self.context, ['fake_agg'])
+            update_aggregates.assert_called_once_with(['fake_agg'])
+
+    def test_delete_aggregate(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'delete_aggregate'
+                ) as delete_aggregate:
+            self.manager.delete_aggregate(self.context, 'fake_agg')
+            delete_aggregate.assert_called_once_with('fake_agg')
+
+    @mock.patch.object(scheduler_stats, 'end_request')
+    @mock.patch.object(scheduler_stats, 'start_request')
+    def test_select_destination_records_request(self, mock_start, mock_end):
+        with mock.patch.object(self.manager.driver, 'select_destinations',
+                               side_effect=exception.NoValidHost(reason='')):
+            self.assertRaises(messaging.ExpectedException,
+                              self.manager.select_destinations,
+                              self.context, {'num_instances': 1}, {})
+        mock_end.assert_called_once_with(mock_start.return_value,
+                                         {'num_instances': 1})
+
+    @mock.patch.object(scheduler_stats, 'reset_stats')
+    @mock.patch.object(scheduler_stats, 'get_stats')
+    def test_get_scheduler_stats(self, mock_get_stats, mock_reset_stats):
+        result = self.manager.get_scheduler_stats(self.context)
+
+        self.assertEqual(mock_get_stats.return_value, result)
+        self.assertFalse(mock_reset_stats.called)
+
+        self.manager.get_scheduler_stats(self.context, reset=True)
+        mock_reset_stats.assert_called_once_with()
+
 
 class SchedulerV3PassthroughTestCase(test.TestCase):
     def setUp(self):
@@ -78,6 +125,10 @@ class SchedulerTestCase(test.NoDBTestCase):
 
     def setUp(self):
         super(SchedulerTestCase, self).setUp()
+        patcher = mock.patch.object(objects.AggregateList, 'get_all',
+                                    return_value=[])
+        self.mock_get_aggregates = patcher.start()
+        self.addCleanup(patcher.stop)
         self.driver = self.driver_cls()
         self.context = context.RequestContext('fake_user', 'fake_project')
         self.topic = 'fake_topic'
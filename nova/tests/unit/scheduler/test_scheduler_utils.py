@@ -259,8 +259,10 @@ class SchedulerUtilsTestCase(test.NoDBTestCase):
             group_info = scheduler_utils._get_group_details(
                 self.context, 'fake_uuid', group_hosts)
             self.assertEqual(
-                (set(['hostA', 'hostB']), [policy]),
+                (set(['hostB']), [policy], group.uuid, group.members),
                 group_info)
+            # The hosts of the members are read by the scheduler
+            self.assertFalse(get_hosts.called)
 
     def test_get_group_details(self):
         for policy in ['affinity', 'anti-affinity']:
@@ -317,7 +319,8 @@ class SchedulerUtilsTestCase(test.NoDBTestCase):
     @mock.patch.object(scheduler_utils, '_get_group_details')
     def test_setup_instance_group_in_filter_properties(self, mock_ggd):
         mock_ggd.return_value = scheduler_utils.GroupDetails(
-            hosts=set(['hostA', 'hostB']), policies=['policy'])
+            hosts=set(['hostA', 'hostB']), policies=['policy'],
+            uuid='fake-group-uuid', members=['fake-uuid'])
         spec = {'instance_properties': {'uuid': 'fake-uuid'}}
         filter_props = {'group_hosts': ['hostC']}
 
@@ -327,7 +330,9 @@ class SchedulerUtilsTestCase(test.NoDBTestCase):
                                          ['hostC'])
         expected_filter_props = {'group_updated': True,
                                  'group_hosts': set(['hostA', 'hostB']),
-                                 'group_policies': ['policy']}
+                                 'group_policies': ['policy'],
+                                 'group_uuid': 'fake-group-uuid',
+                                 'group_members': ['fake-uuid']}
         self.assertEqual(expected_filter_props, filter_props)
 
     @mock.patch.object(scheduler_utils, '_get_group_details')
@@ -0,0 +1,125 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the scheduler filter and weigher statistics.
+"""
+
+import mock
+
+from nova.scheduler import filters
+from nova.scheduler import stats
+from nova.scheduler import weights
+from nova import test
+from nova.tests.unit.scheduler import fakes
+
+
+class HistogramTestCase(test.NoDBTestCase):
+
+    def test_add(self):
+        histogram = stats.Histogram()
+        for value in (0.5, 1, 3, 7000):
+            histogram.add(value)
+
+        result = histogram.to_dict()
+        self.assertEqual(4, result['count'])
+        self.assertEqual(7004.5, result['total_ms'])
+        self.assertEqual(0.5, result['min_ms'])
+        self.assertEqual(7000, result['max_ms'])
+        buckets = {bound: count for bound, count in result['buckets']
+                   if count}
+        self.assertEqual({1: 2, 5: 1, None: 1}, buckets)
+
+
+class SchedulerStatsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(SchedulerStatsTestCase, self).setUp()
+        self.flags(scheduler_collect_stats=True)
+        stats.reset_stats()
+        self.addCleanup(stats.reset_stats)
+
+    def test_record(self):
+        stats.record('filter', 'RamFilter', 0.002, 10, 4)
+        stats.record('filter', 'RamFilter', 0.001, 4, 4)
+        stats.record('weigher', 'RAMWeigher', 0.001, 4, 4)
+
+        result = stats.get_stats()
+        ram_filter = result['filters']['RamFilter']
+        self.assertEqual(2, ram_filter['time']['count'])
+        self.assertEqual(14, ram_filter['hosts_in'])
+        self.assertEqual(6, ram_filter['hosts_removed'])
+        self.assertEqual(['RAMWeigher'], result['weighers'].keys())
+
+    def test_record_disabled(self):
+        self.flags(scheduler_collect_stats=False)
+        stats.record('filter', 'RamFilter', 0.002, 10, 4)
+        self.assertEqual({}, stats.get_stats()['filters'])
+
+    def test_reset_stats(self):
+        stats.record('filter', 'RamFilter', 0.002, 10, 4)
+        stats.reset_stats()
+        self.assertEqual({}, stats.get_stats()['filters'])
+
+    @mock.patch.object(stats.LOG, 'warning')
+    @mock.patch('time.time')
+    def test_slow_request_logged(self, mock_time, mock_warning):
+        self.flags(scheduler_slow_request_time=1.0)
+        mock_time.side_effect = [10.0, 12.0]
+
+        start = stats.start_request()
+        stats.record('filter', 'RamFilter', 0.5, 10, 4)
+        stats.record('filter', 'RamFilter', 0.25, 4, 3)
+        stats.end_request(start, {'num_instances': 2})
+
+        self.assertEqual(1, stats.get_stats()['requests']['count'])
+        self.assertEqual(1, mock_warning.call_count)
+        params = mock_warning.call_args[0][1]
+        self.assertEqual(2, params['elapsed'])
+        self.assertEqual('RamFilter 2 run(s) 750.0ms removed 7 host(s)',
+                         params['runs'])
+
+    @mock.patch.object(stats.LOG, 'warning')
+    @mock.patch('time.time')
+    def test_fast_request_not_logged(self, mock_time, mock_warning):
+        self.flags(scheduler_slow_request_time=1.0)
+        mock_time.side_effect = [10.0, 10.5]
+
+        start = stats.start_request()
+        stats.record('filter', 'RamFilter', 0.5, 10, 4)
+        stats.end_request(start, {'num_instances': 1})
+
+        self.assertFalse(mock_warning.called)
+
+    def test_handlers_record_runs(self):
+        class OddFilter(filters.BaseHostFilter):
+            def host_passes(self, host_state, filter_properties):
+                return int(host_state.host[-1]) % 2
+
+        class FakeWeigher(weights.BaseHostWeigher):
+            def _weigh_object(self, host_state, weight_properties):
+                return 1.0
+
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i, {})
+                 for i in xrange(4)]
+        hosts = filters.HostFilterHandler().get_filtered_objects(
+            [OddFilter()], hosts, {})
+        weights.HostWeightHandler().get_weighed_objects(
+            [FakeWeigher()], hosts, {})
+
+        result = stats.get_stats()
+        self.assertEqual(4, result['filters']['OddFilter']['hosts_in'])
+        self.assertEqual(2, result['filters']['OddFilter']['hosts_removed'])
+        self.assertEqual(1,
+                         result['weighers']['FakeWeigher']['time']['count'])
@@ -19,6 +19,7 @@ Tests For Scheduler weights.
 from nova import exception
 from nova.scheduler import host_manager
 from nova.scheduler import weights
+from nova.scheduler.weights import image_cache
 from nova.scheduler.weights import io_ops
 from nova.scheduler.weights import metrics
 from nova.scheduler.weights import ram
@@ -40,6 +41,7 @@ class TestWeighedHost(test.NoDBTestCase):
         self.assertIn(ram.RAMWeigher, classes)
         self.assertIn(metrics.MetricsWeigher, classes)
         self.assertIn(io_ops.IoOpsWeigher, classes)
+        self.assertIn(image_cache.ImageCacheWeigher, classes)
 
 
 class RamWeigherTestCase(test.NoDBTestCase):
@@ -313,3 +315,49 @@ class IoOpsWeigherTestCase(test.NoDBTestCase):
         self._do_test(io_ops_weight_multiplier=2.0,
                       expected_weight=2.0,
                       expected_host='host4')
+
+
+class ImageCacheWeigherTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ImageCacheWeigherTestCase, self).setUp()
+        self.weight_handler = weights.HostWeightHandler()
+        self.weighers = [image_cache.ImageCacheWeigher()]
+        # sha1('image1') starts with 1edf82c214f4
+        self.weight_properties = {
+            'request_spec': {'instance_properties': {'image_ref': 'image1'}}}
+
+    def _get_weighed_hosts(self, weight_properties):
+        host_values = [
+            ('host1', 'node1', {'stats': {'cached_images': 'aaaaaaaaaaaa'}}),
+            ('host2', 'node2', {'stats': {
+                'cached_images': '1edf82c214f4,bbbbbbbbbbbb'}}),
+            ('host3', 'node3', {'stats': {}}),
+        ]
+        hosts = [fakes.FakeHostState(host, node, values)
+                 for host, node, values in host_values]
+        return self.weight_handler.get_weighed_objects(self.weighers,
+                                                       hosts,
+                                                       weight_properties)
+
+    def test_default_multiplier_disabled(self):
+        weighed_hosts = self._get_weighed_hosts(self.weight_properties)
+        self.assertEqual([0.0, 0.0, 0.0], [h.weight for h in weighed_hosts])
+
+    def test_prefers_host_with_image_cached(self):
+        self.flags(image_cache_weight_multiplier=1.0)
+        weighed_hosts = self._get_weighed_hosts(self.weight_properties)
+        self.assertEqual('host2', weighed_hosts[0].obj.host)
+        self.assertEqual(1.0, weighed_hosts[0].weight)
+        self.assertEqual([0.0, 0.0], [h.weight for h in weighed_hosts[1:]])
+
+    def test_negative_multiplier(self):
+        self.flags(image_cache_weight_multiplier=-1.0)
+        weighed_hosts = self._get_weighed_hosts(self.weight_properties)
+        self.assertEqual('host2', weighed_hosts[-1].obj.host)
+        self.assertEqual(-1.0, weighed_hosts[-1].weight)
+
+    def test_no_image_ref(self):
+        self.flags(image_cache_weight_multiplier=1.0)
+        weighed_hosts = self._get_weighed_hosts({})
+        self.assertEqual([0.0, 0.0, 0.0], [h.weight for h in weighed_hosts])
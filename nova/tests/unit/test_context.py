@@ -130,3 +130,8 @@ class ContextTestCase(test.NoDBTestCase):
         ctxt = context.RequestContext.from_dict(ctxt.to_dict())
 
         self.assertEqual(len(warns), 0, warns)
+
+    def test_to_dict_from_dict_keeps_db_written(self):
+        ctxt = context.RequestContext('111', '222', db_written=True)
+        ctxt = context.RequestContext.from_dict(ctxt.to_dict())
+        self.assertTrue(ctxt.db_written)
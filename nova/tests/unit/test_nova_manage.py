@@ -382,6 +382,44 @@ class DBCommandsTestCase(test.TestCase):
     def test_archive_deleted_rows_negative(self):
         self.assertEqual(1, self.commands.archive_deleted_rows(-1))
 
+    @mock.patch.object(db, 'archive_deleted_rows',
+                       return_value={'instances': 2})
+    def test_archive_deleted_rows(self, mock_archive):
+        self.commands.archive_deleted_rows(None)
+        mock_archive.assert_called_once_with(mock.ANY, 1000)
+
+    @mock.patch('time.sleep')
+    @mock.patch.object(db, 'archive_deleted_rows')
+    def test_archive_deleted_rows_until_complete(self, mock_archive,
+                                                 mock_sleep):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        mock_archive.side_effect = [{'instances': 10, 'instance_extra': 10},
+                                    {'instances': 5}, {}]
+
+        self.commands.archive_deleted_rows(20, until_complete=True, sleep='2',
+                                           verbose=True)
+
+        self.assertEqual([mock.call(mock.ANY, 20)] * 3,
+                         mock_archive.call_args_list)
+        self.assertEqual([mock.call(2.0)] * 2, mock_sleep.call_args_list)
+        output = sys.stdout.getvalue()
+        self.assertIn('Archived 5 rows, 25 so far', output)
+        self.assertIn('instance_extra: 10\ninstances: 15', output)
+
+    @mock.patch.object(db, 'instance_system_metadata_blobs_rebuild')
+    def test_rebuild_system_metadata_blobs(self, mock_rebuild):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        mock_rebuild.side_effect = [(2, 5), (1, 7)]
+
+        self.commands.rebuild_system_metadata_blobs(max_number='2')
+
+        self.assertEqual([mock.call(mock.ANY, 2, marker=None),
+                          mock.call(mock.ANY, 2, marker=5)],
+                         mock_rebuild.call_args_list)
+        self.assertIn('3 instances done', sys.stdout.getvalue())
+
     @mock.patch.object(migration, 'db_null_instance_uuid_scan',
                        return_value={'foo': 0})
     def test_null_instance_uuid_scan_no_records_found(self, mock_scan):
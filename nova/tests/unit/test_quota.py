@@ -16,6 +16,7 @@
 
 import datetime
 
+import mock
 from oslo_config import cfg
 from oslo_utils import timeutils
 
@@ -2340,6 +2341,48 @@ class DbQuotaDriverTestCase(test.TestCase):
         self.assertEqual(calls, exemplar)
 
 
+class OptimisticDbQuotaDriverTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(OptimisticDbQuotaDriverTestCase, self).setUp()
+        self.flags(until_refresh=5, max_age=60)
+        self.driver = quota.OptimisticDbQuotaDriver()
+        self.context = FakeContext('test_project', 'test_class')
+
+    @mock.patch.object(db, 'quota_reserve')
+    @mock.patch.object(db, 'quota_reserve_optimistic',
+                       return_value=['resv-1'])
+    def test_reserve(self, mock_reserve, mock_locking_reserve):
+        expire = timeutils.utcnow()
+        quotas = {'instances': 10}
+        with mock.patch.object(self.driver, '_get_quotas',
+                               return_value=quotas), \
+                mock.patch.object(db, 'quota_get_all_by_project'):
+            result = self.driver.reserve(self.context,
+                                         quota.QUOTAS._resources,
+                                         dict(instances=2), expire=expire)
+
+        self.assertEqual(['resv-1'], result)
+        mock_reserve.assert_called_once_with(
+            self.context, quota.QUOTAS._resources, quotas, quotas,
+            dict(instances=2), expire, 5, 60, project_id='test_project',
+            user_id='fake_user')
+        self.assertFalse(mock_locking_reserve.called)
+
+    @mock.patch.object(db, 'reservation_commit_optimistic')
+    def test_commit(self, mock_commit):
+        self.driver.commit(self.context, ['resv-1'])
+        mock_commit.assert_called_once_with(self.context, ['resv-1'],
+                                            project_id='test_project',
+                                            user_id='fake_user')
+
+    @mock.patch.object(db, 'reservation_rollback_optimistic')
+    def test_rollback(self, mock_rollback):
+        self.driver.rollback(self.context, ['resv-1'])
+        mock_rollback.assert_called_once_with(self.context, ['resv-1'],
+                                              project_id='test_project',
+                                              user_id='fake_user')
+
+
 class FakeSession(object):
     def begin(self):
         return self
@@ -2441,7 +2484,7 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
             return FakeSession()
 
         def fake_get_project_user_quota_usages(context, session, project_id,
-                                               user_id):
+                                               user_id, lock=True):
             return self.usages.copy(), self.usages.copy()
 
         def fake_quota_usage_create(project_id, user_id, resource,
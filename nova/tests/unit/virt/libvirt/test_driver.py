@@ -87,6 +87,7 @@ from nova.virt.libvirt import driver as libvirt_driver
 from nova.virt.libvirt import firewall
 from nova.virt.libvirt import host
 from nova.virt.libvirt import imagebackend
+from nova.virt.libvirt import imagecache
 from nova.virt.libvirt import lvm
 from nova.virt.libvirt import rbd_utils
 from nova.virt.libvirt import utils as libvirt_utils
@@ -4578,6 +4579,15 @@ class LibvirtConnTestCase(test.NoDBTestCase):
         self.assertEqual(uuids[3], vm4.UUIDString())
         mock_list.assert_called_with(only_running=False)
 
+    @mock.patch.object(host.Host, "get_domain_states")
+    def test_get_all_instance_power_states(self, mock_states):
+        mock_states.return_value = {'uuid1': libvirt_driver.VIR_DOMAIN_BLOCKED,
+                                    'uuid2': libvirt_driver.VIR_DOMAIN_SHUTOFF}
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.assertEqual({'uuid1': power_state.RUNNING,
+                          'uuid2': power_state.SHUTDOWN},
+                         drvr.get_all_instance_power_states())
+
     @mock.patch.object(host.Host, "list_instance_domains")
     def test_get_all_block_devices(self, mock_list):
         xml = [
@@ -11812,8 +11822,10 @@ class HostStateTestCase(test.NoDBTestCase):
         def _get_host_numa_topology(self):
             return HostStateTestCase.numa_topology
 
+    @mock.patch.object(imagecache, 'get_cached_images_summary',
+                       return_value='356a192b7913')
     @mock.patch.object(libvirt, "openAuth")
-    def test_update_status(self, mock_open):
+    def test_update_status(self, mock_open, mock_summary):
         mock_open.return_value = fakelibvirt.Connection("qemu:///system")
 
         drvr = HostStateTestCase.FakeConnection()
@@ -11843,6 +11855,7 @@ class HostStateTestCase(test.NoDBTestCase):
                             stats['numa_topology'])._to_dict(),
                         matchers.DictMatches(
                                 HostStateTestCase.numa_topology._to_dict()))
+        self.assertEqual({'cached_images': '356a192b7913'}, stats['stats'])
 
 
 class LibvirtDriverTestCase(test.NoDBTestCase):
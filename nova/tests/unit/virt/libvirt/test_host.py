@@ -556,6 +556,48 @@ class HostTestCase(test.NoDBTestCase):
         self.assertEqual(doms[2].name(), vm2.name())
         mock_list.assert_called_with(True)
 
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats",
+                       create=True)
+    @mock.patch.object(libvirt, "VIR_DOMAIN_STATS_STATE", new=1,
+                       create=True)
+    def test_get_domain_states_fast(self, mock_stats):
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        mock_stats.return_value = [
+            (vm1, {'state.state': libvirt.VIR_DOMAIN_RUNNING,
+                   'state.reason': 1}),
+            (vm2, {'state.state': libvirt.VIR_DOMAIN_SHUTOFF,
+                   'state.reason': 0})]
+
+        states = self.host.get_domain_states()
+
+        mock_stats.assert_called_once_with(libvirt.VIR_DOMAIN_STATS_STATE)
+        self.assertEqual({vm1.UUIDString(): libvirt.VIR_DOMAIN_RUNNING,
+                          vm2.UUIDString(): libvirt.VIR_DOMAIN_SHUTOFF},
+                         states)
+
+    @mock.patch.object(host.Host, "list_instance_domains")
+    @mock.patch.object(host.Host, "_get_domain_states_fast")
+    def test_get_domain_states_fallback(self, mock_fast, mock_list):
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm1.info = mock.Mock(return_value=[libvirt.VIR_DOMAIN_RUNNING])
+        # Undefined since it was listed
+        vm2 = FakeVirtDomain(name="instance00000002")
+        vm2.info = mock.Mock(side_effect=fakelibvirt.make_libvirtError(
+            libvirt.libvirtError, "Domain not found",
+            error_code=libvirt.VIR_ERR_NO_DOMAIN))
+        mock_fast.side_effect = AttributeError
+        mock_list.return_value = [vm1, vm2]
+
+        states = self.host.get_domain_states()
+        self.assertEqual({vm1.UUIDString(): libvirt.VIR_DOMAIN_RUNNING},
+                         states)
+        mock_list.assert_called_once_with(only_running=False)
+
+        # The bulk API is not tried again
+        self.host.get_domain_states()
+        mock_fast.assert_called_once_with()
+
     def test_cpu_features_bug_1217630(self):
         self.host.get_connection()
 
@@ -25,6 +25,7 @@ from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_serialization import jsonutils
 from oslo_utils import importutils
+from oslo_utils import units
 
 from nova import conductor
 from nova import context
@@ -551,6 +552,209 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
             self.assertEqual(image_cache_manager.corrupt_base_files,
                              [fname])
 
+    def test_handle_base_image_prefetched(self):
+        img = '123'
+
+        with self._make_base_file() as fname:
+            os.utime(fname, (-1, time.time() - 3601))
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.unexplained_images = [fname]
+            image_cache_manager.prefetch_images = set([img])
+            image_cache_manager._handle_base_image(img, fname)
+
+            self.assertEqual(image_cache_manager.unexplained_images, [])
+            self.assertEqual(image_cache_manager.active_base_files, [fname])
+            self.assertEqual(image_cache_manager.removable_base_files, [])
+
+    def test_handle_base_image_used_records_usage(self):
+        self.flags(image_cache_eviction_policy='lfu', group='libvirt')
+        self.stubs.Set(libvirt_utils, 'chown', lambda x, y: None)
+        img = '123'
+
+        with self._make_base_file() as fname:
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.used_images = {'123': (1, 2, ['banana-42'])}
+            image_cache_manager._handle_base_image(img, fname)
+            image_cache_manager._handle_base_image(img, fname)
+
+            self.assertEqual(6, imagecache.read_stored_info(fname,
+                                                            field='uses'))
+
+    def _make_cache(self, tmpdir, ages):
+        base_dir = os.path.join(tmpdir, '_base')
+        os.mkdir(base_dir)
+        base_files = []
+        for name, age in ages:
+            fname = os.path.join(base_dir, name)
+            with open(fname, 'w') as f:
+                f.write('data')
+            os.utime(fname, (-1, time.time() - age))
+            base_files.append(fname)
+        return base_dir, base_files
+
+    @mock.patch.object(imagecache.ImageCacheManager, '_get_disk_usage',
+                       return_value=units.Mi)
+    def test_evict_base_files_within_budget(self, mock_usage):
+        self.flags(image_cache_max_size_mb=3, group='libvirt')
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            base_dir, base_files = self._make_cache(
+                tmpdir, [('a', 10 * 24 * 3600), ('b', 20 * 24 * 3600)])
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.removable_base_files = base_files
+            image_cache_manager._evict_base_files(base_dir)
+
+            for fname in base_files:
+                self.assertTrue(os.path.exists(fname))
+
+    @mock.patch.object(imagecache.ImageCacheManager, '_get_disk_usage',
+                       return_value=units.Mi)
+    def test_evict_base_files_lru(self, mock_usage):
+        self.flags(image_cache_max_size_mb=2, group='libvirt')
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            base_dir, base_files = self._make_cache(
+                tmpdir, [('a', 60), ('b', 3 * 60), ('c', 2 * 60),
+                         ('d', 10)])
+            a, b, c, d = base_files
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.removable_base_files = [a, b, c]
+            image_cache_manager._evict_base_files(base_dir)
+
+            self.assertFalse(os.path.exists(b))
+            self.assertFalse(os.path.exists(c))
+            self.assertTrue(os.path.exists(a))
+            self.assertTrue(os.path.exists(d))
+
+    @mock.patch.object(imagecache.ImageCacheManager, '_get_disk_usage',
+                       return_value=units.Mi)
+    def test_evict_base_files_lfu(self, mock_usage):
+        self.flags(image_cache_max_size_mb=2, group='libvirt')
+        self.flags(image_cache_eviction_policy='lfu', group='libvirt')
+        self.flags(image_info_filename_pattern=('$instances_path/'
+                                                '%(image)s.info'),
+                   group='libvirt')
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            base_dir, base_files = self._make_cache(
+                tmpdir, [('a', 60), ('b', 3 * 60), ('c', 2 * 60)])
+            a, b, c = base_files
+            imagecache.write_stored_info(a, field='uses', value=1)
+            imagecache.write_stored_info(b, field='uses', value=50)
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.removable_base_files = base_files
+            image_cache_manager._evict_base_files(base_dir)
+
+            self.assertFalse(os.path.exists(c))
+            self.assertTrue(os.path.exists(a))
+            self.assertTrue(os.path.exists(b))
+
+    @mock.patch.object(objects.AggregateList, 'get_by_host')
+    def test_list_prefetch_images(self, mock_get_by_host):
+        self.flags(image_cache_prefetch_images=['1', '2'],
+                   image_cache_prefetch_aggregates=True, group='libvirt')
+        mock_get_by_host.return_value = [
+            objects.Aggregate(metadata={'image_cache_prefetch': '2, 3,'}),
+            objects.Aggregate(metadata={'image_cache_prefetch': '4'})]
+        ctxt = context.get_admin_context()
+
+        image_cache_manager = imagecache.ImageCacheManager()
+        self.assertEqual(set(['1', '2', '3', '4']),
+                         image_cache_manager._list_prefetch_images(ctxt))
+        mock_get_by_host.assert_called_once_with(
+            ctxt, CONF.host, key='image_cache_prefetch')
+
+    @mock.patch.object(objects.AggregateList, 'get_by_host')
+    def test_list_prefetch_images_no_aggregates(self, mock_get_by_host):
+        self.flags(image_cache_prefetch_images=['1'], group='libvirt')
+
+        image_cache_manager = imagecache.ImageCacheManager()
+        self.assertEqual(set(['1']),
+                         image_cache_manager._list_prefetch_images(None))
+        self.assertFalse(mock_get_by_host.called)
+
+    @mock.patch.object(utils, 'spawn_n')
+    @mock.patch.object(libvirt_utils, 'fetch_image')
+    def test_prefetch(self, mock_fetch, mock_spawn):
+        mock_spawn.side_effect = lambda f, *args: f(*args)
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            cached = hashlib.sha1('1').hexdigest()
+            base_dir, base_files = self._make_cache(tmpdir, [(cached, 0)])
+            ctxt = context.RequestContext('fake-user', 'fake-project')
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.prefetch(ctxt, ['1', '2'])
+
+            self.assertEqual(1, mock_spawn.call_count)
+            mock_fetch.assert_called_once_with(
+                ctxt, os.path.join(base_dir, hashlib.sha1('2').hexdigest()),
+                '2', 'fake-user', 'fake-project')
+            self.assertEqual(set(), image_cache_manager.prefetching)
+
+    @mock.patch.object(utils, 'spawn_n')
+    def test_prefetch_in_progress(self, mock_spawn):
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            ctxt = context.RequestContext('fake-user', 'fake-project')
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.prefetch(ctxt, ['1'])
+            image_cache_manager.prefetch(ctxt, ['1'])
+
+            self.assertEqual(1, mock_spawn.call_count)
+            self.assertEqual(set(['1']), image_cache_manager.prefetching)
+
+    def _test_update_prefetch(self, ctxt):
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            self.flags(image_cache_prefetch_images=['1'], group='libvirt')
+            self._make_cache(tmpdir, [])
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            with mock.patch.object(image_cache_manager,
+                                   'prefetch') as mock_prefetch:
+                image_cache_manager.update(ctxt, [])
+            return mock_prefetch
+
+    def test_update_prefetch_without_token(self):
+        self.flags(auth_strategy='keystone')
+        ctxt = context.get_admin_context()
+        self.assertFalse(self._test_update_prefetch(ctxt).called)
+
+    def test_update_prefetch_noauth(self):
+        self.flags(auth_strategy='noauth')
+        ctxt = context.get_admin_context()
+        self._test_update_prefetch(ctxt).assert_called_once_with(
+            ctxt, set(['1']))
+
+    def test_update_prefetch_with_token(self):
+        self.flags(auth_strategy='keystone')
+        ctxt = context.RequestContext('fake-user', 'fake-project',
+                                      auth_token='fake-token')
+        self._test_update_prefetch(ctxt).assert_called_once_with(
+            ctxt, set(['1']))
+
+    def test_get_cached_images_summary(self):
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            hashed_1 = hashlib.sha1('1').hexdigest()
+            hashed_2 = hashlib.sha1('2').hexdigest()
+            base_dir, base_files = self._make_cache(
+                tmpdir, [(hashed_1, 0), (hashed_1 + '_10737418240', 0),
+                         (hashed_2, 0), ('swap_128', 0)])
+
+            self.assertEqual(','.join(sorted([hashed_1[:12], hashed_2[:12]])),
+                             imagecache.get_cached_images_summary())
+
+    def test_get_cached_images_summary_no_base(self):
+        self.flags(instances_path='/tmp/no/such/dir/name/please')
+        self.assertEqual('', imagecache.get_cached_images_summary())
+
     def test_verify_base_images(self):
         hashed_1 = '356a192b7913b04c54574d18c28d46e6395428ab'
         hashed_21 = '472b07b9fcf2c2451e8781e944bf5f77cd8457c8'
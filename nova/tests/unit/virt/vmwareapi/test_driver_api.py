@@ -508,6 +508,11 @@ class VMwareAPIVMTestCase(test.NoDBTestCase):
         uuids = self.conn.list_instance_uuids()
         self.assertEqual(len(uuids), 1)
 
+    def test_get_all_instance_power_states(self):
+        self._create_vm()
+        power_states = self.conn.get_all_instance_power_states()
+        self.assertEqual({self.uuid: power_state.RUNNING}, power_states)
+
     def test_list_instance_uuids_invalid_uuid(self):
         self._create_vm(uuid='fake_id')
         uuids = self.conn.list_instance_uuids()
@@ -384,6 +384,12 @@ class XenAPIVMTestCase(stubs.XenAPITestBase):
         self.assertEqual(len(uuids), len(instance_uuids))
         self.assertEqual(set(uuids), set(instance_uuids))
 
+    def test_get_all_instance_power_states(self):
+        uuids = [self._create_instance()['uuid'] for x in xrange(2)]
+        power_states = self.conn.get_all_instance_power_states()
+        self.assertEqual(dict.fromkeys(uuids, power_state.RUNNING),
+                         power_states)
+
     def test_get_rrd_server(self):
         self.flags(connection_url='myscheme://myaddress/',
                    group='xenserver')
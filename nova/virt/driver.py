@@ -225,6 +225,17 @@ class ComputeDriver(object):
         """
         raise NotImplementedError()
 
+    def get_all_instance_power_states(self):
+        """Return the power states of all the instances known to the
+        virtualization layer, as a dict of power states by instance uuid.
+
+        This lets the power state sync compare all the instances of a host
+        with the hypervisor at once, rather than calling get_info() for
+        each of them. Drivers which cannot fetch the power states in bulk
+        cheaply should not implement it.
+        """
+        raise NotImplementedError()
+
     def rebuild(self, context, instance, image_meta, injected_files,
                 admin_password, bdms, detach_block_devices,
                 attach_block_devices, network_info=None,
@@ -1158,6 +1169,19 @@ class ComputeDriver(object):
         """
         pass
 
+    def prefetch_images(self, context, image_ids):
+        """Fetch images into the driver's local image cache ahead of time.
+
+        Called with the images listed in the image_cache_prefetch metadata
+        of an aggregate of the host, when it is set or when the host joins
+        the aggregate. The fetch is expected to happen in the background.
+
+        :param context: the request context, which is allowed to download
+                        the images
+        :param image_ids: list of the IDs of the images to fetch
+        """
+        raise NotImplementedError()
+
     def add_to_aggregate(self, context, aggregate, host, **kwargs):
         """Add a compute host to an aggregate."""
         # NOTE(jogo) Currently only used for XenAPI-Pool
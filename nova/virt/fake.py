@@ -134,6 +134,9 @@ class FakeDriver(driver.ComputeDriver):
     def list_instance_uuids(self):
         return [self.instances[name].uuid for name in self.instances.keys()]
 
+    def get_all_instance_power_states(self):
+        return {i.uuid: i.state for i in self.instances.values()}
+
     def plug_vifs(self, instance, network_info):
         """Plug VIFs into networks."""
         pass
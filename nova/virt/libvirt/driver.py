@@ -593,6 +593,10 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return uuids
 
+    def get_all_instance_power_states(self):
+        return {uuid: LIBVIRT_POWER_STATE[state] for uuid, state
+                in self._host.get_domain_states().iteritems()}
+
     def plug_vifs(self, instance, network_info):
         """Plug VIFs into networks."""
         for vif in network_info:
@@ -4899,6 +4903,11 @@ class LibvirtDriver(driver.ComputeDriver):
         else:
             data['numa_topology'] = None
 
+        # NOTE: lets the scheduler prefer hosts which already hold the
+        # image of an instance, see ImageCacheWeigher.
+        data['stats'] = {
+            'cached_images': imagecache.get_cached_images_summary()}
+
         return data
 
     def check_instance_shared_storage_local(self, context, instance):
@@ -5873,6 +5882,10 @@ class LibvirtDriver(driver.ComputeDriver):
         """Manage the local cache of images."""
         self.image_cache_manager.update(context, all_instances)
 
+    def prefetch_images(self, context, image_ids):
+        if CONF.libvirt.image_cache_prefetch_aggregates:
+            self.image_cache_manager.prefetch(context, image_ids)
+
     def _cleanup_remote_migration(self, dest, inst_base, inst_base_resize,
                                   shared_storage=False):
         """Used only for cleanup in case migrate_disk_and_power_off fails."""
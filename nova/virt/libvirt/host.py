@@ -79,6 +79,7 @@ class Host(object):
         self._conn_event_handler = conn_event_handler
         self._lifecycle_event_handler = lifecycle_event_handler
         self._skip_list_all_domains = False
+        self._skip_domain_stats = False
         self._caps = None
         self._hostname = None
 
@@ -585,6 +586,46 @@ class Host(object):
 
         return doms
 
+    def _get_domain_states_fast(self):
+        # The modern (>= 1.2.8) fast way - 1 single API call for the states
+        # of all domains
+        stats = self.get_connection().getAllDomainStats(
+            libvirt.VIR_DOMAIN_STATS_STATE)
+        return {dom.UUIDString(): record['state.state']
+                for dom, record in stats}
+
+    def _get_domain_states_slow(self):
+        # The legacy (< 1.2.8) slow way - O(n) API call for n domains
+        states = {}
+        for dom in self.list_instance_domains(only_running=False):
+            try:
+                states[dom.UUIDString()] = dom.info()[0]
+            except libvirt.libvirtError as ex:
+                # The domain may have been undefined since it was listed
+                if ex.get_error_code() != libvirt.VIR_ERR_NO_DOMAIN:
+                    raise
+        return states
+
+    def get_domain_states(self):
+        """Get the state of all the libvirt domains
+
+        Query libvirt for the state of all the domains, running or not,
+        in a single call when libvirt supports the bulk domain stats API.
+
+        :returns: dict of libvirt domain states (VIR_DOMAIN_*) by domain
+                  UUID
+        """
+        if not self._skip_domain_stats:
+            try:
+                return self._get_domain_states_fast()
+            except (libvirt.libvirtError, AttributeError) as ex:
+                LOG.info(_LI("Unable to use bulk domain stats APIs, "
+                             "falling back to slow code path: %(ex)s"),
+                         {'ex': ex})
+                self._skip_domain_stats = True
+
+        return self._get_domain_states_slow()
+
     def get_online_cpus(self):
         """Get the set of CPUs that are online on the host
 
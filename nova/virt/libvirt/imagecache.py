@@ -29,10 +29,13 @@ from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_serialization import jsonutils
+from oslo_utils import units
 
+from nova.compute import utils as compute_utils
 from nova.i18n import _LE
 from nova.i18n import _LI
 from nova.i18n import _LW
+from nova import objects
 from nova.openstack.common import fileutils
 from nova.openstack.common import log as logging
 from nova import utils
@@ -63,13 +66,45 @@ imagecache_opts = [
     cfg.IntOpt('checksum_interval_seconds',
                default=3600,
                help='How frequently to checksum base images'),
+    cfg.IntOpt('image_cache_max_size_mb',
+               default=0,
+               help='Disk budget in MB for the image cache. When set, unused '
+                    'base images are kept regardless of their age while the '
+                    'cache fits in the budget, and are evicted following '
+                    'image_cache_eviction_policy when it does not. When 0, '
+                    'unused base images are removed once old enough'),
+    cfg.StrOpt('image_cache_eviction_policy',
+               default='lru',
+               choices=('lru', 'lfu'),
+               help='Order in which unused base images are evicted when the '
+                    'image cache is over budget: "lru" evicts the least '
+                    'recently used images first, "lfu" the least frequently '
+                    'used ones'),
+    cfg.ListOpt('image_cache_prefetch_images',
+                default=[],
+                help='IDs of images to fetch into the image cache ahead of '
+                     'planned launches. Prefetched images are never removed '
+                     'from the cache. The periodic task has no token to '
+                     'download them with, so they are only fetched ahead '
+                     'of time when auth_strategy is not keystone'),
+    cfg.BoolOpt('image_cache_prefetch_aggregates',
+                default=False,
+                help='Also prefetch the images listed, comma separated, in '
+                     'the image_cache_prefetch metadata key of the '
+                     'aggregates of this host. They are fetched when the key '
+                     'is set or the host joins the aggregate, with the '
+                     'token of the request doing so'),
     ]
 
 CONF = cfg.CONF
 CONF.register_opts(imagecache_opts, 'libvirt')
 CONF.import_opt('instances_path', 'nova.compute.manager')
+CONF.import_opt('auth_strategy', 'nova.api.auth')
 CONF.import_opt('image_cache_subdirectory_name', 'nova.virt.imagecache')
 
+# Number of hex digits of the base image names reported to the scheduler.
+CACHED_IMAGE_PREFIX_LENGTH = 12
+
 
 def get_cache_fname(images, key):
     """Return a filename based on the SHA1 hash of a given image ID.
@@ -95,6 +130,26 @@ def get_cache_fname(images, key):
         return hashlib.sha1(image_id).hexdigest()
 
 
+def get_cached_images_summary():
+    """Summarise the images held in the image cache for the scheduler.
+
+    Returns a sorted, comma separated list of the first
+    CACHED_IMAGE_PREFIX_LENGTH characters of the name of each original base
+    image, that is of the SHA1 hash of its image id. An empty string is
+    returned when there is no image cache.
+    """
+    base_dir = os.path.join(CONF.instances_path,
+                            CONF.image_cache_subdirectory_name)
+    if not os.path.exists(base_dir):
+        return ''
+
+    digest_size = hashlib.sha1().digestsize * 2
+    prefixes = set(ent[:CACHED_IMAGE_PREFIX_LENGTH]
+                   for ent in os.listdir(base_dir)
+                   if len(ent) == digest_size)
+    return ','.join(sorted(prefixes))
+
+
 def get_info_filename(base_path):
     """Construct a filename for storing additional information about a base
     image.
@@ -237,6 +292,7 @@ class ImageCacheManager(imagecache.ImageCacheManager):
     def __init__(self):
         super(ImageCacheManager, self).__init__()
         self.lock_path = os.path.join(CONF.instances_path, 'locks')
+        self.prefetching = set()
         self._reset_state()
 
     def _reset_state(self):
@@ -245,6 +301,7 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         self.used_images = {}
         self.image_popularity = {}
         self.instance_names = set()
+        self.prefetch_images = set()
 
         self.back_swap_images = set()
         self.used_swap_images = set()
@@ -536,6 +593,7 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                           'remote': remote})
 
                 self.active_base_files.append(base_file)
+                self._record_usage(base_file, local + remote)
 
                 if not base_file:
                     LOG.warn(_LW('image %(id)s at (%(base_file)s): warning '
@@ -545,6 +603,14 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                                  'base_file': base_file,
                                  'instance_list': ' '.join(instances)})
 
+        if (not image_in_use and base_file and
+                img_id in self.prefetch_images):
+            image_in_use = True
+            LOG.info(_LI('image %(id)s at (%(base_file)s): prefetched'),
+                     {'id': img_id,
+                      'base_file': base_file})
+            self.active_base_files.append(base_file)
+
         if image_bad:
             self.corrupt_base_files.append(base_file)
 
@@ -565,6 +631,109 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                     libvirt_utils.chown(base_file, os.getuid())
                     os.utime(base_file, None)
 
+    def _record_usage(self, base_file, count):
+        """Count the instances using a base file for LFU eviction."""
+        if (CONF.libvirt.image_cache_eviction_policy != 'lfu' or
+                not base_file or not os.path.exists(base_file)):
+            return
+        uses = read_stored_info(base_file, field='uses') or 0
+        write_stored_info(base_file, field='uses', value=uses + count)
+
+    @staticmethod
+    def _get_disk_usage(path):
+        try:
+            return os.stat(path).st_blocks * 512
+        except OSError:
+            return 0
+
+    def _get_eviction_order(self, base_files):
+        """Sort unused base files in the order they should be evicted."""
+        if CONF.libvirt.image_cache_eviction_policy == 'lfu':
+            def key(base_file):
+                uses = read_stored_info(base_file, field='uses') or 0
+                return (uses, self._get_age_of_file(base_file)[1] * -1)
+        else:
+            def key(base_file):
+                return self._get_age_of_file(base_file)[1] * -1
+        return sorted(base_files, key=key)
+
+    def _evict_base_files(self, base_dir):
+        """Remove unused base files until the cache fits in its budget."""
+        budget = CONF.libvirt.image_cache_max_size_mb * units.Mi
+        cache_size = sum(self._get_disk_usage(os.path.join(base_dir, ent))
+                         for ent in os.listdir(base_dir))
+        if cache_size <= budget:
+            LOG.debug('Image cache uses %(size)d of %(budget)d bytes, '
+                      'keeping unused base files',
+                      {'size': cache_size, 'budget': budget})
+            return
+
+        for base_file in self._get_eviction_order(self.removable_base_files):
+            if cache_size <= budget:
+                break
+            size = self._get_disk_usage(base_file)
+            self._remove_old_enough_file(base_file, 0)
+            if not os.path.exists(base_file):
+                cache_size -= size
+
+        if cache_size > budget:
+            LOG.warn(_LW('Image cache uses %(size)d bytes, more than its '
+                         'budget of %(budget)d bytes, with only base files '
+                         'in use left'),
+                     {'size': cache_size, 'budget': budget})
+
+    def _list_prefetch_images(self, context):
+        """List the images to fetch into the cache ahead of time."""
+        prefetch_images = set(CONF.libvirt.image_cache_prefetch_images)
+        if CONF.libvirt.image_cache_prefetch_aggregates:
+            aggregates = objects.AggregateList.get_by_host(
+                context, CONF.host, key='image_cache_prefetch')
+            for aggregate in aggregates:
+                prefetch_images.update(
+                    compute_utils.get_prefetch_images(aggregate.metadata))
+        return prefetch_images
+
+    def prefetch(self, context, image_ids):
+        """Fetch the given images which are not cached yet in the background.
+
+        The images are downloaded with the given context, which must hold a
+        token when the image service authenticates with keystone.
+        """
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+        for img_id in sorted(set(image_ids)):
+            base_file = os.path.join(base_dir,
+                                     get_cache_fname({'id': img_id}, 'id'))
+            if os.path.exists(base_file) or img_id in self.prefetching:
+                continue
+            LOG.info(_LI('image %(id)s at (%(base_file)s): prefetching'),
+                     {'id': img_id,
+                      'base_file': base_file})
+            self.prefetching.add(img_id)
+            utils.spawn_n(self._prefetch_image, context, img_id, base_file)
+
+    def _prefetch_image(self, context, img_id, base_file):
+        # NOTE: take the lock imagebackend holds while fetching the
+        # same base file for an instance.
+        @utils.synchronized(os.path.basename(base_file), external=True,
+                            lock_path=self.lock_path)
+        def fetch_sync():
+            if not os.path.exists(base_file):
+                fileutils.ensure_tree(os.path.dirname(base_file))
+                libvirt_utils.fetch_image(context, base_file, img_id,
+                                          context.user_id,
+                                          context.project_id)
+
+        try:
+            fetch_sync()
+        except Exception as e:
+            LOG.error(_LE('image %(id)s: failed to prefetch, error '
+                          'was %(error)s'),
+                      {'id': img_id,
+                       'error': e})
+        finally:
+            self.prefetching.discard(img_id)
+
     def _age_and_verify_swap_images(self, context, base_dir):
         LOG.debug('Verify swap images')
 
@@ -584,7 +753,9 @@ class ImageCacheManager(imagecache.ImageCacheManager):
     def _age_and_verify_cached_images(self, context, all_instances, base_dir):
         LOG.debug('Verify base images')
         # Determine what images are on disk because they're in use
-        for img in self.used_images:
+        images = self.used_images.keys()
+        images.extend(sorted(self.prefetch_images - set(images)))
+        for img in images:
             fingerprint = hashlib.sha1(img).hexdigest()
             LOG.debug('Image id %(id)s yields fingerprint %(fingerprint)s',
                       {'id': img,
@@ -620,8 +791,11 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                      ' '.join(self.removable_base_files))
 
             if self.remove_unused_base_images:
-                for base_file in self.removable_base_files:
-                    self._remove_base_file(base_file)
+                if CONF.libvirt.image_cache_max_size_mb:
+                    self._evict_base_files(base_dir)
+                else:
+                    for base_file in self.removable_base_files:
+                        self._remove_base_file(base_file)
 
         # That's it
         LOG.debug('Verification complete')
@@ -652,6 +826,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             return
         # reset the local statistics
         self._reset_state()
+        # fetch the images wanted ahead of planned launches
+        self.prefetch_images = self._list_prefetch_images(context)
+        if CONF.auth_strategy != 'keystone' or context.auth_token:
+            self.prefetch(context, self.prefetch_images)
         # read the cached images
         self._list_base_images(base_dir)
         # read running instances data
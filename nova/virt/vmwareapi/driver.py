@@ -260,6 +260,14 @@ class VMwareVCDriver(driver.ComputeDriver):
             instances.extend(vmops.list_instances())
         return instances
 
+    def get_all_instance_power_states(self):
+        """Return the power states of the VM instances of all nodes."""
+        power_states = {}
+        for node in self.get_available_nodes():
+            vmops = self._get_vmops_for_compute_node(node)
+            power_states.update(vmops.get_all_power_states())
+        return power_states
+
     def migrate_disk_and_power_off(self, context, instance, dest,
                                    flavor, network_info,
                                    block_device_info=None,
@@ -1506,29 +1506,29 @@ class VMwareVMOps(object):
 
     def _get_valid_vms_from_retrieve_result(self, retrieve_result):
         """Returns list of valid vms from RetrieveResult object."""
-        lst_vm_names = []
+        return [vm_name for vm_name, props
+                in self._iter_valid_vms_from_retrieve_result(retrieve_result)]
 
+    def _iter_valid_vms_from_retrieve_result(self, retrieve_result):
+        """Yields the name and the properties of the valid vms from
+        RetrieveResult object.
+        """
         while retrieve_result:
             token = vm_util._get_token(retrieve_result)
             for vm in retrieve_result.objects:
-                vm_name = None
-                conn_state = None
-                for prop in vm.propSet:
-                    if prop.name == "name":
-                        vm_name = prop.val
-                    elif prop.name == "runtime.connectionState":
-                        conn_state = prop.val
+                props = {prop.name: prop.val for prop in vm.propSet}
+                vm_name = props.get("name")
+                conn_state = props.get("runtime.connectionState")
                 # Ignoring the orphaned or inaccessible VMs
                 if (conn_state not in ["orphaned", "inaccessible"] and
                     uuidutils.is_uuid_like(vm_name)):
-                    lst_vm_names.append(vm_name)
+                    yield vm_name, props
             if token:
                 retrieve_result = self._session._call_method(vim_util,
                                                  "continue_to_get_objects",
                                                  token)
             else:
                 break
-        return lst_vm_names
 
     def instance_exists(self, instance):
         try:
@@ -1785,6 +1785,21 @@ class VMwareVMOps(object):
         LOG.debug("Got total of %s instances", str(len(lst_vm_names)))
         return lst_vm_names
 
+    def get_all_power_states(self):
+        """Returns the power states of the VM instances that are registered
+        with vCenter cluster, by instance uuid.
+        """
+        properties = ['name', 'runtime.connectionState',
+                      'runtime.powerState']
+        vms = []
+        if self._root_resource_pool:
+            vms = self._session._call_method(
+                vim_util, 'get_inner_objects', self._root_resource_pool, 'vm',
+                'VirtualMachine', properties)
+        return {vm_name: VMWARE_POWER_STATES[props['runtime.powerState']]
+                for vm_name, props
+                in self._iter_valid_vms_from_retrieve_result(vms)}
+
     def get_vnc_console(self, instance):
         """Return connection info for a vnc console using vCenter logic."""
 
@@ -185,6 +185,12 @@ class XenAPIDriver(driver.ComputeDriver):
         """
         return self._vmops.list_instance_uuids()
 
+    def get_all_instance_power_states(self):
+        """Get the power states of the nova instances resident on the
+        hypervisor, by instance uuid.
+        """
+        return self._vmops.get_all_power_states()
+
     def spawn(self, context, instance, image_meta, injected_files,
               admin_password, network_info=None, block_device_info=None,
               flavor=None):
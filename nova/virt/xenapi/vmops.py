@@ -203,6 +203,18 @@ class VMOps(object):
                 nova_uuids.append(nova_uuid)
         return nova_uuids
 
+    def get_all_power_states(self):
+        """Get the power states of the nova instances whose VMs are resident
+        on the hypervisor, by instance uuid.
+        """
+        power_states = {}
+        for vm_ref, vm_rec in vm_utils.list_vms(self._session):
+            nova_uuid = vm_rec['other_config'].get('nova_uuid')
+            if nova_uuid:
+                power_states[nova_uuid] = vm_utils.XENAPI_POWER_STATE[
+                    vm_rec['power_state']]
+        return power_states
+
     def confirm_migration(self, migration, instance, network_info):
         self._destroy_orig_vm(instance, network_info)
 
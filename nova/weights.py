@@ -18,6 +18,7 @@ Pluggable Weighing support
 """
 
 import abc
+import time
 
 import six
 
@@ -121,6 +122,14 @@ class BaseWeigher(object):
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
+    def _record_weigher_run(self, cls_name, elapsed, num_objs):
+        """Called after each weigher run with its duration in seconds and
+        the number of objects it weighed.
+
+        Override in a subclass to collect statistics.
+        """
+        pass
+
     def get_weighed_objects(self, weighers, obj_list, weighing_properties):
         """Return a sorted (descending), normalized list of WeighedObjects."""
 
@@ -129,6 +138,7 @@ class BaseWeightHandler(loadables.BaseLoader):
 
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
         for weigher in weighers:
+            start = time.time()
             weights = weigher.weigh_objects(weighed_objs, weighing_properties)
 
             # Normalize the weights
@@ -139,5 +149,7 @@ class BaseWeightHandler(loadables.BaseLoader):
             for i, weight in enumerate(weights):
                 obj = weighed_objs[i]
                 obj.weight += weigher.weight_multiplier() * weight
+            self._record_weigher_run(weigher.__class__.__name__,
+                                     time.time() - start, len(weighed_objs))
 
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)